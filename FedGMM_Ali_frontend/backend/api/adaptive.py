@@ -1,21 +1,44 @@
 from flask import Blueprint, jsonify, request
 import os
 import json
+import numpy as np
+from backend.utils.shared_data import shared_data
+from backend.api.responses import json_response
 
 # 创建蓝图
 adaptive_api = Blueprint('adaptive_api', __name__)
 
-# 模拟数据
-mock_adaptive_data = []
-for round_num in range(1, 11):
-    for client_id in range(1, 5):
-        mock_adaptive_data.append({
-            'round': round_num,
-            'client_id': client_id,
-            'tau_star': min(round(5 + round_num * 0.5 + client_id * 0.2, 2), 10),
-            'accuracy': round(0.6 + round_num * 0.03 + client_id * 0.01, 3),
-            'loss': round(1.2 - round_num * 0.05 - client_id * 0.01, 3)
-        })
+# 共享内存中的数据集名称
+ADAPTIVE_DATASET = 'adaptive'
+
+def build_adaptive_columns():
+    """
+    生成模拟自适应迭代数据（列式）
+    
+    Returns:
+        dict: 列名 -> NumPy数组
+    """
+    rows = []
+    for round_num in range(1, 11):
+        for client_id in range(1, 5):
+            rows.append((
+                round_num,
+                client_id,
+                min(round(5 + round_num * 0.5 + client_id * 0.2, 2), 10),
+                round(0.6 + round_num * 0.03 + client_id * 0.01, 3),
+                round(1.2 - round_num * 0.05 - client_id * 0.01, 3)
+            ))
+    
+    round_col, client_col, tau_col, accuracy_col, loss_col = zip(*rows)
+    return {
+        'round': np.array(round_col, dtype=np.int32),
+        'client_id': np.array(client_col, dtype=np.int32),
+        'tau_star': np.array(tau_col, dtype=np.float64),
+        'accuracy': np.array(accuracy_col, dtype=np.float64),
+        'loss': np.array(loss_col, dtype=np.float64)
+    }
+
+shared_data.register(ADAPTIVE_DATASET, build_adaptive_columns)
 
 @adaptive_api.route('/data', methods=['GET'])
 def get_adaptive_data():
@@ -63,28 +86,33 @@ def get_adaptive_data():
         start_round = request.args.get('start_round', type=int)
         end_round = request.args.get('end_round', type=int)
         
-        # 过滤数据
-        filtered_data = mock_adaptive_data.copy()
+        # 过滤数据（在共享内存列上按掩码筛选）
+        table = shared_data.table(ADAPTIVE_DATASET)
+        mask = np.ones(len(table), dtype=bool)
         
         if client_id:
-            filtered_data = [item for item in filtered_data if item['client_id'] == client_id]
+            mask &= table['client_id'] == client_id
         
         if start_round:
-            filtered_data = [item for item in filtered_data if item['round'] >= start_round]
+            mask &= table['round'] >= start_round
         
         if end_round:
-            filtered_data = [item for item in filtered_data if item['round'] <= end_round]
+            mask &= table['round'] <= end_round
+        
+        rows = np.flatnonzero(mask)
+        filtered_data = table.to_records(rows)
+        tau_star = table['tau_star'][rows]
         
         # 计算统计信息
         statistics = {
-            'total_rounds': len(set(item['round'] for item in filtered_data)),
-            'total_clients': len(set(item['client_id'] for item in filtered_data)),
-            'average_tau_star': round(sum(item['tau_star'] for item in filtered_data) / len(filtered_data), 2) if filtered_data else 0,
-            'max_tau_star': max(item['tau_star'] for item in filtered_data) if filtered_data else 0,
-            'min_tau_star': min(item['tau_star'] for item in filtered_data) if filtered_data else 0
+            'total_rounds': len(np.unique(table['round'][rows])),
+            'total_clients': len(np.unique(table['client_id'][rows])),
+            'average_tau_star': round(sum(tau_star.tolist()) / len(rows), 2) if len(rows) else 0,
+            'max_tau_star': float(tau_star.max()) if len(rows) else 0,
+            'min_tau_star': float(tau_star.min()) if len(rows) else 0
         }
         
-        return jsonify({
+        return json_response({
             'data': filtered_data,
             'statistics': statistics
         })
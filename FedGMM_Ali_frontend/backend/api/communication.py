@@ -1,30 +1,48 @@
 from flask import Blueprint, jsonify, request
 import os
 import json
+import numpy as np
+from backend.utils.shared_data import shared_data
+from backend.api.responses import json_response
 
 # 创建蓝图
 communication_api = Blueprint('communication', __name__)
 
-# 生成模拟通信数据
-mock_communication_data = []
-for round_num in range(0, 51):
-    for client_id in range(0, 3):
-        # 生成模拟数据
-        original_size = 1000000 + round_num * 10000 + client_id * 5000
-        compressed_size = int(original_size * (0.4 - round_num * 0.005 + client_id * 0.02))
-        compression_ratio = compressed_size / original_size
-        savings = original_size - compressed_size
-        savings_percentage = savings / original_size
-        
-        mock_communication_data.append({
-            'round': round_num,
-            'client_id': client_id,
-            'original_size': original_size,
-            'compressed_size': compressed_size,
-            'compression_ratio': round(compression_ratio, 4),
-            'savings': savings,
-            'savings_percentage': round(savings_percentage, 4)
-        })
+# 共享内存中的数据集名称
+COMMUNICATION_DATASET = 'communication'
+
+def build_communication_columns():
+    """
+    生成模拟通信数据（列式）
+    
+    Returns:
+        dict: 列名 -> NumPy数组
+    """
+    rows = []
+    for round_num in range(0, 51):
+        for client_id in range(0, 3):
+            # 生成模拟数据
+            original_size = 1000000 + round_num * 10000 + client_id * 5000
+            compressed_size = int(original_size * (0.4 - round_num * 0.005 + client_id * 0.02))
+            compression_ratio = compressed_size / original_size
+            savings = original_size - compressed_size
+            savings_percentage = savings / original_size
+            
+            rows.append((round_num, client_id, original_size, compressed_size,
+                         round(compression_ratio, 4), savings, round(savings_percentage, 4)))
+    
+    round_col, client_col, original_col, compressed_col, ratio_col, savings_col, percentage_col = zip(*rows)
+    return {
+        'round': np.array(round_col, dtype=np.int32),
+        'client_id': np.array(client_col, dtype=np.int32),
+        'original_size': np.array(original_col, dtype=np.int64),
+        'compressed_size': np.array(compressed_col, dtype=np.int64),
+        'compression_ratio': np.array(ratio_col, dtype=np.float64),
+        'savings': np.array(savings_col, dtype=np.int64),
+        'savings_percentage': np.array(percentage_col, dtype=np.float64)
+    }
+
+shared_data.register(COMMUNICATION_DATASET, build_communication_columns)
 
 @communication_api.route('/data', methods=['GET'])
 def get_communication_data():
@@ -89,28 +107,32 @@ def get_communication_data():
         start_round = request.args.get('start_round', type=int)
         end_round = request.args.get('end_round', type=int)
         
-        # 过滤数据
-        filtered_data = mock_communication_data.copy()
+        # 过滤数据（在共享内存列上按掩码筛选）
+        table = shared_data.table(COMMUNICATION_DATASET)
+        mask = np.ones(len(table), dtype=bool)
         
         if client_id is not None:
-            filtered_data = [item for item in filtered_data if item['client_id'] == client_id]
+            mask &= table['client_id'] == client_id
         
         if start_round is not None:
-            filtered_data = [item for item in filtered_data if item['round'] >= start_round]
+            mask &= table['round'] >= start_round
         
         if end_round is not None:
-            filtered_data = [item for item in filtered_data if item['round'] <= end_round]
+            mask &= table['round'] <= end_round
+        
+        rows = np.flatnonzero(mask)
+        filtered_data = table.to_records(rows)
         
         # 计算统计信息
-        if filtered_data:
-            avg_compression = sum(item['compression_ratio'] for item in filtered_data) / len(filtered_data)
-            total_savings = sum(item['savings'] for item in filtered_data)
-            total_original = sum(item['original_size'] for item in filtered_data)
+        if len(rows):
+            avg_compression = sum(table['compression_ratio'][rows].tolist()) / len(rows)
+            total_savings = int(table['savings'][rows].sum())
+            total_original = int(table['original_size'][rows].sum())
             savings_percentage = total_savings / total_original if total_original > 0 else 0
             
             statistics = {
-                'total_rounds': len(set(item['round'] for item in filtered_data)),
-                'total_clients': len(set(item['client_id'] for item in filtered_data)),
+                'total_rounds': len(np.unique(table['round'][rows])),
+                'total_clients': len(np.unique(table['client_id'][rows])),
                 'avg_compression': round(avg_compression, 4),
                 'total_savings': total_savings,
                 'savings_percentage': round(savings_percentage, 4)
@@ -124,7 +146,7 @@ def get_communication_data():
                 'savings_percentage': 0
             }
         
-        return jsonify({
+        return json_response({
             'data': filtered_data,
             'statistics': statistics
         })
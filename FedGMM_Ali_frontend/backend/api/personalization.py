@@ -1,36 +1,107 @@
 from flask import Blueprint, jsonify, request
 import os
 import json
+import numpy as np
+from backend.utils.gmm_inference import GMMInference
+from backend.utils.shared_data import shared_data
+from backend.api.responses import json_response
 
 # 创建蓝图
 personalization_api = Blueprint('personalization_api', __name__)
 
-# 模拟数据
-mock_personalization_data = []
-for round_num in range(1, 11):
-    for client_id in range(1, 5):
-        # 生成γ权重，确保和为1
-        gamma1 = round(0.3 + round_num * 0.02 + client_id * 0.01, 3)
-        gamma2 = round(0.3 + round_num * 0.01 + client_id * 0.02, 3)
-        gamma3 = round(0.4 - round_num * 0.03 - client_id * 0.03, 3)
-        
-        # 确保权重和为1
-        total = gamma1 + gamma2 + gamma3
-        gamma1 = round(gamma1 / total, 3)
-        gamma2 = round(gamma2 / total, 3)
-        gamma3 = round(gamma3 / total, 3)
+# 共享内存中的数据集名称
+PERSONALIZATION_DATASET = 'personalization'
+# γ权重按分量拆分为 gamma_1、gamma_2、gamma_3 三列
+GAMMA_COMPONENTS = ('1', '2', '3')
+
+def build_personalization_columns():
+    """
+    生成模拟个性化权重数据（列式）
+    
+    Returns:
+        dict: 列名 -> NumPy数组
+    """
+    rows = []
+    for round_num in range(1, 11):
+        for client_id in range(1, 5):
+            # 生成γ权重，确保和为1
+            gamma1 = round(0.3 + round_num * 0.02 + client_id * 0.01, 3)
+            gamma2 = round(0.3 + round_num * 0.01 + client_id * 0.02, 3)
+            gamma3 = round(0.4 - round_num * 0.03 - client_id * 0.03, 3)
+            
+            # 确保权重和为1
+            total = gamma1 + gamma2 + gamma3
+            gamma1 = round(gamma1 / total, 3)
+            gamma2 = round(gamma2 / total, 3)
+            gamma3 = round(gamma3 / total, 3)
+            
+            rows.append((
+                round_num,
+                client_id,
+                gamma1,
+                gamma2,
+                gamma3,
+                round(0.65 + round_num * 0.02 + client_id * 0.015, 3),
+                round(0.6 + round_num * 0.02, 3)
+            ))
+    
+    round_col, client_col, gamma1_col, gamma2_col, gamma3_col, personal_col, global_col = zip(*rows)
+    return {
+        'round': np.array(round_col, dtype=np.int32),
+        'client_id': np.array(client_col, dtype=np.int32),
+        'gamma_1': np.array(gamma1_col, dtype=np.float64),
+        'gamma_2': np.array(gamma2_col, dtype=np.float64),
+        'gamma_3': np.array(gamma3_col, dtype=np.float64),
+        'personalization_accuracy': np.array(personal_col, dtype=np.float64),
+        'global_accuracy': np.array(global_col, dtype=np.float64)
+    }
+
+shared_data.register(PERSONALIZATION_DATASET, build_personalization_columns)
+
+def personalization_records(table, rows):
+    """
+    将共享表中的行转换为接口返回的记录（γ权重还原为字典）
+    
+    Args:
+        table: 个性化数据共享表
+        rows: 行号数组
         
-        mock_personalization_data.append({
-            'round': round_num,
-            'client_id': client_id,
-            'gamma': {
-                '1': gamma1,
-                '2': gamma2,
-                '3': gamma3
-            },
-            'personalization_accuracy': round(0.65 + round_num * 0.02 + client_id * 0.015, 3),
-            'global_accuracy': round(0.6 + round_num * 0.02, 3)
-        })
+    Returns:
+        list: 记录列表
+    """
+    records = table.to_records(rows)
+    for record in records:
+        record['gamma'] = {k: record.pop(f'gamma_{k}') for k in GAMMA_COMPONENTS}
+    return records
+
+# 模拟GMM子模型参数（3个分量，4维用户特征）
+_gmm_rng = np.random.default_rng(0)
+mock_gmm_model = GMMInference(
+    means=_gmm_rng.normal(0, 2, size=(3, 4)),
+    variances=_gmm_rng.uniform(0.5, 1.5, size=(3, 4))
+)
+
+def get_client_gamma(client_id, round_num=None):
+    """
+    获取客户端在指定轮次（默认最新轮次）的γ权重
+
+    Args:
+        client_id: 客户端ID
+        round_num: 轮次（可选）
+
+    Returns:
+        dict: γ权重字典，不存在时返回None
+    """
+    table = shared_data.table(PERSONALIZATION_DATASET)
+    mask = table['client_id'] == client_id
+    if round_num:
+        mask &= table['round'] == round_num
+    rows = np.flatnonzero(mask)
+    if not len(rows):
+        return None
+    # 同一客户端取轮次最大的一行（并列时取最先出现的）
+    row = rows[np.argmax(table['round'][rows])]
+    return {k: float(table[f'gamma_{k}'][row]) for k in GAMMA_COMPONENTS}
 
 @personalization_api.route('/data', methods=['GET'])
 def get_personalization_data():
@@ -75,24 +146,28 @@ def get_personalization_data():
         client_id = request.args.get('client_id', type=int)
         round_num = request.args.get('round', type=int)
         
-        # 过滤数据
-        filtered_data = mock_personalization_data.copy()
+        # 过滤数据（在共享内存列上按掩码筛选）
+        table = shared_data.table(PERSONALIZATION_DATASET)
+        mask = np.ones(len(table), dtype=bool)
         
         if client_id:
-            filtered_data = [item for item in filtered_data if item['client_id'] == client_id]
+            mask &= table['client_id'] == client_id
         
         if round_num:
-            filtered_data = [item for item in filtered_data if item['round'] == round_num]
+            mask &= table['round'] == round_num
+        
+        rows = np.flatnonzero(mask)
+        filtered_data = personalization_records(table, rows)
         
         # 计算统计信息
         statistics = {
-            'total_rounds': len(set(item['round'] for item in filtered_data)),
-            'total_clients': len(set(item['client_id'] for item in filtered_data)),
-            'average_personalization_accuracy': round(sum(item['personalization_accuracy'] for item in filtered_data) / len(filtered_data), 3) if filtered_data else 0,
-            'average_global_accuracy': round(sum(item['global_accuracy'] for item in filtered_data) / len(filtered_data), 3) if filtered_data else 0
+            'total_rounds': len(np.unique(table['round'][rows])),
+            'total_clients': len(np.unique(table['client_id'][rows])),
+            'average_personalization_accuracy': round(sum(table['personalization_accuracy'][rows].tolist()) / len(rows), 3) if len(rows) else 0,
+            'average_global_accuracy': round(sum(table['global_accuracy'][rows].tolist()) / len(rows), 3) if len(rows) else 0
         }
         
-        return jsonify({
+        return json_response({
             'data': filtered_data,
             'statistics': statistics
         })
@@ -103,3 +178,58 @@ def get_personalization_data():
             'data': [],
             'statistics': {}
         }), 500
+
+@personalization_api.route('/responsibility', methods=['POST'])
+def get_responsibility():
+    """
+    计算用户特征在各GMM分量上的责任度（按客户端γ权重混合）
+    ---
+    parameters:
+      - name: features
+        in: body
+        type: array
+        required: true
+        description: 用户特征矩阵 (N, D)
+      - name: client_id
+        in: body
+        type: integer
+        required: true
+        description: 客户端ID
+      - name: round
+        in: body
+        type: integer
+        description: 轮次，默认最新轮次
+    responses:
+      200:
+        description: 成功计算责任度
+    """
+    try:
+        data = request.get_json()
+        features = data.get('features')
+        client_id = data.get('client_id')
+        round_num = data.get('round')
+        
+        # 验证参数
+        if not features or not client_id:
+            return jsonify({'error': '缺少必要参数'}), 400
+        
+        gamma = get_client_gamma(client_id, round_num)
+        if gamma is None:
+            return jsonify({'error': '客户端或轮次不存在'}), 404
+        
+        try:
+            X = np.asarray(features, dtype=np.float64)
+            responsibilities = mock_gmm_model.responsibilities(X, gamma)
+            summary = mock_gmm_model.summarize(X, gamma)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'client_id': client_id,
+            'gamma': gamma,
+            'responsibilities': np.round(responsibilities, 4).tolist(),
+            'statistics': summary
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
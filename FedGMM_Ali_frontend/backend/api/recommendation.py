@@ -1,10 +1,21 @@
 from flask import Blueprint, jsonify, request
 import os
 import json
+import zlib
+import numpy as np
+from backend.utils.poi_catalog import POICatalog, StringTable
+from backend.utils.feature_store import FeatureStore
+from backend.api.personalization import mock_gmm_model
 
 # 创建蓝图
 recommendation_api = Blueprint('recommendation_api', __name__)
 
+# 数据目录路径
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data')
+
+# 用户特征库（由训练轮次发布，按城市内存映射）
+feature_store = FeatureStore(os.path.join(DATA_DIR, 'features'))
+
 # 模拟城市数据
 cities = ['北京', '上海', '广州', '深圳', '杭州']
 
@@ -47,6 +58,47 @@ mock_recommendation_data = {
     ]
 }
 
+# 列式POI目录（各城市共享名称字符串表）
+poi_names = StringTable()
+poi_catalogs = {
+    city: POICatalog.from_records(records, names=poi_names)
+    for city, records in mock_recommendation_data.items()
+}
+
+# 各GMM分量（子模型）对POI的模拟打分，形状 (K, POI数)
+_component_rng = np.random.default_rng(1)
+poi_component_scores = {
+    city: catalog.score[None, :] * _component_rng.uniform(0.8, 1.2, size=(mock_gmm_model.n_components, len(catalog)))
+    for city, catalog in poi_catalogs.items()
+}
+
+def recommend_top_k(city, user_id, top_k):
+    """
+    为用户生成指定城市的前K个推荐
+
+    Args:
+        city: 城市
+        user_id: 用户ID
+        top_k: 返回前K个推荐
+
+    Returns:
+        list: 带排名的推荐字典列表
+    """
+    catalog = poi_catalogs[city]
+    if isinstance(user_id, int):
+        features, found = feature_store.lookup(city, [user_id])
+    else:
+        features, found = None, [False]
+    if found[0] and features.shape[1] == mock_gmm_model.n_features:
+        # 特征库中有该用户：按GMM责任度混合各子模型打分
+        scores = mock_gmm_model.mixed_score(features, poi_component_scores[city])[0]
+    else:
+        # 根据用户ID生成打分（模拟个性化）
+        # default_rng 只接受非负种子，负数ID按64位补码映射
+        seed = user_id & 0xFFFFFFFFFFFFFFFF if isinstance(user_id, int) else zlib.crc32(str(user_id).encode('utf-8'))
+        scores = np.random.default_rng(seed).random(len(catalog))
+    return catalog.to_records(catalog.top_k(scores, top_k))
+
 @recommendation_api.route('/generate', methods=['POST'])
 def generate_recommendation():
     """
@@ -117,20 +169,8 @@ def generate_recommendation():
         if city not in cities:
             return jsonify({'error': '城市不存在'}), 400
         
-        # 获取推荐数据
-        recommendations = mock_recommendation_data.get(city, [])
-        
-        # 根据用户ID调整推荐顺序（模拟个性化）
-        import random
-        random.seed(user_id)
-        random.shuffle(recommendations)
-        
-        # 截取前K个
-        recommendations = recommendations[:top_k]
-        
-        # 为每个推荐添加排名
-        for i, rec in enumerate(recommendations):
-            rec['rank'] = i + 1
+        # 获取前K个推荐（仅最终结果转换为字典）
+        recommendations = recommend_top_k(city, user_id, top_k)
         
         return jsonify({
             'recommendations': recommendations,
@@ -226,20 +266,8 @@ def compare_cities():
         # 获取每个城市的推荐数据
         comparisons = []
         for city in valid_cities:
-            # 获取推荐数据
-            recommendations = mock_recommendation_data.get(city, [])
-            
-            # 根据用户ID调整推荐顺序（模拟个性化）
-            import random
-            random.seed(user_id)
-            random.shuffle(recommendations)
-            
-            # 截取前K个
-            recommendations = recommendations[:top_k]
-            
-            # 为每个推荐添加排名
-            for i, rec in enumerate(recommendations):
-                rec['rank'] = i + 1
+            # 获取前K个推荐
+            recommendations = recommend_top_k(city, user_id, top_k)
             
             comparisons.append({
                 'city': city,
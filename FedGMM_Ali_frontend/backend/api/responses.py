@@ -0,0 +1,52 @@
+from flask import jsonify, request, Response, stream_with_context
+from backend.utils.crypto_utils import secure_server
+
+# 分块加密响应的媒体类型与响应头
+ENCRYPTED_STREAM_MIMETYPE = 'application/octet-stream'
+ENCRYPTED_STREAM_HEADERS = {'X-Encryption': 'AES-GCM-STREAM', 'Cache-Control': 'no-cache'}
+
+
+# 按会话ID构建JSON响应（Flask 与 Quart 版本共用）
+def build_json_response(payload, session_id, jsonify, stream_response):
+    """
+    会话ID为空时返回普通JSON；会话不存在时返回401；否则把分块加密流交给 stream_response 包装
+
+    Args:
+        payload: 响应数据
+        session_id: 请求头 X-Session-Id 的值
+        jsonify: 所用框架的 jsonify
+        stream_response: 接收加密分块迭代器、返回流式响应的函数
+
+    Returns:
+        Response: 框架响应
+    """
+    if not session_id:
+        return jsonify(payload)
+    if secure_server.sessions.get(session_id) is None:
+        return jsonify({
+            'success': False,
+            'session_expired': True,
+            'message': '加密会话不存在或已过期'
+        }), 401
+    return stream_response(secure_server.encrypt_stream(payload, session_id))
+
+
+# 按请求头 X-Session-Id 返回分块加密的JSON流
+def json_response(payload):
+    """
+    返回JSON响应；请求携带加密会话ID时改为分块AES-GCM加密流，边序列化边发送
+
+    Args:
+        payload: 响应数据
+
+    Returns:
+        Response: Flask响应
+    """
+    return build_json_response(
+        payload, request.headers.get('X-Session-Id'), jsonify,
+        lambda chunks: Response(
+            stream_with_context(chunks),
+            mimetype=ENCRYPTED_STREAM_MIMETYPE,
+            headers=ENCRYPTED_STREAM_HEADERS
+        )
+    )
@@ -1,8 +1,19 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 import os
-import threading
+import json
 from backend.utils.ssh_client import SSHClient
-from backend.utils.crypto_utils import secure_server
+from backend.utils.ssh_pool import ssh_pool, make_key
+from backend.utils.ssh_connector import ssh_connector
+from backend.utils.ssh_health import ssh_health
+from backend.utils.ssh_jobs import command_jobs
+from backend.utils.training_monitor import training_monitors
+from backend.utils.training_fanout import TrainingShard, assign_shards, training_fanout
+from backend.utils.job_queue import JOB_QUEUED, JOB_DISPATCHING, JOB_FAILED, training_queue
+from backend.utils.sweep import expand_grid, sample_random, sweep_launcher
+from backend.utils.metric_series import metric_series
+from backend.utils.artifact_sync import ArtifactSync, ARTIFACT_CATEGORIES, artifact_syncs
+from backend.utils.crypto_utils import secure_server, KEY_READY_TIMEOUT
+from backend.api.responses import json_response
 
 # 创建蓝图
 system_api = Blueprint('system', __name__)
@@ -10,14 +21,12 @@ system_api = Blueprint('system', __name__)
 # 数据目录路径
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data')
 
-# 创建线程本地存储，为每个线程维护独立的SSH客户端实例
-thread_local = threading.local()
+# 进程级SSH客户端，所有请求线程共享连接池中的已认证连接
+ssh_client = SSHClient(pool=ssh_pool, connector=ssh_connector)
 
 def get_ssh_client():
-    """获取当前线程的SSH客户端实例"""
-    if not hasattr(thread_local, 'ssh_client'):
-        thread_local.ssh_client = SSHClient()
-    return thread_local.ssh_client
+    """获取进程共享的SSH客户端实例"""
+    return ssh_client
 
 # 检查数据文件是否存在
 def check_data_exists():
@@ -80,6 +89,114 @@ def get_system_status():
             'system_status': '系统状态获取失败'
         }), 500
 
+# 以下辅助函数由同步接口与 asyncio 接口（system_async.py）共用：
+# 返回 (响应数据, 状态码)，处理函数可直接返回（Flask 与 Quart 都会把字典序列化为JSON）
+
+def failure(message, status=400, **extra):
+    """
+    构建失败响应
+
+    Args:
+        message: 错误信息
+        status: HTTP状态码
+        **extra: 附加字段
+
+    Returns:
+        tuple: (响应数据, 状态码)
+    """
+    return dict({'success': False, 'message': message}, **extra), status
+
+def require_connection():
+    """
+    获取当前SSH连接
+
+    Returns:
+        tuple: (未连接时的错误响应或None, 连接)
+    """
+    connection = get_ssh_client().get_connection()
+    if connection is None:
+        return failure('SSH未连接，请先连接到服务器'), None
+    return None, connection
+
+def ssh_connect_params(data):
+    """
+    校验并提取SSH连接参数
+
+    Args:
+        data: 请求JSON
+
+    Returns:
+        tuple: (参数缺失时的错误响应或None, connect_async 的关键字参数)
+    """
+    hostname = data.get('hostname')
+    username = data.get('username')
+
+    # 验证必要参数
+    if not hostname or not username:
+        return failure('缺少必要参数: hostname 和 username'), None
+
+    return None, {
+        'hostname': hostname,
+        'username': username,
+        'password': data.get('password'),
+        'key_filename': data.get('key_filename'),
+        'port': data.get('port', 22),
+        'timeout': data.get('timeout', 30),
+        'max_retries': data.get('max_retries', 3),
+        'retry_delay': data.get('retry_delay', 1)
+    }
+
+def ssh_connect_result(attempt):
+    """根据后台连接的当前状态构建响应，连接尚未完成时返回202"""
+    return {
+        'success': attempt.status != 'failed',
+        'pending': attempt.status == 'pending',
+        'message': attempt.message,
+        'connection_status': get_ssh_client().get_connection_status()
+    }, 202 if attempt.status == 'pending' else 200
+
+def command_submitted_result(job):
+    """构建命令任务已提交的响应"""
+    return {
+        'success': True,
+        'job_id': job.job_id,
+        'job': job.to_dict(),
+        'message': '命令任务已提交'
+    }, 202
+
+def command_finished_result(job):
+    """构建命令任务结束后的响应，附带全部输出"""
+    output = job.read()
+    success = job.status == 'completed'
+    return {
+        'success': success,
+        'job_id': job.job_id,
+        'stdout': output['stdout'],
+        'stderr': output['stderr'],
+        'message': job.error_message if not success else '命令执行成功'
+    }, 200
+
+def command_output_lines(job, offsets, finished):
+    """
+    读取命令任务在偏移量之后的新输出，格式化为NDJSON行
+
+    Args:
+        job: 命令任务
+        offsets: [stdout偏移量, stderr偏移量]，原地更新
+        finished: 读取前任务是否已结束
+
+    Returns:
+        list: NDJSON行；任务结束时最后一行为任务信息
+    """
+    output = job.read(offsets[0], offsets[1])
+    offsets[:] = [output['stdout_offset'], output['stderr_offset']]
+    lines = []
+    if output['stdout'] or output['stderr'] or output['truncated']:
+        lines.append(json.dumps(output, ensure_ascii=False) + '\n')
+    if finished:
+        lines.append(json.dumps({'job': job.to_dict()}, ensure_ascii=False) + '\n')
+    return lines
+
 # SSH连接API
 @system_api.route('/ssh/connect', methods=['POST'])
 def ssh_connect():
@@ -87,80 +204,121 @@ def ssh_connect():
     try:
         # 获取请求参数
         data = request.json
-        hostname = data.get('hostname')
-        username = data.get('username')
-        password = data.get('password')
-        key_filename = data.get('key_filename')
-        port = data.get('port', 22)
-        timeout = data.get('timeout', 30)
-        max_retries = data.get('max_retries', 3)
-        retry_delay = data.get('retry_delay', 5)
+        error, params = ssh_connect_params(data)
+        if error:
+            return error
         
-        # 验证必要参数
-        if not hostname or not username:
-            return jsonify({
-                'success': False,
-                'message': '缺少必要参数: hostname 和 username'
-            }), 400
+        # 在后台连接SSH服务器，请求立即返回
+        attempt = get_ssh_client().connect_async(**params)
         
-        # 连接到SSH服务器
-        success, message = get_ssh_client().connect(
-            hostname=hostname,
-            username=username,
-            password=password,
-            key_filename=key_filename,
-            port=port,
-            timeout=timeout,
-            max_retries=max_retries,
-            retry_delay=retry_delay
-        )
+        # 可选：最多等待 wait 秒
+        wait = data.get('wait')
+        if wait:
+            attempt.wait(timeout=float(wait))
         
-        return jsonify({
-            'success': success,
-            'message': message,
-            'connection_status': get_ssh_client().get_connection_status()
-        })
+        return ssh_connect_result(attempt)
     except Exception as e:
-        return jsonify({
-            'success': False,
-            'message': f'连接错误: {str(e)}'
-        }), 500
+        return failure(f'连接错误: {str(e)}', 500)
 
 # SSH执行命令API
 @system_api.route('/ssh/execute', methods=['POST'])
 def ssh_execute():
-    """执行SSH命令"""
+    """提交SSH命令任务，立即返回任务ID（wait=true 时等待完成并返回全部输出）"""
     try:
         # 获取请求参数
         data = request.json
         command = data.get('command')
-        timeout = data.get('timeout', 60)
         
         # 验证必要参数
         if not command:
+            return failure('缺少必要参数: command')
+        
+        # 检查SSH连接状态
+        error, connection = require_connection()
+        if error:
+            return error
+        
+        # 提交命令任务
+        job = command_jobs.submit(connection, command, timeout=data.get('timeout', 60))
+        if not data.get('wait', False):
+            return command_submitted_result(job)
+        
+        # 兼容同步调用：等待任务结束
+        job.wait()
+        return command_finished_result(job)
+    except Exception as e:
+        return failure(f'执行错误: {str(e)}', 500)
+
+# SSH命令任务列表API
+@system_api.route('/ssh/jobs')
+def ssh_list_jobs():
+    """列出SSH命令任务"""
+    return jsonify({
+        'success': True,
+        'jobs': command_jobs.list()
+    })
+
+# SSH命令任务输出API
+@system_api.route('/ssh/jobs/<job_id>')
+def ssh_job_output(job_id):
+    """按偏移量获取SSH命令任务的输出"""
+    try:
+        job = command_jobs.get(job_id)
+        if job is None:
             return jsonify({
                 'success': False,
-                'message': '缺少必要参数: command'
-            }), 400
+                'message': '任务不存在'
+            }), 404
         
-        # 执行命令
-        success, stdout, stderr, error_msg = get_ssh_client().execute_command(
-            command=command,
-            timeout=timeout
-        )
+        stdout_offset = request.args.get('stdout_offset', 0, type=int)
+        stderr_offset = request.args.get('stderr_offset', 0, type=int)
+        max_chars = request.args.get('max_chars', type=int)
         
         return jsonify({
-            'success': success,
-            'stdout': stdout,
-            'stderr': stderr,
-            'message': error_msg if not success else '命令执行成功'
+            'success': True,
+            'job': job.to_dict(),
+            'output': job.read(stdout_offset, stderr_offset, max_chars)
         })
     except Exception as e:
         return jsonify({
             'success': False,
-            'message': f'执行错误: {str(e)}'
+            'message': f'获取任务输出错误: {str(e)}'
         }), 500
 
+# SSH命令任务输出流API
+@system_api.route('/ssh/jobs/<job_id>/stream')
+def ssh_job_stream(job_id):
+    """以NDJSON流的形式持续推送SSH命令任务的输出，直到任务结束"""
+    job = command_jobs.get(job_id)
+    if job is None:
+        return failure('任务不存在', 404)
+    
+    offsets = [request.args.get('stdout_offset', 0, type=int), request.args.get('stderr_offset', 0, type=int)]
+    
+    def generate():
+        while True:
+            job.wait_for_output(offsets[0], offsets[1], timeout=15)
+            finished = job.finished
+            yield from command_output_lines(job, offsets, finished)
+            if finished:
+                return
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# SSH取消命令任务API
+@system_api.route('/ssh/jobs/<job_id>/cancel', methods=['POST'])
+def ssh_cancel_job(job_id):
+    """取消SSH命令任务"""
+    if not command_jobs.cancel(job_id):
+        return jsonify({
+            'success': False,
+            'message': '任务不存在'
+        }), 404
+    return jsonify({
+        'success': True,
+        'message': '已请求取消任务'
+    })
+
 # SSH获取连接状态API
 @system_api.route('/ssh/status')
 def ssh_status():
@@ -168,7 +326,10 @@ def ssh_status():
     try:
         return jsonify({
             'success': True,
-            'connection_status': get_ssh_client().get_connection_status()
+            'connection_status': get_ssh_client().get_connection_status(),
+            'pool': ssh_pool.stats(),
+            # 后台保活探测得到的往返时延与自动重连情况
+            'health': ssh_health.status()
         })
     except Exception as e:
         return jsonify({
@@ -197,6 +358,13 @@ def ssh_close():
 def get_public_key():
     """获取服务器公钥"""
     try:
+        # 密钥可能仍在后台生成，超时返回503让客户端稍后重试
+        secure_server.crypto.load_in_background()
+        if not secure_server.crypto.ensure_keys(timeout=KEY_READY_TIMEOUT):
+            return jsonify({
+                'success': False,
+                'message': '服务器密钥正在生成，请稍后重试'
+            }), 503
         public_key = secure_server.crypto.get_public_key_pem()
         return jsonify({
             'public_key': public_key,
@@ -208,6 +376,40 @@ def get_public_key():
             'message': f'获取公钥失败: {str(e)}'
         }), 500
 
+# 建立加密会话
+@system_api.route('/session', methods=['POST'])
+def open_crypto_session():
+    """会话握手：客户端用服务器公钥加密AES会话密钥，之后的加密请求只需对称解密"""
+    try:
+        session = secure_server.open_session(request.json)
+        return jsonify(dict(session, success=True))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': f'建立加密会话失败: {str(e)}'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'建立加密会话失败: {str(e)}'
+        }), 500
+
+# 关闭加密会话
+@system_api.route('/session/<session_id>/close', methods=['POST'])
+def close_crypto_session(session_id):
+    """关闭加密会话"""
+    try:
+        closed = secure_server.close_session(session_id)
+        return jsonify({
+            'success': closed,
+            'message': '会话已关闭' if closed else '会话不存在或已过期'
+        }), 200 if closed else 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'关闭加密会话失败: {str(e)}'
+        }), 500
+
 # 处理加密的SSH凭证
 @system_api.route('/ssh-credentials', methods=['POST'])
 def handle_ssh_credentials():
@@ -216,6 +418,16 @@ def handle_ssh_credentials():
         # 获取加密的请求数据
         encrypted_request = request.json
         
+        # 会话已过期时返回401，客户端重新握手后重试
+        encryption_info = encrypted_request.get('encryption') if isinstance(encrypted_request, dict) else None
+        session_id = encryption_info.get('session_id') if isinstance(encryption_info, dict) else None
+        if session_id and secure_server.sessions.get(session_id) is None:
+            return jsonify({
+                'success': False,
+                'session_expired': True,
+                'message': '加密会话不存在或已过期'
+            }), 401
+        
         # 解密请求
         decrypted_data = secure_server.decrypt_request(encrypted_request)
         
@@ -240,8 +452,8 @@ def handle_ssh_credentials():
             private_key = ssh_data.get('private_key')
             passphrase = ssh_data.get('passphrase')
             
-            # 连接到SSH服务器
-            success, message = get_ssh_client().connect(
+            # 在后台连接SSH服务器，连接结果通过 /ssh/status 查询
+            attempt = get_ssh_client().connect_async(
                 hostname=hostname,
                 username=username,
                 password=password,
@@ -249,12 +461,13 @@ def handle_ssh_credentials():
                 port=port,
                 timeout=30,
                 max_retries=3,
-                retry_delay=5
+                retry_delay=1
             )
             
             result['connection_test'] = {
-                'success': success,
-                'message': message
+                'success': attempt.status != 'failed',
+                'pending': attempt.status == 'pending',
+                'message': attempt.message
             }
             
         except Exception as conn_error:
@@ -263,231 +476,707 @@ def handle_ssh_credentials():
                 'message': f'连接测试失败: {str(conn_error)}'
             }
         
-        return jsonify({
+        response = {
             'success': True,
             'data': result,
             'message': 'SSH凭证处理成功'
-        })
+        }
+        # 会话模式下响应同样用会话密钥加密
+        if decrypted_data['session_id']:
+            return jsonify(secure_server.encrypt_session_response(response, decrypted_data['session_id']))
+        return jsonify(response)
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'处理SSH凭证失败: {str(e)}'
         }), 500
 
+# 获取训练监控器
+def get_training_monitor(key, log_file, interval=None, job=None):
+    """
+    获取训练监控器，并传入训练队列中记录的进程PID
+    
+    服务重启后或在其他工作进程中，监控注册表里没有PID，按进程名检测会把同一主机上的其他训练误判为本任务仍在运行。
+    
+    Args:
+        key: 连接池键
+        log_file: 远程日志文件路径
+        interval: 轮询间隔（秒，可选）
+        job: 已查到的队列任务（可选，未提供时按日志文件查找）
+        
+    Returns:
+        TrainingMonitor: 监控器
+    """
+    if job is None:
+        job = training_queue.find(key, log_file)
+    pid = job['pid'] if job is not None else None
+    return training_monitors.get(key, log_file, interval=interval, pid=pid)
+
+# 构建训练命令
+def build_train_command(city, rounds, gamma, tau, compression=True, adaptive=True, personalization=True):
+    """
+    构建训练命令及其日志文件名
+    
+    Returns:
+        tuple: (训练命令, 日志文件名)
+    """
+    train_command = f'python train.py --city {city} --rounds {rounds} --gamma {gamma} --tau {tau}'
+    
+    # 添加可选参数
+    if compression:
+        train_command += ' --compression'
+    if adaptive:
+        train_command += ' --adaptive'
+    if personalization:
+        train_command += ' --personalization'
+    return train_command, f'train_{city}_{rounds}.log'
+
+# 校验训练参数并提交到训练队列
+def submit_training(data):
+    """
+    校验训练参数、构建训练命令并提交到训练队列，按主机并发槽位派发
+    
+    Args:
+        data: 请求JSON
+        
+    Returns:
+        tuple: (校验或提交失败时的错误响应或None, 队列任务)
+    """
+    # 提取训练参数
+    params = {
+        'city': data.get('city', 'Tokyo'),
+        'rounds': data.get('rounds', 50),
+        'gamma': data.get('gamma', 0.1),
+        'tau': data.get('tau', 0.5),
+        'compression': data.get('compression', True),
+        'adaptive': data.get('adaptive', True),
+        'personalization': data.get('personalization', True)
+    }
+    
+    # 验证必要参数
+    if not params['city']:
+        return failure('缺少必要参数: city'), None
+    
+    # 构建训练命令
+    train_command, log_file = build_train_command(**params)
+    
+    # 检查SSH连接状态
+    if not get_ssh_client().connected:
+        return failure('SSH未连接，请先连接到服务器'), None
+    
+    try:
+        job = training_queue.submit(get_ssh_client().key, train_command, log_file,
+                                    priority=data.get('priority', 0), params=params)
+    except ValueError as e:
+        # 同一主机上已有使用相同日志文件的未结束任务
+        return failure(f'启动训练任务失败: {str(e)}', 409), None
+    return None, job
+
+def training_start_result(job):
+    """根据派发结果构建启动训练的响应：排队返回202，启动失败返回500"""
+    task_info = dict(job['params'], command=job['command'], log_file=job['log_file'])
+    if job['status'] == JOB_QUEUED:
+        # 主机槽位已满，任务排队等待
+        return {
+            'success': True,
+            'queued': True,
+            'message': '主机并发已满，训练任务已排队',
+            'job': job,
+            'task_info': task_info
+        }, 202
+    if job['status'] == JOB_FAILED:
+        # 命令执行失败
+        return failure(f"启动训练任务失败: {job['message']}", 500, job=job)
+    
+    # 命令执行成功，返回训练任务信息
+    return {
+        'success': True,
+        'message': '训练任务已启动',
+        'job': job,
+        'task_info': task_info
+    }, 200
+
+def require_log_file_connection(log_file):
+    """
+    校验日志文件参数与SSH连接状态
+    
+    Returns:
+        tuple: (错误响应或None, 连接)
+    """
+    if not log_file:
+        return failure('缺少必要参数: log_file'), None
+    return require_connection()
+
+def training_status_result(snapshot):
+    """根据监控器缓存状态构建训练状态响应"""
+    if snapshot is None:
+        return failure('获取训练状态超时', 504)
+    if not snapshot['success']:
+        return failure(snapshot['message'], 404 if snapshot.get('not_found') else 500)
+    return {
+        'success': True,
+        'message': '获取训练状态成功',
+        'status': snapshot['status'],
+        'progress': snapshot['progress'],
+        'error': snapshot['error'],
+        'error_message': snapshot['error_message'],
+        'log_content': snapshot['log_content'],
+        'offset': snapshot['offset'],
+        'updated_at': snapshot['updated_at']
+    }, 200
+
+def _sse_message(event, data, event_id=None):
+    """格式化一条Server-Sent Events消息"""
+    message = f'event: {event}\n'
+    if event_id is not None:
+        message += f'id: {event_id}\n'
+    return message + f'data: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+# SSE响应头：禁用缓存与反向代理缓冲
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def sse_snapshot(monitor):
+    """
+    格式化监控器的完整状态
+    
+    Returns:
+        tuple: (事件序号, SSE消息)
+    """
+    seq, data = monitor.snapshot_event()
+    return seq, _sse_message('snapshot', data, monitor.event_id(seq))
+
+def sse_events(monitor, seq, events):
+    """
+    格式化一批训练事件；训练结束且事件已全部发送时追加 end 消息
+    
+    Args:
+        monitor: 训练监控器
+        seq: 已发送的最新事件序号
+        events: events_after 返回的事件列表
+        
+    Returns:
+        tuple: (最新事件序号, SSE消息列表, 是否结束)
+    """
+    messages = []
+    for event_seq, event_type, data in events:
+        seq = event_seq
+        messages.append(_sse_message(event_type, data, monitor.event_id(seq)))
+    finished = monitor.finished and seq >= monitor.event_seq
+    if finished:
+        messages.append(_sse_message('end', monitor.snapshot_event()[1], monitor.event_id(seq)))
+    return seq, messages, finished
+
+def locate_training_metrics(args):
+    """
+    按 job_id 或 log_file 定位指标所在的主机与日志文件
+    
+    Args:
+        args: 查询参数
+        
+    Returns:
+        tuple: (错误响应或None, (队列任务或None, 连接池键, 日志文件))
+    """
+    job_id = args.get('job_id')
+    log_file = args.get('log_file')
+    if job_id:
+        job = training_queue.get(job_id)
+        if job is None:
+            return failure('任务不存在', 404), None
+        return None, (job, make_key(job['hostname'], job['port'], job['username']), job['log_file'])
+    if log_file:
+        key = get_ssh_client().key
+        if key is None:
+            return failure('SSH未连接，请先连接到服务器'), None
+        return None, (None, key, log_file)
+    return failure('缺少必要参数: job_id 或 log_file'), None
+
+def training_metrics_payload(key, log_file, args):
+    """按查询参数读取指标时间序列，构建响应数据"""
+    series = metric_series.get(key, log_file)
+    names = args.get('metrics')
+    result = series.query(
+        names=names.split(',') if names else None,
+        since_round=args.get('since_round', type=int),
+        max_points=args.get('max_points', type=int)
+    )
+    return {
+        'success': True,
+        'log_file': log_file,
+        'latest': series.latest(),
+        **result
+    }
+
+def locate_training_job(data):
+    """
+    按 job_id 或日志文件定位要停止的训练任务
+    
+    Returns:
+        tuple: (错误响应或None, 队列任务)
+    """
+    job_id = data.get('job_id')
+    log_file = data.get('log_file')
+    
+    # 验证必要参数
+    if not job_id and not log_file:
+        return failure('缺少必要参数: job_id 或 log_file'), None
+    
+    if job_id:
+        job = training_queue.get(job_id)
+    else:
+        # 检查SSH连接状态
+        if not get_ssh_client().connected:
+            return failure('SSH未连接，请先连接到服务器'), None
+        job = training_queue.find(get_ssh_client().key, log_file)
+    if job is None:
+        return failure('训练任务不存在', 404), None
+    return None, job
+
+def training_stop_result(job):
+    """根据取消后的任务状态构建停止训练的响应，任务已结束时返回409"""
+    if job['status'] != 'cancelled':
+        return failure(f"训练任务已{job['status']}，无需停止", 409, job=job)
+    return {
+        'success': True,
+        'message': '训练任务已停止',
+        'job': job
+    }, 200
+
 # 启动训练任务
 @system_api.route('/train/start', methods=['POST'])
 def start_training():
-    """启动训练任务"""
+    """提交训练任务到队列，主机有空闲槽位时立即启动"""
     try:
-        # 获取请求参数
         data = request.json
+        error, job = submit_training(data)
+        if error:
+            return error
+        job = training_queue.wait(job['job_id'], statuses=(JOB_QUEUED, JOB_DISPATCHING), timeout=data.get('wait', 5))
+        return training_start_result(job)
+    except Exception as e:
+        return failure(f'启动训练任务错误: {str(e)}', 500)
+
+# 获取训练任务状态
+@system_api.route('/train/status', methods=['POST'])
+def get_training_status():
+    """获取训练任务状态"""
+    try:
+        data = request.json
+        error, connection = require_log_file_connection(data.get('log_file'))
+        if error:
+            return error
         
-        # 提取训练参数
-        city = data.get('city', 'Tokyo')
-        rounds = data.get('rounds', 50)
-        gamma = data.get('gamma', 0.1)
-        tau = data.get('tau', 0.5)
-        compression = data.get('compression', True)
-        adaptive = data.get('adaptive', True)
-        personalization = data.get('personalization', True)
+        # 由后台监控线程统一轮询远程主机，这里直接读取缓存状态
+        monitor = get_training_monitor(connection.key, data['log_file'], interval=data.get('poll_interval'))
+        return training_status_result(monitor.read())
+    except Exception as e:
+        return failure(f'获取训练状态错误: {str(e)}', 500)
+
+# 训练进度实时推送（SSE）
+@system_api.route('/train/stream')
+def stream_training():
+    """以Server-Sent Events推送训练增量（新日志行、进度变化、每轮指标），支持 Last-Event-ID 续传"""
+    log_file = request.args.get('log_file')
+    error, connection = require_log_file_connection(log_file)
+    if error:
+        return error
+    
+    key = connection.key
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    def generate():
+        monitor = get_training_monitor(key, log_file)
+        monitor.read()
+        yield 'retry: 3000\n\n'
         
-        # 验证必要参数
-        if not city:
+        seq = monitor.parse_event_id(last_event_id)
+        if seq is None:
+            # 无法续传时先发送完整状态
+            seq, message = sse_snapshot(monitor)
+            yield message
+        
+        while True:
+            events = monitor.events_after(seq, timeout=15)
+            seq, messages, finished = sse_events(monitor, seq, events)
+            yield from messages
+            if finished:
+                return
+            if not monitor.alive and not monitor.finished:
+                # 监控器已停止或被替换，重新获取并发送完整状态
+                monitor = get_training_monitor(key, log_file)
+                monitor.read()
+                seq, message = sse_snapshot(monitor)
+                yield message
+            elif not events:
+                yield ': keepalive\n\n'
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+# 训练指标时间序列API
+@system_api.route('/train/metrics')
+def get_training_metrics():
+    """按轮次读取训练指标时间序列（由后台监控线程增量写入，无需重新读取日志）"""
+    try:
+        error, target = locate_training_metrics(request.args)
+        if error:
+            return error
+        job, key, log_file = target
+        
+        # 确保监控线程在运行，以便持续写入时间序列
+        if ssh_pool.get(key) is not None:
+            monitor = get_training_monitor(key, log_file, job=job)
+            monitor.read(timeout=request.args.get('timeout', 10, type=float))
+        
+        return json_response(training_metrics_payload(key, log_file, request.args))
+    except Exception as e:
+        return failure(f'获取训练指标错误: {str(e)}', 500)
+
+# 停止训练任务
+@system_api.route('/train/stop', methods=['POST'])
+def stop_training():
+    """停止指定的训练任务（按 job_id 或日志文件定位，只终止该任务的进程组）"""
+    try:
+        error, job = locate_training_job(request.json or {})
+        if error:
+            return error
+        return training_stop_result(training_queue.cancel(job['job_id']))
+    except Exception as e:
+        return failure(f'停止训练任务错误: {str(e)}', 500)
+
+# 训练队列API
+@system_api.route('/train/queue', methods=['GET'])
+def list_training_queue():
+    """列出训练任务及各主机的槽位占用"""
+    try:
+        return json_response({
+            'success': True,
+            'jobs': training_queue.list(status=request.args.get('status'),
+                                        limit=request.args.get('limit', 100, type=int)),
+            'hosts': training_queue.host_slots()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'获取训练队列错误: {str(e)}'
+        }), 500
+
+# 训练任务详情API
+@system_api.route('/train/queue/<job_id>')
+def get_queued_training(job_id):
+    """获取训练任务信息"""
+    job = training_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': '任务不存在'
+        }), 404
+    return jsonify({
+        'success': True,
+        'job': job
+    })
+
+# 取消训练任务API
+@system_api.route('/train/queue/<job_id>/cancel', methods=['POST'])
+def cancel_queued_training(job_id):
+    """取消排队中的任务或终止运行中的任务"""
+    try:
+        job = training_queue.cancel(job_id)
+        if job is None:
             return jsonify({
                 'success': False,
-                'message': '缺少必要参数: city'
+                'message': '任务不存在'
+            }), 404
+        return jsonify({
+            'success': True,
+            'message': '任务已取消' if job['status'] == 'cancelled' else f"任务已{job['status']}，无需取消",
+            'job': job
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'取消训练任务错误: {str(e)}'
+        }), 500
+
+# 主机并发槽位API
+@system_api.route('/train/queue/slots', methods=['POST'])
+def set_training_slots():
+    """设置主机可同时运行的训练任务数（默认为当前连接的主机）"""
+    try:
+        data = request.json or {}
+        slots = data.get('slots')
+        if slots is None:
+            return jsonify({
+                'success': False,
+                'message': '缺少必要参数: slots'
             }), 400
         
-        # 构建训练命令
-        train_command = f'python train.py --city {city} --rounds {rounds} --gamma {gamma} --tau {tau}'
+        if data.get('hostname'):
+            key = make_key(data['hostname'], data.get('port', 22), data.get('username', 'root'))
+        else:
+            key = get_ssh_client().key
+            if key is None:
+                return jsonify({
+                    'success': False,
+                    'message': 'SSH未连接，请先连接到服务器'
+                }), 400
         
-        # 添加可选参数
-        if compression:
-            train_command += ' --compression'
-        if adaptive:
-            train_command += ' --adaptive'
-        if personalization:
-            train_command += ' --personalization'
+        training_queue.set_host_slots(key, slots)
+        return jsonify({
+            'success': True,
+            'message': '主机并发槽位已更新',
+            'hosts': training_queue.host_slots()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'设置主机并发槽位错误: {str(e)}'
+        }), 500
+
+# 超参数扫描API
+@system_api.route('/train/sweep', methods=['POST'])
+def start_training_sweep():
+    """按参数网格或随机搜索展开训练任务，装箱到远程主机或本地执行器"""
+    try:
+        data = request.json or {}
+        base = {
+            'city': data.get('city', 'Tokyo'),
+            'rounds': data.get('rounds', 50),
+            'gamma': data.get('gamma', 0.1),
+            'tau': data.get('tau', 0.5),
+            'compression': data.get('compression', True),
+            'adaptive': data.get('adaptive', True),
+            'personalization': data.get('personalization', True)
+        }
+        executor = data.get('executor', 'hosts')
         
-        # 检查SSH连接状态
-        if not get_ssh_client().connected:
+        # 展开参数组合
+        if data.get('grid'):
+            configs = expand_grid(data['grid'])
+        elif data.get('random'):
+            search = data['random']
+            configs = sample_random(search.get('space', {}), int(search.get('n', 10)), search.get('seed'))
+        else:
             return jsonify({
                 'success': False,
-                'message': 'SSH未连接，请先连接到服务器'
+                'message': '缺少必要参数: grid 或 random'
             }), 400
         
-        # 执行训练命令（使用nohup后台执行）
-        background_command = f'nohup {train_command} > train_{city}_{rounds}.log 2>&1 &'
-        success, stdout, stderr, error_msg = get_ssh_client().execute_command(
-            command=background_command,
-            timeout=30
-        )
+        trials = []
+        for config in configs:
+            params = dict(base, **config)
+            train_command, _ = build_train_command(**params)
+            trials.append({'params': config, 'command': train_command})
         
-        if success:
-            # 命令执行成功，返回训练任务信息
-            return jsonify({
-                'success': True,
-                'message': '训练任务已启动',
-                'task_info': {
-                    'city': city,
-                    'rounds': rounds,
-                    'gamma': gamma,
-                    'tau': tau,
-                    'compression': compression,
-                    'adaptive': adaptive,
-                    'personalization': personalization,
-                    'command': train_command,
-                    'log_file': f'train_{city}_{rounds}.log'
-                }
-            })
-        else:
-            # 命令执行失败
+        hosts = None
+        if executor == 'hosts':
+            # 默认只使用当前连接的主机
+            hosts = [make_key(h['hostname'], h.get('port', 22), h.get('username', 'root'))
+                     for h in data.get('hosts', [])] or [get_ssh_client().key]
+            if hosts[0] is None:
+                return jsonify({
+                    'success': False,
+                    'message': 'SSH未连接，请先连接到服务器'
+                }), 400
+        
+        sweep = sweep_launcher.launch(base, trials, hosts=hosts, executor=executor,
+                                      priority=data.get('priority', 0))
+        return jsonify({
+            'success': True,
+            'message': f'已提交 {len(trials)} 个训练任务',
+            'sweep_id': sweep.sweep_id,
+            'trials': len(trials)
+        }), 202
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'启动超参数扫描错误: {str(e)}'
+        }), 500
+
+# 超参数扫描结果API
+@system_api.route('/train/sweep/<sweep_id>')
+def get_training_sweep(sweep_id):
+    """获取超参数扫描的结果表（可按参数或指标排序）"""
+    try:
+        sweep = sweep_launcher.get(sweep_id)
+        if sweep is None:
             return jsonify({
                 'success': False,
-                'message': f'启动训练任务失败: {error_msg}',
-                'stderr': stderr
-            }), 500
-            
+                'message': '扫描不存在'
+            }), 404
+        
+        results = sweep_launcher.results(
+            sweep,
+            sort_by=request.args.get('sort_by'),
+            descending=request.args.get('order', 'desc') != 'asc'
+        )
+        return json_response(dict(results, success=True))
     except Exception as e:
         return jsonify({
             'success': False,
-            'message': f'启动训练任务错误: {str(e)}'
+            'message': f'获取扫描结果错误: {str(e)}'
         }), 500
 
-# 获取训练任务状态
-@system_api.route('/train/status', methods=['POST'])
-def get_training_status():
-    """获取训练任务状态"""
+# 取消超参数扫描API
+@system_api.route('/train/sweep/<sweep_id>/cancel', methods=['POST'])
+def cancel_training_sweep(sweep_id):
+    """取消扫描中尚未结束的全部任务"""
     try:
-        # 获取请求参数
-        data = request.json
-        log_file = data.get('log_file')
-        
-        # 验证必要参数
-        if not log_file:
+        sweep = sweep_launcher.get(sweep_id)
+        if sweep is None:
             return jsonify({
                 'success': False,
-                'message': '缺少必要参数: log_file'
-            }), 400
+                'message': '扫描不存在'
+            }), 404
+        return jsonify({
+            'success': True,
+            'message': '扫描已取消',
+            'cancelled': sweep_launcher.cancel(sweep)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'取消扫描错误: {str(e)}'
+        }), 500
+
+# 多主机扇出训练API
+@system_api.route('/train/fanout', methods=['POST'])
+def start_training_fanout():
+    """把训练按城市分片并发启动到多台主机（轮询分配，城市数不多于主机数时每台主机一个城市）"""
+    try:
+        data = request.json or {}
+        hosts = data.get('hosts') or []
+        cities = data.get('cities') or []
+        rounds = data.get('rounds', 50)
+        gamma = data.get('gamma', 0.1)
+        tau = data.get('tau', 0.5)
+        compression = data.get('compression', True)
+        adaptive = data.get('adaptive', True)
+        personalization = data.get('personalization', True)
         
-        # 检查SSH连接状态
-        if not get_ssh_client().connected:
+        # 验证必要参数
+        if not hosts or not cities:
             return jsonify({
                 'success': False,
-                'message': 'SSH未连接，请先连接到服务器'
+                'message': '缺少必要参数: hosts 或 cities'
             }), 400
+        for host in hosts:
+            if not host.get('hostname') or not host.get('username'):
+                return jsonify({
+                    'success': False,
+                    'message': '主机缺少必要参数: hostname 或 username'
+                }), 400
         
-        # 检查日志文件是否存在
-        check_file_command = f'ls -la {log_file}'
-        success, stdout, stderr, error_msg = get_ssh_client().execute_command(
-            command=check_file_command,
-            timeout=30
-        )
+        shards = []
+        for city, host in assign_shards(cities, hosts):
+            train_command, log_file = build_train_command(city, rounds, gamma, tau, compression, adaptive, personalization)
+            shards.append(TrainingShard(city, host, train_command, log_file))
         
-        if not success:
+        run = training_fanout.launch(shards)
+        return jsonify({
+            'success': True,
+            'message': '扇出训练已提交',
+            'run_id': run.run_id,
+            'shards': [{'city': shard.city, 'host': shard.target, 'log_file': shard.log_file} for shard in shards]
+        }), 202
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'启动扇出训练错误: {str(e)}'
+        }), 500
+
+# 多主机扇出训练状态API
+@system_api.route('/train/fanout/<run_id>')
+def get_training_fanout_status(run_id):
+    """获取扇出训练的汇总状态：各主机进度、最慢主机与失败分片"""
+    try:
+        run = training_fanout.get(run_id)
+        if run is None:
             return jsonify({
                 'success': False,
-                'message': f'日志文件不存在: {error_msg}'
+                'message': '扇出训练不存在'
             }), 404
         
-        # 检查是否有训练进程在运行
-        check_process_command = f'ps aux | grep "train.py" | grep -v grep'
-        success, stdout, stderr, error_msg = get_ssh_client().execute_command(
-            command=check_process_command,
-            timeout=30
-        )
-        
-        # 读取日志文件末尾内容
-        tail_command = f'tail -50 {log_file}'
-        success, log_content, stderr, error_msg = get_ssh_client().execute_command(
-            command=tail_command,
-            timeout=30
-        )
-        
-        # 分析日志内容，提取训练进度
-        progress = 0
-        status = 'running'
-        error = False
-        error_message = ''
-        
-        # 简单的进度提取逻辑
-        if log_content:
-            # 查找包含轮次信息的行
-            lines = log_content.split('\n')
-            for line in lines:
-                if 'Round' in line:
-                    import re
-                    match = re.search(r'Round (\d+)/(\d+)', line)
-                    if match:
-                        current_round = int(match.group(1))
-                        total_rounds = int(match.group(2))
-                        progress = int((current_round / total_rounds) * 100)
-                # 查找错误信息
-                if 'Error' in line or 'error' in line:
-                    error = True
-                    error_message = line
-                    status = 'error'
-                # 查找训练完成信息
-                if 'Training completed' in line:
-                    progress = 100
-                    status = 'completed'
-        
-        # 检查进程是否在运行
-        if not stdout.strip() and status == 'running':
-            # 进程不在运行，但状态仍为running，可能是已完成或出错
-            if error:
-                status = 'error'
-            else:
-                status = 'completed'
-        
-        return jsonify({
+        return json_response({
             'success': True,
             'message': '获取训练状态成功',
-            'status': status,
-            'progress': progress,
-            'error': error,
-            'error_message': error_message,
-            'log_content': log_content
+            **training_fanout.status(run)
         })
-        
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'获取训练状态错误: {str(e)}'
         }), 500
 
-# 停止训练任务
-@system_api.route('/train/stop', methods=['POST'])
-def stop_training():
-    """停止训练任务"""
+# 同步训练产物API
+@system_api.route('/sync', methods=['POST'])
+def sync_artifacts():
+    """从训练主机并行、可续传地同步训练产物到本地数据目录（只传输新增或变化的文件）"""
     try:
+        data = request.json or {}
+        remote_dir = data.get('remote_dir', 'data')
+        categories = data.get('categories', list(ARTIFACT_CATEGORIES))
+        workers = data.get('workers', 4)
+        compress = data.get('compress', True)
+        wait = data.get('wait', 0)
+        
+        # 只允许同步已知的产物目录
+        invalid = [c for c in categories if c not in ARTIFACT_CATEGORIES]
+        if invalid:
+            return jsonify({
+                'success': False,
+                'message': f'不支持的产物目录: {", ".join(invalid)}'
+            }), 400
+        
         # 检查SSH连接状态
-        if not get_ssh_client().connected:
+        connection = get_ssh_client().get_connection()
+        if connection is None:
             return jsonify({
                 'success': False,
                 'message': 'SSH未连接，请先连接到服务器'
             }), 400
         
-        # 查找并终止训练进程
-        stop_command = f'pkill -f "train.py"'
-        success, stdout, stderr, error_msg = get_ssh_client().execute_command(
-            command=stop_command,
-            timeout=30
-        )
+        sync = ArtifactSync(connection, remote_dir, DATA_DIR, categories=categories,
+                            workers=workers, compress=compress)
+        job = artifact_syncs.start(sync)
+        if wait:
+            job.finished_event.wait(float(wait))
         
-        if success:
+        if job.status == 'running':
             return jsonify({
                 'success': True,
-                'message': '训练任务已停止'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': f'停止训练任务失败: {error_msg}'
-            }), 500
-            
+                'job_id': job.job_id,
+                'job': job.to_dict(),
+                'message': '同步任务已启动'
+            }), 202
+        return jsonify({
+            'success': job.status == 'completed',
+            'job_id': job.job_id,
+            'job': job.to_dict(),
+            'data_exists': check_data_exists(),
+            'message': '同步完成' if job.status == 'completed' else f'同步失败: {job.error_message}'
+        })
     except Exception as e:
         return jsonify({
             'success': False,
-            'message': f'停止训练任务错误: {str(e)}'
+            'message': f'同步训练产物错误: {str(e)}'
         }), 500
+
+# 同步任务状态API
+@system_api.route('/sync/<job_id>')
+def sync_status(job_id):
+    """获取同步任务状态"""
+    job = artifact_syncs.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': '任务不存在'
+        }), 404
+    return jsonify({
+        'success': True,
+        'job': job.to_dict(),
+        'data_exists': check_data_exists()
+    })
@@ -0,0 +1,206 @@
+"""
+SSH与训练接口的 asyncio 版本（Quart）
+
+这些接口几乎全部时间都在等待远程主机：命令输出、训练状态轮询、连接建立。同步版本每个请求
+占用一个工作线程直到等待结束；这里的处理函数在等待期间让出事件循环，一个进程即可同时承载
+数百个远程操作。连接池、命令任务、训练监控与队列与同步版本（system.py）共享同一进程内的实例，
+参数校验与响应构建复用 system.py 中的辅助函数，这里只保留等待点。
+"""
+from quart import Blueprint, jsonify, request, Response
+from backend.api.system import (
+    get_ssh_client, get_training_monitor, failure, require_connection, ssh_connect_params,
+    ssh_connect_result, command_submitted_result, command_finished_result, command_output_lines,
+    submit_training, training_start_result, require_log_file_connection, training_status_result,
+    SSE_HEADERS, sse_snapshot, sse_events, locate_training_metrics, training_metrics_payload,
+    locate_training_job, training_stop_result
+)
+from backend.api.responses import ENCRYPTED_STREAM_MIMETYPE, ENCRYPTED_STREAM_HEADERS, build_json_response
+from backend.utils.ssh_pool import ssh_pool
+from backend.utils.ssh_jobs import command_jobs
+from backend.utils.job_queue import JOB_QUEUED, JOB_DISPATCHING, training_queue
+from backend.utils.async_bridge import async_bridge
+
+# 创建蓝图
+system_async_api = Blueprint('system_async', __name__)
+
+# 按请求头 X-Session-Id 返回分块加密的JSON流
+def json_response(payload):
+    """
+    返回JSON响应；请求携带加密会话ID时改为分块AES-GCM加密流（与同步版本的 json_response 一致）
+
+    Args:
+        payload: 响应数据
+
+    Returns:
+        Response: Quart响应
+    """
+    return build_json_response(
+        payload, request.headers.get('X-Session-Id'), jsonify,
+        lambda chunks: Response(chunks, mimetype=ENCRYPTED_STREAM_MIMETYPE, headers=ENCRYPTED_STREAM_HEADERS)
+    )
+
+# SSH连接API
+@system_async_api.route('/ssh/connect', methods=['POST'])
+async def ssh_connect():
+    """连接到SSH服务器（后台连接，wait 秒内在事件循环中等待结果）"""
+    try:
+        data = await request.get_json()
+        error, params = ssh_connect_params(data)
+        if error:
+            return error
+
+        # 提交后台连接，可选：最多等待 wait 秒
+        attempt = get_ssh_client().connect_async(**params)
+        wait = data.get('wait')
+        if wait:
+            await attempt.wait_async(timeout=float(wait))
+        return ssh_connect_result(attempt)
+    except Exception as e:
+        return failure(f'连接错误: {str(e)}', 500)
+
+# SSH执行命令API
+@system_async_api.route('/ssh/execute', methods=['POST'])
+async def ssh_execute():
+    """提交SSH命令任务（在事件循环中读取输出，不占用工作线程），wait=true 时等待完成并返回全部输出"""
+    try:
+        data = await request.get_json()
+        command = data.get('command')
+        if not command:
+            return failure('缺少必要参数: command')
+
+        error, connection = require_connection()
+        if error:
+            return error
+
+        job = command_jobs.submit_async(connection, command, timeout=data.get('timeout', 60))
+        if not data.get('wait', False):
+            return command_submitted_result(job)
+
+        # 兼容同步调用：等待任务结束
+        await job.wait_async()
+        return command_finished_result(job)
+    except Exception as e:
+        return failure(f'执行错误: {str(e)}', 500)
+
+# SSH命令任务输出流API
+@system_async_api.route('/ssh/jobs/<job_id>/stream')
+async def ssh_job_stream(job_id):
+    """以NDJSON流的形式持续推送SSH命令任务的输出，直到任务结束"""
+    job = command_jobs.get(job_id)
+    if job is None:
+        return failure('任务不存在', 404)
+
+    offsets = [request.args.get('stdout_offset', 0, type=int), request.args.get('stderr_offset', 0, type=int)]
+
+    async def generate():
+        while True:
+            await job.wait_for_output_async(offsets[0], offsets[1], timeout=15)
+            finished = job.finished
+            for line in command_output_lines(job, offsets, finished):
+                yield line
+            if finished:
+                return
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+# 启动训练任务
+@system_async_api.route('/train/start', methods=['POST'])
+async def start_training():
+    """提交训练任务到队列，主机有空闲槽位时立即启动"""
+    try:
+        data = await request.get_json()
+        error, job = submit_training(data)
+        if error:
+            return error
+        job = await training_queue.wait_async(job['job_id'], statuses=(JOB_QUEUED, JOB_DISPATCHING),
+                                              timeout=data.get('wait', 5))
+        return training_start_result(job)
+    except Exception as e:
+        return failure(f'启动训练任务错误: {str(e)}', 500)
+
+# 获取训练任务状态
+@system_async_api.route('/train/status', methods=['POST'])
+async def get_training_status():
+    """获取训练任务状态（读取后台监控线程的缓存状态）"""
+    try:
+        data = await request.get_json()
+        error, connection = require_log_file_connection(data.get('log_file'))
+        if error:
+            return error
+
+        monitor = get_training_monitor(connection.key, data['log_file'], interval=data.get('poll_interval'))
+        return training_status_result(await monitor.read_async())
+    except Exception as e:
+        return failure(f'获取训练状态错误: {str(e)}', 500)
+
+# 训练进度实时推送（SSE）
+@system_async_api.route('/train/stream')
+async def stream_training():
+    """以Server-Sent Events推送训练增量，支持 Last-Event-ID 续传；每个订阅者只占用一个协程"""
+    log_file = request.args.get('log_file')
+    error, connection = require_log_file_connection(log_file)
+    if error:
+        return error
+
+    key = connection.key
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+    async def generate():
+        monitor = get_training_monitor(key, log_file)
+        await monitor.read_async()
+        yield 'retry: 3000\n\n'
+
+        seq = monitor.parse_event_id(last_event_id)
+        if seq is None:
+            # 无法续传时先发送完整状态
+            seq, message = sse_snapshot(monitor)
+            yield message
+
+        while True:
+            events = await monitor.events_after_async(seq, timeout=15)
+            seq, messages, finished = sse_events(monitor, seq, events)
+            for message in messages:
+                yield message
+            if finished:
+                return
+            if not monitor.alive and not monitor.finished:
+                # 监控器已停止或被替换，重新获取并发送完整状态
+                monitor = get_training_monitor(key, log_file)
+                await monitor.read_async()
+                seq, message = sse_snapshot(monitor)
+                yield message
+            elif not events:
+                yield ': keepalive\n\n'
+
+    return Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+# 训练指标时间序列API
+@system_async_api.route('/train/metrics')
+async def get_training_metrics():
+    """按轮次读取训练指标时间序列"""
+    try:
+        error, target = locate_training_metrics(request.args)
+        if error:
+            return error
+        job, key, log_file = target
+
+        # 确保监控线程在运行，以便持续写入时间序列
+        if ssh_pool.get(key) is not None:
+            monitor = get_training_monitor(key, log_file, job=job)
+            await monitor.read_async(timeout=request.args.get('timeout', 10, type=float))
+
+        return json_response(training_metrics_payload(key, log_file, request.args))
+    except Exception as e:
+        return failure(f'获取训练指标错误: {str(e)}', 500)
+
+# 停止训练任务
+@system_async_api.route('/train/stop', methods=['POST'])
+async def stop_training():
+    """停止指定的训练任务（终止远程进程组的SSH调用交给桥接线程池）"""
+    try:
+        error, job = locate_training_job(await request.get_json() or {})
+        if error:
+            return error
+        return training_stop_result(await async_bridge.call(training_queue.cancel, job['job_id']))
+    except Exception as e:
+        return failure(f'停止训练任务错误: {str(e)}', 500)
@@ -1,7 +1,9 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
+import gc
 import os
 import sys
+import logging
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -12,40 +14,89 @@ from backend.api.communication import communication_api
 from backend.api.adaptive import adaptive_api
 from backend.api.personalization import personalization_api
 from backend.api.recommendation import recommendation_api
+from backend.utils.metrics import metrics, instrument_app, CONTENT_TYPE
 
-# 创建Flask应用
-app = Flask(__name__)
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
-# 启用CORS
-CORS(app, resources={"/*": {"origins": "*"}})
+def create_app():
+    """
+    创建Flask应用
+    
+    Returns:
+        Flask: 注册好蓝图与路由的应用实例
+    """
+    app = Flask(__name__)
+    
+    # 启用CORS
+    CORS(app, resources={"/*": {"origins": "*"}}, expose_headers=['X-Encryption'])
+    
+    # 记录各蓝图/路由的请求耗时、响应大小、错误数与正在处理的请求数
+    instrument_app(app)
+    
+    # 注册API蓝图
+    app.register_blueprint(system_api, url_prefix='/api/system')
+    app.register_blueprint(communication_api, url_prefix='/api/communication')
+    app.register_blueprint(adaptive_api, url_prefix='/api/adaptive')
+    app.register_blueprint(personalization_api, url_prefix='/api/personalization')
+    app.register_blueprint(recommendation_api, url_prefix='/api/recommendation')
+    
+    # 根路由
+    @app.route('/')
+    def index():
+        return jsonify({
+            'message': '城市旅游消费个性化推荐系统API',
+            'version': '1.0.0',
+            'endpoints': {
+                'system': '/api/system/status',
+                'communication': '/api/communication/data',
+                'adaptive': '/api/adaptive/data',
+                'personalization': '/api/personalization/data',
+                'recommendation': '/api/recommendation/generate'
+            }
+        })
+    
+    # 健康检查
+    @app.route('/health')
+    def health():
+        return jsonify({'status': 'healthy'})
+    
+    # Prometheus 指标
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
+    
+    return app
 
-# 注册API蓝图
-app.register_blueprint(system_api, url_prefix='/api/system')
-app.register_blueprint(communication_api, url_prefix='/api/communication')
-app.register_blueprint(adaptive_api, url_prefix='/api/adaptive')
-app.register_blueprint(personalization_api, url_prefix='/api/personalization')
-app.register_blueprint(recommendation_api, url_prefix='/api/recommendation')
+def preload_shared_data():
+    """
+    在多进程服务器fork工作进程之前加载共享数据：工作进程以写时复制方式共享这些内存页
+    
+    POI目录与GMM模型在导入时已构建；这里把通信/自适应/个性化数据集发布到共享内存（工作进程
+    按清单零拷贝附加），加载RSA密钥（保证所有工作进程使用同一密钥对）并映射各城市的用户特征，
+    最后冻结垃圾回收追踪的对象，避免GC改写引用计数页破坏写时复制共享。重新加载（如收到HUP信号）
+    时可再次调用，数据集以新一代发布，工作进程在下次请求时切换。
+    """
+    from backend.utils.crypto_utils import secure_server
+    from backend.utils.shared_data import shared_data
+    from backend.api.recommendation import cities, feature_store
+    
+    datasets = shared_data.publish_all()
+    secure_server.crypto.ensure_keys()
+    loaded = [city for city in cities if feature_store.open(city) is not None]
+    
+    gc.collect()
+    gc.freeze()
+    logger.info(f'共享数据已预加载: 数据集={datasets}, 特征城市={loaded}, 冻结对象数={gc.get_freeze_count()}')
 
-# 根路由
-@app.route('/')
-def index():
-    return jsonify({
-        'message': '城市旅游消费个性化推荐系统API',
-        'version': '1.0.0',
-        'endpoints': {
-            'system': '/api/system/status',
-            'communication': '/api/communication/data',
-            'adaptive': '/api/adaptive/data',
-            'personalization': '/api/personalization/data',
-            'recommendation': '/api/recommendation/generate'
-        }
-    })
-
-# 健康检查
-@app.route('/health')
-def health():
-    return jsonify({'status': 'healthy'})
+# 模块级应用实例（开发服务器与测试使用）
+app = create_app()
 
 if __name__ == '__main__':
-    # 运行应用
+    # 在后台加载或生成RSA密钥，非加密接口无需等待
+    from backend.utils.crypto_utils import secure_server
+    secure_server.crypto.load_in_background()
+    
+    # 运行开发服务器（生产环境使用 serve.py 启动多进程服务器）
     app.run(host='0.0.0.0', port=5001, debug=True)
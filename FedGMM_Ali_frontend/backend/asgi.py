@@ -0,0 +1,89 @@
+"""ASGI入口：SSH与训练接口由 asyncio 版本处理，其余接口转交 Flask 应用（hypercorn backend.asgi:app）"""
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quart import Quart, request
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from werkzeug.exceptions import HTTPException
+
+from backend.app import create_app
+from backend.api.system_async import system_async_api
+from backend.utils.metrics import instrument_async_app
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+async def add_cors_headers(response):
+    """与 Flask 应用的 CORS 配置保持一致：允许任意来源并暴露 X-Encryption"""
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Expose-Headers'] = 'X-Encryption'
+    if request.method == 'OPTIONS':
+        response.headers['Access-Control-Allow-Methods'] = request.headers.get(
+            'Access-Control-Request-Method', 'GET, POST, OPTIONS')
+        response.headers['Access-Control-Allow-Headers'] = request.headers.get(
+            'Access-Control-Request-Headers', '*')
+    return response
+
+
+def create_async_app():
+    """
+    创建 asyncio 版本的 Quart 应用（仅包含SSH与训练接口）
+
+    Returns:
+        Quart: 应用实例
+    """
+    app = Quart(__name__)
+    # 命令输出流、训练进度推送为长连接，不限制响应时长
+    app.config['RESPONSE_TIMEOUT'] = None
+    app.register_blueprint(system_async_api, url_prefix='/api/system')
+    app.after_request(add_cors_headers)
+    instrument_async_app(app)
+    return app
+
+
+class AsyncDispatcher:
+    """按路由分发请求：asyncio 版本有对应路由时交给 Quart，否则在线程池中运行 Flask 应用"""
+
+    def __init__(self, async_app, wsgi_app):
+        """
+        初始化分发器
+
+        Args:
+            async_app: Quart 应用
+            wsgi_app: Flask 应用
+        """
+        self.async_app = async_app
+        self.wsgi_app = AsyncioWSGIMiddleware(wsgi_app)
+        self._adapter = async_app.url_map.bind('')
+
+    def handles(self, path: str, method: str) -> bool:
+        """
+        判断请求是否由 asyncio 版本处理
+
+        Args:
+            path: 请求路径
+            method: 请求方法
+
+        Returns:
+            bool: 是否匹配 Quart 应用的路由
+        """
+        try:
+            self._adapter.match(path, method)
+            return True
+        except HTTPException:
+            return False
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan' or (
+                scope['type'] == 'http' and self.handles(scope['path'], scope['method'])):
+            await self.async_app(scope, receive, send)
+        else:
+            await self.wsgi_app(scope, receive, send)
+
+
+app = AsyncDispatcher(create_async_app(), create_app())
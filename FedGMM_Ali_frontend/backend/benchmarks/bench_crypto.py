@@ -0,0 +1,269 @@
+"""
+CryptoUtils / SecureServer 微基准测试
+
+覆盖 rsa_decrypt、aes_decrypt、verify_hmac、decrypt_request（RSA与会话两种模式）、encrypt_response，
+在不同负载大小与并发线程数下测量吞吐量、延迟分位数与每次调用的内存分配，
+结果可保存为基线，之后与基线对比以发现性能回退。
+
+用法（在 FedGMM_Ali_frontend 目录下）:
+    python -m backend.benchmarks.bench_crypto                      # 运行并与基线对比
+    python -m backend.benchmarks.bench_crypto --save-baseline      # 运行并覆盖基线
+    python -m backend.benchmarks.bench_crypto --filter aes --threads 1,8 --duration 2
+"""
+import argparse
+import base64
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import hashlib
+import hmac
+import numpy as np
+import cryptography
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding as rsa_padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from backend.utils.crypto_utils import SecureServer
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'crypto.json')
+PAYLOAD_SIZES = (256, 4 * 1024, 64 * 1024, 1024 * 1024)
+THREAD_LEVELS = (1, 4)
+# 吞吐量低于基线该比例时判定为回退
+DEFAULT_TOLERANCE = 0.25
+
+
+def make_payload(size: int):
+    """构造序列化后约为 size 字节的JSON数据"""
+    return {'items': 'x' * max(0, size - 16)}
+
+
+class Fixture:
+    """基准测试共用的密钥、会话与预先加密好的请求"""
+
+    def __init__(self, key_dir: str):
+        self.server = SecureServer(key_dir=key_dir, lazy=False)
+        self.crypto = self.server.crypto
+        self.public_key = self.crypto.backend.private_key.public_key()
+        self.aes_key = AESGCM.generate_key(bit_length=256)
+        self.aes_key_b64 = base64.b64encode(self.aes_key).decode('utf-8')
+        self.wrapped_key = self.wrap_key(self.aes_key_b64)
+        self.session_id = self.server.sessions.create(self.aes_key_b64).session_id
+        self.hmac_key = 'benchmark-hmac-key'
+        self._ids = itertools.count()
+
+    def wrap_key(self, aes_key_b64: str) -> str:
+        oaep = rsa_padding.OAEP(mgf=rsa_padding.MGF1(hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+        return base64.b64encode(self.public_key.encrypt(aes_key_b64.encode('utf-8'), oaep)).decode('utf-8')
+
+    def encrypt(self, plaintext: bytes):
+        iv = os.urandom(12)
+        ciphertext = AESGCM(self.aes_key).encrypt(iv, plaintext, None)
+        return base64.b64encode(ciphertext).decode('utf-8'), base64.b64encode(iv).decode('utf-8')
+
+    def request(self, size: int, session: bool):
+        content, iv = self.encrypt(json.dumps(make_payload(size)).encode('utf-8'))
+        encryption = {'iv': iv}
+        if session:
+            encryption.update(algorithm='AES-GCM', session_id=self.session_id)
+        else:
+            encryption.update(algorithm='RSA-OAEP-AES-GCM', key_algorithm='RSA-OAEP', encrypted_key=self.wrapped_key)
+        return {'message_id': '', 'encryption': encryption, 'data': {'type': 'regular', 'content': content},
+                'timestamp': 0, 'version': '1.0'}
+
+    def next_message_id(self) -> str:
+        # 会话模式拒绝重复消息ID，每次调用使用新ID（消息ID不参与加密，密文可复用）
+        return f'bench-{next(self._ids)}'
+
+
+def build_cases(fixture: Fixture):
+    """
+    构造基准用例
+
+    Returns:
+        list: (用例名, 负载字节数, 无参调用函数)
+    """
+    crypto, server = fixture.crypto, fixture.server
+    cases = [('rsa_decrypt', 44, lambda: crypto.rsa_decrypt(fixture.wrapped_key, 'oaep'))]
+    for size in PAYLOAD_SIZES:
+        content, iv = fixture.encrypt(b'x' * size)
+        data = 'x' * size
+        signature = base64.b64encode(hmac.new(fixture.hmac_key.encode('utf-8'), data.encode('utf-8'),
+                                              hashlib.sha256).digest()).decode('utf-8')
+        rsa_request = fixture.request(size, session=False)
+        session_request = fixture.request(size, session=True)
+        payload = make_payload(size)
+        response_iv = base64.b64encode(os.urandom(12)).decode('utf-8')
+
+        def decrypt_session(request=session_request):
+            return server.decrypt_request(dict(request, message_id=fixture.next_message_id()))
+
+        cases += [
+            ('aes_decrypt', size, lambda c=content, i=iv: crypto.aes_decrypt(c, fixture.aes_key_b64, i)),
+            ('verify_hmac', size, lambda d=data, s=signature: crypto.verify_hmac(d, s, fixture.hmac_key)),
+            ('decrypt_request[rsa]', size, lambda r=rsa_request: server.decrypt_request(r)),
+            ('decrypt_request[session]', size, decrypt_session),
+            ('encrypt_response', size,
+             lambda p=payload, i=response_iv: server.encrypt_response(p, fixture.aes_key_b64, i)),
+        ]
+    return cases
+
+
+def measure(fn, threads: int, duration: float):
+    """
+    在 threads 个线程中持续调用 fn 约 duration 秒
+
+    Returns:
+        dict: 吞吐量与延迟分位数（微秒）
+    """
+    fn()
+    deadline = time.perf_counter() + duration
+    samples = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(latencies):
+        barrier.wait()
+        while True:
+            start = time.perf_counter()
+            fn()
+            end = time.perf_counter()
+            latencies.append(end - start)
+            if end >= deadline:
+                break
+
+    workers = [threading.Thread(target=worker, args=(samples[i],)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    start = time.perf_counter()
+    barrier.wait()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = np.array([value for latencies in samples for value in latencies]) * 1e6
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'calls': int(len(latencies)),
+        'ops_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_us': round(float(p50), 1),
+        'p95_us': round(float(p95), 1),
+        'p99_us': round(float(p99), 1)
+    }
+
+
+def measure_allocations(fn, calls: int = 20):
+    """单线程下测量每次调用分配的内存块数与峰值内存（tracemalloc开销较大，与计时分开测量）"""
+    tracemalloc.start()
+    try:
+        fn()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        base_current, _ = tracemalloc.get_traced_memory()
+        for _ in range(calls):
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return {
+        'alloc_blocks_per_call': round(blocks / calls, 1),
+        'peak_kib': round((peak - base_current) / 1024, 1)
+    }
+
+
+def case_key(name: str, size: int, threads: int) -> str:
+    return f'{name}/{size}B/t{threads}'
+
+
+def compare(results, baseline, tolerance: float):
+    """
+    与基线对比吞吐量
+
+    Returns:
+        list: 回退的用例 (键, 基线ops/s, 当前ops/s)
+    """
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get('results', {}).get(key)
+        if reference and result['ops_per_sec'] < reference['ops_per_sec'] * (1 - tolerance):
+            regressions.append((key, reference['ops_per_sec'], result['ops_per_sec']))
+    return regressions
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'cryptography': cryptography.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='加密模块微基准测试')
+    parser.add_argument('--duration', type=float, default=1.0, help='每个用例的计时时长（秒）')
+    parser.add_argument('--threads', default=','.join(map(str, THREAD_LEVELS)), help='并发线程数列表，逗号分隔')
+    parser.add_argument('--filter', default='', help='只运行名称包含该字符串的用例')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='基线文件路径')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='允许的吞吐量下降比例')
+    parser.add_argument('--output', help='把本次结果另存为JSON')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    thread_levels = [int(value) for value in args.threads.split(',') if value]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as key_dir:
+        fixture = Fixture(key_dir)
+        cases = [case for case in build_cases(fixture) if args.filter in case[0]]
+        print(f'{"用例":<40}{"ops/s":>12}{"p50(us)":>11}{"p95(us)":>11}{"p99(us)":>11}{"分配块/次":>11}{"峰值KiB":>10}')
+        for name, size, fn in cases:
+            allocations = measure_allocations(fn)
+            for threads in thread_levels:
+                key = case_key(name, size, threads)
+                result = dict(measure(fn, threads, args.duration), **allocations)
+                results[key] = result
+                print(f'{key:<40}{result["ops_per_sec"]:>12.1f}{result["p50_us"]:>11.1f}{result["p95_us"]:>11.1f}'
+                      f'{result["p99_us"]:>11.1f}{result["alloc_blocks_per_call"]:>11.1f}{result["peak_kib"]:>10.1f}')
+
+    report = {'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'environment': environment(),
+              'duration': args.duration, 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'基线已保存: {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('未找到基线文件，使用 --save-baseline 生成')
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('environment') != report['environment']:
+        print('提示: 基线来自不同的运行环境，对比结果仅供参考')
+    regressions = compare(results, baseline, args.tolerance)
+    for key, reference, current in regressions:
+        print(f'性能回退: {key} {reference:.1f} -> {current:.1f} ops/s')
+    if not regressions:
+        print(f'与基线相比无超过 {args.tolerance:.0%} 的吞吐量下降')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
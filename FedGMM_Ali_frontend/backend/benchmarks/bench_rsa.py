@@ -0,0 +1,82 @@
+"""
+RSA后端性能对比：纯Python rsa库 与 OpenSSL（cryptography库）的私钥解密耗时
+
+用法（在 FedGMM_Ali_frontend 目录下）:
+    python -m backend.benchmarks.bench_rsa --iterations 200 --threads 4
+"""
+import argparse
+import base64
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from cryptography.hazmat.primitives.asymmetric import padding as rsa_padding
+from backend.utils.crypto_utils import CryptoUtils, RSA_BACKENDS, RSA_PADDING_PKCS1V15
+
+
+def encrypt_payloads(crypto: CryptoUtils, count: int):
+    """用公钥加密 count 个32字节的base64 AES密钥（与前端封装的明文长度一致）"""
+    public_key = crypto.backend.private_key.public_key()
+    payloads = []
+    for _ in range(count):
+        plaintext = base64.b64encode(os.urandom(32))
+        payloads.append(base64.b64encode(public_key.encrypt(plaintext, rsa_padding.PKCS1v15())).decode('utf-8'))
+    return payloads
+
+
+def run(backend: str, key_dir: str, payloads, threads: int):
+    """
+    测量一个后端的解密耗时
+
+    Returns:
+        dict: 每次调用的平均/中位/P95耗时（毫秒）与吞吐量
+    """
+    crypto = CryptoUtils(key_dir=key_dir, backend=backend)
+    crypto.rsa_decrypt(payloads[0], RSA_PADDING_PKCS1V15)
+
+    def timed(payload):
+        start = time.perf_counter()
+        crypto.rsa_decrypt(payload, RSA_PADDING_PKCS1V15)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = sorted(executor.map(timed, payloads))
+    elapsed = time.perf_counter() - start
+    return {
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'median_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'ops_per_sec': len(latencies) / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RSA后端解密性能对比')
+    parser.add_argument('--iterations', type=int, default=200, help='每个后端的解密次数')
+    parser.add_argument('--threads', type=int, default=1, help='并发线程数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as key_dir:
+        # 由OpenSSL后端生成PKCS#1密钥文件，两个后端加载同一对密钥
+        crypto = CryptoUtils(key_dir=key_dir, backend='openssl')
+        payloads = encrypt_payloads(crypto, args.iterations)
+
+        print(f'RSA-{crypto.backend.private_key.key_size} 解密，{args.iterations} 次，{args.threads} 线程')
+        print(f'{"后端":<10}{"平均(ms)":>12}{"中位(ms)":>12}{"P95(ms)":>12}{"ops/s":>12}')
+        results = {}
+        for backend in RSA_BACKENDS:
+            results[backend] = result = run(backend, key_dir, payloads, args.threads)
+            print(f'{backend:<10}{result["mean_ms"]:>12.3f}{result["median_ms"]:>12.3f}'
+                  f'{result["p95_ms"]:>12.3f}{result["ops_per_sec"]:>12.1f}')
+        speedup = results['python']['mean_ms'] / results['openssl']['mean_ms']
+        print(f'OpenSSL后端单次解密快 {speedup:.1f} 倍')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+启动耗时测量：导入应用的耗时，以及首次加密请求前加载/生成RSA密钥的耗时
+
+用法（在 FedGMM_Ali_frontend 目录下）:
+    python -m backend.benchmarks.bench_startup --repeat 3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.utils.crypto_utils import CryptoUtils, RSA_BACKENDS
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMPORT_SCRIPT = (
+    'import time; start = time.perf_counter(); import backend.app; '
+    'print(time.perf_counter() - start)'
+)
+
+
+def measure_import(key_dir: str) -> float:
+    """在新进程中导入 backend.app，返回导入耗时（秒）；密钥目录为空，验证导入时不生成密钥"""
+    env = dict(os.environ, CRYPTO_KEY_DIR=key_dir)
+    output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=PROJECT_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    if os.path.exists(os.path.join(key_dir, 'private_key.pem')):
+        raise RuntimeError('导入应用时生成了密钥')
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_keys(backend: str, key_dir: str) -> float:
+    """测量首次使用时加载（目录为空时生成）密钥的耗时（秒）"""
+    crypto = CryptoUtils(key_dir=key_dir, backend=backend, lazy=True)
+    crypto.ensure_keys()
+    return crypto.load_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='应用启动与密钥加载耗时')
+    parser.add_argument('--repeat', type=int, default=3, help='每项测量的重复次数（取中位数）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as key_dir:
+        imports = [measure_import(key_dir) for _ in range(args.repeat)]
+    print(f'导入 backend.app: {statistics.median(imports) * 1000:.1f} ms（导入时不加载密钥）')
+
+    for backend in RSA_BACKENDS:
+        generate, load = [], []
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory() as key_dir:
+                generate.append(measure_keys(backend, key_dir))
+                load.append(measure_keys(backend, key_dir))
+        print(f'{backend:<8} 首次生成密钥: {statistics.median(generate) * 1000:>9.1f} ms'
+              f'    加载已有密钥: {statistics.median(load) * 1000:>7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Gunicorn 配置（生产环境多进程服务）
+
+用法（在 FedGMM_Ali_frontend 目录下）:
+    gunicorn -c backend/gunicorn.conf.py backend.wsgi:app
+或使用启动脚本:
+    python -m backend.serve --workers 4 --threads 8
+
+平滑重启: kill -HUP <master pid>，主进程重新预加载共享数据后逐个替换工作进程；
+平滑升级: kill -USR2 <master pid> 启动新主进程，确认正常后向旧主进程发送 TERM。
+
+指标: 工作进程把请求/SSH/加密指标写入 METRICS_DIR 下的快照，/metrics 合并全部工作进程的指标
+（最多延迟 METRICS_FLUSH_INTERVAL 秒）。
+
+注意: SSH连接池、命令任务、训练监控与加密会话保存在各工作进程内存中，多个工作进程时请求可能落到
+不同进程（加密会话在其他进程返回401并触发重新握手），因此默认只启动1个工作进程并通过 threads 提高并发；
+只提供无状态接口（数据查询、推荐）的部署可通过 GUNICORN_WORKERS 增加进程数。
+"""
+import os
+import tempfile
+
+# 在应用导入之前设置：多进程下 /metrics 需合并各工作进程的指标快照
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'fedgmm-metrics'))
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5001')
+# 进程内状态（SSH连接、加密会话等）尚未在进程间共享，默认单个工作进程
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+# gthread 工作进程：每个进程内用线程处理请求，SSH/SSE等长连接不会占满进程
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+# fork之前导入应用并加载共享数据，工作进程写时复制共享
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# 定期回收工作进程，抖动避免所有进程同时重启
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+proc_name = 'fedgmm-backend'
+
+
+def when_ready(server):
+    from backend.app import preload_shared_data
+    from backend.utils.metrics import metrics
+    metrics.reset_directory()
+    preload_shared_data()
+    server.log.info(f'共享数据已加载，启动 {server.num_workers} 个工作进程，每进程 {server.cfg.threads} 线程')
+
+
+def on_reload(server):
+    # HUP: 预加载的应用不会重新导入，在主进程中刷新共享数据后再fork新工作进程
+    from backend.app import preload_shared_data
+    preload_shared_data()
+    server.log.info('共享数据已重新加载')
+
+
+def post_fork(server, worker):
+    from backend.utils.metrics import metrics
+    metrics.start_exporter()
+
+
+def child_exit(server, worker):
+    # 已退出工作进程的累计指标并入归档，/metrics 中的计数不会因进程回收而回退
+    from backend.utils.metrics import metrics
+    metrics.mark_process_dead(worker.pid)
@@ -0,0 +1,100 @@
+"""
+生产环境启动脚本：预加载共享数据后以多进程（pre-fork）方式运行
+
+用法（在 FedGMM_Ali_frontend 目录下）:
+    python -m backend.serve --threads 16 --bind 0.0.0.0:5001
+    python -m backend.serve --async --bind 0.0.0.0:5001
+
+未安装 gunicorn（如 Windows）时退回单进程多线程服务器。--async 以单进程 asyncio 服务器（hypercorn）
+运行，SSH与训练接口在事件循环中等待远程主机，其余接口在线程池中运行。
+"""
+import argparse
+import os
+import runpy
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='启动后端服务（多进程）')
+    parser.add_argument('--bind', help='监听地址，默认 0.0.0.0:5001')
+    parser.add_argument('--workers', type=int, help='工作进程数（默认1，SSH/训练/加密会话状态保存在进程内）')
+    parser.add_argument('--threads', type=int, help='每个工作进程的线程数')
+    parser.add_argument('--timeout', type=int, help='请求超时（秒）')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='以单进程 asyncio 服务器运行（SSH与训练接口不占用线程）')
+    return parser.parse_args()
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            # 先读取配置文件，再用命令行参数覆盖
+            for name, value in runpy.run_path(CONFIG_FILE).items():
+                if name in self.cfg.settings and value is not None:
+                    self.cfg.set(name, value)
+            for name in ('bind', 'workers', 'threads', 'timeout'):
+                value = getattr(args, name)
+                if value is not None:
+                    self.cfg.set(name, value)
+
+        def load(self):
+            # 在读取配置文件之后导入应用，配置中设置的环境变量（如 METRICS_DIR）才会生效
+            from backend.app import create_app
+            return create_app()
+
+    Application().run()
+
+
+def run_fallback(args):
+    from werkzeug.serving import run_simple
+    from backend.app import create_app, preload_shared_data
+
+    host, _, port = (args.bind or '0.0.0.0:5001').rpartition(':')
+    preload_shared_data()
+    logger.warning('未安装gunicorn，以单进程多线程模式运行')
+    run_simple(host or '0.0.0.0', int(port), create_app(), threaded=True, use_reloader=False)
+
+
+def run_async(args):
+    import asyncio
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    from backend.app import preload_shared_data
+    from backend.asgi import app
+
+    if args.workers or args.threads:
+        logger.warning('asyncio 模式为单进程运行，忽略 --workers/--threads')
+    config = Config()
+    config.bind = [args.bind or '0.0.0.0:5001']
+    config.accesslog = '-'
+    preload_shared_data()
+    logger.info(f'以 asyncio 模式运行: {config.bind[0]}')
+    asyncio.run(serve(app, config))
+
+
+def main():
+    args = parse_args()
+    if args.use_async:
+        run_async(args)
+        return
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        run_fallback(args)
+        return
+    run_gunicorn(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,428 @@
+import hashlib
+import json
+import os
+import shlex
+import stat
+import threading
+import time
+import uuid
+import zlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 默认同步的训练产物目录（与 check_data_exists 检查的目录一致）
+ARTIFACT_CATEGORIES = ('communication', 'gamma', 'tau', 'models')
+# 本地同步清单文件名
+MANIFEST_FILE = '.sync_manifest.json'
+# 单次读取块大小
+CHUNK_SIZE = 256 * 1024
+# 远程主机没有 sha256sum 时用 python3 计算SHA-256（输出格式与 sha256sum 一致）
+PYTHON_SHA256_SCRIPT = '''import hashlib, sys
+for path in sys.argv[1:]:
+    h = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1048576), b''):
+                h.update(chunk)
+    except OSError:
+        continue
+    print(h.hexdigest() + '  ' + path)
+'''
+# 远程计算SHA-256的命令，按顺序尝试，前一个不可用或未算出全部文件时换下一个
+REMOTE_SHA256_COMMANDS = (
+    'sha256sum --',
+    'python3 -c ' + shlex.quote(PYTHON_SHA256_SCRIPT),
+    'openssl dgst -sha256 -r'
+)
+
+
+def sha256_file(path: str) -> str:
+    """计算本地文件的SHA-256"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class RemoteArtifact:
+    """远程产物文件"""
+
+    def __init__(self, rel_path: str, remote_path: str, size: int, mtime: int):
+        self.rel_path = rel_path
+        self.remote_path = remote_path
+        self.size = size
+        self.mtime = mtime
+        self.sha256 = None
+
+
+class ArtifactSync:
+    """把训练主机上的产物并行、可续传地同步到本地 DATA_DIR，并校验SHA-256"""
+
+    def __init__(self, connection, remote_root: str, local_root: str,
+                 categories=ARTIFACT_CATEGORIES, workers: int = 4, compress: bool = True):
+        """
+        初始化同步任务
+
+        Args:
+            connection: 池化SSH连接（PooledConnection）
+            remote_root: 远程产物根目录
+            local_root: 本地数据目录（DATA_DIR）
+            categories: 要同步的子目录
+            workers: 并行传输的SFTP/exec channel数
+            compress: 是否在远程用gzip压缩后传输（适合日志、numpy等可压缩数据）
+        """
+        self.connection = connection
+        self.remote_root = remote_root.rstrip('/') or '/'
+        self.local_root = local_root
+        self.categories = list(categories)
+        self.workers = max(1, int(workers))
+        self.compress = compress
+        self.manifest_path = os.path.join(local_root, MANIFEST_FILE)
+        self._manifest_lock = threading.Lock()
+        self._thread_local = threading.local()
+        self._sftp_clients = []
+
+    # ---------- 清单 ----------
+
+    def load_manifest(self) -> Dict[str, Dict[str, any]]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest: Dict[str, Dict[str, any]]):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    # ---------- 远程列举 ----------
+
+    def _sftp(self):
+        """每个工作线程使用独立的SFTP channel，实现并行传输"""
+        sftp = getattr(self._thread_local, 'sftp', None)
+        if sftp is None:
+            sftp = self._thread_local.sftp = self.connection.client.open_sftp()
+            with self._manifest_lock:
+                self._sftp_clients.append(sftp)
+        return sftp
+
+    def _close_sftp_clients(self):
+        with self._manifest_lock:
+            clients, self._sftp_clients = self._sftp_clients, []
+        for sftp in clients:
+            try:
+                sftp.close()
+            except Exception:
+                pass
+
+    def list_remote(self) -> List[RemoteArtifact]:
+        """
+        递归列出远程产物
+
+        Returns:
+            List[RemoteArtifact]: 远程文件列表
+        """
+        sftp = self.connection.sftp()
+        artifacts = []
+        stack = [(category, f'{self.remote_root}/{category}') for category in self.categories]
+        while stack:
+            rel_dir, remote_dir = stack.pop()
+            try:
+                entries = sftp.listdir_attr(remote_dir)
+            except IOError:
+                continue
+            for entry in entries:
+                rel_path = f'{rel_dir}/{entry.filename}'
+                remote_path = f'{remote_dir}/{entry.filename}'
+                if stat.S_ISDIR(entry.st_mode):
+                    stack.append((rel_path, remote_path))
+                elif stat.S_ISREG(entry.st_mode):
+                    artifacts.append(RemoteArtifact(rel_path, remote_path, entry.st_size, int(entry.st_mtime)))
+        return sorted(artifacts, key=lambda a: a.rel_path)
+
+    def plan(self, artifacts: List[RemoteArtifact]) -> List[RemoteArtifact]:
+        """
+        筛选新增或变化（大小/修改时间不同，或本地文件缺失）的文件
+
+        Args:
+            artifacts: 远程文件列表
+
+        Returns:
+            List[RemoteArtifact]: 需要传输的文件
+        """
+        manifest = self.load_manifest()
+        changed = []
+        for artifact in artifacts:
+            entry = manifest.get(artifact.rel_path)
+            local_path = self._local_path(artifact)
+            if entry and entry['size'] == artifact.size and entry['mtime'] == artifact.mtime \
+                    and os.path.exists(local_path):
+                continue
+            changed.append(artifact)
+        return changed
+
+    def _remote_checksums(self, artifacts: List[RemoteArtifact]):
+        """
+        一次远程命令批量计算SHA-256；sha256sum 不可用时依次改用 python3、openssl
+
+        仍未算出校验和的文件保持 sha256 为 None，传输时按校验失败处理。
+        """
+        batch = 200
+        for i in range(0, len(artifacts), batch):
+            pending = artifacts[i:i + batch]
+            for checksum_command in REMOTE_SHA256_COMMANDS:
+                command = checksum_command + ' ' + ' '.join(shlex.quote(a.remote_path) for a in pending)
+                try:
+                    exit_status, stdout, stderr = self.connection.exec_command(command, timeout=300)
+                except Exception as e:
+                    logger.warning(f'远程计算SHA-256失败（{checksum_command.split()[0]}）: {str(e)}')
+                    continue
+                sums = {}
+                for line in stdout.splitlines():
+                    # sha256sum 与 python3 输出 "摘要  路径"，openssl -r 输出 "摘要 *路径"
+                    digest, _, path = line.partition(' ')
+                    sums[path[1:] if path[:1] in (' ', '*') else path] = digest.lower()
+                for artifact in pending:
+                    artifact.sha256 = sums.get(artifact.remote_path)
+                pending = [a for a in pending if a.sha256 is None]
+                if not pending:
+                    break
+                logger.warning(f'{checksum_command.split()[0]} 未能计算 {len(pending)} 个文件的SHA-256，尝试下一种方式')
+
+    # ---------- 传输 ----------
+
+    def _local_path(self, artifact: RemoteArtifact) -> str:
+        local_path = os.path.normpath(os.path.join(self.local_root, *artifact.rel_path.split('/')))
+        if not local_path.startswith(os.path.normpath(self.local_root) + os.sep):
+            raise ValueError(f'非法的产物路径: {artifact.rel_path}')
+        return local_path
+
+    def _resume_offset(self, artifact: RemoteArtifact, part_path: str) -> int:
+        """读取续传位置；远程文件已变化时丢弃未完成的部分"""
+        meta_path = part_path + '.json'
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            offset = os.path.getsize(part_path)
+            if meta.get('size') == artifact.size and meta.get('mtime') == artifact.mtime and offset <= artifact.size:
+                return offset
+        except (FileNotFoundError, ValueError, OSError):
+            pass
+        with open(meta_path, 'w') as f:
+            json.dump({'size': artifact.size, 'mtime': artifact.mtime}, f)
+        open(part_path, 'wb').close()
+        return 0
+
+    def _download_sftp(self, artifact: RemoteArtifact, out, offset: int):
+        with self._sftp().open(artifact.remote_path, 'rb') as f:
+            f.seek(offset)
+            if hasattr(f, 'prefetch'):
+                f.prefetch(artifact.size - offset)
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+
+    def _download_gzip(self, artifact: RemoteArtifact, out, offset: int):
+        """远程 tail|gzip 压缩后经exec channel传输，本地流式解压"""
+        command = f'tail -c +{offset + 1} -- {shlex.quote(artifact.remote_path)} | gzip -1 -c'
+        channel = self.connection.open_channel(timeout=30)
+        try:
+            channel.exec_command(command)
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            while True:
+                chunk = channel.recv(CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(decompressor.decompress(chunk))
+            out.write(decompressor.flush())
+            exit_status = channel.recv_exit_status()
+            if exit_status != 0:
+                raise IOError(f'远程压缩传输失败，退出状态码: {exit_status}')
+        finally:
+            channel.close()
+
+    def transfer(self, artifact: RemoteArtifact) -> Dict[str, any]:
+        """
+        传输单个文件（可续传），校验后原子替换到本地
+
+        Args:
+            artifact: 远程文件
+
+        Returns:
+            Dict[str, any]: 传输结果
+        """
+        local_path = self._local_path(artifact)
+        if artifact.sha256 is None:
+            # 没有远程校验和就无法确认文件完整，不能只凭大小接受
+            raise IOError(f'远程主机无法计算SHA-256，文件未校验: {artifact.rel_path}')
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        part_path = local_path + '.part'
+
+        for attempt in range(2):
+            offset = self._resume_offset(artifact, part_path)
+            with open(part_path, 'ab') as out:
+                if offset < artifact.size:
+                    if self.compress:
+                        self._download_gzip(artifact, out, offset)
+                    else:
+                        self._download_sftp(artifact, out, offset)
+
+            digest = sha256_file(part_path)
+            if os.path.getsize(part_path) == artifact.size and digest == artifact.sha256:
+                break
+            # 校验失败，丢弃后完整重传一次
+            logger.warning(f'校验失败，重新传输: {artifact.rel_path}')
+            os.remove(part_path)
+            os.remove(part_path + '.json')
+        else:
+            raise IOError(f'文件校验失败: {artifact.rel_path}')
+
+        os.replace(part_path, local_path)
+        os.remove(part_path + '.json')
+        os.utime(local_path, (artifact.mtime, artifact.mtime))
+
+        with self._manifest_lock:
+            manifest = self.load_manifest()
+            manifest[artifact.rel_path] = {'size': artifact.size, 'mtime': artifact.mtime, 'sha256': digest}
+            self._save_manifest(manifest)
+        return {'path': artifact.rel_path, 'size': artifact.size, 'resumed_from': offset, 'sha256': digest}
+
+    def run(self, progress=None) -> Dict[str, any]:
+        """
+        执行同步
+
+        Args:
+            progress: 每个文件完成后的回调，参数为结果字典（可选）
+
+        Returns:
+            Dict[str, any]: 同步汇总
+        """
+        started = time.time()
+        os.makedirs(self.local_root, exist_ok=True)
+        # 同步期间标记连接在用，避免被连接池当作空闲连接回收
+        self.connection.acquire()
+        try:
+            artifacts = self.list_remote()
+            changed = self.plan(artifacts)
+            if changed:
+                self._remote_checksums(changed)
+
+            transferred, failed = [], []
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='artifact-sync') as executor:
+                futures = {executor.submit(self.transfer, artifact): artifact for artifact in changed}
+                for future in as_completed(futures):
+                    artifact = futures[future]
+                    try:
+                        result = future.result()
+                        transferred.append(result)
+                    except Exception as e:
+                        logger.error(f'同步文件失败 {artifact.rel_path}: {str(e)}')
+                        result = {'path': artifact.rel_path, 'error': str(e)}
+                        failed.append(result)
+                    if progress is not None:
+                        progress(result)
+        finally:
+            self._close_sftp_clients()
+            self.connection.release()
+
+        return {
+            'remote_files': len(artifacts),
+            'transferred': transferred,
+            'failed': failed,
+            'skipped': len(artifacts) - len(changed),
+            'bytes': sum(item['size'] - item['resumed_from'] for item in transferred),
+            'elapsed': round(time.time() - started, 3)
+        }
+
+
+class SyncJob:
+    """后台同步任务"""
+
+    def __init__(self, sync: ArtifactSync):
+        self.job_id = uuid.uuid4().hex
+        self.sync = sync
+        self.status = 'running'
+        self.completed_files = 0
+        self.result = None
+        self.error_message = ''
+        self.started_at = time.time()
+        self.finished_at = None
+        self.finished_event = threading.Event()
+
+    def _progress(self, result):
+        self.completed_files += 1
+
+    def run(self):
+        try:
+            self.result = self.sync.run(progress=self._progress)
+            self.status = 'failed' if self.result['failed'] else 'completed'
+            if self.result['failed']:
+                self.error_message = f"{len(self.result['failed'])} 个文件同步失败"
+        except Exception as e:
+            logger.error(f'同步任务失败: {str(e)}')
+            self.status = 'failed'
+            self.error_message = str(e)
+        finally:
+            self.finished_at = time.time()
+            self.finished_event.set()
+
+    def to_dict(self) -> Dict[str, any]:
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'remote_root': self.sync.remote_root,
+            'completed_files': self.completed_files,
+            'result': self.result,
+            'error_message': self.error_message,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class SyncManager:
+    """管理后台同步任务（同一时间每个本地目录只运行一个同步）"""
+
+    def __init__(self, max_jobs: int = 50):
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, SyncJob] = {}
+        self._lock = threading.Lock()
+
+    def start(self, sync: ArtifactSync) -> SyncJob:
+        """
+        启动同步任务；同一本地目录已有运行中的任务时直接返回该任务
+
+        Args:
+            sync: 同步配置
+
+        Returns:
+            SyncJob: 同步任务
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status == 'running' and job.sync.local_root == sync.local_root:
+                    return job
+            job = SyncJob(sync)
+            self._jobs[job.job_id] = job
+            finished = [j for j in self._jobs.values() if j.status != 'running']
+            for old in sorted(finished, key=lambda j: j.started_at)[:max(0, len(self._jobs) - self.max_jobs)]:
+                del self._jobs[old.job_id]
+        threading.Thread(target=job.run, name=f'artifact-sync-{job.job_id[:8]}', daemon=True).start()
+        return job
+
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+# 全局同步任务管理器
+artifact_syncs = SyncManager()
@@ -0,0 +1,155 @@
+import os
+import asyncio
+import functools
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 执行阻塞SSH调用（打开channel、发送exec请求、终止远程进程等）的线程数
+DEFAULT_BRIDGE_WORKERS = int(os.environ.get('ASYNC_BRIDGE_WORKERS', 16))
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+
+class AsyncCondition(threading.Condition):
+    """
+    可被协程等待的条件变量
+
+    后台线程照常在持有锁时调用 notify_all，除唤醒阻塞等待的线程外，还通过 call_soon_threadsafe
+    唤醒事件循环中的等待者；协程等待期间不占用线程
+    """
+
+    def __init__(self, lock=None):
+        super().__init__(lock)
+        # (事件循环, Future)，受条件变量的锁保护
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def notify_all(self):
+        super().notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    def _register(self, loop: asyncio.AbstractEventLoop) -> asyncio.Future:
+        """登记协程等待者（调用方需持有锁）"""
+        future = loop.create_future()
+        self._async_waiters.append((loop, future))
+        return future
+
+    async def _wait_future(self, loop: asyncio.AbstractEventLoop, future: asyncio.Future,
+                           timeout: Optional[float]) -> bool:
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self:
+                if (loop, future) in self._async_waiters:
+                    self._async_waiters.remove((loop, future))
+
+    async def wait_async(self, timeout: Optional[float] = None) -> bool:
+        """
+        协程版 wait：等待下一次 notify_all（调用时无需持有锁）
+
+        Args:
+            timeout: 最长等待时间（秒，可选）
+
+        Returns:
+            bool: 是否被唤醒（超时返回False）
+        """
+        loop = asyncio.get_running_loop()
+        with self:
+            future = self._register(loop)
+        return await self._wait_future(loop, future, timeout)
+
+    async def wait_for_async(self, predicate: Callable[[], any], timeout: Optional[float] = None):
+        """
+        协程版 wait_for：等待 predicate 为真或超时（调用时无需持有锁）
+
+        Args:
+            predicate: 条件函数（在持有锁时调用）
+            timeout: 最长等待时间（秒，可选）
+
+        Returns:
+            predicate 的最后一次结果
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            # 检查条件与登记等待者在同一把锁内完成，不会错过其间的通知
+            with self:
+                result = predicate()
+                remaining = None if deadline is None else deadline - loop.time()
+                if result or (remaining is not None and remaining <= 0):
+                    return result
+                future = self._register(loop)
+            await self._wait_future(loop, future, remaining)
+
+
+class AsyncBridge:
+    """事件循环与阻塞SSH调用之间的桥：阻塞调用放入专用线程池，避免占用事件循环与默认执行器"""
+
+    def __init__(self, max_workers: int = DEFAULT_BRIDGE_WORKERS):
+        """
+        初始化桥接器
+
+        Args:
+            max_workers: 执行阻塞调用的线程数
+        """
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='async-bridge')
+
+    async def call(self, fn: Callable, *args, **kwargs):
+        """
+        在专用线程池中执行阻塞调用并等待结果
+
+        Args:
+            fn: 阻塞函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+
+        Returns:
+            fn 的返回值
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+
+async def wait_readable(fd: int, timeout: Optional[float]) -> bool:
+    """
+    等待文件描述符可读（paramiko channel 的 fileno 在缓冲区有数据或EOF时可读）
+
+    Args:
+        fd: 文件描述符
+        timeout: 最长等待时间（秒，可选）
+
+    Returns:
+        bool: 是否可读
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    loop.add_reader(fd, _wake, future)
+    try:
+        await asyncio.wait_for(future, timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        loop.remove_reader(fd)
+
+
+# 全局桥接器
+async_bridge = AsyncBridge()
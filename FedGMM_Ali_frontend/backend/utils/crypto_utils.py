@@ -5,38 +5,299 @@ import os
 import time
 import hashlib
 import hmac
+import struct
+import secrets
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives import padding, hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa as rsa_keys, padding as rsa_padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.exceptions import InvalidTag
 import logging
+from backend.utils.metrics import crypto_operation_seconds
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，多进程同时生成密钥时不加文件锁
+    fcntl = None
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 密钥目录：默认位于 backend/keys，与启动时的工作目录无关，可通过环境变量 CRYPTO_KEY_DIR 指定
+DEFAULT_KEY_DIR = os.path.abspath(os.environ.get(
+    'CRYPTO_KEY_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'keys')
+))
+# 接口等待密钥就绪的最长时间（秒），超时返回503，避免请求线程长时间阻塞在密钥生成上
+KEY_READY_TIMEOUT = float(os.environ.get('CRYPTO_KEY_READY_TIMEOUT', 5))
+
+# RSA运算后端：openssl（cryptography库，默认）或 python（纯Python rsa库）
+RSA_BACKEND = os.environ.get('CRYPTO_RSA_BACKEND', 'openssl')
+RSA_KEY_BITS = 2048
+
+# 会话密钥有效期（秒，每次使用后顺延）与会话表容量
+SESSION_TTL = int(os.environ.get('CRYPTO_SESSION_TTL', 1800))
+MAX_SESSIONS = int(os.environ.get('CRYPTO_MAX_SESSIONS', 1024))
+# 每个会话记住的最近消息ID数，用于拒绝重放
+SESSION_REPLAY_WINDOW = 1024
+
+# AES-GCM认证标签长度（与 Web Crypto 一致，附加在密文末尾）
+GCM_TAG_SIZE = 16
+
+# 分块流式加密格式：头部为 魔数(4字节) + nonce前缀(8字节)；
+# 之后每帧为 密文长度(4字节大端) + 密文（含16字节标签），nonce = 前缀 + 帧序号(4字节大端)，
+# 附加认证数据 = 帧序号 + 结束标志(1字节)；最后一帧为结束标志为1的空帧，用于检测截断
+STREAM_MAGIC = b'FGS1'
+STREAM_NONCE_PREFIX_SIZE = 8
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_MAX_FRAME = 16 * 1024 * 1024
+
+# AES密钥的RSA封装填充方式
+RSA_PADDING_PKCS1V15 = 'pkcs1v15'
+RSA_PADDING_OAEP = 'oaep'
+
+# 请求中 key_algorithm 字段到填充方式的映射（前端 crypto.js 使用 RSA-OAEP + SHA-256）
+KEY_ALGORITHM_PADDINGS = {
+    'RSA-OAEP': RSA_PADDING_OAEP,
+    'RSA-PKCS1': RSA_PADDING_PKCS1V15,
+    'RSA-PKCS1-V1_5': RSA_PADDING_PKCS1V15
+}
+
+
+class RSABackend(ABC):
+    """RSA私钥运算后端；密钥文件统一使用PKCS#1 PEM格式，两种后端可互相读取"""
+
+    name = None
+
+    @abstractmethod
+    def generate(self, bits: int = RSA_KEY_BITS):
+        """生成新密钥对并返回 (私钥PEM, 公钥PEM)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def load(self, private_pem: bytes, public_pem: bytes):
+        """加载PKCS#1 PEM格式的密钥对"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def public_pem(self) -> bytes:
+        """PKCS#1 PEM格式的公钥"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def decrypt(self, ciphertext: bytes, scheme: str = RSA_PADDING_PKCS1V15) -> bytes:
+        """
+        使用私钥解密
+
+        Args:
+            ciphertext: 密文
+            scheme: 填充方式（pkcs1v15 或 oaep）
+
+        Returns:
+            bytes: 明文
+        """
+        raise NotImplementedError
+
+
+class PythonRSABackend(RSABackend):
+    """纯Python实现（rsa库），仅支持PKCS#1 v1.5填充"""
+
+    name = 'python'
+
+    def __init__(self):
+        self.private_key = None
+        self.public_key = None
+
+    def generate(self, bits: int = RSA_KEY_BITS):
+        # rsa.newkeys 返回 (公钥, 私钥)
+        self.public_key, self.private_key = rsa.newkeys(bits)
+        return self.private_key.save_pkcs1(), self.public_key.save_pkcs1()
+
+    def load(self, private_pem: bytes, public_pem: bytes):
+        self.private_key = rsa.PrivateKey.load_pkcs1(private_pem)
+        self.public_key = rsa.PublicKey.load_pkcs1(public_pem)
+
+    def public_pem(self) -> bytes:
+        return self.public_key.save_pkcs1()
+
+    def decrypt(self, ciphertext: bytes, scheme: str = RSA_PADDING_PKCS1V15) -> bytes:
+        if scheme != RSA_PADDING_PKCS1V15:
+            raise ValueError(f'纯Python后端不支持 {scheme} 填充')
+        try:
+            return rsa.decrypt(ciphertext, self.private_key)
+        except rsa.DecryptionError:
+            raise ValueError('RSA解密失败')
+
+
+class OpenSSLRSABackend(RSABackend):
+    """基于OpenSSL（cryptography库）的实现，支持PKCS#1 v1.5与OAEP(SHA-256)填充"""
+
+    name = 'openssl'
+
+    def __init__(self):
+        self.private_key = None
+
+    def generate(self, bits: int = RSA_KEY_BITS):
+        self.private_key = rsa_keys.generate_private_key(public_exponent=65537, key_size=bits)
+        private_pem = self.private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption()
+        )
+        return private_pem, self.public_pem()
+
+    def load(self, private_pem: bytes, public_pem: bytes):
+        # 公钥由私钥导出，public_pem 仅为与其他后端保持相同接口
+        self.private_key = serialization.load_pem_private_key(private_pem, password=None)
+
+    def public_pem(self) -> bytes:
+        return self.private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.PKCS1
+        )
+
+    def decrypt(self, ciphertext: bytes, scheme: str = RSA_PADDING_PKCS1V15) -> bytes:
+        if scheme == RSA_PADDING_OAEP:
+            scheme_padding = rsa_padding.OAEP(
+                mgf=rsa_padding.MGF1(algorithm=hashes.SHA256()),
+                algorithm=hashes.SHA256(),
+                label=None
+            )
+        elif scheme == RSA_PADDING_PKCS1V15:
+            scheme_padding = rsa_padding.PKCS1v15()
+        else:
+            raise ValueError(f'不支持的填充方式: {scheme}')
+        try:
+            return self.private_key.decrypt(ciphertext, scheme_padding)
+        except ValueError:
+            raise ValueError('RSA解密失败')
+
+
+RSA_BACKENDS = {
+    PythonRSABackend.name: PythonRSABackend,
+    OpenSSLRSABackend.name: OpenSSLRSABackend
+}
+
+
+def create_rsa_backend(name: str = None) -> RSABackend:
+    """
+    创建RSA后端
+
+    Args:
+        name: 后端名称（openssl 或 python，默认取环境变量 CRYPTO_RSA_BACKEND）
+
+    Returns:
+        RSABackend: RSA后端实例
+    """
+    name = name or RSA_BACKEND
+    if name not in RSA_BACKENDS:
+        raise ValueError(f'未知的RSA后端: {name}')
+    return RSA_BACKENDS[name]()
+
 class CryptoUtils:
     """加密工具类"""
     
-    def __init__(self, key_dir='./keys'):
+    def __init__(self, key_dir=None, backend=None, lazy=False):
         """
         初始化加密工具
         
         Args:
-            key_dir: 密钥存储目录
+            key_dir: 密钥存储目录（可选，默认 DEFAULT_KEY_DIR）
+            backend: RSA后端名称（openssl 或 python，可选）
+            lazy: 为True时不立即加载密钥，首次使用或调用 load_in_background 时再加载
         """
-        self.key_dir = key_dir
-        self.private_key = None
-        self.public_key = None
-        self._ensure_key_dir()
-        self._load_or_generate_keys()
+        self.key_dir = os.path.abspath(key_dir or DEFAULT_KEY_DIR)
+        self.backend = create_rsa_backend(backend)
+        self.load_seconds = None
+        self._ready = threading.Event()
+        self._load_lock = threading.Lock()
+        self._load_error = None
+        self._loader = None
+        if not lazy:
+            self.ensure_keys()
+    
+    @property
+    def ready(self):
+        """密钥是否已加载"""
+        return self._ready.is_set()
+    
+    def ensure_keys(self, timeout=None):
+        """
+        确保密钥已加载，未加载时在当前线程加载（或等待后台加载完成）
+        
+        Args:
+            timeout: 等待后台加载的最长时间（秒，可选）
+            
+        Returns:
+            bool: 密钥是否就绪
+        """
+        if self._ready.is_set():
+            return True
+        loader = self._loader
+        if loader is not None and loader.is_alive():
+            if not self._ready.wait(timeout):
+                return False
+        else:
+            self._load()
+        if not self._ready.is_set():
+            raise RuntimeError(f'RSA密钥加载失败: {str(self._load_error)}')
+        return True
+    
+    def _load(self):
+        with self._load_lock:
+            if self._ready.is_set():
+                return
+            start = time.perf_counter()
+            try:
+                self._load_or_generate_keys()
+            except Exception as e:
+                self._load_error = e
+                raise
+            self.load_seconds = time.perf_counter() - start
+            self._ready.set()
+    
+    def load_in_background(self):
+        """
+        在后台线程中加载或生成密钥，不阻塞应用启动
+        
+        Returns:
+            threading.Thread: 加载线程（密钥已就绪时返回None）
+        """
+        with self._load_lock:
+            if self._ready.is_set():
+                return None
+            if self._loader is not None and self._loader.is_alive():
+                return self._loader
+            
+            def load():
+                try:
+                    self._load()
+                except Exception as e:
+                    logger.error(f'后台加载RSA密钥失败: {str(e)}')
+            
+            self._loader = threading.Thread(target=load, name='rsa-key-loader', daemon=True)
+            self._loader.start()
+            return self._loader
     
     def _ensure_key_dir(self):
         """确保密钥目录存在"""
         if not os.path.exists(self.key_dir):
-            os.makedirs(self.key_dir)
+            os.makedirs(self.key_dir, exist_ok=True)
     
     def _load_or_generate_keys(self):
-        """加载或生成RSA密钥对"""
+        """加载或生成RSA密钥对（多进程同时启动时用文件锁保证只生成一次）"""
+        self._ensure_key_dir()
+        with open(os.path.join(self.key_dir, '.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._load_or_generate_locked()
+    
+    def _load_or_generate_locked(self):
         private_key_path = os.path.join(self.key_dir, 'private_key.pem')
         public_key_path = os.path.join(self.key_dir, 'public_key.pem')
         
@@ -51,10 +312,9 @@ class CryptoUtils:
                         public_key_data = f.read()
                     
                     # 加载密钥
-                    self.private_key = rsa.PrivateKey.load_pkcs1(private_key_data)
-                    self.public_key = rsa.PublicKey.load_pkcs1(public_key_data)
+                    self.backend.load(private_key_data, public_key_data)
                     
-                    logger.info('成功加载现有RSA密钥对')
+                    logger.info(f'成功加载现有RSA密钥对（{self.backend.name}后端）')
                 except Exception as load_error:
                     logger.warning(f'加载现有密钥失败，将生成新密钥: {str(load_error)}')
                     # 删除损坏的密钥文件
@@ -74,52 +334,63 @@ class CryptoUtils:
     def _generate_new_keys(self, private_key_path, public_key_path):
         """生成新的RSA密钥对"""
         # 生成新密钥对
-        self.private_key, self.public_key = rsa.newkeys(2048)
+        private_key_data, public_key_data = self.backend.generate(RSA_KEY_BITS)
         
-        # 保存密钥
-        with open(private_key_path, 'wb') as f:
-            f.write(self.private_key.save_pkcs1())
+        # 保存密钥（PKCS#1格式，私钥仅所有者可读）
+        with open(os.open(private_key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+            f.write(private_key_data)
         
         with open(public_key_path, 'wb') as f:
-            f.write(self.public_key.save_pkcs1())
+            f.write(public_key_data)
         
         logger.info('成功生成并保存新的RSA密钥对')
     
     def get_public_key_pem(self):
         """
-        获取公钥的PEM格式
+        获取公钥的PEM格式（SubjectPublicKeyInfo，即 BEGIN PUBLIC KEY，前端 crypto.js 以 spki 格式导入）
+        
+        磁盘上的密钥文件仍为PKCS#1格式，这里只转换返回给客户端的格式。
         
         Returns:
             str: PEM格式的公钥
         """
         try:
-            public_key_pem = self.public_key.save_pkcs1().decode('utf-8')
-            return f'-----BEGIN RSA PUBLIC KEY-----\n{public_key_pem}\n-----END RSA PUBLIC KEY-----'
+            self.ensure_keys()
+            public_key = serialization.load_pem_public_key(self.backend.public_pem())
+            # 去掉末尾换行：前端按头尾标记的长度截取Base64内容
+            return public_key.public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo
+            ).decode('utf-8').strip()
         except Exception as e:
             logger.error(f'获取公钥PEM格式失败: {str(e)}')
             raise
     
-    def rsa_decrypt(self, encrypted_data):
+    @crypto_operation_seconds.timed(operation='rsa_decrypt')
+    def rsa_decrypt(self, encrypted_data, scheme=RSA_PADDING_PKCS1V15):
         """
         使用RSA私钥解密
         
         Args:
             encrypted_data: 加密的数据（base64编码）
+            scheme: 填充方式（pkcs1v15 或 oaep）
             
         Returns:
             str: 解密后的数据
         """
+        self.ensure_keys()
         try:
             encrypted_bytes = base64.b64decode(encrypted_data)
-            decrypted_bytes = rsa.decrypt(encrypted_bytes, self.private_key)
+            decrypted_bytes = self.backend.decrypt(encrypted_bytes, scheme)
             return decrypted_bytes.decode('utf-8')
-        except rsa.DecryptionError:
+        except (ValueError, UnicodeDecodeError):
             logger.error('RSA解密失败: 解密错误')
             raise ValueError('RSA解密失败')
         except Exception as e:
             logger.error(f'RSA解密失败: {str(e)}')
             raise
     
+    @crypto_operation_seconds.timed(operation='aes_decrypt')
     def aes_decrypt(self, encrypted_data, key, iv):
         """
         使用AES-GCM解密
@@ -138,15 +409,19 @@ class CryptoUtils:
             iv_bytes = base64.b64decode(iv)
             ciphertext_bytes = base64.b64decode(encrypted_data)
             
+            # Web Crypto 把16字节认证标签附加在密文末尾
+            tag = ciphertext_bytes[-GCM_TAG_SIZE:]
+            ciphertext_bytes = ciphertext_bytes[:-GCM_TAG_SIZE]
+            
             # 创建解密器
             cipher = Cipher(
                 algorithms.AES(key_bytes),
-                modes.GCM(iv_bytes),
+                modes.GCM(iv_bytes, tag),
                 backend=default_backend()
             )
             decryptor = cipher.decryptor()
             
-            # 解密数据
+            # 解密数据（认证标签不匹配时 finalize 抛出异常）
             decrypted_bytes = decryptor.update(ciphertext_bytes) + decryptor.finalize()
             
             return decrypted_bytes.decode('utf-8')
@@ -154,6 +429,7 @@ class CryptoUtils:
             logger.error(f'AES解密失败: {str(e)}')
             raise ValueError('AES解密失败')
     
+    @crypto_operation_seconds.timed(operation='hmac_verify')
     def verify_hmac(self, data, signature, key):
         """
         验证HMAC签名
@@ -191,18 +467,331 @@ class CryptoUtils:
             logger.error(f'哈希密码失败: {str(e)}')
             raise
 
+def _stream_nonce(prefix, counter):
+    return prefix + struct.pack('>I', counter)
+
+
+def _stream_aad(counter, final):
+    return struct.pack('>IB', counter, 1 if final else 0)
+
+
+class StreamEncryptor:
+    """分块AES-GCM流式加密：边序列化边加密，内存占用与块大小相关而与数据总量无关"""
+
+    def __init__(self, key, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        初始化流式加密器
+        
+        Args:
+            key: AES密钥（原始字节）
+            chunk_size: 每帧明文的最大字节数
+        """
+        self.aesgcm = AESGCM(key)
+        self.chunk_size = chunk_size
+        self.prefix = os.urandom(STREAM_NONCE_PREFIX_SIZE)
+        self.counter = 0
+
+    @crypto_operation_seconds.timed(operation='stream_encrypt_frame')
+    def _frame(self, plaintext, final=False):
+        if self.counter > 0xFFFFFFFF:
+            raise ValueError('流式加密帧数超出上限')
+        ciphertext = self.aesgcm.encrypt(_stream_nonce(self.prefix, self.counter), bytes(plaintext),
+                                         _stream_aad(self.counter, final))
+        self.counter += 1
+        return struct.pack('>I', len(ciphertext)) + ciphertext
+
+    def encrypt_chunks(self, chunks):
+        """
+        加密字节块序列，按 chunk_size 重新分帧
+        
+        Args:
+            chunks: 明文字节块的可迭代对象
+            
+        Yields:
+            bytes: 头部与各加密帧
+        """
+        yield STREAM_MAGIC + self.prefix
+        buffer = bytearray()
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= self.chunk_size:
+                yield self._frame(buffer[:self.chunk_size])
+                del buffer[:self.chunk_size]
+        if buffer:
+            yield self._frame(buffer)
+        yield self._frame(b'', final=True)
+
+    def encrypt_json(self, data):
+        """
+        边JSON序列化边加密
+        
+        Args:
+            data: 可JSON序列化的数据
+            
+        Yields:
+            bytes: 头部与各加密帧
+        """
+        pieces = (piece.encode('utf-8') for piece in json.JSONEncoder(ensure_ascii=False).iterencode(data))
+        return self.encrypt_chunks(pieces)
+
+
+class StreamDecryptor:
+    """分块AES-GCM流式解密，可逐段喂入接收到的字节"""
+
+    def __init__(self, key):
+        """
+        初始化流式解密器
+        
+        Args:
+            key: AES密钥（原始字节）
+        """
+        self.aesgcm = AESGCM(key)
+        self.prefix = None
+        self.counter = 0
+        self.finished = False
+        self._buffer = bytearray()
+
+    @crypto_operation_seconds.timed(operation='stream_decrypt')
+    def feed(self, data):
+        """
+        喂入接收到的字节
+        
+        Args:
+            data: 字节数据
+            
+        Returns:
+            list: 本次解出的明文块
+        """
+        self._buffer += data
+        plaintexts = []
+        if self.prefix is None:
+            header_size = len(STREAM_MAGIC) + STREAM_NONCE_PREFIX_SIZE
+            if len(self._buffer) < header_size:
+                return plaintexts
+            if bytes(self._buffer[:len(STREAM_MAGIC)]) != STREAM_MAGIC:
+                raise ValueError('无效的加密流头部')
+            self.prefix = bytes(self._buffer[len(STREAM_MAGIC):header_size])
+            del self._buffer[:header_size]
+        while len(self._buffer) >= 4:
+            if self.finished:
+                raise ValueError('加密流结束后仍有数据')
+            length = struct.unpack('>I', self._buffer[:4])[0]
+            if length > STREAM_MAX_FRAME:
+                raise ValueError('加密帧长度超出上限')
+            if len(self._buffer) < 4 + length:
+                break
+            ciphertext = bytes(self._buffer[4:4 + length])
+            del self._buffer[:4 + length]
+            nonce = _stream_nonce(self.prefix, self.counter)
+            # 先按普通帧验证，失败再按结束帧验证
+            for final in (False, True):
+                try:
+                    plaintext = self.aesgcm.decrypt(nonce, ciphertext, _stream_aad(self.counter, final))
+                    break
+                except InvalidTag:
+                    continue
+            else:
+                raise ValueError('加密帧认证失败')
+            self.counter += 1
+            if final:
+                self.finished = True
+            elif plaintext:
+                plaintexts.append(plaintext)
+        return plaintexts
+
+
+def decrypt_stream(key, chunks):
+    """
+    解密完整的加密流
+    
+    Args:
+        key: AES密钥（原始字节）
+        chunks: 接收到的字节块的可迭代对象
+        
+    Returns:
+        bytes: 明文
+    """
+    decryptor = StreamDecryptor(key)
+    plaintext = bytearray()
+    for chunk in chunks:
+        for block in decryptor.feed(chunk):
+            plaintext += block
+    if not decryptor.finished:
+        raise ValueError('加密流被截断')
+    if decryptor._buffer:
+        raise ValueError('加密流结束后仍有数据')
+    return bytes(plaintext)
+
+
+class CryptoSession:
+    """握手建立的AES-GCM会话"""
+
+    def __init__(self, session_id, key, ttl):
+        self.session_id = session_id
+        # base64编码的AES密钥，与一次性请求中RSA解出的密钥格式一致
+        self.key = key
+        self.ttl = ttl
+        self.created_at = time.time()
+        self.expires_at = self.created_at + ttl
+        self.requests = 0
+        self._messages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, message_id) -> bool:
+        """消息ID是否已在本会话中使用过"""
+        with self._lock:
+            return message_id in self._messages
+
+    def remember(self, message_id):
+        """记录已处理的消息ID并顺延会话有效期"""
+        with self._lock:
+            self._messages[message_id] = True
+            while len(self._messages) > SESSION_REPLAY_WINDOW:
+                self._messages.popitem(last=False)
+            self.requests += 1
+            self.expires_at = time.time() + self.ttl
+
+
+class SessionStore:
+    """有界的会话表：超过有效期的会话惰性清除，数量超过上限时淘汰最久未使用的会话"""
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        """
+        初始化会话表
+        
+        Args:
+            ttl: 会话有效期（秒）
+            max_sessions: 最多保存的会话数
+        """
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def create(self, key):
+        """
+        创建会话
+        
+        Args:
+            key: base64编码的AES密钥
+            
+        Returns:
+            CryptoSession: 新会话
+        """
+        session = CryptoSession(secrets.token_urlsafe(24), key, self.ttl)
+        with self._lock:
+            self._purge_expired(time.time())
+            self._sessions[session.session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id):
+        """
+        获取未过期的会话
+        
+        Args:
+            session_id: 会话ID
+            
+        Returns:
+            CryptoSession: 会话，不存在或已过期时返回None
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if session.expires_at <= time.time():
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def remove(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _purge_expired(self, now):
+        """清除过期会话（调用方需持有 self._lock）"""
+        expired = [sid for sid, session in self._sessions.items() if session.expires_at <= now]
+        for sid in expired:
+            del self._sessions[sid]
+
 class SecureServer:
     """加密通信服务器"""
     
-    def __init__(self):
-        """初始化加密服务器"""
+    def __init__(self, key_dir=None, lazy=True):
+        """
+        初始化加密服务器
+        
+        Args:
+            key_dir: 密钥存储目录（可选）
+            lazy: 是否延迟到首次使用时再加载密钥（默认延迟，导入模块时不做任何RSA运算）
+        """
         try:
-            self.crypto = CryptoUtils()
+            self.crypto = CryptoUtils(key_dir=key_dir, lazy=lazy)
+            self.sessions = SessionStore()
             logger.info('加密服务器初始化成功')
         except Exception as e:
             logger.error(f'初始化加密服务器失败: {str(e)}')
             raise
     
+    @crypto_operation_seconds.timed(operation='open_session')
+    def open_session(self, handshake):
+        """
+        处理会话握手：RSA解密客户端生成的AES密钥并建立会话，之后的请求只需对称加密
+        
+        Args:
+            handshake: 握手请求，encryption 中包含 encrypted_key 与 key_algorithm
+            
+        Returns:
+            dict: 会话ID与有效期
+        """
+        try:
+            if not isinstance(handshake, dict) or not isinstance(handshake.get('encryption'), dict):
+                raise ValueError('无效的握手请求格式')
+            
+            encryption_info = handshake['encryption']
+            encrypted_aes_key = encryption_info.get('encrypted_key')
+            if not encrypted_aes_key or not isinstance(encrypted_aes_key, str):
+                raise ValueError('缺少加密的会话密钥')
+            
+            scheme = KEY_ALGORITHM_PADDINGS.get(encryption_info.get('key_algorithm'), RSA_PADDING_PKCS1V15)
+            try:
+                aes_key = self.crypto.rsa_decrypt(encrypted_aes_key, scheme)
+                key_size = len(base64.b64decode(aes_key))
+            except Exception as e:
+                raise ValueError(f'解密会话密钥失败: {str(e)}')
+            if key_size not in (16, 24, 32):
+                raise ValueError('会话密钥长度无效')
+            
+            session = self.sessions.create(aes_key)
+            logger.info(f'已建立加密会话，当前会话数: {len(self.sessions)}')
+            return {
+                'session_id': session.session_id,
+                'algorithm': 'AES-GCM',
+                'expires_in': session.ttl
+            }
+        except ValueError as e:
+            logger.error(f'建立加密会话失败: {str(e)}')
+            raise
+    
+    def close_session(self, session_id):
+        """
+        关闭会话
+        
+        Args:
+            session_id: 会话ID
+            
+        Returns:
+            bool: 会话是否存在
+        """
+        return self.sessions.remove(session_id)
+    
+    @crypto_operation_seconds.timed(operation='decrypt_request')
     def decrypt_request(self, encrypted_request):
         """
         解密客户端请求
@@ -229,20 +818,35 @@ class SecureServer:
             if not isinstance(encryption_info, dict):
                 raise ValueError('无效的加密信息格式')
             
-            encrypted_aes_key = encryption_info.get('encrypted_key')
+            session_id = encryption_info.get('session_id')
+            session = None
             iv = encryption_info.get('iv')
             
-            if not encrypted_aes_key or not iv:
-                raise ValueError('缺少加密信息')
-            
-            if not isinstance(encrypted_aes_key, str) or not isinstance(iv, str):
-                raise ValueError('加密信息格式错误')
-            
-            # 解密AES密钥
-            try:
-                aes_key = self.crypto.rsa_decrypt(encrypted_aes_key)
-            except Exception as e:
-                raise ValueError(f'解密AES密钥失败: {str(e)}')
+            if session_id:
+                # 会话模式：使用握手时协商的AES密钥，无需RSA运算
+                session = self.sessions.get(session_id)
+                if session is None:
+                    raise ValueError('加密会话不存在或已过期')
+                if not iv or not isinstance(iv, str):
+                    raise ValueError('加密信息格式错误')
+                if session.seen(encrypted_request['message_id']):
+                    raise ValueError('重复的消息ID')
+                aes_key = session.key
+            else:
+                encrypted_aes_key = encryption_info.get('encrypted_key')
+                
+                if not encrypted_aes_key or not iv:
+                    raise ValueError('缺少加密信息')
+                
+                if not isinstance(encrypted_aes_key, str) or not isinstance(iv, str):
+                    raise ValueError('加密信息格式错误')
+                
+                # 解密AES密钥（填充方式由 key_algorithm 决定，未指定时沿用PKCS#1 v1.5）
+                scheme = KEY_ALGORITHM_PADDINGS.get(encryption_info.get('key_algorithm'), RSA_PADDING_PKCS1V15)
+                try:
+                    aes_key = self.crypto.rsa_decrypt(encrypted_aes_key, scheme)
+                except Exception as e:
+                    raise ValueError(f'解密AES密钥失败: {str(e)}')
             
             # 验证数据信息
             data_info = encrypted_request['data']
@@ -272,13 +876,17 @@ class SecureServer:
             # 验证数据类型
             data_type = data_info.get('type', 'regular')
             
+            if session is not None:
+                session.remember(encrypted_request['message_id'])
+            
             logger.info(f'成功解密请求，消息ID: {encrypted_request["message_id"]}, 数据类型: {data_type}')
             
             return {
                 'data': data,
                 'data_type': data_type,
                 'message_id': encrypted_request['message_id'],
-                'timestamp': encrypted_request['timestamp']
+                'timestamp': encrypted_request['timestamp'],
+                'session_id': session_id if session is not None else None
             }
         except ValueError as e:
             logger.error(f'解密请求失败: {str(e)}')
@@ -287,6 +895,7 @@ class SecureServer:
             logger.error(f'解密请求失败: {str(e)}')
             raise ValueError(f'解密请求失败: {str(e)}')
     
+    @crypto_operation_seconds.timed(operation='encrypt_response')
     def encrypt_response(self, data, aes_key, iv):
         """
         加密服务器响应
@@ -334,7 +943,7 @@ class SecureServer:
             
             # 加密数据
             try:
-                ciphertext = encryptor.update(data_bytes) + encryptor.finalize()
+                ciphertext = encryptor.update(data_bytes) + encryptor.finalize() + encryptor.tag
             except Exception as e:
                 raise ValueError(f'加密数据失败: {str(e)}')
             
@@ -361,6 +970,42 @@ class SecureServer:
             logger.error(f'加密响应失败: {str(e)}')
             raise ValueError(f'加密响应失败: {str(e)}')
     
+    def encrypt_session_response(self, data, session_id):
+        """
+        使用会话密钥加密服务器响应（每次响应生成新的IV）
+        
+        Args:
+            data: 响应数据
+            session_id: 会话ID
+            
+        Returns:
+            dict: 加密后的响应
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ValueError('加密会话不存在或已过期')
+        iv = base64.b64encode(os.urandom(12)).decode('utf-8')
+        response = self.encrypt_response(data, session.key, iv)
+        response['encryption']['session_id'] = session_id
+        return response
+    
+    def encrypt_stream(self, data, session_id, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        使用会话密钥把响应数据加密为分块流（会话在返回前校验，流开始后不会再因会话失效而中断）
+        
+        Args:
+            data: 响应数据
+            session_id: 会话ID
+            chunk_size: 每帧明文的最大字节数
+            
+        Returns:
+            Iterator[bytes]: 头部与各加密帧
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ValueError('加密会话不存在或已过期')
+        return StreamEncryptor(base64.b64decode(session.key), chunk_size).encrypt_json(data)
+    
     def process_ssh_credentials(self, ssh_data):
         """
         处理SSH凭证
@@ -0,0 +1,226 @@
+import os
+import shutil
+import threading
+import time
+import logging
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class CityFeatures:
+    """单个城市某一版本的用户特征（内存映射，只读）"""
+
+    def __init__(self, version_dir: str, version: str):
+        """
+        打开版本目录中的特征文件
+
+        Args:
+            version_dir: 版本目录
+            version: 版本号
+        """
+        self.version = version
+        self.features = np.load(os.path.join(version_dir, 'features.npy'), mmap_mode='r')
+        self.row_index = np.load(os.path.join(version_dir, 'row_index.npy'), mmap_mode='r')
+
+    @property
+    def dim(self) -> int:
+        return self.features.shape[1]
+
+    def lookup(self, user_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量查询用户特征
+
+        Args:
+            user_ids: 用户ID序列
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (特征矩阵 (N, D)，是否命中掩码 (N,))，未命中行为0
+        """
+        ids = np.asarray(list(user_ids) if not isinstance(user_ids, np.ndarray) else user_ids, dtype=np.int64)
+        in_range = (ids >= 0) & (ids < len(self.row_index))
+        rows = np.full(len(ids), -1, dtype=np.int64)
+        rows[in_range] = self.row_index[ids[in_range]]
+        found = rows >= 0
+
+        out = np.zeros((len(ids), self.dim), dtype=np.float32)
+        if found.any():
+            # 排序后读取，内存映射按页顺序访问
+            hit = np.flatnonzero(found)
+            order = np.argsort(rows[hit], kind='stable')
+            out[hit[order]] = self.features[rows[hit[order]]]
+        return out, found
+
+
+class FeatureStore:
+    """按城市组织的用户特征库：稠密 user_id→行号 索引 + float32 内存映射特征矩阵，支持原子版本切换"""
+
+    CURRENT_FILE = 'CURRENT'
+
+    def __init__(self, root_dir: str, keep_versions: int = 2):
+        """
+        初始化特征库
+
+        Args:
+            root_dir: 特征库根目录，结构为 <root>/<city>/<version>/
+            keep_versions: 每个城市保留的历史版本数
+        """
+        self.root_dir = root_dir
+        self.keep_versions = max(1, keep_versions)
+        self._lock = threading.Lock()
+        # 城市 -> (CURRENT文件标识, CityFeatures)
+        self._cache: Dict[str, Tuple[Tuple[int, int], CityFeatures]] = {}
+
+    def _city_dir(self, city: str) -> str:
+        if not city or os.sep in city or city in ('.', '..'):
+            raise ValueError(f'无效的城市名称: {city}')
+        return os.path.join(self.root_dir, city)
+
+    def current_version(self, city: str) -> Optional[str]:
+        """
+        获取城市当前生效的版本号
+
+        Args:
+            city: 城市
+
+        Returns:
+            Optional[str]: 版本号，不存在时返回None
+        """
+        try:
+            with open(os.path.join(self._city_dir(city), self.CURRENT_FILE), 'r') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def open(self, city: str) -> Optional[CityFeatures]:
+        """
+        打开城市当前版本的特征（有缓存，版本切换后自动重新映射）
+
+        Args:
+            city: 城市
+
+        Returns:
+            Optional[CityFeatures]: 特征快照，不存在时返回None
+        """
+        current_path = os.path.join(self._city_dir(city), self.CURRENT_FILE)
+        try:
+            stat = os.stat(current_path)
+        except FileNotFoundError:
+            return None
+        # os.replace 会更换inode，结合mtime判断指针是否变化
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+
+        cached = self._cache.get(city)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        with self._lock:
+            cached = self._cache.get(city)
+            if cached and cached[0] == stamp:
+                return cached[1]
+            version = self.current_version(city)
+            if version is None:
+                return None
+            snapshot = CityFeatures(os.path.join(self._city_dir(city), version), version)
+            self._cache[city] = (stamp, snapshot)
+            logger.info(f'已加载特征: 城市={city}, 版本={version}, 用户数={snapshot.features.shape[0]}')
+            return snapshot
+
+    def lookup(self, city: str, user_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量查询用户特征
+
+        Args:
+            city: 城市
+            user_ids: 用户ID序列
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (特征矩阵，是否命中掩码)；城市无特征时特征矩阵列数为0
+        """
+        snapshot = self.open(city)
+        if snapshot is None:
+            ids = list(user_ids)
+            return np.zeros((len(ids), 0), dtype=np.float32), np.zeros(len(ids), dtype=bool)
+        return snapshot.lookup(user_ids)
+
+    def publish(self, city: str, user_ids: Iterable[int], features: np.ndarray,
+                version: Optional[str] = None) -> str:
+        """
+        发布新版本特征：先写入临时目录，再原子切换 CURRENT 指针
+
+        Args:
+            city: 城市
+            user_ids: 用户ID序列（非负整数，不可重复）
+            features: 特征矩阵 (N, D)
+            version: 版本号（可选，默认按时间生成）
+
+        Returns:
+            str: 发布的版本号
+        """
+        ids = np.asarray(list(user_ids) if not isinstance(user_ids, np.ndarray) else user_ids, dtype=np.int64)
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        if features.ndim != 2 or features.shape[0] != len(ids):
+            raise ValueError('特征矩阵行数必须与用户ID数量一致')
+        if len(ids) and ids.min() < 0:
+            raise ValueError('用户ID必须为非负整数')
+        if len(np.unique(ids)) != len(ids):
+            raise ValueError('用户ID不能重复')
+
+        version = version or time.strftime('v%Y%m%d%H%M%S') + f'_{time.time_ns() % 1000000:06d}'
+        city_dir = self._city_dir(city)
+        version_dir = os.path.join(city_dir, version)
+        if os.path.exists(version_dir):
+            raise ValueError(f'版本已存在: {version}')
+        os.makedirs(city_dir, exist_ok=True)
+
+        # 写入临时目录后重命名，读者不会看到半写入的版本
+        tmp_dir = os.path.join(city_dir, f'.tmp_{version}')
+        os.makedirs(tmp_dir)
+        try:
+            row_index = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int32)
+            row_index[ids] = np.arange(len(ids), dtype=np.int32)
+            np.save(os.path.join(tmp_dir, 'features.npy'), features)
+            np.save(os.path.join(tmp_dir, 'row_index.npy'), row_index)
+            os.rename(tmp_dir, version_dir)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        # 原子替换 CURRENT 指针
+        current_tmp = os.path.join(city_dir, f'.{self.CURRENT_FILE}.tmp')
+        with open(current_tmp, 'w') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(current_tmp, os.path.join(city_dir, self.CURRENT_FILE))
+        logger.info(f'已发布特征: 城市={city}, 版本={version}, 用户数={len(ids)}')
+
+        with self._lock:
+            self._cache.pop(city, None)
+        self._prune(city, version)
+        return version
+
+    def versions(self, city: str) -> List[str]:
+        """
+        列出城市的全部版本（按修改时间升序）
+
+        Args:
+            city: 城市
+
+        Returns:
+            List[str]: 版本号列表
+        """
+        city_dir = self._city_dir(city)
+        if not os.path.isdir(city_dir):
+            return []
+        entries = [e for e in os.scandir(city_dir) if e.is_dir() and not e.name.startswith('.')]
+        return [e.name for e in sorted(entries, key=lambda e: e.stat().st_mtime_ns)]
+
+    def _prune(self, city: str, current: str):
+        """删除超出保留数量的旧版本（已映射的读者在Linux下不受影响）"""
+        old = [v for v in self.versions(city) if v != current]
+        for version in old[:max(0, len(old) - (self.keep_versions - 1))]:
+            shutil.rmtree(os.path.join(self._city_dir(city), version), ignore_errors=True)
@@ -0,0 +1,177 @@
+import numpy as np
+from typing import Dict, Optional, Union
+
+# 对数概率下限，避免 log(0)
+LOG_EPS = 1e-300
+
+
+def gamma_to_weights(gamma: Dict[str, float]) -> np.ndarray:
+    """
+    将个性化接口返回的 γ 字典（键为 '1'..'K'）转换为归一化权重向量
+
+    Args:
+        gamma: γ 权重字典
+
+    Returns:
+        np.ndarray: 形状为 (K,) 的权重
+    """
+    keys = sorted(gamma, key=int)
+    weights = np.array([gamma[k] for k in keys], dtype=np.float64)
+    if weights.ndim != 1 or len(weights) == 0 or np.any(weights < 0):
+        raise ValueError('无效的γ权重')
+    total = weights.sum()
+    if total <= 0:
+        raise ValueError('γ权重之和必须大于0')
+    return weights / total
+
+
+def logsumexp(a: np.ndarray, axis: int = -1, keepdims: bool = False) -> np.ndarray:
+    """
+    数值稳定的批量 log-sum-exp
+
+    Args:
+        a: 输入数组
+        axis: 求和维度
+        keepdims: 是否保留维度
+
+    Returns:
+        np.ndarray: log(sum(exp(a)))
+    """
+    a_max = np.max(a, axis=axis, keepdims=True)
+    # 全为 -inf 的行按 0 处理，结果仍为 -inf
+    a_max = np.where(np.isfinite(a_max), a_max, 0.0)
+    with np.errstate(divide='ignore'):
+        out = np.log(np.sum(np.exp(a - a_max), axis=axis, keepdims=True)) + a_max
+    if not keepdims:
+        out = np.squeeze(out, axis=axis)
+    return out
+
+
+class GMMInference:
+    """对角协方差GMM的批量推理：分量责任度、对数似然与个性化混合打分"""
+
+    def __init__(self, means: np.ndarray, variances: np.ndarray, weights: Optional[np.ndarray] = None):
+        """
+        初始化GMM推理器
+
+        Args:
+            means: 分量均值，形状 (K, D)
+            variances: 分量对角方差，形状 (K, D)
+            weights: 全局混合权重，形状 (K,)，默认均匀
+        """
+        self.means = np.asarray(means, dtype=np.float64)
+        self.variances = np.asarray(variances, dtype=np.float64)
+        if self.means.ndim != 2 or self.means.shape != self.variances.shape:
+            raise ValueError('均值与方差形状必须同为 (K, D)')
+        if np.any(self.variances <= 0):
+            raise ValueError('方差必须为正')
+        self.n_components, self.n_features = self.means.shape
+        if weights is None:
+            weights = np.full(self.n_components, 1.0 / self.n_components)
+        self.weights = self._check_weights(weights)
+
+        # 预计算与样本无关的常数项
+        self._precision = 1.0 / self.variances
+        self._log_norm = -0.5 * (self.n_features * np.log(2 * np.pi) + np.sum(np.log(self.variances), axis=1))
+
+    def _check_weights(self, weights: Union[np.ndarray, Dict[str, float]]) -> np.ndarray:
+        """校验混合权重，支持 γ 字典、(K,) 或逐用户 (N, K)"""
+        if isinstance(weights, dict):
+            weights = gamma_to_weights(weights)
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape[-1] != self.n_components:
+            raise ValueError(f'混合权重维度应为 {self.n_components}')
+        return weights
+
+    def log_component_likelihood(self, X: np.ndarray) -> np.ndarray:
+        """
+        计算每个样本在每个分量下的对数似然
+
+        Args:
+            X: 用户特征，形状 (N, D)
+
+        Returns:
+            np.ndarray: 形状 (N, K)
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f'特征维度应为 {self.n_features}')
+        # 展开平方项，避免构造 (N, K, D) 中间数组
+        quad = (
+            (X ** 2) @ self._precision.T
+            - 2 * X @ (self.means * self._precision).T
+            + np.sum(self.means ** 2 * self._precision, axis=1)
+        )
+        return self._log_norm - 0.5 * quad
+
+    def _weighted_log_prob(self, X: np.ndarray, weights=None) -> np.ndarray:
+        """计算 log(π_k) + log p(x|k)"""
+        weights = self.weights if weights is None else self._check_weights(weights)
+        with np.errstate(divide='ignore'):
+            log_weights = np.log(np.maximum(weights, 0.0))
+        return self.log_component_likelihood(X) + log_weights
+
+    def responsibilities(self, X: np.ndarray, weights=None) -> np.ndarray:
+        """
+        计算分量责任度 p(k|x)
+
+        Args:
+            X: 用户特征，形状 (N, D)
+            weights: 混合权重（γ 字典、(K,) 或 (N, K)），默认使用全局权重
+
+        Returns:
+            np.ndarray: 形状 (N, K)，每行和为1
+        """
+        weighted = self._weighted_log_prob(X, weights)
+        return np.exp(weighted - logsumexp(weighted, axis=1, keepdims=True))
+
+    def log_likelihood(self, X: np.ndarray, weights=None) -> np.ndarray:
+        """
+        计算混合模型下每个样本的对数似然
+
+        Args:
+            X: 用户特征，形状 (N, D)
+            weights: 混合权重，默认使用全局权重
+
+        Returns:
+            np.ndarray: 形状 (N,)
+        """
+        return logsumexp(self._weighted_log_prob(X, weights), axis=1)
+
+    def mixed_score(self, X: np.ndarray, component_scores: np.ndarray, weights=None) -> np.ndarray:
+        """
+        个性化混合打分：按责任度加权各分量（子模型）的物品打分
+
+        Args:
+            X: 用户特征，形状 (N, D)
+            component_scores: 各分量对物品的打分，形状 (K, M)
+            weights: 混合权重，默认使用全局权重
+
+        Returns:
+            np.ndarray: 形状 (N, M)
+        """
+        component_scores = np.asarray(component_scores, dtype=np.float64)
+        if component_scores.ndim != 2 or component_scores.shape[0] != self.n_components:
+            raise ValueError(f'分量打分形状应为 ({self.n_components}, M)')
+        return self.responsibilities(X, weights) @ component_scores
+
+    def summarize(self, X: np.ndarray, weights=None) -> Dict:
+        """
+        汇总责任度统计，用于个性化分析
+
+        Args:
+            X: 用户特征，形状 (N, D)
+            weights: 混合权重，默认使用全局权重
+
+        Returns:
+            Dict: 平均责任度、主导分量分布与平均熵
+        """
+        resp = self.responsibilities(X, weights)
+        entropy = -np.sum(resp * np.log(np.maximum(resp, LOG_EPS)), axis=1)
+        dominant = np.bincount(np.argmax(resp, axis=1), minlength=self.n_components)
+        return {
+            'n_users': int(resp.shape[0]),
+            'mean_responsibility': {str(k + 1): round(float(v), 4) for k, v in enumerate(resp.mean(axis=0))},
+            'dominant_component': {str(k + 1): int(v) for k, v in enumerate(dominant)},
+            'mean_entropy': round(float(entropy.mean()), 4) if len(entropy) else 0
+        }
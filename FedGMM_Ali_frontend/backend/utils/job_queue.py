@@ -0,0 +1,537 @@
+import json
+import os
+import shlex
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from backend.utils.async_bridge import AsyncCondition
+from backend.utils.ssh_pool import format_key, make_key, ssh_pool
+from backend.utils.log_tail import log_tailers
+from backend.utils.training_monitor import (training_monitors, launch_training, kill_process_group,
+                                            poll_training_status, process_alive)
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 默认队列数据库路径，可通过环境变量覆盖
+DEFAULT_DB_PATH = os.environ.get('TRAIN_QUEUE_DB', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'train_queue.db'))
+# 每台主机默认可同时运行的训练任务数
+DEFAULT_HOST_SLOTS = int(os.environ.get('TRAIN_QUEUE_HOST_SLOTS', 1))
+# 调度间隔（秒）
+DEFAULT_SCHEDULE_INTERVAL = float(os.environ.get('TRAIN_QUEUE_INTERVAL', 2))
+# 无人监控的运行中任务，回收时检查远程进程的间隔（秒）
+DEFAULT_REAP_INTERVAL = float(os.environ.get('TRAIN_QUEUE_REAP_INTERVAL', 30))
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_DISPATCHING = 'dispatching'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+FINISHED_STATUSES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_DISPATCHING, JOB_RUNNING)
+
+# 本进程的启动令牌：与PID一起标识派发任务的进程，PID被复用（如容器重启后仍为1号进程）时也能区分
+_PROCESS_TOKEN = uuid.uuid4().hex[:8]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    hostname TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    command TEXT NOT NULL,
+    log_file TEXT NOT NULL,
+    params TEXT NOT NULL DEFAULT '{}',
+    message TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    pid INTEGER,
+    pgid INTEGER,
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_log ON jobs (hostname, port, username, log_file, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, hostname, port, username, priority DESC, created_at);
+CREATE TABLE IF NOT EXISTS host_slots (
+    hostname TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    slots INTEGER NOT NULL,
+    PRIMARY KEY (hostname, port, username)
+);
+"""
+
+
+def _process_owner() -> str:
+    """当前进程的派发者标识（多进程部署中各工作进程的PID不同）"""
+    return f'{os.getpid()}:{_PROCESS_TOKEN}'
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """
+    判断派发任务的服务进程是否仍在运行
+
+    Args:
+        owner: 派发者标识（PID:启动令牌）
+
+    Returns:
+        bool: 进程仍在运行时返回True；未记录派发者的旧任务视为已退出
+    """
+    pid, _, token = (owner or '').partition(':')
+    if not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        return token == _PROCESS_TOKEN
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _row_to_dict(row: sqlite3.Row) -> Dict[str, any]:
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    job['host'] = format_key((job['hostname'], job['port'], job['username']))
+    return job
+
+
+class TrainingJobQueue:
+    """持久化的训练任务队列：任务存入SQLite，按优先级派发到主机，并受每台主机的并发槽位限制"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, pool=None, monitors=None,
+                 default_slots: int = DEFAULT_HOST_SLOTS, interval: float = DEFAULT_SCHEDULE_INTERVAL,
+                 reap_interval: float = DEFAULT_REAP_INTERVAL):
+        """
+        初始化任务队列
+
+        Args:
+            db_path: SQLite数据库路径
+            pool: SSH连接池（可选，默认使用全局连接池）
+            monitors: 训练监控注册表（可选，默认使用全局注册表）
+            default_slots: 每台主机默认并发槽位数
+            interval: 调度间隔（秒）
+            reap_interval: 无人监控时检查运行中任务是否结束的间隔（秒）
+        """
+        self.db_path = db_path
+        self.pool = pool if pool is not None else ssh_pool
+        self.monitors = monitors if monitors is not None else training_monitors
+        self.default_slots = default_slots
+        self.interval = interval
+        self.reap_interval = reap_interval
+        self._reap_checked: Dict[str, float] = {}
+        self._initialized = False
+        self._lock = threading.Lock()
+        self._cond = AsyncCondition()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._scheduler = None
+
+    # ---------- 存储 ----------
+
+    @contextmanager
+    def _connect(self):
+        """打开数据库连接，退出时提交并关闭"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _ensure_db(self):
+        with self._lock:
+            if self._initialized:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(SCHEMA)
+                # 旧版本数据库补充进程与派发者列
+                columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+                for column, column_type in (('pid', 'INTEGER'), ('pgid', 'INTEGER'), ('owner', 'TEXT')):
+                    if column not in columns:
+                        conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {column_type}')
+            self._recover_interrupted()
+            self._initialized = True
+
+    def _recover_interrupted(self):
+        """
+        把派发进程已退出的派发中任务标记为失败（服务在派发途中退出，无法确定远程是否已启动）
+
+        只处理派发者已不在运行的任务，多进程部署中新启动或被回收重启的工作进程不会影响其他进程正在派发的任务。
+        """
+        with self._connect() as conn:
+            rows = conn.execute('SELECT job_id, owner FROM jobs WHERE status = ?', (JOB_DISPATCHING,)).fetchall()
+            orphaned = [row['job_id'] for row in rows if not _owner_alive(row['owner'])]
+            conn.executemany(
+                'UPDATE jobs SET status = ?, message = ?, finished_at = ? WHERE job_id = ? AND status = ?',
+                [(JOB_FAILED, '服务重启时任务正在派发，状态未知', time.time(), job_id, JOB_DISPATCHING)
+                 for job_id in orphaned])
+        for job_id in orphaned:
+            logger.warning(f'派发进程已退出，训练任务 {job_id} 标记为失败')
+
+    def _ensure_scheduler(self):
+        self._ensure_db()
+        with self._lock:
+            if self._scheduler is None or not self._scheduler.is_alive():
+                self._scheduler = threading.Thread(target=self._schedule_loop, name='train-queue', daemon=True)
+                self._scheduler.start()
+
+    def _update(self, job_id: str, expected: Optional[tuple] = None, **fields) -> bool:
+        """更新任务字段；指定 expected 时只在状态匹配时更新"""
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        sql = f'UPDATE jobs SET {assignments} WHERE job_id = ?'
+        args = list(fields.values()) + [job_id]
+        if expected:
+            sql += f" AND status IN ({', '.join('?' * len(expected))})"
+            args += list(expected)
+        with self._connect() as conn:
+            return conn.execute(sql, args).rowcount > 0
+
+    # ---------- 任务 ----------
+
+    def submit(self, key, command: str, log_file: str, priority: int = 0,
+               params: Optional[Dict[str, any]] = None) -> Dict[str, any]:
+        """
+        提交训练任务
+
+        Args:
+            key: 目标主机的连接池键 (主机, 端口, 用户名)
+            command: 训练命令
+            log_file: 远程日志文件路径
+            priority: 优先级（越大越先派发）
+            params: 训练参数（可选）
+
+        Returns:
+            Dict[str, any]: 任务信息
+
+        Raises:
+            ValueError: 同一主机上已有使用该日志文件的未结束任务
+        """
+        self._ensure_scheduler()
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            # 同名日志会被新任务覆盖，且停止与状态查询都按日志文件定位任务，因此同一主机上不允许重复
+            conn.execute('BEGIN IMMEDIATE')
+            duplicate = conn.execute(
+                f"SELECT job_id FROM jobs WHERE hostname = ? AND port = ? AND username = ? AND log_file = ? "
+                f"AND status IN ({', '.join('?' * len(ACTIVE_STATUSES))}) LIMIT 1",
+                tuple(key) + (log_file,) + ACTIVE_STATUSES).fetchone()
+            if duplicate is not None:
+                raise ValueError(f"日志文件 {log_file} 已被未结束的任务 {duplicate['job_id']} 使用")
+            conn.execute(
+                'INSERT INTO jobs (job_id, hostname, port, username, priority, status, command, log_file, params, '
+                'created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, key[0], key[1], key[2], int(priority), JOB_QUEUED, command, log_file,
+                 json.dumps(params or {}, ensure_ascii=False), time.time()))
+        self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, any]]:
+        """获取任务信息"""
+        self._ensure_db()
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, any]]:
+        """
+        列出任务（按提交时间倒序）
+
+        Args:
+            status: 按状态过滤（可选）
+            limit: 最多返回数量
+
+        Returns:
+            List[Dict[str, any]]: 任务列表
+        """
+        self._ensure_scheduler()
+        sql = 'SELECT * FROM jobs'
+        args = []
+        if status:
+            sql += ' WHERE status = ?'
+            args.append(status)
+        sql += ' ORDER BY created_at DESC LIMIT ?'
+        args.append(int(limit))
+        with self._connect() as conn:
+            return [_row_to_dict(row) for row in conn.execute(sql, args)]
+
+    def find(self, key, log_file: str) -> Optional[Dict[str, any]]:
+        """
+        按日志文件查找主机上最近提交的任务
+
+        Args:
+            key: 连接池键
+            log_file: 远程日志文件路径
+
+        Returns:
+            Optional[Dict[str, any]]: 任务信息
+        """
+        self._ensure_db()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT * FROM jobs WHERE hostname = ? AND port = ? AND username = ? AND log_file = ? '
+                'ORDER BY created_at DESC LIMIT 1', tuple(key) + (log_file,)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, any]]:
+        """
+        取消任务：排队中的任务直接取消，运行中的任务只终止该任务的进程组
+
+        派发中的任务同样标记为已取消，派发线程随后更新为运行中时发现状态已变，会终止刚启动的进程组。
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            Optional[Dict[str, any]]: 取消后的任务信息，任务不存在时返回None
+        """
+        # 调度线程可能在读取与更新之间推进任务状态（排队→派发中→运行中→结束），更新失败时按新状态重试；
+        # 状态只会单向推进，循环最多执行四次
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                return None
+            if job['status'] in (JOB_QUEUED, JOB_DISPATCHING):
+                if self._update(job_id, expected=(job['status'],), status=JOB_CANCELLED,
+                                message='任务已取消', finished_at=time.time()):
+                    break
+            elif job['status'] == JOB_RUNNING:
+                connection = self.pool.get(make_key(job['hostname'], job['port'], job['username']))
+                if connection is None:
+                    raise ConnectionError(f"主机 {job['host']} 未连接，无法终止任务")
+                if job['pgid'] is not None:
+                    kill_process_group(connection, job['pgid'])
+                else:
+                    # 未记录进程组的旧任务按命令行匹配
+                    connection.exec_command(f"pkill -f {shlex.quote(job['command'])}", timeout=30)
+                if self._update(job_id, expected=(JOB_RUNNING,), status=JOB_CANCELLED,
+                                message='任务已终止', finished_at=time.time()):
+                    break
+            else:
+                break
+        self._wakeup.set()
+        return self.get(job_id)
+
+    def set_host_slots(self, key, slots: int):
+        """
+        设置主机并发槽位数
+
+        Args:
+            key: 连接池键
+            slots: 可同时运行的任务数
+        """
+        self._ensure_scheduler()
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO host_slots (hostname, port, username, slots) VALUES (?, ?, ?, ?)',
+                         (key[0], key[1], key[2], max(0, int(slots))))
+        self._wakeup.set()
+
+    def host_slots(self) -> List[Dict[str, any]]:
+        """获取各主机的槽位占用情况"""
+        self._ensure_db()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT hostname, port, username, "
+                "SUM(status IN ('dispatching', 'running')) AS running, SUM(status = 'queued') AS queued "
+                "FROM jobs GROUP BY hostname, port, username").fetchall()
+            configured = {(r['hostname'], r['port'], r['username']): r['slots']
+                          for r in conn.execute('SELECT * FROM host_slots')}
+        hosts = []
+        for row in rows:
+            key = (row['hostname'], row['port'], row['username'])
+            hosts.append({'host': format_key(key), 'slots': configured.get(key, self.default_slots),
+                          'running': row['running'], 'queued': row['queued']})
+        return hosts
+
+    def host_load(self, key) -> Dict[str, int]:
+        """
+        获取单台主机的负载
+
+        Args:
+            key: 连接池键
+
+        Returns:
+            Dict[str, int]: slots（槽位数）与 active（派发中、运行中和排队中的任务数）
+        """
+        self._ensure_db()
+        with self._connect() as conn:
+            row = conn.execute('SELECT slots FROM host_slots WHERE hostname = ? AND port = ? AND username = ?',
+                               tuple(key)).fetchone()
+            active = conn.execute(
+                'SELECT COUNT(*) FROM jobs WHERE hostname = ? AND port = ? AND username = ? AND status IN (?, ?, ?)',
+                tuple(key) + (JOB_QUEUED, JOB_DISPATCHING, JOB_RUNNING)).fetchone()[0]
+        return {'slots': row['slots'] if row else self.default_slots, 'active': active}
+
+    def wait(self, job_id: str, statuses=(JOB_QUEUED,), timeout: float = 5) -> Optional[Dict[str, any]]:
+        """
+        等待任务离开指定状态
+
+        Args:
+            job_id: 任务ID
+            statuses: 等待离开的状态
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            Optional[Dict[str, any]]: 任务信息
+        """
+        deadline = time.time() + timeout
+        job = self.get(job_id)
+        while job is not None and job['status'] in statuses:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            with self._cond:
+                self._cond.wait(min(remaining, self.interval))
+            job = self.get(job_id)
+        return job
+
+    async def wait_async(self, job_id: str, statuses=(JOB_QUEUED,), timeout: float = 5) -> Optional[Dict[str, any]]:
+        """协程版 wait：在两次调度之间等待而不占用线程（数据库查询很快，直接在事件循环中执行）"""
+        deadline = time.time() + timeout
+        job = self.get(job_id)
+        while job is not None and job['status'] in statuses:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            await self._cond.wait_async(min(remaining, self.interval))
+            job = self.get(job_id)
+        return job
+
+    # ---------- 调度 ----------
+
+    def shutdown(self):
+        """停止调度线程（已排队的任务保留在数据库中）"""
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def _schedule_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.schedule_once()
+            except Exception as e:
+                logger.error(f'训练任务调度出错: {str(e)}')
+            with self._cond:
+                self._cond.notify_all()
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def schedule_once(self):
+        """执行一次调度：回收已结束或派发中断的任务，再按优先级填满各主机的空闲槽位"""
+        self._recover_interrupted()
+        self._reap_finished()
+        with self._connect() as conn:
+            hosts = conn.execute(
+                'SELECT DISTINCT hostname, port, username FROM jobs WHERE status = ?', (JOB_QUEUED,)).fetchall()
+        for host in hosts:
+            key = (host['hostname'], host['port'], host['username'])
+            connection = self.pool.get(key)
+            if connection is None:
+                # 主机未连接，任务继续排队
+                continue
+            with self._connect() as conn:
+                row = conn.execute('SELECT slots FROM host_slots WHERE hostname = ? AND port = ? AND username = ?',
+                                   key).fetchone()
+                slots = row['slots'] if row else self.default_slots
+                running = conn.execute(
+                    'SELECT COUNT(*) FROM jobs WHERE hostname = ? AND port = ? AND username = ? AND status IN (?, ?)',
+                    key + (JOB_DISPATCHING, JOB_RUNNING)).fetchone()[0]
+                queued = conn.execute(
+                    'SELECT * FROM jobs WHERE hostname = ? AND port = ? AND username = ? AND status = ? '
+                    'ORDER BY priority DESC, created_at LIMIT ?',
+                    key + (JOB_QUEUED, max(0, slots - running))).fetchall()
+            for row in queued:
+                self._dispatch(connection, _row_to_dict(row))
+
+    def _dispatch(self, connection, job: Dict[str, any]):
+        # 先抢占任务，避免与取消操作竞争
+        if not self._update(job['job_id'], expected=(JOB_QUEUED,), status=JOB_DISPATCHING, owner=_process_owner()):
+            return
+        try:
+            # 同名日志（此前已结束的任务）将被覆盖，清除旧的监控与日志跟踪状态
+            self.monitors.remove(connection.key, job['log_file'])
+            log_tailers.remove(connection.key, job['log_file'])
+            pid = launch_training(connection, job['command'], job['log_file'])
+            if not self._update(job['job_id'], expected=(JOB_DISPATCHING,), status=JOB_RUNNING,
+                                message='训练任务已启动', started_at=time.time(), pid=pid, pgid=pid):
+                # 任务已在派发途中被取消或被判定为派发中断，终止刚启动的进程，避免出现队列之外的训练
+                logger.warning(f"训练任务 {job['job_id']} 已不在派发状态，终止进程组 {pid}")
+                kill_process_group(connection, pid)
+                return
+            self.monitors.get(connection.key, job['log_file'], pid=pid)
+            logger.info(f"训练任务 {job['job_id']} 已派发到 {job['host']}，PID: {pid}")
+        except Exception as e:
+            logger.error(f"派发训练任务 {job['job_id']} 失败: {str(e)}")
+            self._update(job['job_id'], expected=(JOB_DISPATCHING,), status=JOB_FAILED,
+                         message=f'派发失败: {str(e)}', finished_at=time.time())
+
+    def _reap_finished(self):
+        """根据训练监控的状态把已结束的任务标记为完成或失败，释放槽位"""
+        with self._connect() as conn:
+            running = conn.execute('SELECT * FROM jobs WHERE status = ?', (JOB_RUNNING,)).fetchall()
+        running_ids = {row['job_id'] for row in running}
+        for job_id in list(self._reap_checked):
+            if job_id not in running_ids:
+                del self._reap_checked[job_id]
+        for row in running:
+            key = (row['hostname'], row['port'], row['username'])
+            connection = self.pool.get(key)
+            if connection is None:
+                continue
+            # 只读取已有的监控器，不为回收重新启动已因无人查看而停止的监控
+            monitor = self.monitors.get(key, row['log_file'], create=False)
+            if monitor is not None and (monitor.alive or monitor.finished):
+                snapshot = monitor.snapshot
+            else:
+                snapshot = self._check_unmonitored(connection, row)
+            if not snapshot or not snapshot.get('success') or snapshot['status'] == 'running':
+                continue
+            status = JOB_COMPLETED if snapshot['status'] == 'completed' else JOB_FAILED
+            self._update(row['job_id'], expected=(JOB_RUNNING,), status=status,
+                         message=snapshot.get('error_message') or '训练任务已结束', finished_at=time.time())
+
+    def _check_unmonitored(self, connection, row: sqlite3.Row) -> Optional[Dict[str, any]]:
+        """
+        无人监控的任务按 reap_interval 检查远程进程，进程退出后读取一次日志判断完成或失败
+
+        Args:
+            connection: 池化SSH连接
+            row: 运行中的任务记录
+
+        Returns:
+            Optional[Dict[str, any]]: 训练状态，尚未到检查时间或进程仍在运行时返回None
+        """
+        now = time.time()
+        if now - self._reap_checked.get(row['job_id'], 0) < self.reap_interval:
+            return None
+        self._reap_checked[row['job_id']] = now
+        try:
+            if row['pid'] is not None and process_alive(connection, row['pid']):
+                return None
+            snapshot = poll_training_status(connection, log_tailers.get(connection, row['log_file']), row['pid'])
+            snapshot['success'] = True
+            return snapshot
+        except Exception as e:
+            logger.warning(f"检查训练任务 {row['job_id']} 状态失败: {str(e)}")
+            return None
+
+
+# 全局训练任务队列
+training_queue = TrainingJobQueue()
@@ -0,0 +1,252 @@
+import codecs
+import re
+import threading
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 预编译的日志匹配规则
+ROUND_PATTERN = re.compile(r'Round (\d+)/(\d+)')
+# 轮次行中的 key=value / key: value 数值指标
+METRIC_PATTERN = re.compile(r'([A-Za-z_][\w*]*)\s*[=:]\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)')
+# 轮次行之后的续行只接受这些指标（损失、准确率、tau*、压缩统计），避免把时间等数字当作指标
+CONTINUATION_METRIC_PATTERN = re.compile(r'loss|acc|tau|compress|ratio|bytes|bits', re.IGNORECASE)
+
+
+class TrainingLogParser:
+    """增量训练日志解析器：逐行更新进度、错误与完成状态，可处理跨块的半行"""
+
+    def __init__(self, keep_lines: int = 50):
+        """
+        初始化解析器
+
+        Args:
+            keep_lines: 保留的最近日志行数
+        """
+        self.progress = 0
+        self.status = 'running'
+        self.error = False
+        self.error_message = ''
+        self.current_round = None
+        self.total_rounds = None
+        self.recent_lines = deque(maxlen=keep_lines)
+        # 最近一轮的指标
+        self.last_metrics = {}
+        # 当前轮次已解析的指标（轮次行及其后续行）
+        self._round_metrics = {}
+        self._partial = ''
+        # 尚未被取走的每轮指标
+        self._pending_metrics = []
+
+    def feed(self, text: str) -> List[str]:
+        """
+        输入新追加的日志文本
+
+        Args:
+            text: 新文本（可以在行中间截断）
+
+        Returns:
+            List[str]: 本次解析出的完整行
+        """
+        if not text:
+            return []
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self.parse_line(line)
+        self.recent_lines.extend(lines)
+        return lines
+
+    def parse_line(self, line: str):
+        """
+        解析一行日志
+
+        Args:
+            line: 日志行
+        """
+        match = ROUND_PATTERN.search(line) if 'Round' in line else None
+        is_error = 'Error' in line or 'error' in line
+        if match:
+            self.current_round = int(match.group(1))
+            self.total_rounds = int(match.group(2))
+            if self.total_rounds:
+                self.progress = int((self.current_round / self.total_rounds) * 100)
+            self._round_metrics = {}
+            self._add_metrics(METRIC_PATTERN.findall(line, match.end()))
+        elif self.current_round is not None and not is_error and ('=' in line or ':' in line):
+            self._add_metrics([(k, v) for k, v in METRIC_PATTERN.findall(line)
+                               if CONTINUATION_METRIC_PATTERN.search(k)])
+        # 查找错误信息
+        if is_error:
+            self.error = True
+            self.error_message = line
+            self.status = 'error'
+        # 查找训练完成信息
+        if 'Training completed' in line:
+            self.progress = 100
+            self.status = 'completed'
+
+    def _add_metrics(self, pairs: List[Tuple[str, str]]):
+        """合并当前轮次的指标，并记录一次更新"""
+        if not pairs:
+            return
+        self._round_metrics.update((k.lower(), float(v)) for k, v in pairs)
+        self.last_metrics = dict(self._round_metrics, round=self.current_round)
+        self._pending_metrics.append(dict(self.last_metrics))
+
+    def drain_metrics(self) -> List[Dict[str, float]]:
+        """
+        取走自上次调用以来解析出的每轮指标
+
+        Returns:
+            List[Dict[str, float]]: 每轮指标列表
+        """
+        metrics, self._pending_metrics = self._pending_metrics, []
+        return metrics
+
+    @property
+    def finished(self) -> bool:
+        """日志中是否已出现完成或错误标记"""
+        return self.status in ('completed', 'error')
+
+    def log_content(self) -> str:
+        """最近日志内容（含尚未换行的末尾半行）"""
+        lines = list(self.recent_lines)
+        if self._partial:
+            lines.append(self._partial)
+        return '\n'.join(lines)
+
+    def to_dict(self) -> Dict[str, any]:
+        """
+        获取解析状态
+
+        Returns:
+            Dict[str, any]: 状态信息
+        """
+        return {
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'error_message': self.error_message,
+            'current_round': self.current_round,
+            'total_rounds': self.total_rounds
+        }
+
+
+class LogTailer:
+    """按字节偏移量增量读取远程日志，通过连接上持久的SFTP会话只取新追加的内容"""
+
+    def __init__(self, connection, log_file: str, max_read: int = 1024 * 1024, keep_lines: int = 50):
+        """
+        初始化日志跟踪器
+
+        Args:
+            connection: 池化SSH连接（PooledConnection）
+            log_file: 远程日志文件路径
+            max_read: 单次最多读取的字节数
+            keep_lines: 保留的最近日志行数
+        """
+        self.connection = connection
+        self.log_file = log_file
+        self.max_read = max_read
+        self.keep_lines = keep_lines
+        self.offset = 0
+        # 日志被截断重读的次数
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self.parser = TrainingLogParser(self.keep_lines)
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def poll(self) -> Tuple[List[str], int]:
+        """
+        读取自上次以来新追加的内容并送入解析器
+
+        Returns:
+            Tuple[List[str], int]: (新的完整行, 本次读取的字节数)
+
+        Raises:
+            FileNotFoundError: 日志文件不存在
+        """
+        with self._lock:
+            sftp = self.connection.sftp()
+            try:
+                size = sftp.stat(self.log_file).st_size
+            except IOError as e:
+                raise FileNotFoundError(f'{self.log_file}: {str(e)}')
+
+            if size < self.offset:
+                # 文件被截断或重新创建，从头解析
+                logger.info(f'日志文件被截断，重新读取: {self.log_file}')
+                self._reset()
+                self.generation += 1
+            if size == self.offset:
+                return [], 0
+
+            length = min(size - self.offset, self.max_read)
+            with sftp.open(self.log_file, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(length)
+            self.offset += len(data)
+            lines = self.parser.feed(self._decoder.decode(data))
+            return lines, len(data)
+
+
+class LogTailRegistry:
+    """按 (连接, 日志文件) 缓存日志跟踪器，使每次轮询延续上次的偏移量与解析状态"""
+
+    def __init__(self, max_tailers: int = 64):
+        """
+        初始化注册表
+
+        Args:
+            max_tailers: 最多缓存的跟踪器数量
+        """
+        self.max_tailers = max_tailers
+        self._tailers: 'OrderedDict[Tuple, LogTailer]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, connection, log_file: str) -> LogTailer:
+        """
+        获取（或创建）日志跟踪器
+
+        Args:
+            connection: 池化SSH连接
+            log_file: 远程日志文件路径
+
+        Returns:
+            LogTailer: 日志跟踪器
+        """
+        key = (connection.key, log_file)
+        with self._lock:
+            tailer = self._tailers.get(key)
+            if tailer is None or tailer.connection is not connection:
+                # 连接重建后沿用原偏移量与解析状态
+                previous = tailer
+                tailer = LogTailer(connection, log_file)
+                if previous is not None:
+                    tailer.offset = previous.offset
+                    tailer.generation = previous.generation
+                    tailer.parser = previous.parser
+                    tailer._decoder = previous._decoder
+                self._tailers[key] = tailer
+            self._tailers.move_to_end(key)
+            while len(self._tailers) > self.max_tailers:
+                self._tailers.popitem(last=False)
+            return tailer
+
+    def remove(self, connection_key, log_file: str):
+        """移除日志跟踪器"""
+        with self._lock:
+            self._tailers.pop((connection_key, log_file), None)
+
+
+# 全局日志跟踪器注册表
+log_tailers = LogTailRegistry()
@@ -0,0 +1,168 @@
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# 每个任务保留的轮次数
+DEFAULT_SERIES_CAPACITY = 4096
+
+
+class MetricSeries:
+    """单个训练任务的指标时间序列：按轮次存放在定长环形缓冲区中，同一轮的多次更新合并为一行"""
+
+    def __init__(self, capacity: int = DEFAULT_SERIES_CAPACITY):
+        """
+        初始化时间序列
+
+        Args:
+            capacity: 保留的最大轮次数，超出后覆盖最早的轮次
+        """
+        self.capacity = capacity
+        self.rounds = np.zeros(capacity, dtype=np.int32)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        # 指标名 -> 数值列（缺失值为NaN）
+        self.columns: Dict[str, np.ndarray] = {}
+        # 已写入的总行数（环形缓冲区的逻辑写指针）
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def _column(self, name: str) -> np.ndarray:
+        column = self.columns.get(name)
+        if column is None:
+            column = self.columns[name] = np.full(self.capacity, np.nan, dtype=np.float64)
+        return column
+
+    def append(self, metrics: Dict[str, float], timestamp: Optional[float] = None):
+        """
+        写入一轮指标；与最后一行同一轮次时合并到该行
+
+        Args:
+            metrics: 指标字典，必须包含 round
+            timestamp: 时间戳（可选）
+        """
+        round_num = int(metrics['round'])
+        with self._lock:
+            last = (self.count - 1) % self.capacity
+            if self.count and self.rounds[last] == round_num:
+                slot = last
+            else:
+                slot = self.count % self.capacity
+                self.count += 1
+                self.rounds[slot] = round_num
+                for column in self.columns.values():
+                    column[slot] = np.nan
+            self.timestamps[slot] = timestamp if timestamp is not None else time.time()
+            for name, value in metrics.items():
+                if name != 'round':
+                    self._column(name)[slot] = value
+
+    def _order(self) -> np.ndarray:
+        """按写入顺序排列的环形缓冲区下标"""
+        size = len(self)
+        start = self.count - size
+        return (np.arange(start, self.count) % self.capacity) if size else np.zeros(0, dtype=np.int64)
+
+    def query(self, names: Optional[List[str]] = None, since_round: Optional[int] = None,
+              max_points: Optional[int] = None) -> Dict[str, any]:
+        """
+        读取时间序列
+
+        Args:
+            names: 指标名列表（可选，默认全部）
+            since_round: 只返回大于该轮次的数据（可选，用于增量拉取）
+            max_points: 最多返回的点数，超出时等间隔抽样并保留最后一点（可选）
+
+        Returns:
+            Dict[str, any]: {'rounds', 'timestamps', 'metrics': {指标名: 数值列表（缺失为None）}}
+        """
+        with self._lock:
+            order = self._order()
+            rounds = self.rounds[order]
+            if since_round is not None:
+                order = order[rounds > since_round]
+                rounds = self.rounds[order]
+            if max_points and len(order) > max_points:
+                keep = np.unique(np.linspace(0, len(order) - 1, max_points).round().astype(np.int64))
+                order = order[keep]
+                rounds = rounds[keep]
+            selected = names if names is not None else sorted(self.columns)
+            metrics = {}
+            for name in selected:
+                column = self.columns.get(name)
+                if column is None:
+                    continue
+                values = column[order]
+                metrics[name] = [None if np.isnan(v) else float(v) for v in values]
+            return {
+                'rounds': rounds.tolist(),
+                'timestamps': self.timestamps[order].round(3).tolist(),
+                'metrics': metrics
+            }
+
+    def latest(self) -> Dict[str, float]:
+        """最后一轮的指标"""
+        with self._lock:
+            if not self.count:
+                return {}
+            slot = (self.count - 1) % self.capacity
+            latest = {name: float(column[slot]) for name, column in self.columns.items() if not np.isnan(column[slot])}
+            latest['round'] = int(self.rounds[slot])
+            return latest
+
+    def clear(self):
+        with self._lock:
+            self.count = 0
+            self.columns = {}
+
+
+class MetricSeriesRegistry:
+    """按 (连接, 日志文件) 保存各训练任务的指标时间序列，监控线程重建后继续写入同一序列"""
+
+    def __init__(self, max_series: int = 256, capacity: int = DEFAULT_SERIES_CAPACITY):
+        """
+        初始化注册表
+
+        Args:
+            max_series: 最多保存的任务数
+            capacity: 每个任务保留的轮次数
+        """
+        self.max_series = max_series
+        self.capacity = capacity
+        self._series: 'OrderedDict[Tuple, MetricSeries]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, log_file: str, create: bool = True) -> Optional[MetricSeries]:
+        """
+        获取（或创建）任务的时间序列
+
+        Args:
+            key: 连接池键
+            log_file: 远程日志文件路径
+            create: 不存在时是否创建
+
+        Returns:
+            Optional[MetricSeries]: 时间序列
+        """
+        with self._lock:
+            series = self._series.get((key, log_file))
+            if series is None:
+                if not create:
+                    return None
+                series = self._series[(key, log_file)] = MetricSeries(self.capacity)
+            self._series.move_to_end((key, log_file))
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+            return series
+
+    def remove(self, key, log_file: str):
+        """移除时间序列（同名日志的新任务启动时）"""
+        with self._lock:
+            self._series.pop((key, log_file), None)
+
+
+# 全局指标时间序列注册表
+metric_series = MetricSeriesRegistry()
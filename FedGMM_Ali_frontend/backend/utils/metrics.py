@@ -0,0 +1,700 @@
+import os
+import json
+import math
+import time
+import bisect
+import threading
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 多进程服务器中各工作进程写入指标快照的目录；未设置时 /metrics 只导出本进程的指标
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+# 工作进程写入快照的间隔（秒），即多进程模式下指标的最大延迟
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# 默认延迟分桶（秒）：覆盖毫秒级的数据接口到数十秒的SSH命令
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# 响应大小分桶（字节）
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Metric:
+    """指标族：同名指标按标签值区分为多条时间序列（线程安全）"""
+
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        初始化指标族
+
+        Args:
+            name: 指标名
+            documentation: 说明（导出为 HELP 行）
+            labelnames: 标签名列表
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # 标签值 -> 当前值
+        self._values: Dict[LabelValues, any] = {}
+
+    def _key(self, labels: Dict[str, any]) -> LabelValues:
+        if len(labels) != len(self.labelnames) or any(name not in labels for name in self.labelnames):
+            raise ValueError(f'指标 {self.name} 的标签应为 {self.labelnames}，实际为 {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _copy(self, value):
+        return value
+
+    def samples(self) -> List[Tuple[LabelValues, any]]:
+        """
+        获取各时间序列的当前值
+
+        Returns:
+            List[Tuple[LabelValues, any]]: (标签值, 值) 列表
+        """
+        with self._lock:
+            return [(key, self._copy(value)) for key, value in self._values.items()]
+
+    def describe(self) -> Dict[str, any]:
+        return {'type': self.type, 'help': self.documentation, 'labelnames': list(self.labelnames)}
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    """只增计数器"""
+
+    type = COUNTER
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        计数增加
+
+        Args:
+            amount: 增量（不能为负）
+            **labels: 标签值
+        """
+        if amount < 0:
+            raise ValueError('计数器只能增加')
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """可增可减的瞬时值"""
+
+    type = GAUGE
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(Metric):
+    """分桶直方图：记录各桶计数、总和与样本数"""
+
+    type = HISTOGRAM
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        初始化直方图
+
+        Args:
+            name: 指标名
+            documentation: 说明
+            labelnames: 标签名列表
+            buckets: 各桶上界（升序，+Inf 桶自动追加）
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets if not math.isinf(bound)))
+
+    def _copy(self, value):
+        counts, total = value
+        return [list(counts), total]
+
+    def describe(self) -> Dict[str, any]:
+        description = super().describe()
+        description['buckets'] = list(self.buckets)
+        return description
+
+    def observe(self, value: float, **labels):
+        """
+        记录一个样本
+
+        Args:
+            value: 样本值（延迟为秒，大小为字节）
+            **labels: 标签值
+        """
+        key = self._key(labels)
+        # 落入第一个上界不小于样本值的桶，超出全部上界时落入 +Inf 桶；导出时再累加
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return sum(entry[0]) if entry else 0
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        计时上下文：退出时记录耗时（异常退出同样记录）
+
+        Args:
+            **labels: 标签值
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels) -> Callable:
+        """
+        计时装饰器：记录每次调用的耗时
+
+        Args:
+            **labels: 标签值
+
+        Returns:
+            Callable: 装饰器
+        """
+        self._key(labels)
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Dict[str, any]]]) -> Dict[str, Dict[str, any]]:
+    """
+    合并多个进程的指标快照：计数器、直方图与瞬时值均按标签求和
+
+    Args:
+        snapshots: 快照列表（见 MetricsRegistry.snapshot）
+
+    Returns:
+        Dict[str, Dict[str, any]]: 合并后的快照
+    """
+    merged: Dict[str, Dict[str, any]] = {}
+    values: Dict[str, Dict[LabelValues, any]] = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            if name not in merged:
+                merged[name] = {key: value for key, value in family.items() if key != 'samples'}
+                values[name] = {}
+            elif merged[name]['type'] != family['type'] or merged[name].get('buckets') != family.get('buckets'):
+                logger.warning(f'指标 {name} 在各进程中定义不一致，跳过不兼容的快照')
+                continue
+            target = values[name]
+            for labels, value in family['samples']:
+                key = tuple(labels)
+                if family['type'] == HISTOGRAM:
+                    entry = target.setdefault(key, [[0] * len(value[0]), 0.0])
+                    entry[0] = [a + b for a, b in zip(entry[0], value[0])]
+                    entry[1] += value[1]
+                else:
+                    target[key] = target.get(key, 0) + value
+    for name, family in merged.items():
+        family['samples'] = [[list(key), value] for key, value in values[name].items()]
+    return merged
+
+
+def render_snapshot(snapshot: Dict[str, Dict[str, any]]) -> str:
+    """
+    将快照渲染为 Prometheus 文本格式
+
+    Args:
+        snapshot: 指标快照
+
+    Returns:
+        str: 文本格式的指标
+    """
+    lines = []
+    for name, family in sorted(snapshot.items()):
+        labelnames = family['labelnames']
+        lines.append(f'# HELP {name} {_escape(family["help"])}')
+        lines.append(f'# TYPE {name} {family["type"]}')
+        for labels, value in sorted(family['samples']):
+            if family['type'] != HISTOGRAM:
+                lines.append(f'{name}{_format_labels(labelnames, labels)} {_format_value(value)}')
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(family['buckets'] + [math.inf], counts):
+                cumulative += count
+                bucket_labels = _format_labels(labelnames + ['le'], labels + [_format_value(bound)])
+                lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labelnames, labels)} {_format_value(total)}')
+            lines.append(f'{name}_count{_format_labels(labelnames, labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsRegistry:
+    """
+    指标注册表，以 Prometheus 文本格式导出
+
+    指标保存在进程内存中。多进程服务器（gunicorn）下设置快照目录：各工作进程定期把本进程的
+    指标写入 worker-<pid>.json，任一进程导出时合并目录中的全部快照；工作进程退出后由主进程
+    把其计数器与直方图并入 archive.json（瞬时值丢弃），累计值不会因进程回收而回退
+    """
+
+    ARCHIVE_FILE = 'archive.json'
+
+    def __init__(self, directory: str = METRICS_DIR, flush_interval: float = METRICS_FLUSH_INTERVAL):
+        """
+        初始化注册表
+
+        Args:
+            directory: 多进程快照目录（为空时只导出本进程的指标）
+            flush_interval: 工作进程写入快照的间隔（秒）
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+        self._exporter: Optional[threading.Thread] = None
+        self._exporter_pid = None
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'指标已注册: {metric.name}')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """注册计数器"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """注册瞬时值"""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """注册直方图"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> Dict[str, Dict[str, any]]:
+        """
+        获取本进程全部指标的快照（可JSON序列化）
+
+        Returns:
+            Dict[str, Dict[str, any]]: 指标名 -> {'type', 'help', 'labelnames', ['buckets'], 'samples'}
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        snapshot = {}
+        for metric in metrics:
+            family = metric.describe()
+            family['samples'] = [[list(labels), value] for labels, value in metric.samples()]
+            snapshot[metric.name] = family
+        return snapshot
+
+    def clear(self):
+        """清空全部指标的值（保留注册）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+    def _write_json(self, path: str, data: Dict[str, any]):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, path: str) -> Optional[Dict[str, any]]:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logger.warning(f'指标快照无法解析，已跳过: {path}')
+            return None
+
+    def _worker_path(self, pid: int) -> str:
+        return os.path.join(self.directory, f'worker-{pid}.json')
+
+    def flush(self):
+        """把本进程的指标写入快照目录（未设置目录时不做任何事）"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_json(self._worker_path(os.getpid()), self.snapshot())
+
+    def start_exporter(self):
+        """
+        启动定期写入快照的后台线程（在gunicorn工作进程fork之后调用）
+
+        fork前继承的指标属于主进程，工作进程从零开始计数
+        """
+        if not self.directory or self._exporter_pid == os.getpid():
+            return
+        self.clear()
+        self._exporter_pid = os.getpid()
+
+        def loop():
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f'写入指标快照失败: {str(e)}')
+
+        self._exporter = threading.Thread(target=loop, name='metrics-exporter', daemon=True)
+        self._exporter.start()
+
+    def mark_process_dead(self, pid: int):
+        """
+        工作进程退出后（主进程中调用）：把其计数器与直方图并入归档快照，丢弃瞬时值
+
+        Args:
+            pid: 已退出工作进程的进程号
+        """
+        if not self.directory:
+            return
+        path = self._worker_path(pid)
+        snapshot = self._read_json(path)
+        if snapshot is None:
+            return
+        cumulative = {name: family for name, family in snapshot.items() if family['type'] != GAUGE}
+        archive_path = os.path.join(self.directory, self.ARCHIVE_FILE)
+        archive = self._read_json(archive_path) or {}
+        self._write_json(archive_path, merge_snapshots([archive, cumulative]))
+        os.remove(path)
+
+    def reset_directory(self):
+        """删除快照目录中上一次运行遗留的快照（主进程启动时调用）"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.json'):
+                os.remove(os.path.join(self.directory, filename))
+
+    def collect(self) -> Dict[str, Dict[str, any]]:
+        """
+        获取待导出的指标：未设置快照目录时为本进程的快照，否则合并目录中全部进程的快照
+
+        Returns:
+            Dict[str, Dict[str, any]]: 指标快照
+        """
+        if not self.directory:
+            return self.snapshot()
+        # 先写入本进程的最新值，其余工作进程的快照最多延迟 flush_interval 秒
+        self.flush()
+        snapshots = []
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith('.json'):
+                snapshot = self._read_json(os.path.join(self.directory, filename))
+                if snapshot:
+                    snapshots.append(snapshot)
+        return merge_snapshots(snapshots)
+
+    def render(self) -> str:
+        """
+        以 Prometheus 文本格式导出指标
+
+        Returns:
+            str: 文本格式的指标
+        """
+        return render_snapshot(self.collect())
+
+
+# 全局指标注册表
+metrics = MetricsRegistry()
+
+# HTTP 请求指标：route 为路由模板（如 /api/system/ssh/jobs/<job_id>），未匹配的请求记为 unmatched
+http_requests_total = metrics.counter(
+    'fedgmm_http_requests_total', 'HTTP请求数', ('blueprint', 'route', 'method', 'status'))
+http_request_errors_total = metrics.counter(
+    'fedgmm_http_request_errors_total', 'HTTP请求错误数（5xx响应或未处理异常）', ('blueprint', 'route', 'method'))
+http_request_seconds = metrics.histogram(
+    'fedgmm_http_request_duration_seconds', 'HTTP请求处理耗时（秒，流式响应计到响应头就绪）',
+    ('blueprint', 'route', 'method'))
+http_response_bytes = metrics.histogram(
+    'fedgmm_http_response_size_bytes', 'HTTP响应体大小（字节）', ('blueprint', 'route'), SIZE_BUCKETS)
+http_requests_in_flight = metrics.gauge(
+    'fedgmm_http_requests_in_flight', '正在处理的HTTP请求数（含未结束的流式响应）', ('blueprint', 'route'))
+
+# SSH 命令指标：mode 为 exec（同步执行）或 job（后台任务），status 为结果
+ssh_command_seconds = metrics.histogram(
+    'fedgmm_ssh_command_duration_seconds', 'SSH命令执行耗时（秒）', ('mode', 'status'))
+
+# 加密操作指标
+crypto_operation_seconds = metrics.histogram(
+    'fedgmm_crypto_operation_duration_seconds', '加密/解密操作耗时（秒）', ('operation',))
+
+
+class RequestMetrics:
+    """记录一次HTTP请求的指标（供 Flask 与 Quart 应用的请求钩子共用）"""
+
+    def __init__(self, blueprint: Optional[str], route: Optional[str], method: str):
+        """
+        请求开始：计入正在处理的请求数
+
+        Args:
+            blueprint: 蓝图名（应用级路由为空）
+            route: 路由模板（未匹配时为空）
+            method: 请求方法
+        """
+        self.blueprint = blueprint or ''
+        self.route = route or 'unmatched'
+        self.method = method
+        self.start = time.perf_counter()
+        self.recorded = False
+        # 流式响应在响应体发送完毕时才结束计数，而不是在请求上下文销毁时
+        self.streaming = False
+        self._in_flight = True
+        http_requests_in_flight.inc(blueprint=self.blueprint, route=self.route)
+
+    def record(self, status: int, size: Optional[int] = None):
+        """
+        响应就绪：记录耗时、状态码、响应大小与错误数（每个请求只记录一次）
+
+        Args:
+            status: 响应状态码
+            size: 响应体大小（字节，流式响应为None，结束时再通过 record_size 记录）
+        """
+        if self.recorded:
+            return
+        self.recorded = True
+        http_request_seconds.observe(time.perf_counter() - self.start,
+                                     blueprint=self.blueprint, route=self.route, method=self.method)
+        http_requests_total.inc(blueprint=self.blueprint, route=self.route, method=self.method, status=status)
+        if status >= 500:
+            http_request_errors_total.inc(blueprint=self.blueprint, route=self.route, method=self.method)
+        if size is not None:
+            self.record_size(size)
+
+    def record_size(self, size: int):
+        http_response_bytes.observe(size, blueprint=self.blueprint, route=self.route)
+
+    def finish_stream(self, size: int):
+        """
+        流式响应发送完毕（或被客户端中断）：记录响应大小并结束计数
+
+        Args:
+            size: 已发送的响应体字节数
+        """
+        self.record_size(size)
+        self.streaming = False
+        self.finish()
+
+    def finish(self, error: Optional[BaseException] = None):
+        """
+        请求结束：未记录响应的异常请求按500计；流式响应仍在发送时留给 finish_stream 结束计数
+
+        Args:
+            error: 未处理的异常（可选）
+        """
+        if error is not None:
+            self.record(500)
+        if self.streaming:
+            return
+        if self._in_flight:
+            self._in_flight = False
+            http_requests_in_flight.dec(blueprint=self.blueprint, route=self.route)
+
+
+def _chunk_size(chunk) -> int:
+    return len(chunk.encode('utf-8')) if isinstance(chunk, str) else len(chunk)
+
+
+class _CountedBody:
+    """
+    包装流式响应体，发送完毕或被关闭时回调总字节数（只回调一次）
+
+    服务器在响应结束时调用 close()；未开始迭代就被关闭的生成器不会执行 finally，因此用类而不是生成器包装。
+    """
+
+    def __init__(self, chunks: Iterable, callback: Callable[[int], None]):
+        self.chunks = chunks
+        self.callback = callback
+        self.size = 0
+        self._closed = False
+
+    def __iter__(self):
+        try:
+            for chunk in self.chunks:
+                self.size += _chunk_size(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if hasattr(self.chunks, 'close'):
+                self.chunks.close()
+        finally:
+            self.callback(self.size)
+
+
+class _AsyncCountedBody:
+    """_CountedBody 的异步迭代器版本（Quart 在响应结束时调用 aclose()）"""
+
+    def __init__(self, chunks, callback: Callable[[int], None]):
+        self.chunks = chunks
+        self.callback = callback
+        self.size = 0
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            chunk = await self.chunks.__anext__()
+        except BaseException:
+            # 迭代结束、出错或被取消
+            await self.aclose()
+            raise
+        self.size += _chunk_size(chunk)
+        return chunk
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if hasattr(self.chunks, 'aclose'):
+                await self.chunks.aclose()
+        finally:
+            self.callback(self.size)
+
+
+def instrument_app(app):
+    """
+    为 Flask 应用注册请求指标钩子
+
+    Args:
+        app: Flask 应用
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_metrics():
+        rule = request.url_rule
+        g.request_metrics = RequestMetrics(request.blueprint, rule.rule if rule else None, request.method)
+
+    @app.after_request
+    def _record_request_metrics(response):
+        tracker = g.get('request_metrics')
+        if tracker is None:
+            return response
+        if response.is_streamed:
+            tracker.record(response.status_code)
+            tracker.streaming = True
+            response.response = _CountedBody(response.response, tracker.finish_stream)
+        else:
+            tracker.record(response.status_code, response.content_length or 0)
+        return response
+
+    @app.teardown_request
+    def _finish_request_metrics(error=None):
+        tracker = g.pop('request_metrics', None)
+        if tracker is not None:
+            tracker.finish(error)
+
+
+def instrument_async_app(app):
+    """
+    为 Quart 应用注册请求指标钩子（与 instrument_app 记录相同的指标）
+
+    Args:
+        app: Quart 应用
+    """
+    from quart import g, request
+    from quart.wrappers.response import IterableBody
+
+    @app.before_request
+    async def _start_request_metrics():
+        rule = request.url_rule
+        g.request_metrics = RequestMetrics(request.blueprint, rule.rule if rule else None, request.method)
+
+    @app.after_request
+    async def _record_request_metrics(response):
+        tracker = g.get('request_metrics')
+        if tracker is None:
+            return response
+        if isinstance(response.response, IterableBody):
+            tracker.record(response.status_code)
+            tracker.streaming = True
+            response.response.iter = _AsyncCountedBody(response.response.iter, tracker.finish_stream)
+        else:
+            tracker.record(response.status_code, response.content_length or 0)
+        return response
+
+    @app.teardown_request
+    async def _finish_request_metrics(error=None):
+        tracker = g.pop('request_metrics', None)
+        if tracker is not None:
+            tracker.finish(error)
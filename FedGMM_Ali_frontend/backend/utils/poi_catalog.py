@@ -0,0 +1,194 @@
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Sequence
+
+
+class StringTable:
+    """字符串驻留表，相同字符串只保存一份，列中仅存整数编号"""
+
+    def __init__(self, values: Optional[Iterable[str]] = None):
+        """
+        初始化字符串表
+
+        Args:
+            values: 初始字符串（可选）
+        """
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+        if values:
+            for value in values:
+                self.intern(value)
+
+    def intern(self, value: str) -> int:
+        """
+        驻留字符串并返回其编号
+
+        Args:
+            value: 字符串
+
+        Returns:
+            int: 字符串编号
+        """
+        code = self._index.get(value)
+        if code is None:
+            code = len(self.values)
+            self._index[value] = code
+            self.values.append(value)
+        return code
+
+    def encode(self, values: Iterable[str], dtype=np.int32) -> np.ndarray:
+        """
+        批量编码字符串
+
+        Args:
+            values: 字符串序列
+            dtype: 编码数组类型
+
+        Returns:
+            np.ndarray: 编号数组
+        """
+        return np.fromiter((self.intern(v) for v in values), dtype=dtype)
+
+    def code_of(self, value: str) -> int:
+        """
+        查询字符串编号，不存在时返回-1
+
+        Args:
+            value: 字符串
+
+        Returns:
+            int: 字符串编号
+        """
+        return self._index.get(value, -1)
+
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class POICatalog:
+    """列式存储的POI目录：数值字段为NumPy列，类别/价格字典编码，名称驻留"""
+
+    def __init__(self, place_id: np.ndarray, score: np.ndarray, popularity: np.ndarray,
+                 category: np.ndarray, price: np.ndarray, name: np.ndarray,
+                 categories: StringTable, prices: StringTable, names: StringTable):
+        """
+        初始化POI目录（通常通过 from_records 构建）
+
+        Args:
+            place_id: 地点ID列
+            score: 评分列
+            popularity: 热度列
+            category: 类别编码列
+            price: 价格档位编码列
+            name: 名称编码列
+            categories: 类别字典
+            prices: 价格档位字典
+            names: 名称字符串表
+        """
+        self.place_id = place_id
+        self.score = score
+        self.popularity = popularity
+        self.category = category
+        self.price = price
+        self.name = name
+        self.categories = categories
+        self.prices = prices
+        self.names = names
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict], names: Optional[StringTable] = None) -> 'POICatalog':
+        """
+        从字典列表构建目录
+
+        Args:
+            records: POI字典列表，字段同推荐接口返回值
+            names: 共享的名称字符串表（可选，多城市共用时传入）
+
+        Returns:
+            POICatalog: 列式目录
+        """
+        categories = StringTable()
+        prices = StringTable()
+        names = names if names is not None else StringTable()
+        count = len(records)
+
+        return cls(
+            place_id=np.fromiter((r['place_id'] for r in records), dtype=np.int64, count=count),
+            score=np.fromiter((r['score'] for r in records), dtype=np.float32, count=count),
+            popularity=np.fromiter((r['popularity'] for r in records), dtype=np.int32, count=count),
+            category=categories.encode((r['category'] for r in records), dtype=np.uint16),
+            price=prices.encode((r['price'] for r in records), dtype=np.uint8),
+            name=names.encode((r['name'] for r in records), dtype=np.int32),
+            categories=categories,
+            prices=prices,
+            names=names
+        )
+
+    def __len__(self) -> int:
+        return len(self.place_id)
+
+    @property
+    def nbytes(self) -> int:
+        """列数据占用的字节数（不含字符串表）"""
+        return sum(col.nbytes for col in (self.place_id, self.score, self.popularity,
+                                          self.category, self.price, self.name))
+
+    def category_mask(self, category: str) -> np.ndarray:
+        """
+        按类别筛选
+
+        Args:
+            category: 类别名称
+
+        Returns:
+            np.ndarray: 布尔掩码
+        """
+        return self.category == self.categories.code_of(category)
+
+    def top_k(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        按分数选出前K个地点的行号（降序）
+
+        Args:
+            scores: 与目录等长的打分数组
+            k: 返回数量（与列表切片 [:k] 一致，负数表示去掉末尾 |k| 个）
+
+        Returns:
+            np.ndarray: 行号数组
+        """
+        k = int(k)
+        if k < 0:
+            k += len(scores)
+        k = max(0, min(k, len(scores)))
+        if k == 0:
+            return np.empty(0, dtype=np.int64)
+        if k < len(scores):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+    def to_records(self, rows: Iterable[int]) -> List[Dict]:
+        """
+        将指定行转换为JSON字典，并附加排名（仅用于最终的top-k结果）
+
+        Args:
+            rows: 行号序列
+
+        Returns:
+            List[Dict]: POI字典列表
+        """
+        records = []
+        for rank, row in enumerate(rows, start=1):
+            records.append({
+                'place_id': int(self.place_id[row]),
+                'name': self.names[self.name[row]],
+                'category': self.categories[self.category[row]],
+                'score': round(float(self.score[row]), 2),
+                'price': self.prices[self.price[row]],
+                'popularity': int(self.popularity[row]),
+                'rank': rank
+            })
+        return records
@@ -0,0 +1,362 @@
+import os
+import json
+import time
+import atexit
+import tempfile
+import threading
+import logging
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 清单文件目录与共享内存段名前缀，同一主机上的多个部署需使用不同的值
+SHARED_DATA_DIR = os.environ.get('SHARED_DATA_DIR', os.path.join(tempfile.gettempdir(), 'fedgmm-shared'))
+SHARED_DATA_NAMESPACE = os.environ.get('SHARED_DATA_NAMESPACE', 'fedgmm')
+# 列在共享内存段中的对齐字节数
+COLUMN_ALIGNMENT = 64
+
+
+def _untrack(segment: shared_memory.SharedMemory):
+    """
+    取消resource_tracker对附加段的登记
+
+    Python 3.13 之前附加已有共享内存段也会被登记，进程退出时resource_tracker会将其删除，
+    导致工作进程退出时删掉主进程发布的数据
+    """
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    except Exception:
+        pass
+
+
+def _attach_segment(name: str, untrack: bool = True):
+    """
+    附加已有的共享内存段，返回其底层mmap
+
+    列数组直接以mmap为缓冲区：NumPy对mmap持有导出引用，映射在最后一个数组释放后才解除；
+    若以 SharedMemory.buf 为缓冲区，SharedMemory 被回收时会强行解除映射，仍在使用的数组随即失效
+
+    Args:
+        name: 共享内存段名
+        untrack: 是否取消resource_tracker登记（与发布方共用resource_tracker时不能取消，
+            否则发布方删除段时会重复取消登记）
+
+    Returns:
+        mmap.mmap: 共享内存映射
+    """
+    segment = shared_memory.SharedMemory(name=name)
+    if untrack:
+        _untrack(segment)
+    buffer = segment._mmap
+    segment._buf.release()
+    segment._buf = None
+    segment._mmap = None
+    # 只关闭文件描述符，映射交由列数组管理
+    segment.close()
+    return buffer
+
+
+class SharedTable:
+    """从共享内存段零拷贝映射出的一代列式数据（只读）"""
+
+    def __init__(self, name: str, generation: int, columns: Dict[str, np.ndarray], segment: str = ''):
+        """
+        初始化共享表（通常由 SharedDataRegistry.attach 构建）
+
+        Args:
+            name: 数据集名称
+            generation: 数据代数
+            columns: 列名 -> 只读数组（共享内存段上的视图）
+            segment: 共享内存段名
+        """
+        self.name = name
+        self.generation = generation
+        self.columns = columns
+        self.segment = segment
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def to_records(self, rows: np.ndarray, columns: Optional[List[str]] = None) -> List[Dict[str, any]]:
+        """
+        将指定行转换为字典列表（数值转为Python内置类型）
+
+        Args:
+            rows: 行号数组
+            columns: 列名列表（可选，默认全部）
+
+        Returns:
+            List[Dict[str, any]]: 记录列表
+        """
+        names = columns if columns is not None else list(self.columns)
+        values = [self.columns[name][rows].tolist() for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+
+class SharedDataRegistry:
+    """
+    共享内存列式数据集注册表
+
+    发布方（多进程服务器的主进程）把每个数据集的全部列写入一个共享内存段，并通过原子替换的JSON
+    清单记录段名、代数与各列的类型/形状/偏移；工作进程按清单零拷贝附加，清单变化（数据重新加载）
+    后自动切换到新一代，内存占用不随工作进程数增长
+    """
+
+    MANIFEST_SUFFIX = '.manifest.json'
+
+    def __init__(self, manifest_dir: str = SHARED_DATA_DIR, namespace: str = SHARED_DATA_NAMESPACE,
+                 keep_generations: int = 2):
+        """
+        初始化注册表
+
+        Args:
+            manifest_dir: 清单文件目录
+            namespace: 共享内存段名前缀
+            keep_generations: 发布方为每个数据集保留的历史代数（供尚未切换的工作进程继续读取）
+        """
+        self.manifest_dir = manifest_dir
+        self.namespace = namespace
+        self.keep_generations = max(1, keep_generations)
+        self._lock = threading.Lock()
+        # 数据集名 -> 构建函数（返回列名 -> 数组）
+        self._loaders: Dict[str, Callable[[], Dict[str, np.ndarray]]] = {}
+        # 数据集名 -> (清单文件标识, SharedTable)
+        self._attached: Dict[str, Tuple[Tuple[int, int], SharedTable]] = {}
+        # 本进程发布的共享内存段：数据集名 -> [(代数, 段)]
+        self._published: Dict[str, List[Tuple[int, shared_memory.SharedMemory]]] = {}
+        self._publisher_pid = None
+
+    def _manifest_path(self, name: str) -> str:
+        if not name or os.sep in name or name in ('.', '..'):
+            raise ValueError(f'无效的数据集名称: {name}')
+        return os.path.join(self.manifest_dir, f'{self.namespace}-{name}{self.MANIFEST_SUFFIX}')
+
+    def register(self, name: str, loader: Callable[[], Dict[str, np.ndarray]]):
+        """
+        登记数据集的构建函数，供 publish_all 与首次访问时使用
+
+        Args:
+            name: 数据集名称
+            loader: 构建函数，返回列名 -> 一维数组（各列等长）
+        """
+        self._manifest_path(name)
+        self._loaders[name] = loader
+
+    def read_manifest(self, name: str) -> Optional[Dict[str, any]]:
+        """
+        读取数据集当前的清单
+
+        Args:
+            name: 数据集名称
+
+        Returns:
+            Optional[Dict[str, any]]: 清单，不存在时返回None
+        """
+        try:
+            with open(self._manifest_path(name), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def publish(self, name: str, columns: Dict[str, np.ndarray]) -> int:
+        """
+        发布数据集的新一代：写入新的共享内存段，再原子替换清单
+
+        Args:
+            name: 数据集名称
+            columns: 列名 -> 一维数组（各列等长）
+
+        Returns:
+            int: 新的代数
+        """
+        arrays = {column: np.ascontiguousarray(values) for column, values in columns.items()}
+        lengths = {len(values) for values in arrays.values()}
+        if len(lengths) > 1:
+            raise ValueError(f'数据集 {name} 的列长度不一致')
+
+        layout = []
+        offset = 0
+        for column, values in arrays.items():
+            offset = -(-offset // COLUMN_ALIGNMENT) * COLUMN_ALIGNMENT
+            layout.append({'name': column, 'dtype': values.dtype.str, 'shape': list(values.shape), 'offset': offset})
+            offset += values.nbytes
+
+        with self._lock:
+            previous = self.read_manifest(name)
+            generation = (previous['generation'] + 1) if previous else 1
+            # 段名包含进程号，多个进程同时发布时不会冲突
+            segment = shared_memory.SharedMemory(
+                name=f'{self.namespace}_{name}_{os.getpid()}_{generation}', create=True, size=max(offset, 1))
+            for spec, values in zip(layout, arrays.values()):
+                target = np.ndarray(values.shape, dtype=values.dtype, buffer=segment.buf, offset=spec['offset'])
+                target[...] = values
+                del target
+
+            manifest = {
+                'name': name,
+                'generation': generation,
+                'segment': segment.name,
+                'size': segment.size,
+                'rows': lengths.pop() if lengths else 0,
+                'pid': os.getpid(),
+                'created_at': time.time(),
+                'columns': layout
+            }
+            os.makedirs(self.manifest_dir, exist_ok=True)
+            manifest_path = self._manifest_path(name)
+            tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, manifest_path)
+
+            self._track_published(name, generation, segment)
+        logger.info(f'已发布共享数据: 数据集={name}, 代数={generation}, 行数={manifest["rows"]}, 字节数={offset}')
+        return generation
+
+    def _track_published(self, name: str, generation: int, segment: shared_memory.SharedMemory):
+        if self._publisher_pid is None:
+            atexit.register(self.unlink_published)
+        if self._publisher_pid != os.getpid():
+            # fork继承的段归父进程所有，子进程不负责删除
+            self._published = {}
+            self._publisher_pid = os.getpid()
+        segments = self._published.setdefault(name, [])
+        segments.append((generation, segment))
+        # 删除超出保留代数的旧段；已附加的工作进程在切换前仍可读取其映射
+        while len(segments) > self.keep_generations:
+            _, old = segments.pop(0)
+            self._release(old)
+
+    @staticmethod
+    def _release(segment: shared_memory.SharedMemory):
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+        try:
+            segment.close()
+        except BufferError:
+            pass
+
+    def publish_all(self) -> List[str]:
+        """
+        按登记的构建函数重新发布全部数据集（主进程启动或重新加载时调用）
+
+        Returns:
+            List[str]: 已发布的数据集名称
+        """
+        for name, loader in list(self._loaders.items()):
+            self.publish(name, loader())
+        return list(self._loaders)
+
+    def attach(self, name: str) -> Optional[SharedTable]:
+        """
+        附加数据集当前一代（有缓存，清单变化后自动切换到新一代）
+
+        Args:
+            name: 数据集名称
+
+        Returns:
+            Optional[SharedTable]: 共享表，清单不存在或共享内存段已被删除时返回None
+        """
+        try:
+            stat = os.stat(self._manifest_path(name))
+        except FileNotFoundError:
+            return None
+        # os.replace 会更换inode，结合mtime判断清单是否变化
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+
+        cached = self._attached.get(name)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        with self._lock:
+            cached = self._attached.get(name)
+            if cached and cached[0] == stamp:
+                return cached[1]
+            manifest = self.read_manifest(name)
+            if manifest is None:
+                return None
+            try:
+                # 发布方自身及其fork出的子进程（如gunicorn工作进程）共用同一个resource_tracker
+                publisher = manifest.get('pid')
+                buffer = _attach_segment(manifest['segment'], untrack=publisher not in (os.getpid(), os.getppid()))
+            except FileNotFoundError:
+                # 发布进程已退出并删除了共享内存段
+                return None
+
+            columns = {}
+            for spec in manifest['columns']:
+                values = np.ndarray(tuple(spec['shape']), dtype=np.dtype(spec['dtype']),
+                                    buffer=buffer, offset=spec['offset'])
+                values.flags.writeable = False
+                columns[spec['name']] = values
+            # 旧一代在仍持有其列的请求结束后随引用释放自动解除映射
+            table = SharedTable(name, manifest['generation'], columns, manifest['segment'])
+            self._attached[name] = (stamp, table)
+            logger.info(f'已附加共享数据: 数据集={name}, 代数={table.generation}, 行数={len(table)}')
+            return table
+
+    def table(self, name: str) -> SharedTable:
+        """
+        获取数据集当前一代；尚未发布（如开发服务器、测试）时由本进程按登记的构建函数发布
+
+        Args:
+            name: 数据集名称
+
+        Returns:
+            SharedTable: 共享表
+        """
+        table = self.attach(name)
+        if table is None:
+            loader = self._loaders.get(name)
+            if loader is None:
+                raise KeyError(f'数据集未登记: {name}')
+            self.publish(name, loader())
+            table = self.attach(name)
+        return table
+
+    def status(self) -> Dict[str, Dict[str, any]]:
+        """
+        获取本进程已附加的数据集信息
+
+        Returns:
+            Dict[str, Dict[str, any]]: 数据集名 -> {'generation', 'rows', 'segment'}
+        """
+        return {
+            name: {
+                'generation': table.generation,
+                'rows': len(table),
+                'segment': table.segment
+            }
+            for name, (_, table) in list(self._attached.items())
+        }
+
+    def unlink_published(self):
+        """删除本进程发布的共享内存段及仍指向它们的清单（仅发布进程退出时生效，fork出的子进程跳过）"""
+        if self._publisher_pid != os.getpid():
+            return
+        with self._lock:
+            for name, segments in self._published.items():
+                manifest = self.read_manifest(name)
+                names = {segment.name for _, segment in segments}
+                if manifest and manifest.get('segment') in names:
+                    try:
+                        os.remove(self._manifest_path(name))
+                    except FileNotFoundError:
+                        pass
+                for _, segment in segments:
+                    self._release(segment)
+            self._published.clear()
+
+
+# 全局共享数据注册表
+shared_data = SharedDataRegistry()
@@ -1,27 +1,95 @@
 import paramiko
-import time
 import logging
 from typing import Dict, Optional, Tuple
+from backend.utils.ssh_pool import SSHConnectionPool, ssh_pool, make_key
+from backend.utils.ssh_connector import SSHConnector, ConnectAttempt, CONNECT_CONNECTED, ssh_connector
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class SSHClient:
-    """SSH客户端类，实现连接、认证、状态管理、错误处理和重试机制"""
+    """SSH客户端类，实现连接、认证、状态管理、错误处理和重试机制（底层连接由进程级连接池共享）"""
     
-    def __init__(self):
-        """初始化SSH客户端"""
-        self.client = None
-        self.connected = False
+    def __init__(self, pool: Optional[SSHConnectionPool] = None, connector: Optional[SSHConnector] = None):
+        """
+        初始化SSH客户端
+        
+        Args:
+            pool: SSH连接池（可选，默认使用全局连接池）
+            connector: 后台连接器（可选，默认使用与连接池对应的连接器）
+        """
+        self.pool = pool if pool is not None else ssh_pool
+        if connector is None:
+            connector = ssh_connector if self.pool is ssh_pool else SSHConnector(self.pool)
+        self.connector = connector
+        # 最近一次后台连接操作
+        self.pending: Optional[ConnectAttempt] = None
+        # 是否已建立会话（用户未主动关闭）；连接是否可用以连接池中的健康状态为准
+        self._session = False
         self.hostname = None
         self.username = None
+        self.port = None
+    
+    @property
+    def connected(self) -> bool:
+        """当前是否有可用连接（断线后由健康监控自动重连时会恢复为True）"""
+        return self.get_connection() is not None
+    
+    @property
+    def key(self):
+        """当前连接在连接池中的键"""
+        if self.hostname is None:
+            return None
+        return make_key(self.hostname, self.port, self.username)
+    
+    @property
+    def client(self):
+        """当前连接对应的 paramiko.SSHClient"""
+        connection = self.get_connection()
+        return connection.client if connection else None
+    
+    def connect_async(self, hostname: str, username: str, password: Optional[str] = None, 
+                      key_filename: Optional[str] = None, port: int = 22, 
+                      timeout: int = 30, max_retries: int = 3, retry_delay: float = 5) -> ConnectAttempt:
+        """
+        在后台建立连接并立即返回（指数退避加抖动重试，按主机熔断）
+        
+        Args:
+            hostname: 服务器主机名或IP地址
+            username: 用户名
+            password: 密码（可选）
+            key_filename: 私钥文件路径（可选）
+            port: SSH端口
+            timeout: 单次连接超时时间（秒）
+            max_retries: 最大尝试次数
+            retry_delay: 退避基础间隔（秒）
+        
+        Returns:
+            ConnectAttempt: 连接操作状态，成功后本客户端切换到该连接
+        """
+        def on_success(connection):
+            self.hostname, self.port, self.username = connection.key
+            self._session = True
+        
+        self.pending = self.connector.submit(
+            hostname=hostname,
+            username=username,
+            password=password,
+            key_filename=key_filename,
+            port=port,
+            timeout=timeout,
+            max_retries=max_retries,
+            retry_delay=retry_delay,
+            on_success=on_success
+        )
+        return self.pending
     
     def connect(self, hostname: str, username: str, password: Optional[str] = None, 
                 key_filename: Optional[str] = None, port: int = 22, 
-                timeout: int = 30, max_retries: int = 3, retry_delay: int = 5) -> Tuple[bool, str]:
+                timeout: int = 30, max_retries: int = 3, retry_delay: float = 5) -> Tuple[bool, str]:
         """
-        连接到SSH服务器
+        连接到SSH服务器（阻塞等待后台连接完成）
         
         Args:
             hostname: 服务器主机名或IP地址
@@ -31,66 +99,24 @@ class SSHClient:
             port: SSH端口
             timeout: 连接超时时间（秒）
             max_retries: 最大重试次数
-            retry_delay: 重试间隔（秒）
+            retry_delay: 退避基础间隔（秒）
         
         Returns:
             Tuple[bool, str]: (连接是否成功, 消息)
         """
-        retry_count = 0
+        attempt = self.connect_async(hostname, username, password, key_filename, port,
+                                     timeout, max_retries, retry_delay)
+        attempt.wait()
+        return attempt.status == CONNECT_CONNECTED, attempt.message
+    
+    def get_connection(self):
+        """
+        获取当前连接在连接池中的健康连接
         
-        while retry_count < max_retries:
-            try:
-                logger.info(f"尝试连接到 {hostname}:{port} (重试 {retry_count+1}/{max_retries})")
-                
-                # 创建新的SSH客户端
-                self.client = paramiko.SSHClient()
-                self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                
-                # 连接服务器
-                self.client.connect(
-                    hostname=hostname,
-                    username=username,
-                    password=password,
-                    key_filename=key_filename,
-                    port=port,
-                    timeout=timeout,
-                    look_for_keys=False
-                )
-                
-                # 连接成功
-                self.connected = True
-                self.hostname = hostname
-                self.username = username
-                message = f"成功连接到 {hostname}:{port} 作为用户 {username}"
-                logger.info(message)
-                return True, message
-                
-            except paramiko.AuthenticationException:
-                error_msg = "认证失败，请检查用户名和密码/密钥"
-                logger.error(error_msg)
-                return False, error_msg
-            
-            except paramiko.SSHException as ssh_err:
-                retry_count += 1
-                error_msg = f"SSH错误: {str(ssh_err)}"
-                logger.error(error_msg)
-                
-                if retry_count < max_retries:
-                    logger.info(f"{retry_delay}秒后重试...")
-                    time.sleep(retry_delay)
-                else:
-                    return False, f"连接失败，已达到最大重试次数: {error_msg}"
-            
-            except Exception as e:
-                retry_count += 1
-                error_msg = f"连接错误: {str(e)}"
-                logger.error(error_msg)
-                
-                if retry_count < max_retries:
-                    logger.info(f"{retry_delay}秒后重试...")
-                    time.sleep(retry_delay)
-                else:
-                    return False, f"连接失败，已达到最大重试次数: {error_msg}"
+        Returns:
+            PooledConnection: 池化连接，未连接或已断开时返回None
+        """
+        return self.pool.get(self.key) if self._session else None
     
     def execute_command(self, command: str, timeout: int = 60) -> Tuple[bool, str, str, str]:
         """
@@ -103,21 +129,15 @@ class SSHClient:
         Returns:
             Tuple[bool, str, str, str]: (执行是否成功, 标准输出, 标准错误, 错误消息)
         """
-        if not self.connected or not self.client:
+        connection = self.get_connection()
+        if connection is None:
             return False, "", "", "未连接到服务器"
         
         try:
             logger.info(f"执行命令: {command}")
             
-            # 执行命令
-            stdin, stdout, stderr = self.client.exec_command(command, timeout=timeout)
-            
-            # 读取输出
-            stdout_content = stdout.read().decode('utf-8')
-            stderr_content = stderr.read().decode('utf-8')
-            
-            # 检查命令执行状态
-            exit_status = stdout.channel.recv_exit_status()
+            # 在池化连接上打开新channel执行命令
+            exit_status, stdout_content, stderr_content = connection.exec_command(command, timeout=timeout)
             
             if exit_status == 0:
                 logger.info(f"命令执行成功: {command}")
@@ -145,10 +165,9 @@ class SSHClient:
             bool: 关闭是否成功
         """
         try:
-            if self.client:
-                self.client.close()
-                self.connected = False
+            if self.key is not None and self.pool.close(self.key):
                 logger.info(f"已关闭到 {self.hostname} 的连接")
+            self._session = False
             return True
         except Exception as e:
             logger.error(f"关闭连接时出错: {str(e)}")
@@ -161,12 +180,13 @@ class SSHClient:
         Returns:
             Dict[str, any]: 连接状态信息
         """
-        return {
+        status = {
             "connected": self.connected,
             "hostname": self.hostname,
-            "username": self.username
+            "username": self.username,
+            "port": self.port
         }
-    
-    def __del__(self):
-        """析构函数，确保连接被关闭"""
-        self.close()
+        if self.pending is not None:
+            status["pending"] = self.pending.to_dict()
+            status["circuit"] = self.connector.breaker.status(self.pending.key[:2])
+        return status
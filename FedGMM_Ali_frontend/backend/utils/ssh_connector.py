@@ -0,0 +1,361 @@
+import paramiko
+import heapq
+import itertools
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.utils.async_bridge import AsyncCondition
+from backend.utils.ssh_pool import SSHConnectionPool, ssh_pool, make_key, format_key, credential_fingerprint
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 连接状态
+CONNECT_PENDING = 'pending'
+CONNECT_CONNECTED = 'connected'
+CONNECT_FAILED = 'failed'
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    指数退避 + 抖动（equal jitter）：保留一半退避时间，另一半随机
+
+    Args:
+        attempt: 已失败的次数（从1开始）
+        base_delay: 基础间隔（秒）
+        max_delay: 最大间隔（秒）
+
+    Returns:
+        float: 下次重试前的等待时间（秒）
+    """
+    delay = min(max_delay, base_delay * (2 ** (attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitBreaker:
+    """
+    按主机统计连续连接失败，达到阈值后熔断一段时间，期间直接拒绝连接请求
+
+    熔断到期后进入半开状态：只放行一次探测连接，探测结束前其余请求直接拒绝
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30, max_reset_timeout: float = 300):
+        """
+        初始化熔断器
+
+        Args:
+            failure_threshold: 触发熔断的连续失败次数
+            reset_timeout: 首次熔断时长（秒），再次熔断时翻倍
+            max_reset_timeout: 最长熔断时长（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._hosts: Dict[Tuple[str, int], Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host: Tuple[str, int]) -> Dict[str, float]:
+        return self._hosts.setdefault(host, {'failures': 0, 'trips': 0, 'open_until': 0.0, 'probe_until': 0.0})
+
+    def allow(self, host: Tuple[str, int]) -> Tuple[bool, float]:
+        """
+        判断是否允许连接该主机（半开状态下放行的请求即为探测，需以 record_success/record_failure/
+        release_probe 结束）
+
+        Args:
+            host: (主机, 端口)
+
+        Returns:
+            Tuple[bool, float]: (是否允许, 熔断剩余时间；因探测进行中被拒绝时为0)
+        """
+        with self._lock:
+            state = self._state(host)
+            now = time.time()
+            remaining = state['open_until'] - now
+            if remaining > 0:
+                return False, remaining
+            if state['trips'] > 0:
+                # 半开状态：只放行一次探测；探测方异常退出未释放时，超过熔断时长后允许新的探测
+                if state['probe_until'] > now:
+                    return False, 0.0
+                state['probe_until'] = now + self.reset_timeout
+            return True, 0.0
+
+    def release_probe(self, host: Tuple[str, int]):
+        """探测未得出结果（认证失败、连接取消）时释放探测名额"""
+        with self._lock:
+            self._state(host)['probe_until'] = 0.0
+
+    def record_success(self, host: Tuple[str, int]):
+        with self._lock:
+            self._hosts[host] = {'failures': 0, 'trips': 0, 'open_until': 0.0, 'probe_until': 0.0}
+
+    def record_failure(self, host: Tuple[str, int]) -> bool:
+        """
+        记录一次失败
+
+        Returns:
+            bool: 是否因此触发熔断
+        """
+        with self._lock:
+            state = self._state(host)
+            state['failures'] += 1
+            state['probe_until'] = 0.0
+            # 半开状态下的失败立即重新熔断
+            if state['failures'] >= self.failure_threshold or state['trips'] > 0:
+                timeout = min(self.max_reset_timeout, self.reset_timeout * (2 ** state['trips']))
+                state['open_until'] = time.time() + timeout
+                state['trips'] += 1
+                state['failures'] = 0
+                logger.warning(f'主机 {host[0]}:{host[1]} 连续连接失败，熔断 {timeout:.0f} 秒')
+                return True
+            return False
+
+    def status(self, host: Tuple[str, int]) -> Dict[str, any]:
+        """获取主机的熔断状态"""
+        with self._lock:
+            state = dict(self._state(host))
+        remaining = state['open_until'] - time.time()
+        return {
+            'open': remaining > 0,
+            'retry_after': round(max(0.0, remaining), 1),
+            'consecutive_failures': int(state['failures']),
+            'trips': int(state['trips']),
+            'probing': state['probe_until'] > time.time()
+        }
+
+
+class ConnectAttempt:
+    """一次后台连接操作的状态"""
+
+    def __init__(self, key, fingerprint: str, max_retries: int):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.max_retries = max_retries
+        self.status = CONNECT_PENDING
+        self.message = f'正在连接 {format_key(key)}'
+        self.attempts = 0
+        self.started_at = time.time()
+        self.finished_at = None
+        self.next_retry_at = None
+        self._done = threading.Event()
+        self._cond = AsyncCondition()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def _finish(self, status: str, message: str):
+        self.status = status
+        self.message = message
+        self.next_retry_at = None
+        self.finished_at = time.time()
+        with self._cond:
+            self._done.set()
+            self._cond.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待连接操作结束
+
+        Args:
+            timeout: 最长等待时间（秒，可选）
+
+        Returns:
+            bool: 是否已结束
+        """
+        return self._done.wait(timeout)
+
+    async def wait_async(self, timeout: Optional[float] = None) -> bool:
+        """协程版 wait，等待期间不占用线程"""
+        return await self._cond.wait_for_async(self._done.is_set, timeout=timeout)
+
+    def to_dict(self) -> Dict[str, any]:
+        """获取连接操作状态"""
+        return {
+            'target': format_key(self.key),
+            'status': self.status,
+            'message': self.message,
+            'attempts': self.attempts,
+            'max_retries': self.max_retries,
+            'next_retry_in': round(max(0.0, self.next_retry_at - time.time()), 1) if self.next_retry_at else None
+        }
+
+
+class SSHConnector:
+    """
+    在后台线程中建立SSH连接：指数退避加抖动重试，并按主机熔断，请求线程不再阻塞
+
+    每次尝试占用一个连接线程，退避期间由重试调度线程计时，不占用连接线程，
+    不可达的主机不会让其他主机的连接请求排队
+    """
+
+    def __init__(self, pool: Optional[SSHConnectionPool] = None, breaker: Optional[CircuitBreaker] = None,
+                 max_workers: int = 4, max_delay: float = 60):
+        """
+        初始化连接器
+
+        Args:
+            pool: SSH连接池（可选，默认使用全局连接池）
+            breaker: 熔断器（可选）
+            max_workers: 后台连接线程数（同时进行的连接尝试数）
+            max_delay: 最大重试间隔（秒）
+        """
+        self.pool = pool if pool is not None else ssh_pool
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.max_delay = max_delay
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ssh-connect')
+        self._attempts: Dict[Tuple, ConnectAttempt] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        # 等待重试的连接：(到期时间, 序号, _run 的参数)，由重试调度线程到期后提交到连接线程池
+        self._retries: List[Tuple[float, int, Tuple]] = []
+        self._retry_cond = threading.Condition()
+        self._retry_seq = itertools.count()
+        self._retry_thread: Optional[threading.Thread] = None
+
+    def submit(self, hostname: str, username: str, password: Optional[str] = None,
+               key_filename: Optional[str] = None, port: int = 22, timeout: int = 30,
+               max_retries: int = 3, retry_delay: float = 1,
+               on_success: Optional[Callable] = None) -> ConnectAttempt:
+        """
+        提交连接请求并立即返回
+
+        Args:
+            hostname: 服务器主机名或IP地址
+            username: 用户名
+            password: 密码（可选）
+            key_filename: 私钥文件路径（可选）
+            port: SSH端口
+            timeout: 单次连接超时时间（秒）
+            max_retries: 最大尝试次数
+            retry_delay: 退避基础间隔（秒）
+            on_success: 连接成功后的回调，参数为 PooledConnection
+
+        Returns:
+            ConnectAttempt: 连接操作状态
+        """
+        key = make_key(hostname, port, username)
+        fingerprint = credential_fingerprint(password, key_filename)
+
+        with self._lock:
+            existing = self._attempts.get(key)
+            if existing is not None and not existing.finished and existing.fingerprint == fingerprint:
+                # 同一目标已有进行中的连接，直接复用
+                return existing
+            attempt = ConnectAttempt(key, fingerprint, max(1, int(max_retries)))
+            self._attempts[key] = attempt
+
+        allowed, retry_after = self.breaker.allow(key[:2])
+        if not allowed:
+            if retry_after > 0:
+                message = f'主机 {hostname}:{port} 连接失败次数过多，已熔断，请 {retry_after:.0f} 秒后重试'
+            else:
+                message = f'主机 {hostname}:{port} 正在进行熔断恢复探测，请稍后重试'
+            attempt._finish(CONNECT_FAILED, message)
+            return attempt
+
+        params = dict(hostname=hostname, username=username, password=password,
+                      key_filename=key_filename, port=port, timeout=timeout)
+        self._executor.submit(self._run, attempt, params, retry_delay, on_success)
+        return attempt
+
+    def get(self, key) -> Optional[ConnectAttempt]:
+        """获取目标最近一次的连接操作"""
+        with self._lock:
+            return self._attempts.get(key)
+
+    def _run(self, attempt: ConnectAttempt, params: Dict[str, any], retry_delay: float,
+             on_success: Optional[Callable]):
+        """连接线程：进行一次连接尝试，可重试的失败交给重试调度线程在退避后重新提交"""
+        host = attempt.key[:2]
+        target = format_key(attempt.key)
+        if self._stop_event.is_set():
+            self.breaker.release_probe(host)
+            attempt._finish(CONNECT_FAILED, '连接已取消')
+            return
+        if attempt.attempts > 0 and not self.breaker.allow(host)[0]:
+            # 退避期间该主机被其他连接触发熔断（或正由其他连接探测）
+            attempt._finish(CONNECT_FAILED, f'连接失败，主机已熔断: {attempt.message}')
+            return
+
+        attempt.attempts += 1
+        attempt.next_retry_at = None
+        try:
+            logger.info(f"尝试连接到 {target} (重试 {attempt.attempts}/{attempt.max_retries})")
+            connection = self.pool.connect(**params)
+            self.breaker.record_success(host)
+            if on_success is not None:
+                on_success(connection)
+            message = f"成功连接到 {params['hostname']}:{params['port']} 作为用户 {params['username']}"
+            logger.info(message)
+            attempt._finish(CONNECT_CONNECTED, message)
+            return
+        except paramiko.AuthenticationException:
+            # 认证失败重试无意义，也不计入熔断
+            error_msg = "认证失败，请检查用户名和密码/密钥"
+            logger.error(error_msg)
+            self.breaker.release_probe(host)
+            attempt._finish(CONNECT_FAILED, error_msg)
+            return
+        except Exception as e:
+            if isinstance(e, paramiko.SSHException):
+                error_msg = f"SSH错误: {str(e)}"
+            else:
+                error_msg = f"连接错误: {str(e)}"
+            logger.error(error_msg)
+            tripped = self.breaker.record_failure(host)
+
+        if tripped:
+            attempt._finish(CONNECT_FAILED, f"连接失败，主机已熔断: {error_msg}")
+            return
+        if attempt.attempts >= attempt.max_retries:
+            attempt._finish(CONNECT_FAILED, f"连接失败，已达到最大重试次数: {error_msg}")
+            return
+
+        delay = backoff_delay(attempt.attempts, retry_delay, self.max_delay)
+        attempt.next_retry_at = time.time() + delay
+        attempt.message = f"{error_msg}，{delay:.1f}秒后重试"
+        logger.info(f"{delay:.1f}秒后重试...")
+        self._schedule_retry(delay, (attempt, params, retry_delay, on_success))
+
+    def _schedule_retry(self, delay: float, args: Tuple):
+        with self._retry_cond:
+            heapq.heappush(self._retries, (time.time() + delay, next(self._retry_seq), args))
+            if self._retry_thread is None:
+                self._retry_thread = threading.Thread(target=self._retry_loop, name='ssh-connect-retry', daemon=True)
+                self._retry_thread.start()
+            self._retry_cond.notify()
+
+    def _retry_loop(self):
+        """重试调度线程：到期的重试提交到连接线程池"""
+        with self._retry_cond:
+            while not self._stop_event.is_set():
+                if not self._retries:
+                    self._retry_cond.wait()
+                    continue
+                remaining = self._retries[0][0] - time.time()
+                if remaining > 0:
+                    self._retry_cond.wait(remaining)
+                    continue
+                _, _, args = heapq.heappop(self._retries)
+                self._executor.submit(self._run, *args)
+
+    def shutdown(self):
+        """停止后台连接，等待重试的连接标记为已取消"""
+        self._stop_event.set()
+        with self._retry_cond:
+            pending, self._retries = self._retries, []
+            self._retry_cond.notify_all()
+        for _, _, (attempt, *_rest) in pending:
+            attempt._finish(CONNECT_FAILED, '连接已取消')
+        self._executor.shutdown(wait=False)
+
+
+# 全局连接器实例
+ssh_connector = SSHConnector(ssh_pool)
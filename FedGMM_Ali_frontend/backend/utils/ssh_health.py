@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+from backend.utils.ssh_pool import SSHConnectionPool, PooledConnection, format_key, ssh_pool
+from backend.utils.ssh_connector import SSHConnector, CONNECT_CONNECTED, CONNECT_PENDING, ssh_connector
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 探测间隔与超时（秒），可通过环境变量覆盖
+DEFAULT_PROBE_INTERVAL = float(os.environ.get('SSH_KEEPALIVE_INTERVAL', 15))
+DEFAULT_PROBE_TIMEOUT = float(os.environ.get('SSH_KEEPALIVE_TIMEOUT', 10))
+# OpenSSH 的保活全局请求，服务器总会回复（成功或失败），可用于测量往返时延
+KEEPALIVE_REQUEST = 'keepalive@openssh.com'
+
+# 连接健康状态
+HEALTH_HEALTHY = 'healthy'
+HEALTH_UNRESPONSIVE = 'unresponsive'
+HEALTH_RECONNECTING = 'reconnecting'
+HEALTH_DEAD = 'dead'
+
+
+def probe_rtt(connection: PooledConnection) -> Optional[float]:
+    """
+    发送一次保活请求并测量往返时延
+
+    global_request 本身没有超时，会一直阻塞到服务器回复或transport关闭，由调用方限制等待时间。
+
+    Args:
+        connection: 池化连接
+
+    Returns:
+        Optional[float]: 往返时延（秒），transport已断开时返回None
+    """
+    transport = connection.transport
+    if transport is None or not transport.is_active():
+        return None
+    start = time.perf_counter()
+    transport.global_request(KEEPALIVE_REQUEST, wait=True)
+    return time.perf_counter() - start if transport.is_active() else None
+
+
+class ConnectionHealth:
+    """单条连接的健康记录"""
+
+    def __init__(self, key):
+        self.key = key
+        self.status = HEALTH_HEALTHY
+        self.rtt = None
+        self.rtt_avg = None
+        self.failures = 0
+        self.probes = 0
+        self.reconnects = 0
+        self.last_probe = None
+        self.message = ''
+        self.attempt = None
+        # 尚未回复的保活探测，每条连接最多一个
+        self.probe: Optional[Future] = None
+
+    def record_rtt(self, rtt: float):
+        self.rtt = rtt
+        # 指数加权平均，平滑偶发抖动
+        self.rtt_avg = rtt if self.rtt_avg is None else 0.8 * self.rtt_avg + 0.2 * rtt
+        self.failures = 0
+        self.status = HEALTH_HEALTHY
+        self.message = ''
+
+    def to_dict(self) -> Dict[str, any]:
+        return {
+            'key': format_key(self.key),
+            'status': self.status,
+            'rtt_ms': round(self.rtt * 1000, 2) if self.rtt is not None else None,
+            'rtt_avg_ms': round(self.rtt_avg * 1000, 2) if self.rtt_avg is not None else None,
+            'consecutive_failures': self.failures,
+            'probes': self.probes,
+            'reconnects': self.reconnects,
+            'last_probe': self.last_probe,
+            'message': self.message
+        }
+
+
+class SSHHealthMonitor:
+    """后台连接健康监控：定期发送保活请求测量时延，发现断开的transport后主动重连"""
+
+    def __init__(self, pool: Optional[SSHConnectionPool] = None, connector: Optional[SSHConnector] = None,
+                 interval: float = DEFAULT_PROBE_INTERVAL, probe_timeout: float = DEFAULT_PROBE_TIMEOUT,
+                 failure_threshold: int = 2, max_workers: int = 4):
+        """
+        初始化健康监控
+
+        Args:
+            pool: SSH连接池（可选，默认使用全局连接池）
+            connector: 后台连接器（可选，默认使用全局连接器）
+            interval: 探测间隔（秒）
+            probe_timeout: 单次探测超时（秒）
+            failure_threshold: 连续无响应多少次后判定连接已断开
+            max_workers: 并发探测线程数（无响应的探测会占用线程，直到连接被判定断开并关闭）
+        """
+        self.pool = pool if pool is not None else ssh_pool
+        self.connector = connector if connector is not None else ssh_connector
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = failure_threshold
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ssh-health')
+        self._health: Dict[tuple, ConnectionHealth] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.pool.add_listener(self._on_pool_event)
+
+    def _record(self, key) -> ConnectionHealth:
+        with self._lock:
+            health = self._health.get(key)
+            if health is None:
+                health = self._health[key] = ConnectionHealth(key)
+            return health
+
+    def _on_pool_event(self, event: str, connection: PooledConnection):
+        if event == 'connected':
+            health = self._record(connection.key)
+            if health.status != HEALTH_RECONNECTING:
+                health.status = HEALTH_HEALTHY
+            self.start()
+        elif event == 'lost':
+            self._reconnect(connection, '检测到连接断开')
+        elif event == 'closed':
+            self.forget(connection.key)
+
+    def start(self):
+        """按需启动后台监控线程"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._loop, name='ssh-health-monitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check_once()
+            except Exception as e:
+                logger.error(f'连接健康检查失败: {str(e)}')
+
+    def check_once(self):
+        """并发探测连接池中的全部连接，并处理重连结果"""
+        checks = []
+        for connection in self.pool.connections():
+            health = self._record(connection.key)
+            if health.probe is None or health.probe.done():
+                health.probe = self._executor.submit(probe_rtt, connection)
+            # 上一次探测仍未回复时不再发送新的探测，继续等待它
+            checks.append((connection, health, health.probe))
+        wait([probe for _, _, probe in checks], timeout=self.probe_timeout)
+        for connection, health, probe in checks:
+            self._check(connection, health, probe)
+        self._update_reconnects()
+
+    def _check(self, connection: PooledConnection, health: ConnectionHealth, probe: Future):
+        if not probe.done() and not probe.running():
+            # 探测线程都被占用，探测尚未开始，留到下一轮判断
+            return
+        rtt = None
+        if probe.done():
+            health.probe = None
+            try:
+                rtt = probe.result()
+            except Exception as e:
+                logger.warning(f'保活请求失败: {format_key(connection.key)}: {str(e)}')
+        health.probes += 1
+        health.last_probe = time.time()
+        if rtt is not None:
+            health.record_rtt(rtt)
+            # 保活成功说明连接可用，刷新使用时间，避免连接池把仍在探测的会话当作空闲连接回收
+            connection.touch()
+            return
+        health.failures += 1
+        transport_dead = not connection.is_healthy()
+        if transport_dead or health.failures >= self.failure_threshold:
+            # 连接已断开或持续无响应，关闭后主动重连
+            self.pool.mark_lost(connection)
+        else:
+            health.status = HEALTH_UNRESPONSIVE
+            health.message = f'保活请求 {self.probe_timeout:.0f} 秒内无响应'
+
+    def _reconnect(self, connection: PooledConnection, reason: str):
+        health = self._record(connection.key)
+        params = connection.connect_params
+        if not params:
+            health.status = HEALTH_DEAD
+            health.message = f'{reason}，缺少连接参数，无法重连'
+            return
+        logger.info(f'{reason}，正在重连: {format_key(connection.key)}')
+        health.status = HEALTH_RECONNECTING
+        health.message = reason
+        health.attempt = self.connector.submit(**params)
+        self.start()
+
+    def _update_reconnects(self):
+        with self._lock:
+            records = [h for h in self._health.values() if h.attempt is not None]
+        for health in records:
+            attempt = health.attempt
+            if attempt.status == CONNECT_PENDING:
+                health.message = attempt.message
+                continue
+            health.attempt = None
+            if attempt.status == CONNECT_CONNECTED:
+                health.reconnects += 1
+                health.failures = 0
+                health.status = HEALTH_HEALTHY
+                health.message = '已自动重连'
+                logger.info(f'已自动重连: {format_key(health.key)}')
+            else:
+                health.status = HEALTH_DEAD
+                health.message = attempt.message
+
+    def status(self, key=None) -> Dict[str, Dict[str, any]]:
+        """
+        获取连接健康状态
+
+        Args:
+            key: 连接池键（可选，默认全部）
+
+        Returns:
+            Dict[str, Dict[str, any]]: user@host:port -> 健康状态
+        """
+        self._update_reconnects()
+        with self._lock:
+            records = [h for h in self._health.values() if key is None or h.key == key]
+        return {format_key(h.key): h.to_dict() for h in records}
+
+    def forget(self, key):
+        """移除连接的健康记录（连接被主动关闭时）"""
+        with self._lock:
+            self._health.pop(key, None)
+
+
+# 全局连接健康监控
+ssh_health = SSHHealthMonitor(ssh_pool, ssh_connector)
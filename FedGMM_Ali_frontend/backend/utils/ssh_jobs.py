@@ -0,0 +1,463 @@
+import asyncio
+import codecs
+import socket
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from backend.utils.async_bridge import AsyncCondition, AsyncBridge, async_bridge, wait_readable
+from backend.utils.metrics import ssh_command_seconds
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_TIMEOUT = 'timeout'
+JOB_CANCELLED = 'cancelled'
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_TIMEOUT, JOB_CANCELLED)
+
+
+class RingBuffer:
+    """有界文本环形缓冲区，使用绝对偏移量定位，超出容量时丢弃最早的内容"""
+
+    def __init__(self, capacity: int = 1024 * 1024):
+        """
+        初始化缓冲区
+
+        Args:
+            capacity: 最大保留字符数
+        """
+        self.capacity = capacity
+        self._chunks = deque()
+        self._size = 0
+        # 缓冲区中第一个字符的绝对偏移量
+        self.start_offset = 0
+
+    @property
+    def end_offset(self) -> int:
+        """已写入内容的总长度（下一个字符的绝对偏移量）"""
+        return self.start_offset + self._size
+
+    def append(self, data: str):
+        """
+        追加内容
+
+        Args:
+            data: 文本
+        """
+        if not data:
+            return
+        self._chunks.append(data)
+        self._size += len(data)
+        while self._size > self.capacity:
+            overflow = self._size - self.capacity
+            head = self._chunks[0]
+            if len(head) <= overflow:
+                self._chunks.popleft()
+                dropped = len(head)
+            else:
+                self._chunks[0] = head[overflow:]
+                dropped = overflow
+            self._size -= dropped
+            self.start_offset += dropped
+
+    def read(self, offset: int = 0, max_chars: Optional[int] = None) -> Tuple[str, int, bool]:
+        """
+        从绝对偏移量开始读取
+
+        Args:
+            offset: 起始偏移量
+            max_chars: 最多读取字符数（可选）
+
+        Returns:
+            Tuple[str, int, bool]: (内容, 下一次读取的偏移量, 是否有内容已被丢弃)
+        """
+        truncated = offset < self.start_offset
+        offset = min(max(offset, self.start_offset), self.end_offset)
+        skip = offset - self.start_offset
+        limit = self.end_offset - offset if max_chars is None else min(max_chars, self.end_offset - offset)
+
+        parts = []
+        remaining = limit
+        for chunk in self._chunks:
+            if remaining <= 0:
+                break
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            piece = chunk[skip:skip + remaining]
+            skip = 0
+            parts.append(piece)
+            remaining -= len(piece)
+        return ''.join(parts), offset + limit, truncated
+
+
+class CommandJob:
+    """一个远程命令任务，输出增量写入环形缓冲区"""
+
+    def __init__(self, command: str, timeout: Optional[float], buffer_size: int):
+        self.job_id = uuid.uuid4().hex
+        self.command = command
+        self.timeout = timeout
+        self.status = JOB_PENDING
+        self.exit_status = None
+        self.error_message = ''
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stdout = RingBuffer(buffer_size)
+        self.stderr = RingBuffer(buffer_size)
+        self._cond = AsyncCondition()
+        self._cancel_event = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def _write(self, stream: RingBuffer, data: str):
+        with self._cond:
+            stream.append(data)
+            self._cond.notify_all()
+
+    def _set_status(self, status: str, exit_status: Optional[int] = None, error_message: str = ''):
+        with self._cond:
+            self.status = status
+            if exit_status is not None:
+                self.exit_status = exit_status
+            if error_message:
+                self.error_message = error_message
+            if status == JOB_RUNNING:
+                self.started_at = time.time()
+            elif status in FINISHED_STATES:
+                self.finished_at = time.time()
+                # 从开始执行（未开始时从提交）计到结束
+                ssh_command_seconds.observe(self.finished_at - (self.started_at or self.created_at),
+                                            mode='job', status=status)
+            self._cond.notify_all()
+
+    def read(self, stdout_offset: int = 0, stderr_offset: int = 0,
+             max_chars: Optional[int] = None) -> Dict[str, any]:
+        """
+        读取指定偏移量之后的输出
+
+        Args:
+            stdout_offset: 标准输出起始偏移量
+            stderr_offset: 标准错误起始偏移量
+            max_chars: 每个流最多读取字符数（可选）
+
+        Returns:
+            Dict[str, any]: 输出内容与下一次读取的偏移量
+        """
+        with self._cond:
+            stdout, next_stdout, stdout_truncated = self.stdout.read(stdout_offset, max_chars)
+            stderr, next_stderr, stderr_truncated = self.stderr.read(stderr_offset, max_chars)
+        return {
+            'stdout': stdout,
+            'stderr': stderr,
+            'stdout_offset': next_stdout,
+            'stderr_offset': next_stderr,
+            'truncated': stdout_truncated or stderr_truncated
+        }
+
+    def wait_for_output(self, stdout_offset: int, stderr_offset: int, timeout: float) -> bool:
+        """
+        等待新输出或任务结束
+
+        Args:
+            stdout_offset: 已读取的标准输出偏移量
+            stderr_offset: 已读取的标准错误偏移量
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            bool: 是否有新输出或任务已结束
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self.finished or self.stdout.end_offset > stdout_offset
+                or self.stderr.end_offset > stderr_offset,
+                timeout=timeout
+            )
+
+    async def wait_for_output_async(self, stdout_offset: int, stderr_offset: int, timeout: float) -> bool:
+        """协程版 wait_for_output，等待期间不占用线程"""
+        return await self._cond.wait_for_async(
+            lambda: self.finished or self.stdout.end_offset > stdout_offset
+            or self.stderr.end_offset > stderr_offset,
+            timeout=timeout
+        )
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待任务结束
+
+        Args:
+            timeout: 最长等待时间（秒，可选）
+
+        Returns:
+            bool: 任务是否已结束
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self.finished, timeout=timeout)
+
+    async def wait_async(self, timeout: Optional[float] = None) -> bool:
+        """协程版 wait，等待期间不占用线程"""
+        return await self._cond.wait_for_async(lambda: self.finished, timeout=timeout)
+
+    def cancel(self):
+        """请求取消任务"""
+        self._cancel_event.set()
+
+    def to_dict(self) -> Dict[str, any]:
+        """
+        获取任务信息
+
+        Returns:
+            Dict[str, any]: 任务信息
+        """
+        return {
+            'job_id': self.job_id,
+            'command': self.command,
+            'status': self.status,
+            'exit_status': self.exit_status,
+            'error_message': self.error_message,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'stdout_offset': self.stdout.end_offset,
+            'stderr_offset': self.stderr.end_offset
+        }
+
+
+class CommandJobManager:
+    """远程命令任务管理器：提交后立即返回任务ID，由工作线程增量读取channel输出"""
+
+    def __init__(self, max_workers: int = 8, max_jobs: int = 200, buffer_size: int = 1024 * 1024,
+                 poll_interval: float = 0.05, bridge: Optional[AsyncBridge] = None):
+        """
+        初始化任务管理器
+
+        Args:
+            max_workers: 工作线程数
+            max_jobs: 保留的任务数（超出时淘汰最早结束的任务）
+            buffer_size: 每个输出流的环形缓冲区大小（字符）
+            poll_interval: channel无数据时的轮询间隔（秒）
+            bridge: 协程任务执行阻塞调用所用的桥接器（可选，默认使用全局桥接器）
+        """
+        self.max_jobs = max_jobs
+        self.buffer_size = buffer_size
+        self.poll_interval = poll_interval
+        self.bridge = bridge if bridge is not None else async_bridge
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ssh-job')
+        self._jobs: 'OrderedDict[str, CommandJob]' = OrderedDict()
+        self._lock = threading.Lock()
+        # 运行中的协程任务（保持引用，避免被垃圾回收）
+        self._tasks = set()
+
+    def submit(self, connection, command: str, timeout: Optional[float] = None) -> CommandJob:
+        """
+        提交远程命令
+
+        Args:
+            connection: 池化SSH连接（PooledConnection）
+            command: 要执行的命令
+            timeout: 命令执行超时时间（秒，可选）
+
+        Returns:
+            CommandJob: 任务对象
+        """
+        job = self._add(command, timeout)
+        self._executor.submit(self._run, connection, job)
+        logger.info(f'已提交命令任务 {job.job_id}: {command}')
+        return job
+
+    def submit_async(self, connection, command: str, timeout: Optional[float] = None) -> CommandJob:
+        """
+        在当前事件循环中提交远程命令：输出由channel的文件描述符驱动读取，不占用工作线程
+
+        Args:
+            connection: 池化SSH连接（PooledConnection）
+            command: 要执行的命令
+            timeout: 命令执行超时时间（秒，可选）
+
+        Returns:
+            CommandJob: 任务对象
+        """
+        job = self._add(command, timeout)
+        task = asyncio.get_running_loop().create_task(self._run_async(connection, job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        logger.info(f'已提交命令任务 {job.job_id}（协程）: {command}')
+        return job
+
+    def _add(self, command: str, timeout: Optional[float]) -> CommandJob:
+        job = CommandJob(command, timeout, self.buffer_size)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[CommandJob]:
+        """获取任务"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Dict[str, any]]:
+        """列出全部任务"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in jobs]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消任务
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            bool: 任务是否存在
+        """
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def _evict(self):
+        """淘汰超出保留数量的已结束任务（调用方需持有 self._lock）"""
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [j.job_id for j in self._jobs.values() if j.finished][:excess]:
+            del self._jobs[job_id]
+
+    def _run(self, connection, job: CommandJob):
+        """工作线程：执行命令并增量读取输出"""
+        connection.acquire()
+        channel = None
+        try:
+            channel = connection.open_channel(timeout=job.timeout)
+            channel.settimeout(self.poll_interval)
+            channel.exec_command(job.command)
+            job._set_status(JOB_RUNNING)
+
+            decoders = (codecs.getincrementaldecoder('utf-8')(errors='replace'),
+                        codecs.getincrementaldecoder('utf-8')(errors='replace'))
+            deadline = time.time() + job.timeout if job.timeout else None
+            while True:
+                if job._cancel_event.is_set():
+                    job._set_status(JOB_CANCELLED, error_message='任务已取消')
+                    return
+                if deadline and time.time() > deadline:
+                    job._set_status(JOB_TIMEOUT, error_message=f'命令执行超时 ({job.timeout}秒)')
+                    return
+
+                got_data = False
+                if channel.recv_ready():
+                    job._write(job.stdout, decoders[0].decode(channel.recv(32768)))
+                    got_data = True
+                if channel.recv_stderr_ready():
+                    job._write(job.stderr, decoders[1].decode(channel.recv_stderr(32768)))
+                    got_data = True
+                if got_data:
+                    continue
+                if channel.exit_status_ready():
+                    break
+                time.sleep(self.poll_interval)
+
+            # 读取剩余输出（退出状态可能先于EOF到达）
+            channel.settimeout(10)
+            for stream, recv, decoder in ((job.stdout, channel.recv, decoders[0]),
+                                          (job.stderr, channel.recv_stderr, decoders[1])):
+                while True:
+                    try:
+                        data = recv(32768)
+                    except socket.timeout:
+                        break
+                    if not data:
+                        break
+                    job._write(stream, decoder.decode(data))
+                job._write(stream, decoder.decode(b'', final=True))
+
+            exit_status = channel.recv_exit_status()
+            if exit_status == 0:
+                job._set_status(JOB_COMPLETED, exit_status)
+            else:
+                job._set_status(JOB_FAILED, exit_status, f'命令执行失败，退出状态码: {exit_status}')
+        except Exception as e:
+            logger.error(f'命令任务 {job.job_id} 执行错误: {str(e)}')
+            job._set_status(JOB_FAILED, error_message=f'执行错误: {str(e)}')
+        finally:
+            if channel is not None:
+                channel.close()
+            connection.release()
+
+    async def _run_async(self, connection, job: CommandJob):
+        """协程：执行命令并在channel可读时增量读取输出"""
+        connection.acquire()
+        channel = None
+        try:
+            # 打开channel与发送exec请求需要等待服务器回复，交给桥接线程池
+            channel = await self.bridge.call(connection.open_channel, timeout=job.timeout)
+            await self.bridge.call(channel.exec_command, job.command)
+            job._set_status(JOB_RUNNING)
+            # 非阻塞读取：无数据时抛出 socket.timeout，EOF 时返回空串
+            channel.settimeout(0.0)
+            fd = channel.fileno()
+
+            decoders = (codecs.getincrementaldecoder('utf-8')(errors='replace'),
+                        codecs.getincrementaldecoder('utf-8')(errors='replace'))
+            streams = [(job.stdout, channel.recv, decoders[0]), (job.stderr, channel.recv_stderr, decoders[1])]
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + job.timeout if job.timeout else None
+            while streams:
+                if job._cancel_event.is_set():
+                    job._set_status(JOB_CANCELLED, error_message='任务已取消')
+                    return
+                if deadline and loop.time() > deadline:
+                    job._set_status(JOB_TIMEOUT, error_message=f'命令执行超时 ({job.timeout}秒)')
+                    return
+
+                got_data = False
+                for item in list(streams):
+                    stream, recv, decoder = item
+                    try:
+                        data = recv(32768)
+                    except socket.timeout:
+                        continue
+                    got_data = True
+                    if data:
+                        job._write(stream, decoder.decode(data))
+                    else:
+                        job._write(stream, decoder.decode(b'', final=True))
+                        streams.remove(item)
+                if not got_data:
+                    # 限制单次等待时长，以便及时响应取消与超时
+                    wait = 1.0 if deadline is None else max(0.0, min(1.0, deadline - loop.time()))
+                    await wait_readable(fd, wait)
+
+            exit_status = channel.recv_exit_status() if channel.exit_status_ready() else \
+                await self.bridge.call(channel.recv_exit_status)
+            if exit_status == 0:
+                job._set_status(JOB_COMPLETED, exit_status)
+            else:
+                job._set_status(JOB_FAILED, exit_status, f'命令执行失败，退出状态码: {exit_status}')
+        except Exception as e:
+            logger.error(f'命令任务 {job.job_id} 执行错误: {str(e)}')
+            job._set_status(JOB_FAILED, error_message=f'执行错误: {str(e)}')
+        finally:
+            if channel is not None:
+                channel.close()
+            connection.release()
+
+
+# 全局任务管理器实例
+command_jobs = CommandJobManager()
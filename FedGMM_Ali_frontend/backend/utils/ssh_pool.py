@@ -0,0 +1,421 @@
+import paramiko
+import hashlib
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+from backend.utils.metrics import ssh_command_seconds
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 连接键：(主机, 端口, 用户名)
+PoolKey = Tuple[str, int, str]
+
+
+def make_key(hostname: str, port: int, username: str) -> PoolKey:
+    """
+    构造连接池键
+
+    Args:
+        hostname: 服务器主机名或IP地址
+        port: SSH端口
+        username: 用户名
+
+    Returns:
+        PoolKey: (主机, 端口, 用户名)
+    """
+    return (hostname, int(port), username)
+
+
+def format_key(key: PoolKey) -> str:
+    """将连接池键格式化为 user@host:port"""
+    return f'{key[2]}@{key[0]}:{key[1]}'
+
+
+def credential_fingerprint(password: Optional[str], key_filename: Optional[str]) -> str:
+    """计算凭证指纹，复用连接前确认凭证一致（不保存明文）"""
+    raw = f'{password or ""}\0{key_filename or ""}'.encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()
+
+
+class PooledConnection:
+    """池中的一条已认证SSH连接，命令在同一transport的多路复用channel上执行"""
+
+    def __init__(self, key: PoolKey, client, fingerprint: str):
+        """
+        初始化池化连接
+
+        Args:
+            key: 连接池键
+            client: 已连接的 paramiko.SSHClient
+            fingerprint: 凭证指纹
+        """
+        self.key = key
+        self.client = client
+        self.fingerprint = fingerprint
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+        self.in_flight = 0
+        # 建立连接时的参数（仅保存在内存中），用于断线后主动重连
+        self.connect_params: Dict[str, any] = {}
+        self._lock = threading.Lock()
+        self._sftp = None
+
+    @property
+    def transport(self):
+        return self.client.get_transport()
+
+    def is_healthy(self) -> bool:
+        """检查transport是否仍然存活且已认证"""
+        transport = self.transport
+        return bool(transport is not None and transport.is_active() and transport.is_authenticated())
+
+    def acquire(self):
+        """标记开始使用连接"""
+        with self._lock:
+            self.in_flight += 1
+            self.last_used = time.time()
+
+    def release(self):
+        """标记结束使用连接"""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.last_used = time.time()
+
+    def touch(self):
+        """保活探测成功：刷新使用与健康检查时间"""
+        with self._lock:
+            self.last_used = self.last_checked = time.time()
+
+    def open_channel(self, timeout: Optional[float] = None):
+        """
+        在已认证的transport上打开新的会话channel（不再握手）
+
+        Args:
+            timeout: 打开channel的超时时间（秒）
+
+        Returns:
+            paramiko.Channel: 会话channel
+        """
+        transport = self.transport
+        if transport is None or not transport.is_active():
+            raise paramiko.SSHException('SSH连接已断开')
+        return transport.open_session(timeout=timeout)
+
+    def sftp(self):
+        """
+        获取该连接上持久的SFTP会话（首次使用时打开，断开后重新打开）
+
+        Returns:
+            paramiko.SFTPClient: SFTP客户端
+        """
+        with self._lock:
+            sftp = self._sftp
+            if sftp is None or sftp.get_channel() is None or sftp.get_channel().closed:
+                sftp = self._sftp = self.client.open_sftp()
+            return sftp
+
+    def exec_command(self, command: str, timeout: Optional[float] = None) -> Tuple[int, str, str]:
+        """
+        在新channel上执行命令并读取全部输出
+
+        Args:
+            command: 要执行的命令
+            timeout: 超时时间（秒）
+
+        Returns:
+            Tuple[int, str, str]: (退出状态码, 标准输出, 标准错误)
+        """
+        self.acquire()
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            channel = self.open_channel(timeout=timeout)
+            try:
+                channel.settimeout(timeout)
+                channel.exec_command(command)
+                stdout = channel.makefile('rb', -1)
+                stderr = channel.makefile_stderr('rb', -1)
+                stdout_content = stdout.read().decode('utf-8', errors='replace')
+                stderr_content = stderr.read().decode('utf-8', errors='replace')
+                exit_status = channel.recv_exit_status()
+                status = 'ok' if exit_status == 0 else 'failed'
+                return exit_status, stdout_content, stderr_content
+            finally:
+                channel.close()
+        finally:
+            ssh_command_seconds.observe(time.perf_counter() - start, mode='exec', status=status)
+            self.release()
+
+    def close(self):
+        """关闭底层连接"""
+        try:
+            if self._sftp is not None:
+                self._sftp.close()
+                self._sftp = None
+            self.client.close()
+        except Exception as e:
+            logger.warning(f'关闭连接 {format_key(self.key)} 时出错: {str(e)}')
+
+
+class SSHConnectionPool:
+    """进程级SSH连接池，按 (主机, 端口, 用户名) 复用已认证的transport"""
+
+    def __init__(self, max_size: int = 16, idle_timeout: float = 600, health_check_interval: float = 30,
+                 client_factory: Callable = paramiko.SSHClient):
+        """
+        初始化连接池
+
+        Args:
+            max_size: 最大连接数
+            idle_timeout: 空闲连接回收时间（秒）
+            health_check_interval: 复用前健康检查的最小间隔（秒）
+            client_factory: SSH客户端工厂（便于测试替换）
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.client_factory = client_factory
+        self._connections: Dict[PoolKey, PooledConnection] = {}
+        self._lock = threading.RLock()
+        # 每个键一把锁，避免同一主机并发重复握手
+        self._key_locks: Dict[PoolKey, threading.Lock] = {}
+        self._reaper = None
+        self._stop_event = threading.Event()
+        # 连接事件监听器：callback(event, connection)，event 为 connected、lost 或 closed
+        self._listeners: List[Callable] = []
+
+    def add_listener(self, callback: Callable):
+        """
+        注册连接事件监听器
+
+        Args:
+            callback: 回调函数 callback(event, connection)；connected 表示新建连接，lost 表示检测到连接断开，
+                closed 表示连接被主动关闭
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, event: str, connection: 'PooledConnection'):
+        for callback in list(self._listeners):
+            try:
+                callback(event, connection)
+            except Exception as e:
+                logger.error(f'连接事件回调出错: {str(e)}')
+
+    def _key_lock(self, key: PoolKey) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def connect(self, hostname: str, username: str, password: Optional[str] = None,
+                key_filename: Optional[str] = None, port: int = 22, timeout: int = 30) -> PooledConnection:
+        """
+        获取到指定主机的连接：凭证一致且健康时复用，否则新建并认证
+
+        Args:
+            hostname: 服务器主机名或IP地址
+            username: 用户名
+            password: 密码（可选）
+            key_filename: 私钥文件路径（可选）
+            port: SSH端口
+            timeout: 连接超时时间（秒）
+
+        Returns:
+            PooledConnection: 已认证的连接
+
+        Raises:
+            paramiko.AuthenticationException: 认证失败
+            paramiko.SSHException / OSError: 连接失败
+        """
+        key = make_key(hostname, port, username)
+        fingerprint = credential_fingerprint(password, key_filename)
+
+        with self._key_lock(key):
+            existing = self.get(key, force_check=True)
+            if existing is not None and existing.fingerprint == fingerprint:
+                logger.info(f'复用连接池中的连接: {format_key(key)}')
+                return existing
+            if existing is not None:
+                # 凭证变化，重新认证
+                self.close(key)
+
+            client = self.client_factory()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            client.connect(
+                hostname=hostname,
+                username=username,
+                password=password,
+                key_filename=key_filename,
+                port=port,
+                timeout=timeout,
+                look_for_keys=False
+            )
+            connection = PooledConnection(key, client, fingerprint)
+            connection.connect_params = dict(hostname=hostname, username=username, password=password,
+                                             key_filename=key_filename, port=port, timeout=timeout)
+
+            with self._lock:
+                self._make_room()
+                self._connections[key] = connection
+            self._ensure_reaper()
+            logger.info(f'连接池新建连接: {format_key(key)}，当前连接数: {len(self._connections)}')
+        self._notify('connected', connection)
+        return connection
+
+    def get(self, key: PoolKey, force_check: bool = False) -> Optional[PooledConnection]:
+        """
+        获取池中已存在的健康连接
+
+        Args:
+            key: 连接池键
+            force_check: 是否忽略检查间隔立即做健康检查
+
+        Returns:
+            Optional[PooledConnection]: 连接，不存在或已断开时返回None
+        """
+        with self._lock:
+            connection = self._connections.get(key)
+        if connection is None:
+            return None
+
+        now = time.time()
+        if force_check or now - connection.last_checked >= self.health_check_interval:
+            connection.last_checked = now
+            if not connection.is_healthy():
+                self.mark_lost(connection)
+                return None
+        return connection
+
+    def _remove(self, key: PoolKey, connection: PooledConnection) -> bool:
+        with self._lock:
+            removed = self._connections.get(key) is connection
+            if removed:
+                del self._connections[key]
+        connection.close()
+        return removed
+
+    def mark_lost(self, connection: PooledConnection):
+        """
+        移除已断开的连接并通知监听器（以便主动重连）
+
+        Args:
+            connection: 已断开的连接
+        """
+        if self._remove(connection.key, connection):
+            logger.warning(f'连接已断开，从连接池移除: {format_key(connection.key)}')
+            self._notify('lost', connection)
+
+    def _make_room(self):
+        """连接数达到上限时，关闭最久未使用的空闲连接（调用方需持有 self._lock）"""
+        while len(self._connections) >= self.max_size:
+            idle = [c for c in self._connections.values() if c.in_flight == 0]
+            candidates = idle or list(self._connections.values())
+            victim = min(candidates, key=lambda c: c.last_used)
+            logger.info(f'连接池已满，淘汰连接: {format_key(victim.key)}')
+            del self._connections[victim.key]
+            victim.close()
+
+    def close(self, key: PoolKey) -> bool:
+        """
+        关闭并移除指定连接
+
+        Args:
+            key: 连接池键
+
+        Returns:
+            bool: 是否存在并已关闭
+        """
+        with self._lock:
+            connection = self._connections.pop(key, None)
+        if connection is None:
+            return False
+        connection.close()
+        logger.info(f'已关闭连接池中的连接: {format_key(key)}')
+        self._notify('closed', connection)
+        return True
+
+    def close_all(self):
+        """关闭全部连接并停止回收线程"""
+        self._stop_event.set()
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            connection.close()
+
+    def evict_idle(self) -> int:
+        """
+        回收空闲超时或已断开的连接
+
+        Returns:
+            int: 回收的连接数
+        """
+        now = time.time()
+        with self._lock:
+            connections = list(self._connections.values())
+        lost = [c for c in connections if not c.is_healthy()]
+        for connection in lost:
+            self.mark_lost(connection)
+        with self._lock:
+            victims = [
+                c for c in self._connections.values()
+                if c.in_flight == 0 and now - c.last_used >= self.idle_timeout
+            ]
+            for connection in victims:
+                del self._connections[connection.key]
+        for connection in victims:
+            logger.info(f'回收空闲连接: {format_key(connection.key)}')
+            connection.close()
+            self._notify('closed', connection)
+        return len(victims) + len(lost)
+
+    def _ensure_reaper(self):
+        """按需启动后台回收线程"""
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._stop_event.clear()
+            self._reaper = threading.Thread(target=self._reap_loop, name='ssh-pool-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1.0, min(self.idle_timeout, 60))
+        while not self._stop_event.wait(interval):
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.error(f'回收空闲连接失败: {str(e)}')
+
+    def connections(self) -> List[PooledConnection]:
+        """获取池中全部连接的快照"""
+        with self._lock:
+            return list(self._connections.values())
+
+    def stats(self) -> List[Dict[str, any]]:
+        """
+        获取连接池中各连接的状态
+
+        Returns:
+            List[Dict[str, any]]: 连接状态列表
+        """
+        now = time.time()
+        with self._lock:
+            connections = list(self._connections.values())
+        return [{
+            'key': format_key(c.key),
+            'in_flight': c.in_flight,
+            'idle_seconds': round(now - c.last_used, 1),
+            'age_seconds': round(now - c.created_at, 1)
+        } for c in connections]
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+
+# 全局连接池实例
+ssh_pool = SSHConnectionPool()
@@ -0,0 +1,397 @@
+import codecs
+import itertools
+import math
+import os
+import random
+import shlex
+import subprocess
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from backend.utils.job_queue import FINISHED_STATUSES, training_queue
+from backend.utils.log_tail import TrainingLogParser
+from backend.utils.training_monitor import training_monitors
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 允许扫描的训练参数
+SWEEP_PARAMS = ('rounds', 'gamma', 'tau', 'compression', 'adaptive', 'personalization')
+# 单次扫描的最大配置数
+MAX_SWEEP_CONFIGS = 256
+# 本地执行器的工作目录与日志目录，可通过环境变量覆盖
+LOCAL_TRAIN_DIR = os.environ.get('LOCAL_TRAIN_DIR', os.getcwd())
+LOCAL_SWEEP_LOG_DIR = os.environ.get('LOCAL_SWEEP_LOG_DIR', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'sweeps'))
+
+
+def expand_grid(grid: Dict[str, List[any]]) -> List[Dict[str, any]]:
+    """
+    展开参数网格（笛卡尔积）
+
+    Args:
+        grid: 参数名到候选值列表的映射
+
+    Returns:
+        List[Dict[str, any]]: 参数组合列表
+
+    Raises:
+        ValueError: 参数不支持或组合数超过上限
+    """
+    _check_params(grid)
+    names = sorted(grid)
+    values = [grid[name] if isinstance(grid[name], list) else [grid[name]] for name in names]
+    total = math.prod(len(v) for v in values)
+    if total > MAX_SWEEP_CONFIGS:
+        raise ValueError(f'参数组合数 {total} 超过上限 {MAX_SWEEP_CONFIGS}')
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def sample_random(space: Dict[str, any], n: int, seed: Optional[int] = None) -> List[Dict[str, any]]:
+    """
+    随机搜索采样
+
+    Args:
+        space: 参数空间；列表表示从候选值中选取，{'min', 'max', 'log'} 表示在区间内（对数）均匀采样，
+            {'min', 'max', 'int': true} 表示整数区间
+        n: 采样数量
+        seed: 随机种子（可选）
+
+    Returns:
+        List[Dict[str, any]]: 参数组合列表
+    """
+    _check_params(space)
+    if not 0 < n <= MAX_SWEEP_CONFIGS:
+        raise ValueError(f'采样数量必须在 1 到 {MAX_SWEEP_CONFIGS} 之间')
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name in sorted(space):
+            spec = space[name]
+            if isinstance(spec, list):
+                config[name] = rng.choice(spec)
+            elif spec.get('int'):
+                config[name] = rng.randint(int(spec['min']), int(spec['max']))
+            elif spec.get('log'):
+                config[name] = round(math.exp(rng.uniform(math.log(spec['min']), math.log(spec['max']))), 6)
+            else:
+                config[name] = round(rng.uniform(spec['min'], spec['max']), 6)
+        configs.append(config)
+    return configs
+
+
+def _check_params(params: Dict[str, any]):
+    unknown = [name for name in params if name not in SWEEP_PARAMS]
+    if unknown:
+        raise ValueError(f'不支持扫描的参数: {", ".join(unknown)}')
+
+
+def pack_hosts(count: int, loads: List[Dict[str, any]]) -> List[int]:
+    """
+    把任务装箱到主机：每次分配给 (已有任务数 / 槽位数) 最小的主机
+
+    Args:
+        count: 任务数
+        loads: 各主机负载，包含 slots 与 active（运行中和排队中的任务数）
+
+    Returns:
+        List[int]: 每个任务分配到的主机下标
+    """
+    active = [load['active'] for load in loads]
+    slots = [max(1, load['slots']) for load in loads]
+    assignment = []
+    for _ in range(count):
+        index = min(range(len(loads)), key=lambda i: (active[i] / slots[i], i))
+        active[index] += 1
+        assignment.append(index)
+    return assignment
+
+
+class LocalRun:
+    """本地执行器中的一次训练"""
+
+    def __init__(self, run_id: str, command: str, log_file: str):
+        self.run_id = run_id
+        self.command = command
+        self.log_file = log_file
+        self.status = 'queued'
+        self.message = ''
+        self.process = None
+        self.parser = TrainingLogParser()
+        self.offset = 0
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """增量读取本地日志"""
+        with self._lock:
+            try:
+                with open(self.log_file, 'rb') as f:
+                    f.seek(self.offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return
+            self.offset += len(data)
+            self.parser.feed(self._decoder.decode(data))
+
+
+class LocalTrainingExecutor:
+    """本地训练执行器：用有界线程池并发运行训练子进程，并发数默认等于CPU核数"""
+
+    def __init__(self, max_workers: Optional[int] = None, work_dir: str = LOCAL_TRAIN_DIR,
+                 log_dir: str = LOCAL_SWEEP_LOG_DIR):
+        """
+        初始化本地执行器
+
+        Args:
+            max_workers: 最大并发训练数（默认CPU核数）
+            work_dir: 训练命令的工作目录
+            log_dir: 日志目录
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.work_dir = work_dir
+        self.log_dir = log_dir
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='local-train')
+        self._runs: Dict[str, LocalRun] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, command: str, log_name: str) -> LocalRun:
+        """
+        提交本地训练
+
+        Args:
+            command: 训练命令
+            log_name: 日志文件名
+
+        Returns:
+            LocalRun: 本地训练
+        """
+        os.makedirs(self.log_dir, exist_ok=True)
+        run = LocalRun(uuid.uuid4().hex, command, os.path.join(self.log_dir, log_name))
+        with self._lock:
+            self._runs[run.run_id] = run
+        self._executor.submit(self._run, run)
+        return run
+
+    def _run(self, run: LocalRun):
+        if run.status == 'cancelled':
+            return
+        try:
+            with open(run.log_file, 'wb') as log:
+                run.process = subprocess.Popen(shlex.split(run.command), cwd=self.work_dir, stdout=log,
+                                               stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+                if run.status == 'cancelled':
+                    run.process.terminate()
+                else:
+                    run.status = 'running'
+                exit_status = run.process.wait()
+            run.refresh()
+            if run.status == 'cancelled':
+                return
+            if exit_status == 0 and not run.parser.error:
+                run.status = 'completed'
+            else:
+                run.status = 'failed'
+                run.message = run.parser.error_message or f'退出状态码: {exit_status}'
+        except Exception as e:
+            run.status = 'failed'
+            run.message = str(e)
+
+    def get(self, run_id: str) -> Optional[LocalRun]:
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def cancel(self, run_id: str) -> bool:
+        """取消排队中的训练或终止运行中的子进程"""
+        run = self.get(run_id)
+        if run is None:
+            return False
+        if run.status in ('queued', 'running'):
+            run.status = 'cancelled'
+            if run.process is not None and run.process.poll() is None:
+                run.process.terminate()
+        return True
+
+
+class Sweep:
+    """一次超参数扫描"""
+
+    def __init__(self, base: Dict[str, any], executor: str):
+        self.sweep_id = uuid.uuid4().hex
+        self.base = base
+        self.executor = executor
+        self.trials: List[Dict[str, any]] = []
+        self.created_at = time.time()
+
+
+class SweepLauncher:
+    """把参数组合展开为训练任务，装箱到远程主机（经训练队列）或本地执行器，并汇总成可比较的结果表"""
+
+    def __init__(self, queue=None, monitors=None, local_executor: Optional[LocalTrainingExecutor] = None,
+                 max_sweeps: int = 50):
+        """
+        初始化扫描启动器
+
+        Args:
+            queue: 训练任务队列（可选，默认使用全局队列）
+            monitors: 训练监控注册表（可选，默认使用全局注册表）
+            local_executor: 本地执行器（可选，首次使用时创建）
+            max_sweeps: 保留的扫描记录数
+        """
+        self.queue = queue if queue is not None else training_queue
+        self.monitors = monitors if monitors is not None else training_monitors
+        self._local_executor = local_executor
+        self.max_sweeps = max_sweeps
+        self._sweeps: 'OrderedDict[str, Sweep]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def local_executor(self) -> LocalTrainingExecutor:
+        with self._lock:
+            if self._local_executor is None:
+                self._local_executor = LocalTrainingExecutor()
+            return self._local_executor
+
+    def launch(self, base: Dict[str, any], trials: List[Dict[str, any]], hosts: Optional[List] = None,
+               executor: str = 'hosts', priority: int = 0) -> Sweep:
+        """
+        启动扫描
+
+        Args:
+            base: 基础训练参数
+            trials: 每个配置的 {'params', 'command'}
+            hosts: 远程主机的连接池键列表（executor 为 hosts 时必填）
+            executor: hosts（远程主机）或 local（本地执行器）
+            priority: 队列优先级
+
+        Returns:
+            Sweep: 扫描记录
+        """
+        sweep = Sweep(base, executor)
+        if executor == 'local':
+            for i, trial in enumerate(trials):
+                run = self.local_executor.submit(trial['command'], f'sweep_{sweep.sweep_id[:8]}_{i}.log')
+                sweep.trials.append(dict(trial, run_id=run.run_id))
+        elif executor == 'hosts':
+            if not hosts:
+                raise ValueError('没有可用的主机')
+            loads = [self.queue.host_load(key) for key in hosts]
+            for trial, index in zip(trials, pack_hosts(len(trials), loads)):
+                log_file = f"sweep_{sweep.sweep_id[:8]}_{len(sweep.trials)}.log"
+                job = self.queue.submit(hosts[index], trial['command'], log_file, priority=priority,
+                                        params=dict(trial['params'], sweep_id=sweep.sweep_id))
+                sweep.trials.append(dict(trial, job_id=job['job_id']))
+        else:
+            raise ValueError(f'不支持的执行器: {executor}')
+
+        with self._lock:
+            self._sweeps[sweep.sweep_id] = sweep
+            while len(self._sweeps) > self.max_sweeps:
+                self._sweeps.popitem(last=False)
+        return sweep
+
+    def get(self, sweep_id: str) -> Optional[Sweep]:
+        with self._lock:
+            return self._sweeps.get(sweep_id)
+
+    def _trial_state(self, trial: Dict[str, any]) -> Dict[str, any]:
+        if 'run_id' in trial:
+            run = self.local_executor.get(trial['run_id'])
+            run.refresh()
+            return {'status': run.status, 'message': run.message, 'host': 'local',
+                    'parser': run.parser, 'log_file': run.log_file}
+
+        job = self.queue.get(trial['job_id'])
+        state = {'status': job['status'], 'message': job['message'], 'host': job['host'],
+                 'parser': None, 'log_file': job['log_file']}
+        if job['status'] not in ('queued', 'dispatching', 'cancelled'):
+            key = (job['hostname'], job['port'], job['username'])
+            monitor = self.monitors.get(key, job['log_file'], pid=job['pid'])
+            if monitor.tailer is not None:
+                state['parser'] = monitor.tailer.parser
+        return state
+
+    def results(self, sweep: Sweep, sort_by: Optional[str] = None, descending: bool = True) -> Dict[str, any]:
+        """
+        汇总扫描结果表：每个配置一行，包含参数、状态、进度与最后一轮指标
+
+        Args:
+            sweep: 扫描记录
+            sort_by: 排序字段（参数名或指标名，可选）
+            descending: 是否降序
+
+        Returns:
+            Dict[str, any]: 结果表
+        """
+        rows = []
+        for i, trial in enumerate(sweep.trials):
+            state = self._trial_state(trial)
+            parser = state['parser']
+            rows.append({
+                'trial': i,
+                'params': trial['params'],
+                'status': state['status'],
+                'host': state['host'],
+                'log_file': state['log_file'],
+                'progress': parser.progress if parser else 0,
+                'metrics': dict(parser.last_metrics) if parser else {},
+                'message': state['message']
+            })
+
+        if sort_by:
+            def sort_value(row):
+                return row['metrics'].get(sort_by, row['params'].get(sort_by))
+
+            # 排序字段可能是字符串参数（如 city），不能取负；数值与字符串分组比较，缺失值始终排在最后
+            present = [row for row in rows if sort_value(row) is not None]
+            present.sort(key=lambda row: (isinstance(sort_value(row), str), sort_value(row)), reverse=descending)
+            rows = present + [row for row in rows if sort_value(row) is None]
+
+        columns = sorted({name for row in rows for name in row['params']})
+        metric_columns = sorted({name for row in rows for name in row['metrics']})
+        counts = {}
+        for row in rows:
+            counts[row['status']] = counts.get(row['status'], 0) + 1
+        finished = all(row['status'] in FINISHED_STATUSES for row in rows)
+        return {
+            'sweep_id': sweep.sweep_id,
+            'executor': sweep.executor,
+            'base': sweep.base,
+            'finished': finished,
+            'counts': counts,
+            'param_columns': columns,
+            'metric_columns': metric_columns,
+            'rows': rows
+        }
+
+    def cancel(self, sweep: Sweep) -> int:
+        """
+        取消扫描中尚未结束的全部任务
+
+        Returns:
+            int: 取消的任务数
+        """
+        cancelled = 0
+        for trial in sweep.trials:
+            if 'run_id' in trial:
+                run = self.local_executor.get(trial['run_id'])
+                if run.status in ('queued', 'running'):
+                    self.local_executor.cancel(trial['run_id'])
+                    cancelled += 1
+            else:
+                job = self.queue.get(trial['job_id'])
+                if job['status'] not in FINISHED_STATUSES:
+                    self.queue.cancel(trial['job_id'])
+                    cancelled += 1
+        return cancelled
+
+
+# 全局超参数扫描启动器
+sweep_launcher = SweepLauncher()
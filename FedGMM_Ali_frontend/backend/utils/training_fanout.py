@@ -0,0 +1,228 @@
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from backend.utils.ssh_pool import format_key, ssh_pool
+from backend.utils.ssh_connector import CONNECT_CONNECTED, ssh_connector
+from backend.utils.job_queue import FINISHED_STATUSES, JOB_QUEUED, JOB_DISPATCHING, training_queue
+from backend.utils.training_monitor import training_monitors
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 分片状态：连接主机中、已提交到训练队列、连接或提交失败
+SHARD_LAUNCHING = 'launching'
+SHARD_SUBMITTED = 'submitted'
+SHARD_FAILED = 'failed'
+
+
+def assign_shards(cities: List[str], hosts: List[Dict[str, any]]) -> List[tuple]:
+    """
+    按轮询方式把城市分配到主机（城市数不多于主机数时即每台主机一个城市）
+
+    Args:
+        cities: 城市列表
+        hosts: 主机连接参数列表
+
+    Returns:
+        List[tuple]: (城市, 主机参数) 列表
+    """
+    if not hosts:
+        raise ValueError('主机列表为空')
+    return [(city, hosts[i % len(hosts)]) for i, city in enumerate(cities)]
+
+
+class TrainingShard:
+    """扇出训练中运行在某台主机上的一个分片"""
+
+    def __init__(self, city: str, host: Dict[str, any], command: str, log_file: str):
+        self.city = city
+        self.host = host
+        self.command = command
+        self.log_file = log_file
+        self.key = None
+        self.job_id = None
+        self.status = SHARD_LAUNCHING
+        self.message = ''
+
+    @property
+    def target(self) -> str:
+        if self.key is not None:
+            return format_key(self.key)
+        return f"{self.host.get('username')}@{self.host.get('hostname')}:{self.host.get('port', 22)}"
+
+
+class FanoutRun:
+    """一次多主机扇出训练"""
+
+    def __init__(self, shards: List[TrainingShard]):
+        self.run_id = uuid.uuid4().hex
+        self.shards = shards
+        self.created_at = time.time()
+        self.launched = threading.Event()
+
+
+class TrainingFanout:
+    """
+    把训练分片（如每台主机一个城市）并发提交到多台主机，并汇总各主机的训练状态
+
+    各分片连接主机后提交到训练队列，由队列按主机槽位派发，可在 /train/queue 中查看并通过 /train/stop 停止
+    """
+
+    def __init__(self, pool=None, connector=None, monitors=None, queue=None, max_workers: int = 16,
+                 max_runs: int = 50):
+        """
+        初始化扇出启动器
+
+        Args:
+            pool: SSH连接池（可选，默认使用全局连接池）
+            connector: 后台连接器（可选，默认使用全局连接器）
+            monitors: 训练监控注册表（可选，默认使用全局注册表）
+            queue: 训练任务队列（可选，默认使用全局队列）
+            max_workers: 并发连接线程数
+            max_runs: 保留的扇出记录数
+        """
+        self.pool = pool if pool is not None else ssh_pool
+        self.connector = connector if connector is not None else ssh_connector
+        self.monitors = monitors if monitors is not None else training_monitors
+        self.queue = queue if queue is not None else training_queue
+        self.max_runs = max_runs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='train-fanout')
+        self._runs: 'OrderedDict[str, FanoutRun]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def launch(self, shards: List[TrainingShard], connect_timeout: float = 60) -> FanoutRun:
+        """
+        并发连接各主机并把分片提交到训练队列，立即返回
+
+        Args:
+            shards: 训练分片
+            connect_timeout: 等待单台主机连接的最长时间（秒）
+
+        Returns:
+            FanoutRun: 扇出记录
+        """
+        run = FanoutRun(shards)
+        with self._lock:
+            self._runs[run.run_id] = run
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+
+        futures = [self._executor.submit(self._launch_shard, run, shard, connect_timeout) for shard in shards]
+
+        def mark_launched():
+            for future in futures:
+                future.exception()
+            run.launched.set()
+        threading.Thread(target=mark_launched, daemon=True).start()
+        return run
+
+    def _launch_shard(self, run: FanoutRun, shard: TrainingShard, connect_timeout: float):
+        try:
+            host = shard.host
+            attempt = self.connector.submit(
+                hostname=host['hostname'],
+                username=host['username'],
+                password=host.get('password'),
+                key_filename=host.get('key_filename'),
+                port=host.get('port', 22),
+                timeout=host.get('timeout', 30),
+                max_retries=host.get('max_retries', 3)
+            )
+            shard.key = attempt.key
+            if not attempt.wait(connect_timeout) or attempt.status != CONNECT_CONNECTED:
+                raise ConnectionError(attempt.message)
+            if self.pool.get(attempt.key) is None:
+                raise ConnectionError('SSH连接已断开')
+
+            job = self.queue.submit(shard.key, shard.command, shard.log_file,
+                                    params={'fanout_id': run.run_id, 'city': shard.city})
+            shard.job_id = job['job_id']
+            shard.status = SHARD_SUBMITTED
+            shard.message = '训练任务已提交到队列'
+            logger.info(f'分片 {shard.city} 已提交到 {shard.target} 的训练队列，任务ID: {shard.job_id}')
+        except Exception as e:
+            shard.status = SHARD_FAILED
+            shard.message = str(e)
+            logger.error(f'分片 {shard.city} 在 {shard.target} 启动失败: {str(e)}')
+
+    def get(self, run_id: str) -> Optional[FanoutRun]:
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def status(self, run: FanoutRun, timeout: float = 10) -> Dict[str, any]:
+        """
+        汇总扇出训练状态：各主机进度、最慢主机与失败分片
+
+        Args:
+            run: 扇出记录
+            timeout: 等待各分片首次轮询的最长时间（秒）
+
+        Returns:
+            Dict[str, any]: 汇总状态
+        """
+        jobs = {id(shard): self.queue.get(shard.job_id) for shard in run.shards if shard.job_id}
+        # 先让所有已派发分片的监控线程运行起来，再逐个读取缓存状态
+        monitors = {}
+        for shard in run.shards:
+            job = jobs.get(id(shard))
+            if job is not None and job['status'] not in (JOB_QUEUED, JOB_DISPATCHING) and job['pid'] is not None:
+                monitors[id(shard)] = self.monitors.get(shard.key, shard.log_file, pid=job['pid'])
+
+        deadline = time.time() + timeout
+        hosts, failures = [], []
+        for shard in run.shards:
+            job = jobs.get(id(shard))
+            item = {'city': shard.city, 'host': shard.target, 'log_file': shard.log_file, 'job_id': shard.job_id,
+                    'pid': None, 'launch_status': shard.status, 'status': shard.status, 'progress': 0,
+                    'current_round': None, 'total_rounds': None, 'message': shard.message}
+            if job is not None:
+                item.update({'pid': job['pid'], 'status': job['status'], 'message': job['message']})
+            monitor = monitors.get(id(shard))
+            if monitor is not None:
+                # 队列中已结束（完成、失败或被停止）的任务以队列状态为准，只从监控读取进度
+                active = job['status'] not in FINISHED_STATUSES
+                snapshot = monitor.read(timeout=max(0.0, deadline - time.time()))
+                if snapshot is None or not snapshot['success']:
+                    if active:
+                        item['status'] = 'unknown'
+                        item['message'] = snapshot['message'] if snapshot else '获取训练状态超时'
+                else:
+                    item.update({k: snapshot[k] for k in ('progress', 'current_round', 'total_rounds')})
+                    if active:
+                        item['status'] = snapshot['status']
+                        item['message'] = snapshot['error_message']
+            if item['status'] in (SHARD_FAILED, 'error'):
+                failures.append(item)
+            hosts.append(item)
+
+        running = [item for item in hosts if item['status'] == 'running']
+        slowest = min(running, key=lambda item: item['progress']) if running else None
+        if not run.launched.is_set() or any(item['status'] == SHARD_LAUNCHING for item in hosts):
+            overall = SHARD_LAUNCHING
+        elif any(item['status'] not in FINISHED_STATUSES + (SHARD_FAILED, 'error') for item in hosts):
+            # 仍有分片在排队、派发或运行（含状态未知）
+            overall = 'running'
+        elif failures:
+            overall = 'failed'
+        else:
+            overall = 'cancelled' if any(item['status'] == 'cancelled' for item in hosts) else 'completed'
+
+        return {
+            'run_id': run.run_id,
+            'status': overall,
+            'progress': int(sum(item['progress'] for item in hosts) / len(hosts)) if hosts else 0,
+            'hosts': hosts,
+            'slowest': slowest,
+            'failures': failures,
+            'created_at': run.created_at
+        }
+
+
+# 全局扇出启动器
+training_fanout = TrainingFanout()
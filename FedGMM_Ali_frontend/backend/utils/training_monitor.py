@@ -0,0 +1,432 @@
+import os
+import threading
+import time
+import uuid
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from backend.utils.async_bridge import AsyncCondition
+from backend.utils.log_tail import LogTailer, log_tailers
+from backend.utils.metric_series import metric_series
+from backend.utils.ssh_pool import ssh_pool
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 默认轮询间隔（秒），可通过环境变量覆盖
+DEFAULT_POLL_INTERVAL = float(os.environ.get('TRAIN_STATUS_POLL_INTERVAL', 2))
+# 客户端可请求的最长轮询间隔（秒）；最短为注册表的默认间隔
+MAX_POLL_INTERVAL = 30
+# 无人查看多久后停止监控（秒）
+DEFAULT_IDLE_TIMEOUT = float(os.environ.get('TRAIN_STATUS_IDLE_TIMEOUT', 60))
+# 每个监控器保留的增量事件数（用于断线续传）
+DEFAULT_MAX_EVENTS = 2000
+# 未记录PID的旧任务使用的进程检测命令（[t] 避免匹配到执行检测的shell自身）
+PROCESS_CHECK_COMMAND = 'pgrep -f "[t]rain.py"'
+
+
+def launch_training(connection, command: str, log_file: str) -> int:
+    """
+    在远程主机后台启动训练并返回其PID
+
+    训练进程经 setsid 成为新进程组的组长，进程组ID即PID，停止时可终止整个进程组。
+
+    Args:
+        connection: 池化SSH连接
+        command: 训练命令
+        log_file: 远程日志文件路径
+
+    Returns:
+        int: 训练进程PID（同时也是进程组ID）
+
+    Raises:
+        RuntimeError: 启动失败
+    """
+    exit_status, stdout, stderr = connection.exec_command(
+        f'nohup setsid {command} > {log_file} 2>&1 < /dev/null & echo $!', timeout=30)
+    pid = stdout.strip()
+    if exit_status != 0 or not pid.isdigit():
+        raise RuntimeError(f'命令执行失败，退出状态码: {exit_status}, 错误: {stderr}')
+    return int(pid)
+
+
+def process_alive(connection, pid: int) -> bool:
+    """
+    通过一次 /proc 探测远程进程是否仍在运行
+
+    与 kill -0 等价，但把尚未被回收的僵尸进程视为已退出。
+    """
+    exit_status, stdout, stderr = connection.exec_command(
+        f"awk '/^State:/ {{exit ($2 == \"Z\")}}' /proc/{int(pid)}/status 2>/dev/null", timeout=30)
+    return exit_status == 0
+
+
+def kill_process_group(connection, pgid: int, sig: str = 'TERM') -> bool:
+    """
+    终止远程进程组
+
+    Args:
+        connection: 池化SSH连接
+        pgid: 进程组ID
+        sig: 信号名
+
+    Returns:
+        bool: 是否成功发送信号（进程组已不存在时返回False）
+    """
+    exit_status, stdout, stderr = connection.exec_command(f'kill -s {sig} -- -{int(pgid)}', timeout=30)
+    return exit_status == 0
+
+
+def poll_training_status(connection, tailer: LogTailer, pid: Optional[int] = None) -> Dict[str, any]:
+    """
+    轮询一次训练状态：增量读取日志，必要时检测进程
+
+    Args:
+        connection: 池化SSH连接
+        tailer: 日志跟踪器
+        pid: 训练进程PID（可选，未记录时按进程名检测）
+
+    Returns:
+        Dict[str, any]: 训练状态
+
+    Raises:
+        FileNotFoundError: 日志文件不存在
+    """
+    generation = tailer.generation
+    new_lines, bytes_read = tailer.poll()
+    state = tailer.parser.to_dict()
+    state['new_lines'] = new_lines
+    state['metrics'] = tailer.parser.drain_metrics()
+    state['reset'] = tailer.generation != generation
+
+    # 日志仍在增长说明进程在运行；无新内容且未出现结束标记时才检查进程
+    if state['status'] == 'running' and bytes_read == 0:
+        if pid is not None:
+            running = process_alive(connection, pid)
+        else:
+            exit_status, stdout, stderr = connection.exec_command(PROCESS_CHECK_COMMAND, timeout=30)
+            running = bool(stdout.strip())
+        if not running:
+            # 进程不在运行，但日志中没有错误信息，视为已完成
+            state['status'] = 'completed'
+
+    state['log_content'] = tailer.parser.log_content()
+    state['offset'] = tailer.offset
+    return state
+
+
+class TrainingMonitor:
+    """单个训练任务的后台监控线程：按固定间隔轮询远程主机并缓存最新状态"""
+
+    def __init__(self, pool, key, log_file: str, interval: float = DEFAULT_POLL_INTERVAL,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT, pid: Optional[int] = None):
+        """
+        初始化监控器
+
+        Args:
+            pool: SSH连接池
+            key: 连接池键
+            log_file: 远程日志文件路径
+            interval: 轮询间隔（秒）
+            idle_timeout: 无人读取状态多久后停止（秒）
+            pid: 训练进程PID（可选）
+        """
+        self.pool = pool
+        self.key = key
+        self.log_file = log_file
+        self.pid = pid
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.tailer: Optional[LogTailer] = None
+        self.snapshot: Optional[Dict[str, any]] = None
+        self.poll_count = 0
+        self.last_read = time.time()
+        # 增量事件日志：(序号, 事件类型, 数据)，序号前缀为监控器ID以便续传时识别
+        self.monitor_id = uuid.uuid4().hex[:8]
+        self.events = deque(maxlen=DEFAULT_MAX_EVENTS)
+        self.event_seq = 0
+        self._cond = AsyncCondition()
+        self._stop_event = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=f'train-monitor-{log_file}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    @property
+    def alive(self) -> bool:
+        return self._thread.is_alive() and not self._stopped
+
+    @property
+    def finished(self) -> bool:
+        """训练任务是否已结束（完成或出错）"""
+        snapshot = self.snapshot
+        return bool(snapshot and snapshot.get('success') and snapshot['status'] != 'running')
+
+    def _poll_once(self) -> Dict[str, any]:
+        connection = self.pool.get(self.key)
+        if connection is None:
+            raise ConnectionError('SSH未连接，请先连接到服务器')
+        # 日志跟踪器在连接重建后沿用原偏移量与解析状态
+        self.tailer = log_tailers.get(connection, self.log_file)
+        return poll_training_status(connection, self.tailer, self.pid)
+
+    def _publish(self, snapshot: Dict[str, any]):
+        snapshot['updated_at'] = time.time()
+        new_lines = snapshot.pop('new_lines', [])
+        metrics = snapshot.pop('metrics', [])
+        reset = snapshot.pop('reset', False)
+        series = metric_series.get(self.key, self.log_file)
+        if reset:
+            series.clear()
+        for item in metrics:
+            series.append(item, snapshot['updated_at'])
+        with self._cond:
+            previous = self.snapshot
+            self.snapshot = snapshot
+            self.poll_count += 1
+            if snapshot.get('success'):
+                if reset:
+                    self._add_event('reset', self._state_event(snapshot, with_log=True))
+                if new_lines:
+                    self._add_event('log', {'lines': new_lines, 'offset': snapshot['offset']})
+                for item in metrics:
+                    self._add_event('metrics', item)
+                if previous is None or not previous.get('success') or any(
+                        previous.get(k) != snapshot[k] for k in ('status', 'progress', 'error_message')):
+                    self._add_event('progress', self._state_event(snapshot))
+            self._cond.notify_all()
+
+    @staticmethod
+    def _state_event(snapshot: Dict[str, any], with_log: bool = False) -> Dict[str, any]:
+        keys = ['status', 'progress', 'error', 'error_message', 'current_round', 'total_rounds', 'offset']
+        if with_log:
+            keys.append('log_content')
+        return {k: snapshot.get(k) for k in keys}
+
+    def _add_event(self, event_type: str, data: Dict[str, any]):
+        """追加增量事件（调用方需持有 self._cond）"""
+        self.event_seq += 1
+        self.events.append((self.event_seq, event_type, data))
+
+    def event_id(self, seq: int) -> str:
+        """构造SSE事件ID"""
+        return f'{self.monitor_id}-{seq}'
+
+    def parse_event_id(self, event_id: Optional[str]) -> Optional[int]:
+        """
+        解析客户端的 Last-Event-ID
+
+        Args:
+            event_id: 事件ID
+
+        Returns:
+            Optional[int]: 可续传时返回事件序号，否则返回None
+        """
+        if not event_id or '-' not in event_id:
+            return None
+        monitor_id, _, seq = event_id.partition('-')
+        if monitor_id != self.monitor_id or not seq.isdigit():
+            return None
+        seq = int(seq)
+        with self._cond:
+            # 所需事件已被丢弃时无法续传
+            if seq > self.event_seq or (self.events and seq < self.events[0][0] - 1):
+                return None
+        return seq
+
+    def events_after(self, seq: int, timeout: float) -> List[Tuple[int, str, Dict[str, any]]]:
+        """
+        等待并返回序号大于 seq 的事件
+
+        Args:
+            seq: 已收到的最后一个事件序号
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            List[Tuple[int, str, Dict[str, any]]]: 事件列表
+        """
+        self.last_read = time.time()
+        with self._cond:
+            self._cond.wait_for(lambda: self.event_seq > seq or not self.alive, timeout=timeout)
+            return [event for event in self.events if event[0] > seq]
+
+    async def events_after_async(self, seq: int, timeout: float) -> List[Tuple[int, str, Dict[str, any]]]:
+        """协程版 events_after，等待期间不占用线程"""
+        self.last_read = time.time()
+        await self._cond.wait_for_async(lambda: self.event_seq > seq or not self.alive, timeout=timeout)
+        with self._cond:
+            return [event for event in self.events if event[0] > seq]
+
+    def snapshot_event(self) -> Tuple[int, Dict[str, any]]:
+        """
+        获取当前完整状态及其对应的事件序号
+
+        Returns:
+            Tuple[int, Dict[str, any]]: (事件序号, 状态)
+        """
+        with self._cond:
+            snapshot = self.snapshot or {}
+            data = self._state_event(snapshot, with_log=True) if snapshot.get('success') else \
+                {'error': True, 'message': snapshot.get('message', '')}
+            return self.event_seq, data
+
+    def _run(self):
+        try:
+            self._loop()
+        finally:
+            self._stopped = True
+            with self._cond:
+                self._cond.notify_all()
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            try:
+                snapshot = self._poll_once()
+                snapshot['success'] = True
+            except FileNotFoundError as e:
+                snapshot = {'success': False, 'not_found': True, 'message': f'日志文件不存在: {str(e)}'}
+            except Exception as e:
+                snapshot = {'success': False, 'message': f'获取训练状态错误: {str(e)}'}
+            self._publish(snapshot)
+
+            if snapshot.get('success') and snapshot['status'] != 'running':
+                logger.info(f'训练任务已结束（{snapshot["status"]}），停止监控: {self.log_file}')
+                break
+            if time.time() - self.last_read > self.idle_timeout:
+                logger.info(f'训练状态长时间无人查看，停止监控: {self.log_file}')
+                break
+            self._stop_event.wait(self.interval)
+
+    def read(self, timeout: float = 30) -> Optional[Dict[str, any]]:
+        """
+        读取缓存的最新状态（首次读取时等待第一次轮询完成）
+
+        Args:
+            timeout: 等待首次轮询的最长时间（秒）
+
+        Returns:
+            Optional[Dict[str, any]]: 状态快照，超时返回None
+        """
+        self.last_read = time.time()
+        with self._cond:
+            self._cond.wait_for(lambda: self.snapshot is not None, timeout=timeout)
+            return dict(self.snapshot) if self.snapshot is not None else None
+
+    async def read_async(self, timeout: float = 30) -> Optional[Dict[str, any]]:
+        """协程版 read，等待首次轮询期间不占用线程"""
+        self.last_read = time.time()
+        await self._cond.wait_for_async(lambda: self.snapshot is not None, timeout=timeout)
+        with self._cond:
+            return dict(self.snapshot) if self.snapshot is not None else None
+
+    def wait_for_update(self, poll_count: int, timeout: float) -> int:
+        """
+        等待下一次轮询结果
+
+        Args:
+            poll_count: 调用方已看到的轮询次数
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            int: 当前轮询次数
+        """
+        self.last_read = time.time()
+        with self._cond:
+            self._cond.wait_for(lambda: self.poll_count > poll_count or not self.alive, timeout=timeout)
+            return self.poll_count
+
+
+class TrainingMonitorRegistry:
+    """每个 (连接, 日志文件) 只运行一个监控线程，所有查看者共享其缓存状态"""
+
+    def __init__(self, pool, interval: float = DEFAULT_POLL_INTERVAL, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        """
+        初始化注册表
+
+        Args:
+            pool: SSH连接池
+            interval: 默认轮询间隔（秒）
+            idle_timeout: 默认空闲停止时间（秒）
+        """
+        self.pool = pool
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self._monitors: Dict[Tuple, TrainingMonitor] = {}
+        # 已知的训练进程PID，监控线程重建时沿用
+        self._pids: Dict[Tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, log_file: str, interval: Optional[float] = None, pid: Optional[int] = None,
+            create: bool = True) -> Optional[TrainingMonitor]:
+        """
+        获取监控器；不存在或已停止时启动新的监控线程
+
+        Args:
+            key: 连接池键
+            log_file: 远程日志文件路径
+            interval: 轮询间隔（秒，可选，通常来自客户端，限制在默认间隔与 MAX_POLL_INTERVAL 之间）
+            pid: 训练进程PID（可选，记录后用 kill -0 检测进程）
+            create: 监控器不存在或已停止时是否新建并启动；为False时只返回已有的监控器（可能为None）
+
+        Returns:
+            Optional[TrainingMonitor]: 监控器
+        """
+        interval = self._clamp_interval(interval)
+        with self._lock:
+            if pid is not None:
+                self._pids[(key, log_file)] = pid
+            pid = self._pids.get((key, log_file))
+            monitor = self._monitors.get((key, log_file))
+            if not create:
+                return monitor
+            if monitor is not None and (monitor.alive or monitor.finished):
+                # 任务已结束时沿用最终状态，不再启动轮询
+                if interval:
+                    monitor.interval = interval
+                monitor.pid = pid
+                return monitor
+            monitor = TrainingMonitor(self.pool, key, log_file, interval or self.interval, self.idle_timeout, pid)
+            self._monitors[(key, log_file)] = monitor
+            monitor.start()
+            return monitor
+
+    def _clamp_interval(self, interval) -> Optional[float]:
+        """监控器由所有查看者共享，单个查看者不能让它比默认间隔更频繁地轮询远程主机"""
+        try:
+            interval = float(interval) if interval else None
+        except (TypeError, ValueError):
+            return None
+        if interval is None:
+            return None
+        return min(max(interval, self.interval), max(MAX_POLL_INTERVAL, self.interval))
+
+    def remove(self, key, log_file: str):
+        """停止并移除监控器（例如同名日志的新任务启动时）"""
+        with self._lock:
+            monitor = self._monitors.pop((key, log_file), None)
+            self._pids.pop((key, log_file), None)
+            metric_series.remove(key, log_file)
+        if monitor is not None:
+            monitor.stop()
+
+    def list(self):
+        """列出全部监控器的状态"""
+        with self._lock:
+            monitors = list(self._monitors.values())
+        return [{
+            'log_file': m.log_file,
+            'pid': m.pid,
+            'alive': m.alive,
+            'interval': m.interval,
+            'poll_count': m.poll_count
+        } for m in monitors]
+
+
+# 全局训练监控注册表
+training_monitors = TrainingMonitorRegistry(ssh_pool)
@@ -0,0 +1,9 @@
+"""WSGI入口：gunicorn -c backend/gunicorn.conf.py backend.wsgi:app"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app import create_app
+
+app = create_app()
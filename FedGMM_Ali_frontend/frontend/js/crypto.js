@@ -284,6 +284,15 @@ const SecureClient = {
         serverPublicKey: null
     },
     
+    // 加密会话（握手后请求只需AES加密，服务器不再做RSA运算）
+    session: {
+        id: null,
+        key: null,
+        ttl: 0,
+        expiresAt: 0,
+        pendingKey: null
+    },
+    
     // 初始化加密客户端
     async init() {
         try {
@@ -319,19 +328,94 @@ const SecureClient = {
         }
     },
     
-    // 生成加密的请求数据
-    async encryptRequest(data, isSSH = false) {
+    // 生成会话握手请求：用服务器公钥加密新的AES会话密钥
+    async createSessionHandshake() {
         try {
-            // 检查服务器公钥是否已设置
             if (!this.keys.serverPublicKey) {
                 throw new Error('服务器公钥未设置');
             }
             
+            const sessionKey = await CryptoUtils.generateAESKey();
+            const sessionKeyExported = await CryptoUtils.exportAESKey(sessionKey);
+            const encryptedKey = await CryptoUtils.rsaEncrypt(this.keys.serverPublicKey, sessionKeyExported);
+            this.session.pendingKey = sessionKey;
+            
+            return {
+                message_id: CryptoUtils.generateMessageId(),
+                encryption: {
+                    key_algorithm: 'RSA-OAEP',
+                    encrypted_key: encryptedKey
+                },
+                timestamp: Date.now(),
+                version: '1.0'
+            };
+        } catch (error) {
+            console.error('生成会话握手请求失败:', error);
+            throw new Error(`生成会话握手请求失败: ${error.message}`);
+        }
+    },
+    
+    // 握手成功后启用会话
+    setSession(sessionId, expiresIn) {
+        if (!sessionId || !this.session.pendingKey) {
+            throw new Error('会话信息不完整');
+        }
+        this.session.id = sessionId;
+        this.session.key = this.session.pendingKey;
+        this.session.pendingKey = null;
+        this.session.ttl = expiresIn * 1000;
+        this.session.expiresAt = Date.now() + this.session.ttl;
+    },
+    
+    // 清除会话（会话过期时退回每次请求RSA加密密钥的方式）
+    clearSession() {
+        this.session = { id: null, key: null, ttl: 0, expiresAt: 0, pendingKey: null };
+    },
+    
+    // 会话是否可用
+    hasSession() {
+        return !!this.session.id && Date.now() < this.session.expiresAt;
+    },
+    
+    // 使用会话密钥生成加密请求
+    async encryptSessionRequest(data, isSSH = false) {
+        const encryptedData = await CryptoUtils.aesEncrypt(this.session.key, JSON.stringify(data));
+        // 服务器每次使用会话后顺延有效期
+        this.session.expiresAt = Date.now() + this.session.ttl;
+        return {
+            message_id: CryptoUtils.generateMessageId(),
+            encryption: {
+                algorithm: 'AES-GCM',
+                session_id: this.session.id,
+                iv: encryptedData.iv
+            },
+            data: {
+                type: isSSH ? 'ssh_credentials' : 'regular',
+                content: encryptedData.ciphertext
+            },
+            timestamp: Date.now(),
+            version: '1.0'
+        };
+    },
+    
+    // 生成加密的请求数据
+    async encryptRequest(data, isSSH = false) {
+        try {
             // 验证数据格式
             if (data === null || data === undefined) {
                 throw new Error('加密数据不能为空');
             }
             
+            // 已建立会话时只需对称加密
+            if (this.hasSession()) {
+                return await this.encryptSessionRequest(data, isSSH);
+            }
+            
+            // 检查服务器公钥是否已设置
+            if (!this.keys.serverPublicKey) {
+                throw new Error('服务器公钥未设置');
+            }
+            
             // 生成AES密钥
             const aesKey = await CryptoUtils.generateAESKey();
             this.keys.aesKey = aesKey;
@@ -393,22 +477,24 @@ const SecureClient = {
                 throw new Error('响应数据不完整');
             }
             
-            // 提取加密信息
+            // 提取加密信息（服务器响应的IV位于 encryption 字段中）
             const content = encryptedResponse.data.content;
-            const iv = content.iv;
-            const ciphertext = content.ciphertext;
+            const encryption = encryptedResponse.encryption || {};
+            const iv = typeof content === 'string' ? encryption.iv : content.iv;
+            const ciphertext = typeof content === 'string' ? content : content.ciphertext;
             
             if (!iv || !ciphertext) {
                 throw new Error('缺少加密信息');
             }
             
-            // 检查AES密钥是否存在
-            if (!this.keys.aesKey) {
+            // 会话响应使用会话密钥，否则使用最近一次请求的AES密钥
+            const aesKey = encryption.session_id ? this.session.key : this.keys.aesKey;
+            if (!aesKey) {
                 throw new Error('AES密钥未设置');
             }
             
             // 使用AES密钥解密数据
-            const decryptedData = await CryptoUtils.aesDecrypt(this.keys.aesKey, ciphertext, iv);
+            const decryptedData = await CryptoUtils.aesDecrypt(aesKey, ciphertext, iv);
             
             // 解析JSON数据
             try {
@@ -422,6 +508,93 @@ const SecureClient = {
         }
     },
     
+    // 解密分块加密流（服务器 X-Encryption: AES-GCM-STREAM 响应），onChunk 可接收逐块解出的文本
+    async decryptStream(response, onChunk = null) {
+        if (!this.session.key) {
+            throw new Error('加密会话未建立');
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        const headerSize = 12;
+        let buffer = new Uint8Array(0);
+        let prefix = null;
+        let counter = 0;
+        let finished = false;
+        let text = '';
+        
+        const append = (chunk) => {
+            const merged = new Uint8Array(buffer.length + chunk.length);
+            merged.set(buffer);
+            merged.set(chunk, buffer.length);
+            buffer = merged;
+        };
+        const frameParams = (final) => {
+            const nonce = new Uint8Array(12);
+            nonce.set(prefix);
+            const aad = new Uint8Array(5);
+            const view = new DataView(nonce.buffer);
+            view.setUint32(8, counter);
+            new DataView(aad.buffer).setUint32(0, counter);
+            aad[4] = final ? 1 : 0;
+            return { name: 'AES-GCM', iv: nonce, additionalData: aad };
+        };
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (value) {
+                append(value);
+            }
+            if (prefix === null && buffer.length >= headerSize) {
+                if (new TextDecoder().decode(buffer.slice(0, 4)) !== 'FGS1') {
+                    throw new Error('无效的加密流头部');
+                }
+                prefix = buffer.slice(4, headerSize);
+                buffer = buffer.slice(headerSize);
+            }
+            while (prefix !== null && buffer.length >= 4) {
+                if (finished) {
+                    // 结束帧之后不应再有任何帧，可能是拼接或注入的数据
+                    throw new Error('加密流结束后仍有数据');
+                }
+                const length = new DataView(buffer.buffer, buffer.byteOffset).getUint32(0);
+                if (buffer.length < 4 + length) {
+                    break;
+                }
+                const ciphertext = buffer.slice(4, 4 + length);
+                buffer = buffer.slice(4 + length);
+                let plaintext = null;
+                for (const final of [false, true]) {
+                    try {
+                        plaintext = await window.crypto.subtle.decrypt(frameParams(final), this.session.key, ciphertext);
+                        finished = final;
+                        break;
+                    } catch (error) {
+                        // 认证失败时按结束帧再试一次
+                    }
+                }
+                if (plaintext === null) {
+                    throw new Error('加密帧认证失败');
+                }
+                counter += 1;
+                const chunkText = decoder.decode(plaintext, { stream: !finished });
+                text += chunkText;
+                if (onChunk && chunkText) {
+                    onChunk(chunkText);
+                }
+            }
+            if (done) {
+                break;
+            }
+        }
+        if (!finished) {
+            throw new Error('加密流被截断');
+        }
+        if (buffer.length > 0) {
+            throw new Error('加密流结束后仍有数据');
+        }
+        return JSON.parse(text);
+    },
+    
     // 重置加密状态
     reset() {
         this.keys = {
@@ -430,6 +603,7 @@ const SecureClient = {
             aesKey: null,
             serverPublicKey: null
         };
+        this.clearSession();
         console.log('加密客户端状态已重置');
     },
     
@@ -438,7 +612,8 @@ const SecureClient = {
         return {
             initialized: !!this.keys.privateKey,
             serverPublicKeySet: !!this.keys.serverPublicKey,
-            hasAesKey: !!this.keys.aesKey
+            hasAesKey: !!this.keys.aesKey,
+            hasSession: this.hasSession()
         };
     }
 };
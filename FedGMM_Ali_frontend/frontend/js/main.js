@@ -31,7 +31,15 @@ const Utils = {
                 }
             }
             
-            const response = await fetch(`${API_BASE_URL}${endpoint}`, config);
+            let response = await fetch(`${API_BASE_URL}${endpoint}`, config);
+            
+            // 加密会话过期：重新握手后重试一次
+            if (encrypt && data && response.status === 401 && SecureClient.hasSession()) {
+                SecureClient.clearSession();
+                await this.openEncryptionSession();
+                config.body = JSON.stringify(await SecureClient.encryptRequest(data, isSSH));
+                response = await fetch(`${API_BASE_URL}${endpoint}`, config);
+            }
             
             if (!response.ok) {
                 throw new Error(`API请求失败: ${response.status}`);
@@ -51,6 +59,33 @@ const Utils = {
         }
     },
     
+    // 以加密流方式获取大体量数据（需已建立加密会话，未建立时退回普通请求）
+    async fetchEncryptedStream(endpoint, onChunk = null, retried = false) {
+        if (!SecureClient.hasSession()) {
+            return await this.fetchAPI(endpoint);
+        }
+        const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+            headers: { 'X-Session-Id': SecureClient.session.id },
+            credentials: 'include'
+        });
+        if (response.status === 401) {
+            // 加密会话过期：重新握手后重试一次，仍被拒绝时退回普通请求
+            SecureClient.clearSession();
+            if (retried) {
+                return await this.fetchAPI(endpoint);
+            }
+            await this.openEncryptionSession();
+            return await this.fetchEncryptedStream(endpoint, onChunk, true);
+        }
+        if (!response.ok) {
+            throw new Error(`API请求失败: ${response.status}`);
+        }
+        if (response.headers.get('X-Encryption') !== 'AES-GCM-STREAM') {
+            return await response.json();
+        }
+        return await SecureClient.decryptStream(response, onChunk);
+    },
+    
     // 显示加载状态
     showLoading(element) {
         element.innerHTML = '<div class="loading-container"><div class="loading"></div></div>';
@@ -166,6 +201,7 @@ const Utils = {
             if (response.success) {
                 const serverPublicKey = response.public_key;
                 await SecureClient.setServerPublicKey(serverPublicKey);
+                await this.openEncryptionSession();
                 console.log('加密系统初始化成功');
             }
         } catch (error) {
@@ -174,6 +210,19 @@ const Utils = {
         }
     },
     
+    // 建立加密会话，失败时退回每次请求单独加密密钥的方式
+    async openEncryptionSession() {
+        try {
+            const handshake = await SecureClient.createSessionHandshake();
+            const response = await this.fetchAPI('/system/session', 'POST', handshake);
+            if (response.success) {
+                SecureClient.setSession(response.session_id, response.expires_in);
+            }
+        } catch (error) {
+            console.error('建立加密会话失败:', error);
+        }
+    },
+    
     // 初始化导航菜单
     initNavigation() {
         const navLinks = document.querySelectorAll('.nav a');
@@ -221,7 +270,7 @@ const DataLoader = {
             }
             
             const queryString = params.toString() ? `?${params.toString()}` : '';
-            const response = await Utils.fetchAPI(`/communication/data${queryString}`);
+            const response = await Utils.fetchEncryptedStream(`/communication/data${queryString}`);
             return response;
         } catch (error) {
             console.error('加载通信数据失败:', error);
@@ -242,7 +291,7 @@ const DataLoader = {
             }
             
             const queryString = params.toString() ? `?${params.toString()}` : '';
-            const response = await Utils.fetchAPI(`/adaptive/data${queryString}`);
+            const response = await Utils.fetchEncryptedStream(`/adaptive/data${queryString}`);
             return response;
         } catch (error) {
             console.error('加载自适应迭代数据失败:', error);
@@ -262,7 +311,7 @@ const DataLoader = {
             }
             
             const queryString = params.toString() ? `?${params.toString()}` : '';
-            const response = await Utils.fetchAPI(`/personalization/data${queryString}`);
+            const response = await Utils.fetchEncryptedStream(`/personalization/data${queryString}`);
             return response;
         } catch (error) {
             console.error('加载个性化权重数据失败:', error);
@@ -0,0 +1,247 @@
+"""本地SSH替身：命令在本机 /bin/sh 中执行，用于在没有远程主机时测试SSH相关逻辑"""
+import os
+import socket
+import subprocess
+import time
+import threading
+import paramiko
+
+
+class FakeChannel:
+    """模拟 paramiko.Channel，后台线程持续读取本地子进程输出"""
+
+    def __init__(self):
+        self.closed = False
+        self.timeout = None
+        self._proc = None
+        self._stdout = bytearray()
+        self._stderr = bytearray()
+        self._cond = threading.Condition()
+        self._eof = [False, False]
+        # 与 paramiko 相同：fileno() 返回的管道在有输出或EOF时可读
+        self._pipe = None
+        self._pipe_set = False
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def exec_command(self, command):
+        self._proc = subprocess.Popen(['/bin/sh', '-c', command], stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE, stdin=subprocess.DEVNULL)
+        threading.Thread(target=self._pump, args=(self._proc.stdout, self._stdout, 0), daemon=True).start()
+        threading.Thread(target=self._pump, args=(self._proc.stderr, self._stderr, 1), daemon=True).start()
+
+    def _pump(self, pipe, buffer, index):
+        while True:
+            data = pipe.read1(4096)
+            with self._cond:
+                if not data:
+                    self._eof[index] = True
+                else:
+                    buffer.extend(data)
+                self._update_pipe()
+                self._cond.notify_all()
+                if not data:
+                    return
+
+    def _update_pipe(self):
+        """同步管道可读状态（调用方需持有 self._cond）"""
+        if self._pipe is None:
+            return
+        ready = bool(self._stdout) or bool(self._stderr) or any(self._eof)
+        if ready and not self._pipe_set:
+            os.write(self._pipe[1], b'*')
+            self._pipe_set = True
+        elif not ready and self._pipe_set:
+            os.read(self._pipe[0], 1)
+            self._pipe_set = False
+
+    def fileno(self):
+        with self._cond:
+            if self._pipe is None:
+                self._pipe = os.pipe()
+                self._update_pipe()
+            return self._pipe[0]
+
+    def _recv(self, buffer, index, nbytes):
+        with self._cond:
+            if not self._cond.wait_for(lambda: buffer or self._eof[index], timeout=self.timeout):
+                raise socket.timeout()
+            data = bytes(buffer[:nbytes])
+            del buffer[:nbytes]
+            self._update_pipe()
+            return data
+
+    def recv(self, nbytes):
+        return self._recv(self._stdout, 0, nbytes)
+
+    def recv_stderr(self, nbytes):
+        return self._recv(self._stderr, 1, nbytes)
+
+    def recv_ready(self):
+        with self._cond:
+            return bool(self._stdout)
+
+    def recv_stderr_ready(self):
+        with self._cond:
+            return bool(self._stderr)
+
+    def exit_status_ready(self):
+        with self._cond:
+            finished = all(self._eof)
+        return finished and self._proc.poll() is not None
+
+    def recv_exit_status(self):
+        with self._cond:
+            self._cond.wait_for(lambda: all(self._eof))
+        return self._proc.wait()
+
+    def makefile(self, mode='rb', bufsize=-1):
+        return _FakeFile(self.recv)
+
+    def makefile_stderr(self, mode='rb', bufsize=-1):
+        return _FakeFile(self.recv_stderr)
+
+    def close(self):
+        self.closed = True
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.kill()
+        with self._cond:
+            if self._pipe is not None:
+                for fd in self._pipe:
+                    os.close(fd)
+                self._pipe = None
+
+
+class _FakeFile:
+    def __init__(self, recv):
+        self._recv = recv
+
+    def read(self):
+        chunks = []
+        while True:
+            data = self._recv(65536)
+            if not data:
+                return b''.join(chunks)
+            chunks.append(data)
+
+
+class FakeTransport:
+    """模拟 paramiko.Transport"""
+
+    def __init__(self):
+        self.active = True
+        self.sessions_opened = 0
+        self.keepalives = 0
+        self.global_requests = 0
+        # 保活请求的模拟时延（秒）与是否不回复
+        self.latency = 0
+        self.hang = False
+
+    def is_active(self):
+        return self.active
+
+    def is_authenticated(self):
+        return self.active
+
+    def open_session(self, timeout=None):
+        if not self.active:
+            raise paramiko.SSHException('transport closed')
+        self.sessions_opened += 1
+        return FakeChannel()
+
+    def send_ignore(self, byte_count=None):
+        if not self.active:
+            raise paramiko.SSHException('transport closed')
+        self.keepalives += 1
+
+    def global_request(self, kind, data=None, wait=True):
+        if not self.active:
+            raise paramiko.SSHException('transport closed')
+        self.global_requests += 1
+        while self.hang and self.active:
+            time.sleep(0.01)
+        time.sleep(self.latency)
+        return None
+
+    def set_keepalive(self, interval):
+        pass
+
+    def close(self):
+        self.active = False
+
+
+class FakeSFTPClient:
+    """模拟 paramiko.SFTPClient，直接操作本地文件系统"""
+
+    def __init__(self):
+        self.channel = FakeChannel()
+        self.open_count = 0
+
+    def get_channel(self):
+        return self.channel
+
+    def stat(self, path):
+        return os.stat(path)
+
+    def listdir_attr(self, path='.'):
+        if not os.path.isdir(path):
+            raise IOError(f'No such file: {path}')
+        return [paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(path, name)), name)
+                for name in sorted(os.listdir(path))]
+
+    def open(self, path, mode='r', bufsize=-1):
+        self.open_count += 1
+        return open(path, mode)
+
+    def close(self):
+        self.channel.closed = True
+
+
+class FakeSSHClient:
+    """模拟 paramiko.SSHClient；通过类属性控制连接失败或认证失败"""
+
+    # 连接次数（握手次数）
+    connect_count = 0
+    # 设置为异常实例时 connect 抛出该异常
+    fail_with = None
+    # 只接受该密码（None表示接受任意密码）
+    accepted_password = None
+    # 连接这些主机时抛出 OSError（模拟不可达）
+    unreachable_hosts = set()
+
+    def __init__(self):
+        self.transport = None
+
+    @classmethod
+    def reset(cls):
+        cls.connect_count = 0
+        cls.fail_with = None
+        cls.accepted_password = None
+        cls.unreachable_hosts = set()
+
+    def set_missing_host_key_policy(self, policy):
+        pass
+
+    def connect(self, hostname, username=None, password=None, key_filename=None, port=22,
+                timeout=None, look_for_keys=True, **kwargs):
+        type(self).connect_count += 1
+        if type(self).fail_with is not None:
+            raise type(self).fail_with
+        if hostname in type(self).unreachable_hosts:
+            raise OSError(f'{hostname} unreachable')
+        if type(self).accepted_password is not None and password != type(self).accepted_password:
+            raise paramiko.AuthenticationException('bad password')
+        self.transport = FakeTransport()
+
+    def get_transport(self):
+        return self.transport
+
+    def open_sftp(self):
+        if self.transport is None or not self.transport.active:
+            raise paramiko.SSHException('transport closed')
+        return FakeSFTPClient()
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
@@ -47,6 +47,18 @@ class TestAPI(unittest.TestCase):
         self.assertIn('data', data)
         self.assertIn('statistics', data)
     
+    def test_personalization_responsibility(self):
+        """测试个性化责任度API"""
+        test_data = {
+            'features': [[0.0, 0.0, 0.0, 0.0], [1.0, -1.0, 0.5, 2.0]],
+            'client_id': 1
+        }
+        response = self.app.post('/api/personalization/responsibility', json=test_data)
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(len(data['responsibilities']), 2)
+        self.assertIn('statistics', data)
+    
     def test_recommendation_generate(self):
         """测试推荐生成API"""
         test_data = {
@@ -62,6 +74,17 @@ class TestAPI(unittest.TestCase):
         self.assertIn('user_id', data)
         self.assertIn('top_k', data)
     
+    def test_recommendation_negative_values(self):
+        """测试负数用户ID可正常生成推荐，负数top_k按切片语义去掉末尾的推荐"""
+        response = self.app.post('/api/recommendation/generate', json={'city': '北京', 'user_id': -1, 'top_k': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()['recommendations']), 5)
+        full = self.app.post('/api/recommendation/generate', json={'city': '北京', 'user_id': 1, 'top_k': 100})
+        total = len(full.get_json()['recommendations'])
+        response = self.app.post('/api/recommendation/generate', json={'city': '北京', 'user_id': 1, 'top_k': -2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()['recommendations']), total - 2)
+    
     def test_recommendation_compare(self):
         """测试多城市推荐对比API"""
         test_data = {
@@ -0,0 +1,299 @@
+import unittest
+import sys
+import os
+import json
+import base64
+import tempfile
+import shutil
+from unittest import mock
+
+# 添加项目根目录及后端目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'FedGMM_Ali_frontend'))
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding as rsa_padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from backend.utils import crypto_utils
+from backend.utils.crypto_utils import CryptoUtils, SecureServer, SessionStore, StreamEncryptor, StreamDecryptor, decrypt_stream
+
+def encrypt_like_frontend(public_key, data, key_algorithm='RSA-OAEP'):
+    """按 crypto.js 的格式构造加密请求：RSA封装base64编码的AES密钥，AES-GCM密文末尾附加标签"""
+    aes_key = AESGCM.generate_key(bit_length=256)
+    iv = os.urandom(12)
+    exported = base64.b64encode(aes_key)
+    if key_algorithm == 'RSA-OAEP':
+        wrap = rsa_padding.OAEP(mgf=rsa_padding.MGF1(hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+    else:
+        wrap = rsa_padding.PKCS1v15()
+    ciphertext = AESGCM(aes_key).encrypt(iv, json.dumps(data).encode('utf-8'), None)
+    return {
+        'message_id': 'msg-1',
+        'encryption': {
+            'algorithm': f'{key_algorithm}-AES-GCM',
+            'key_algorithm': key_algorithm,
+            'encrypted_key': base64.b64encode(public_key.encrypt(exported, wrap)).decode('utf-8'),
+            'iv': base64.b64encode(iv).decode('utf-8')
+        },
+        'data': {'type': 'ssh_credentials', 'content': base64.b64encode(ciphertext).decode('utf-8')},
+        'timestamp': 0,
+        'version': '1.0'
+    }, aes_key, iv
+
+class TestRSABackends(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.key_dir = tempfile.mkdtemp()
+        cls.openssl = CryptoUtils(key_dir=cls.key_dir, backend='openssl')
+        cls.public_key = cls.openssl.backend.private_key.public_key()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.key_dir)
+
+    def test_backends_share_key_files(self):
+        """测试两个后端读取同一PKCS#1密钥文件，解密结果一致"""
+        python = CryptoUtils(key_dir=self.key_dir, backend='python')
+        self.assertEqual(python.get_public_key_pem(), self.openssl.get_public_key_pem())
+        payload = base64.b64encode(self.public_key.encrypt(b'secret', rsa_padding.PKCS1v15())).decode('utf-8')
+        self.assertEqual(python.rsa_decrypt(payload), 'secret')
+        self.assertEqual(self.openssl.rsa_decrypt(payload), 'secret')
+
+    def test_python_backend_rejects_oaep(self):
+        """测试纯Python后端不支持OAEP填充"""
+        python = CryptoUtils(key_dir=self.key_dir, backend='python')
+        with self.assertRaises(ValueError):
+            python.rsa_decrypt(base64.b64encode(b'x' * 256).decode('utf-8'), 'oaep')
+
+    def test_incomplete_backend_rejected(self):
+        """测试未实现全部方法的后端在实例化时即报错"""
+        class IncompleteBackend(crypto_utils.RSABackend):
+            def public_pem(self):
+                return b''
+
+        with self.assertRaises(TypeError):
+            IncompleteBackend()
+
+    def test_decrypt_frontend_request(self):
+        """测试解密 crypto.js 格式（RSA-OAEP + AES-GCM）的请求"""
+        server = SecureServer.__new__(SecureServer)
+        server.crypto = self.openssl
+        request, _, _ = encrypt_like_frontend(self.public_key, {'hostname': 'h', 'username': 'u'})
+        result = server.decrypt_request(request)
+        self.assertEqual(result['data'], {'hostname': 'h', 'username': 'u'})
+        self.assertEqual(result['data_type'], 'ssh_credentials')
+
+    def test_served_public_key_imports_as_spki(self):
+        """测试 /public-key 返回的PEM可按 crypto.js 的方式（截去头尾后按spki导入）使用"""
+        from backend.app import app
+        from backend.utils.crypto_utils import secure_server
+        pem = app.test_client().get('/api/system/public-key').get_json()['public_key']
+        header, footer = '-----BEGIN PUBLIC KEY-----', '-----END PUBLIC KEY-----'
+        self.assertEqual(pem.count('-----BEGIN'), 1)
+        public_key = serialization.load_der_public_key(base64.b64decode(pem[len(header):len(pem) - len(footer)]))
+        request, _, _ = encrypt_like_frontend(public_key, {'hostname': 'h', 'username': 'u'})
+        self.assertEqual(secure_server.decrypt_request(request)['data'], {'hostname': 'h', 'username': 'u'})
+
+    def test_tampered_ciphertext_rejected(self):
+        """测试AES-GCM密文被篡改时认证失败"""
+        server = SecureServer.__new__(SecureServer)
+        server.crypto = self.openssl
+        request, _, _ = encrypt_like_frontend(self.public_key, {'a': 1}, key_algorithm='RSA-PKCS1')
+        content = bytearray(base64.b64decode(request['data']['content']))
+        content[0] ^= 1
+        request['data']['content'] = base64.b64encode(bytes(content)).decode('utf-8')
+        with self.assertRaises(ValueError):
+            server.decrypt_request(request)
+
+    def test_encrypt_response_appends_tag(self):
+        """测试响应密文附加GCM标签，可被前端解密"""
+        server = SecureServer.__new__(SecureServer)
+        server.crypto = self.openssl
+        key, iv = AESGCM.generate_key(bit_length=256), os.urandom(12)
+        response = server.encrypt_response({'ok': True}, base64.b64encode(key).decode(), base64.b64encode(iv).decode())
+        plaintext = AESGCM(key).decrypt(iv, base64.b64decode(response['data']['content']), None)
+        self.assertEqual(json.loads(plaintext), {'ok': True})
+
+class TestLazyKeys(unittest.TestCase):
+    def setUp(self):
+        self.key_dir = os.path.join(tempfile.mkdtemp(), 'keys')
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.key_dir))
+
+    def test_lazy_does_not_touch_disk(self):
+        """测试延迟模式下构造时不生成密钥，首次使用时生成"""
+        server = SecureServer(key_dir=self.key_dir)
+        self.assertFalse(server.crypto.ready)
+        self.assertFalse(os.path.exists(self.key_dir))
+        self.assertTrue(server.crypto.get_public_key_pem().startswith('-----BEGIN PUBLIC KEY-----'))
+        self.assertTrue(server.crypto.ready)
+        self.assertEqual(os.stat(os.path.join(self.key_dir, 'private_key.pem')).st_mode & 0o777, 0o600)
+
+    def test_background_load(self):
+        """测试后台生成密钥，等待者共享同一次生成"""
+        crypto = CryptoUtils(key_dir=self.key_dir, lazy=True)
+        crypto.load_in_background()
+        self.assertTrue(crypto.ensure_keys(timeout=30))
+        pem = crypto.get_public_key_pem()
+        self.assertIsNone(crypto.load_in_background())
+        self.assertEqual(CryptoUtils(key_dir=self.key_dir).get_public_key_pem(), pem)
+
+    def test_python_generated_keys(self):
+        """测试纯Python后端生成的密钥文件可被OpenSSL后端加载"""
+        with mock.patch.object(crypto_utils, 'RSA_KEY_BITS', 512):
+            python = CryptoUtils(key_dir=self.key_dir, backend='python')
+        openssl = CryptoUtils(key_dir=self.key_dir, backend='openssl')
+        self.assertEqual(openssl.get_public_key_pem(), python.get_public_key_pem())
+
+class TestCryptoSession(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.key_dir = tempfile.mkdtemp()
+        cls.crypto = CryptoUtils(key_dir=cls.key_dir)
+        cls.public_key = cls.crypto.backend.private_key.public_key()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.key_dir)
+
+    def setUp(self):
+        self.server = SecureServer.__new__(SecureServer)
+        self.server.crypto = self.crypto
+        self.server.sessions = SessionStore(ttl=60, max_sessions=2)
+        request, self.aes_key, _ = encrypt_like_frontend(self.public_key, {})
+        self.session_id = self.server.open_session(request)['session_id']
+
+    def session_request(self, data, message_id):
+        iv = os.urandom(12)
+        ciphertext = AESGCM(self.aes_key).encrypt(iv, json.dumps(data).encode('utf-8'), None)
+        return {
+            'message_id': message_id,
+            'encryption': {'algorithm': 'AES-GCM', 'session_id': self.session_id,
+                           'iv': base64.b64encode(iv).decode('utf-8')},
+            'data': {'type': 'regular', 'content': base64.b64encode(ciphertext).decode('utf-8')},
+            'timestamp': 0,
+            'version': '1.0'
+        }
+
+    def test_session_requests_skip_rsa(self):
+        """测试会话建立后请求不再进行RSA解密"""
+        calls = []
+        original = self.crypto.rsa_decrypt
+        self.crypto.rsa_decrypt = lambda *args: calls.append(args) or original(*args)
+        try:
+            for i in range(3):
+                result = self.server.decrypt_request(self.session_request({'i': i}, f'm{i}'))
+                self.assertEqual(result['data'], {'i': i})
+                self.assertEqual(result['session_id'], self.session_id)
+        finally:
+            del self.crypto.rsa_decrypt
+        self.assertEqual(calls, [])
+
+    def test_replay_rejected(self):
+        """测试同一会话内重复的消息ID被拒绝"""
+        request = self.session_request({'a': 1}, 'm1')
+        self.server.decrypt_request(request)
+        with self.assertRaises(ValueError):
+            self.server.decrypt_request(request)
+
+    def test_session_response_round_trip(self):
+        """测试会话响应可用会话密钥解密"""
+        response = self.server.encrypt_session_response({'ok': True}, self.session_id)
+        self.assertEqual(response['encryption']['session_id'], self.session_id)
+        iv = base64.b64decode(response['encryption']['iv'])
+        plaintext = AESGCM(self.aes_key).decrypt(iv, base64.b64decode(response['data']['content']), None)
+        self.assertEqual(json.loads(plaintext), {'ok': True})
+
+    def test_expired_and_evicted_sessions(self):
+        """测试会话过期及超过容量时淘汰最久未使用的会话"""
+        store = self.server.sessions
+        store.get(self.session_id).expires_at = 0
+        with self.assertRaises(ValueError):
+            self.server.decrypt_request(self.session_request({}, 'm1'))
+        first, second, third = store.create('k1'), store.create('k2'), store.create('k3')
+        self.assertIsNone(store.get(first.session_id))
+        self.assertIsNotNone(store.get(third.session_id))
+        self.assertEqual(len(store), 2)
+
+class TestStreamEncryption(unittest.TestCase):
+    def setUp(self):
+        self.key = AESGCM.generate_key(bit_length=256)
+        self.data = {'rounds': list(range(2000)), 'name': '东京'}
+
+    def encrypt(self, chunk_size=1024):
+        return list(StreamEncryptor(self.key, chunk_size).encrypt_json(self.data))
+
+    def test_round_trip(self):
+        """测试分块加密后逐字节喂入也能还原"""
+        frames = self.encrypt()
+        self.assertGreater(len(frames), 5)
+        self.assertTrue(all(len(frame) <= 1024 + 20 for frame in frames[1:]))
+        stream = b''.join(frames)
+        decryptor = StreamDecryptor(self.key)
+        plaintext = b''.join(b''.join(decryptor.feed(stream[i:i + 7])) for i in range(0, len(stream), 7))
+        self.assertTrue(decryptor.finished)
+        self.assertEqual(json.loads(plaintext), self.data)
+
+    def test_truncation_and_reorder_detected(self):
+        """测试截断、帧重排与篡改均被检测"""
+        frames = self.encrypt()
+        with self.assertRaises(ValueError):
+            decrypt_stream(self.key, frames[:-1])
+        with self.assertRaises(ValueError):
+            decrypt_stream(self.key, frames + [frames[1]])
+        with self.assertRaises(ValueError):
+            decrypt_stream(self.key, frames + [b'\x00'])
+        with self.assertRaises(ValueError):
+            decrypt_stream(self.key, [frames[0], frames[2], frames[1]] + frames[3:])
+        tampered = bytearray(frames[1])
+        tampered[10] ^= 1
+        with self.assertRaises(ValueError):
+            decrypt_stream(self.key, [frames[0], bytes(tampered)] + frames[2:])
+
+    def test_session_stream_response(self):
+        """测试携带会话ID的请求返回加密流"""
+        from backend.app import app
+        from backend.api.system import json_response
+        from backend.utils.crypto_utils import secure_server
+        session = secure_server.sessions.create(base64.b64encode(self.key).decode('utf-8'))
+        with app.test_request_context(headers={'X-Session-Id': session.session_id}):
+            response = json_response(self.data)
+            self.assertEqual(response.headers['X-Encryption'], 'AES-GCM-STREAM')
+            self.assertEqual(json.loads(decrypt_stream(self.key, response.response)), self.data)
+        with app.test_request_context(headers={'X-Session-Id': 'missing'}):
+            self.assertEqual(json_response(self.data)[1], 401)
+
+    def test_async_session_stream_response(self):
+        """测试 asyncio 版本的 json_response 同样返回可解密的加密流"""
+        import asyncio
+        from quart import Quart
+        from backend.api.system_async import json_response
+        from backend.utils.crypto_utils import secure_server
+        session = secure_server.sessions.create(base64.b64encode(self.key).decode('utf-8'))
+        app = Quart(__name__)
+        app.add_url_rule('/data', 'data', lambda: json_response(self.data))
+
+        async def fetch(headers):
+            response = await app.test_client().get('/data', headers=headers)
+            return response, await response.get_data()
+
+        response, body = asyncio.run(fetch({'X-Session-Id': session.session_id}))
+        self.assertEqual(response.headers['X-Encryption'], 'AES-GCM-STREAM')
+        self.assertEqual(json.loads(decrypt_stream(self.key, [body])), self.data)
+        response, _ = asyncio.run(fetch({'X-Session-Id': 'missing'}))
+        self.assertEqual(response.status_code, 401)
+
+    def test_data_endpoint_stream(self):
+        """测试大体量数据接口按会话ID返回加密流，未携带会话ID时仍返回普通JSON"""
+        from backend.app import app
+        from backend.utils.crypto_utils import secure_server
+        session = secure_server.sessions.create(base64.b64encode(self.key).decode('utf-8'))
+        client = app.test_client()
+        plain = client.get('/api/communication/data?client_id=1').get_json()
+        response = client.get('/api/communication/data?client_id=1', headers={'X-Session-Id': session.session_id})
+        self.assertEqual(response.headers['X-Encryption'], 'AES-GCM-STREAM')
+        self.assertEqual(json.loads(decrypt_stream(self.key, [response.data])), plain)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,976 @@
+import unittest
+import sys
+import os
+import threading
+import tempfile
+import json
+import shutil
+import time
+import asyncio
+from unittest import mock
+
+# 添加项目根目录及后端目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'FedGMM_Ali_frontend'))
+
+from fake_ssh import FakeSSHClient
+from backend.utils.ssh_pool import SSHConnectionPool, make_key
+from backend.utils.ssh_client import SSHClient
+from backend.utils.ssh_connector import SSHConnector, CircuitBreaker, backoff_delay
+from backend.utils.ssh_health import SSHHealthMonitor
+from backend.utils.ssh_jobs import RingBuffer, CommandJobManager
+from backend.utils.log_tail import TrainingLogParser, LogTailRegistry
+from backend.utils.training_monitor import TrainingMonitorRegistry
+from backend.utils.artifact_sync import ArtifactSync
+from backend.utils.training_fanout import TrainingFanout, TrainingShard, assign_shards
+from backend.utils import job_queue
+from backend.utils.job_queue import TrainingJobQueue
+from backend.utils.training_monitor import process_alive, launch_training
+from backend.utils.metric_series import MetricSeries
+from backend.utils.sweep import SweepLauncher, LocalTrainingExecutor, expand_grid, sample_random, pack_hosts
+
+def use_temp_training_queue(test):
+    """全局训练队列改用临时数据库（避免在仓库中生成队列数据库），测试结束后停止调度并恢复"""
+    from backend.utils.job_queue import training_queue
+    db_dir = tempfile.mkdtemp()
+    saved = (training_queue.db_path, training_queue._initialized, training_queue.interval)
+    training_queue.db_path = os.path.join(db_dir, 'queue.db')
+    training_queue._initialized = False
+    training_queue.interval = 0.05
+
+    def restore():
+        training_queue.shutdown()
+        if training_queue._scheduler is not None:
+            training_queue._scheduler.join(5)
+        training_queue.db_path, training_queue._initialized, training_queue.interval = saved
+        training_queue._stop_event = threading.Event()
+        shutil.rmtree(db_dir)
+    test.addCleanup(restore)
+    return training_queue
+
+class TestSSHConnectionPool(unittest.TestCase):
+    def setUp(self):
+        FakeSSHClient.reset()
+        self.pool = SSHConnectionPool(max_size=2, idle_timeout=60, client_factory=FakeSSHClient)
+
+    def tearDown(self):
+        self.pool.close_all()
+
+    def test_reuse_across_threads(self):
+        """测试不同线程复用同一条已认证连接"""
+        clients = [SSHClient(pool=self.pool) for _ in range(4)]
+        threads = [threading.Thread(target=c.connect, args=('host', 'root', 'pw')) for c in clients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(FakeSSHClient.connect_count, 1)
+
+        # 另一个实例未调用connect也无法执行命令，同一实例在多个线程中共享
+        success, stdout, stderr, _ = clients[0].execute_command('echo hello')
+        self.assertTrue(success)
+        self.assertEqual(stdout.strip(), 'hello')
+        transport = self.pool.get(make_key('host', 22, 'root')).transport
+        self.assertEqual(transport.sessions_opened, 1)
+
+    def test_credential_change_reconnects(self):
+        """测试凭证变化时重新握手"""
+        self.pool.connect('host', 'root', password='a')
+        self.pool.connect('host', 'root', password='b')
+        self.assertEqual(FakeSSHClient.connect_count, 2)
+        self.assertEqual(len(self.pool), 1)
+
+    def test_max_size_and_idle_eviction(self):
+        """测试连接数上限与空闲回收"""
+        first = self.pool.connect('h1', 'root')
+        self.pool.connect('h2', 'root')
+        self.pool.connect('h3', 'root')
+        self.assertEqual(len(self.pool), 2)
+        self.assertIsNone(self.pool.get(first.key))
+
+        self.pool.idle_timeout = 0
+        self.assertEqual(self.pool.evict_idle(), 2)
+        self.assertEqual(len(self.pool), 0)
+
+    def test_dead_transport_removed(self):
+        """测试健康检查移除已断开的连接"""
+        connection = self.pool.connect('host', 'root')
+        connection.transport.close()
+        self.assertIsNone(self.pool.get(connection.key, force_check=True))
+        client = SSHClient(pool=self.pool)
+        client.hostname, client.port, client.username, client._session = 'host', 22, 'root', True
+        success, _, _, error_msg = client.execute_command('true')
+        self.assertFalse(success)
+        self.assertFalse(client.connected)
+
+    def test_command_failure(self):
+        """测试命令失败时返回退出状态"""
+        client = SSHClient(pool=self.pool)
+        client.connect('host', 'root', 'pw')
+        success, _, stderr, error_msg = client.execute_command('echo oops >&2; exit 3')
+        self.assertFalse(success)
+        self.assertEqual(stderr.strip(), 'oops')
+        self.assertIn('3', error_msg)
+
+class TestSSHConnector(unittest.TestCase):
+    def setUp(self):
+        FakeSSHClient.reset()
+        self.pool = SSHConnectionPool(client_factory=FakeSSHClient)
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        self.connector = SSHConnector(self.pool, self.breaker)
+
+    def tearDown(self):
+        self.connector.shutdown()
+        self.pool.close_all()
+
+    def test_backoff_delay(self):
+        """测试指数退避加抖动的范围"""
+        for attempt, ceiling in ((1, 1), (2, 2), (3, 4), (10, 8)):
+            delay = backoff_delay(attempt, 1, 8)
+            self.assertGreaterEqual(delay, ceiling / 2)
+            self.assertLessEqual(delay, ceiling)
+
+    def test_connect_returns_immediately(self):
+        """测试连接请求立即返回，成功后客户端切换到新连接"""
+        client = SSHClient(pool=self.pool, connector=self.connector)
+        attempt = client.connect_async('host', 'root', 'pw')
+        self.assertIn(attempt.status, ('pending', 'connected'))
+        self.assertTrue(attempt.wait(timeout=5))
+        self.assertEqual(attempt.status, 'connected')
+        self.assertTrue(client.connected)
+        self.assertEqual(client.get_connection_status()['hostname'], 'host')
+
+    def test_auth_failure_not_retried(self):
+        """测试认证失败不重试"""
+        FakeSSHClient.accepted_password = 'secret'
+        client = SSHClient(pool=self.pool, connector=self.connector)
+        success, message = client.connect('host', 'root', 'wrong', max_retries=5, retry_delay=0.01)
+        self.assertFalse(success)
+        self.assertEqual(FakeSSHClient.connect_count, 1)
+        self.assertFalse(self.breaker.status(('host', 22))['open'])
+
+    def test_circuit_breaker(self):
+        """测试连续失败后熔断，熔断期间直接拒绝"""
+        FakeSSHClient.fail_with = OSError('unreachable')
+        client = SSHClient(pool=self.pool, connector=self.connector)
+        success, message = client.connect('host', 'root', 'pw', max_retries=5, retry_delay=0.01)
+        self.assertFalse(success)
+        self.assertEqual(FakeSSHClient.connect_count, 2)
+        self.assertIn('熔断', message)
+
+        attempt = client.connect_async('host', 'root', 'pw')
+        self.assertEqual(attempt.status, 'failed')
+        self.assertEqual(FakeSSHClient.connect_count, 2)
+        self.assertTrue(client.get_connection_status()['circuit']['open'])
+
+    def test_backoff_releases_workers(self):
+        """测试退避期间不占用连接线程，其他主机的连接无需排队"""
+        connector = SSHConnector(self.pool, CircuitBreaker(failure_threshold=10), max_workers=1)
+        try:
+            FakeSSHClient.unreachable_hosts = {'down1', 'down2'}
+            failing = [connector.submit(host, 'root', 'pw', max_retries=3, retry_delay=1) for host in ('down1', 'down2')]
+            time.sleep(0.1)
+            attempt = connector.submit('up', 'root', 'pw')
+            self.assertTrue(attempt.wait(timeout=0.4))
+            self.assertEqual(attempt.status, 'connected')
+            self.assertTrue(all(a.status == 'pending' and a.next_retry_at for a in failing))
+            for a in failing:
+                self.assertTrue(a.wait(timeout=10))
+                self.assertEqual((a.status, a.attempts), ('failed', 3))
+        finally:
+            connector.shutdown()
+
+    def test_half_open_single_probe(self):
+        """测试熔断到期后只放行一次探测，探测结束前其余请求直接拒绝"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        host = ('host', 22)
+        self.assertTrue(breaker.record_failure(host))
+        self.assertEqual(breaker.allow(host)[0], False)
+        time.sleep(0.1)
+        self.assertEqual(breaker.allow(host), (True, 0.0))
+        self.assertEqual(breaker.allow(host), (False, 0.0))
+        self.assertTrue(breaker.status(host)['probing'])
+        # 探测未得出结果时释放名额，下一个请求成为新的探测
+        breaker.release_probe(host)
+        self.assertEqual(breaker.allow(host), (True, 0.0))
+        breaker.record_success(host)
+        self.assertEqual(breaker.allow(host), (True, 0.0))
+        self.assertEqual(breaker.allow(host), (True, 0.0))
+
+class TestSSHHealth(unittest.TestCase):
+    def setUp(self):
+        FakeSSHClient.reset()
+        self.pool = SSHConnectionPool(client_factory=FakeSSHClient)
+        self.connector = SSHConnector(self.pool, CircuitBreaker())
+        self.health = SSHHealthMonitor(self.pool, self.connector, interval=60, probe_timeout=0.2)
+        self.client = SSHClient(pool=self.pool, connector=self.connector)
+        self.assertTrue(self.client.connect('host', 'root', 'pw')[0])
+
+    def tearDown(self):
+        self.health.stop()
+        self.connector.shutdown()
+        self.pool.close_all()
+
+    def test_rtt_recorded(self):
+        """测试保活探测记录往返时延"""
+        connection = self.client.get_connection()
+        connection.transport.latency = 0.02
+        connection.last_used -= 100
+        self.health.check_once()
+        status = self.health.status(connection.key)['root@host:22']
+        self.assertEqual(status['status'], 'healthy')
+        self.assertGreaterEqual(status['rtt_ms'], 20)
+        self.assertEqual(connection.transport.global_requests, 1)
+        # 保活成功刷新使用时间，会话不会被当作空闲连接回收
+        self.assertLess(time.time() - connection.last_used, 5)
+
+    def test_dead_transport_reconnected(self):
+        """测试transport断开后主动重连，客户端无需重新登录"""
+        old = self.client.get_connection()
+        old.transport.close()
+        self.health.check_once()
+        deadline = time.time() + 5
+        while self.health.status()['root@host:22']['status'] == 'reconnecting' and time.time() < deadline:
+            time.sleep(0.05)
+        status = self.health.status()['root@host:22']
+        self.assertEqual(status['status'], 'healthy')
+        self.assertEqual(status['reconnects'], 1)
+        self.assertTrue(self.client.connected)
+        self.assertIsNot(self.client.get_connection(), old)
+
+    def test_unresponsive_then_lost(self):
+        """测试连续无响应达到阈值后判定断开"""
+        connection = self.client.get_connection()
+        connection.transport.hang = True
+        self.health.check_once()
+        self.assertEqual(self.health.status()['root@host:22']['status'], 'unresponsive')
+        probe = self.health._health[connection.key].probe
+        self.health.check_once()
+        self.assertIn(self.health.status()['root@host:22']['status'], ('reconnecting', 'healthy'))
+        self.assertFalse(connection.transport.is_active())
+        # 未回复的探测期间不叠加新的探测，连接关闭后探测线程随之释放
+        self.assertEqual(connection.transport.global_requests, 1)
+        self.assertIsNone(probe.result(timeout=5))
+
+    def test_close_forgets_health(self):
+        """测试主动关闭连接后清除健康记录"""
+        self.health.check_once()
+        self.client.close()
+        self.assertEqual(self.health.status(), {})
+
+class TestCommandJobs(unittest.TestCase):
+    def setUp(self):
+        FakeSSHClient.reset()
+        self.pool = SSHConnectionPool(client_factory=FakeSSHClient)
+        self.connection = self.pool.connect('host', 'root')
+        self.jobs = CommandJobManager(max_workers=2, buffer_size=16, poll_interval=0.01)
+
+    def tearDown(self):
+        self.pool.close_all()
+
+    def test_ring_buffer(self):
+        """测试环形缓冲区按绝对偏移量读取并丢弃最早内容"""
+        buffer = RingBuffer(capacity=5)
+        buffer.append('abc')
+        buffer.append('defg')
+        self.assertEqual(buffer.start_offset, 2)
+        self.assertEqual(buffer.read(0), ('cdefg', 7, True))
+        self.assertEqual(buffer.read(4, max_chars=2), ('ef', 6, False))
+        self.assertEqual(buffer.read(7), ('', 7, False))
+
+    def test_streamed_output(self):
+        """测试任务立即返回并增量读取输出"""
+        job = self.jobs.submit(self.connection, 'echo 一二三; echo err >&2; exit 2')
+        self.assertTrue(job.wait(timeout=5))
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.exit_status, 2)
+        output = job.read()
+        self.assertEqual(output['stdout'], '一二三\n')
+        self.assertEqual(output['stderr'], 'err\n')
+        self.assertEqual(job.read(stdout_offset=output['stdout_offset'])['stdout'], '')
+
+    def test_bounded_buffer(self):
+        """测试输出超过缓冲区容量时只保留最新内容"""
+        job = self.jobs.submit(self.connection, 'seq 1 100')
+        job.wait(timeout=5)
+        output = job.read()
+        self.assertTrue(output['truncated'])
+        self.assertTrue(output['stdout'].endswith('99\n100\n'))
+        self.assertLessEqual(len(output['stdout']), 16)
+
+    def test_cancel_and_timeout(self):
+        """测试取消与超时"""
+        job = self.jobs.submit(self.connection, 'sleep 5')
+        self.jobs.cancel(job.job_id)
+        self.assertTrue(job.wait(timeout=5))
+        self.assertEqual(job.status, 'cancelled')
+        job = self.jobs.submit(self.connection, 'sleep 5', timeout=0.1)
+        self.assertTrue(job.wait(timeout=5))
+        self.assertEqual(job.status, 'timeout')
+
+    def test_async_jobs_multiplexed(self):
+        """测试协程任务在事件循环中并发读取输出，不占用工作线程"""
+        jobs = CommandJobManager(max_workers=1, buffer_size=1024, poll_interval=0.01)
+
+        async def run():
+            started = time.time()
+            submitted = [jobs.submit_async(self.connection, f'sleep 0.3; echo {i}; echo e{i} >&2')
+                         for i in range(40)]
+            await asyncio.gather(*(job.wait_async(timeout=10) for job in submitted))
+            elapsed = time.time() - started
+            cancelled = jobs.submit_async(self.connection, 'sleep 5')
+            jobs.cancel(cancelled.job_id)
+            timed_out = jobs.submit_async(self.connection, 'sleep 5', timeout=0.2)
+            await asyncio.gather(cancelled.wait_async(timeout=5), timed_out.wait_async(timeout=5))
+            return submitted, elapsed, cancelled, timed_out
+
+        submitted, elapsed, cancelled, timed_out = asyncio.run(run())
+        for i, job in enumerate(submitted):
+            self.assertEqual(job.status, 'completed')
+            self.assertEqual(job.read()['stdout'], f'{i}\n')
+            self.assertEqual(job.read()['stderr'], f'e{i}\n')
+        # 40个命令并发执行，而非按单个工作线程串行
+        self.assertLess(elapsed, 5)
+        self.assertEqual(cancelled.status, 'cancelled')
+        self.assertEqual(timed_out.status, 'timeout')
+
+class TestLogTail(unittest.TestCase):
+    def setUp(self):
+        FakeSSHClient.reset()
+        self.pool = SSHConnectionPool(client_factory=FakeSSHClient)
+        self.connection = self.pool.connect('host', 'root')
+        self.log_file = tempfile.NamedTemporaryFile(suffix='.log', delete=False).name
+        self.registry = LogTailRegistry()
+
+    def tearDown(self):
+        self.pool.close_all()
+        os.remove(self.log_file)
+
+    def append(self, text):
+        with open(self.log_file, 'a') as f:
+            f.write(text)
+
+    def test_parser_partial_lines(self):
+        """测试解析器处理跨块的半行"""
+        parser = TrainingLogParser()
+        self.assertEqual(parser.feed('Round 1/4 loss=1.0\nRou'), ['Round 1/4 loss=1.0'])
+        self.assertEqual(parser.progress, 25)
+        parser.feed('nd 2/4\n')
+        self.assertEqual(parser.progress, 50)
+        parser.feed('Training completed\n')
+        self.assertEqual(parser.status, 'completed')
+        self.assertEqual(parser.progress, 100)
+
+    def test_parser_round_metrics(self):
+        """测试解析轮次行及其续行中的指标"""
+        parser = TrainingLogParser()
+        parser.feed('Round 1/4 loss=1.0\n  Accuracy: 0.5, tau*: 0.3\n  compression_ratio=0.25 at 12:30\n')
+        parser.feed('Round 2/4 loss=0.8\nRuntimeError: code=3\n')
+        updates = parser.drain_metrics()
+        self.assertEqual(updates[2], {'loss': 1.0, 'accuracy': 0.5, 'tau*': 0.3, 'compression_ratio': 0.25, 'round': 1})
+        self.assertEqual(updates[-1], {'loss': 0.8, 'round': 2})
+
+    def test_metric_series_ring_buffer(self):
+        """测试时间序列按轮次合并、环形覆盖与增量查询"""
+        series = MetricSeries(capacity=4)
+        for r in range(1, 7):
+            series.append({'round': r, 'loss': 1.0 / r})
+        series.append({'round': 6, 'accuracy': 0.9})
+        result = series.query()
+        self.assertEqual(result['rounds'], [3, 4, 5, 6])
+        self.assertEqual(result['metrics']['accuracy'], [None, None, None, 0.9])
+        self.assertEqual(series.latest(), {'loss': 1.0 / 6, 'accuracy': 0.9, 'round': 6})
+        self.assertEqual(series.query(['loss'], since_round=4)['rounds'], [5, 6])
+        self.assertEqual(series.query(max_points=2)['rounds'], [3, 6])
+
+    def test_incremental_reads(self):
+        """测试每次轮询只读取新追加的字节"""
+        self.append('Round 1/10\n')
+        tailer = self.registry.get(self.connection, self.log_file)
+        lines, read = tailer.poll()
+        self.assertEqual((lines, read), (['Round 1/10'], 11))
+        self.assertEqual(tailer.poll(), ([], 0))
+
+        self.append('Round 2/10\nRuntimeError: boom\n')
+        tailer = self.registry.get(self.connection, self.log_file)
+        lines, read = tailer.poll()
+        self.assertEqual(lines, ['Round 2/10', 'RuntimeError: boom'])
+        self.assertEqual(tailer.offset, os.path.getsize(self.log_file))
+        self.assertEqual(tailer.parser.status, 'error')
+        self.assertEqual(tailer.parser.progress, 20)
+
+    def test_truncated_log_resets(self):
+        """测试日志被截断后重新解析"""
+        self.append('Round 5/10\nTraining completed\n')
+        tailer = self.registry.get(self.connection, self.log_file)
+        tailer.poll()
+        with open(self.log_file, 'w') as f:
+            f.write('Round 1/10\n')
+        tailer.poll()
+        self.assertEqual(tailer.parser.status, 'running')
+        self.assertEqual(tailer.parser.progress, 10)
+
+    def test_missing_file(self):
+        """测试日志文件不存在"""
+        tailer = self.registry.get(self.connection, self.log_file + '.missing')
+        with self.assertRaises(FileNotFoundError):
+            tailer.poll()
+
+class TestTrainingMonitor(unittest.TestCase):
+    def setUp(self):
+        FakeSSHClient.reset()
+        self.pool = SSHConnectionPool(client_factory=FakeSSHClient)
+        self.connection = self.pool.connect('host', 'root')
+        self.log_file = tempfile.NamedTemporaryFile(suffix='.log', delete=False).name
+        self.monitors = TrainingMonitorRegistry(self.pool, interval=0.05, idle_timeout=5)
+
+    def tearDown(self):
+        self.pool.close_all()
+        os.remove(self.log_file)
+
+    def test_shared_cached_state(self):
+        """测试多个查看者共享同一个后台监控线程"""
+        with open(self.log_file, 'w') as f:
+            f.write('Round 3/10\n')
+        monitors = [self.monitors.get(self.connection.key, self.log_file) for _ in range(5)]
+        self.assertTrue(all(m is monitors[0] for m in monitors))
+        # 客户端请求的轮询间隔不能低于默认间隔
+        self.assertIs(self.monitors.get(self.connection.key, self.log_file, interval=0.001), monitors[0])
+        self.assertEqual(monitors[0].interval, 0.05)
+        snapshot = monitors[0].read(timeout=5)
+        self.assertTrue(snapshot['success'])
+        self.assertEqual(snapshot['progress'], 30)
+
+        with open(self.log_file, 'a') as f:
+            f.write('Training completed\n')
+        monitor = monitors[0]
+        count = monitor.poll_count
+        while monitor.alive:
+            count = monitor.wait_for_update(count, timeout=5)
+        snapshot = monitor.read()
+        self.assertEqual(snapshot['status'], 'completed')
+        # 已结束的任务不再启动新的轮询
+        self.assertIs(self.monitors.get(self.connection.key, self.log_file), monitor)
+
+    def test_missing_log(self):
+        """测试日志文件不存在时返回错误状态"""
+        monitor = self.monitors.get(self.connection.key, self.log_file + '.missing')
+        snapshot = monitor.read(timeout=5)
+        self.assertFalse(snapshot['success'])
+        self.assertTrue(snapshot['not_found'])
+
+class TestArtifactSync(unittest.TestCase):
+    def setUp(self):
+        FakeSSHClient.reset()
+        self.pool = SSHConnectionPool(client_factory=FakeSSHClient)
+        self.connection = self.pool.connect('host', 'root')
+        self.remote = tempfile.mkdtemp()
+        self.local = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.remote, 'gamma', 'Tokyo'))
+        os.makedirs(os.path.join(self.remote, 'models'))
+        self.write('gamma/Tokyo/round_1.npy', b'\x00\x01' * 5000)
+        self.write('models/global.pt', os.urandom(300000))
+
+    def tearDown(self):
+        self.pool.close_all()
+        shutil.rmtree(self.remote)
+        shutil.rmtree(self.local)
+
+    def write(self, rel_path, data):
+        with open(os.path.join(self.remote, rel_path), 'wb') as f:
+            f.write(data)
+
+    def read_local(self, rel_path):
+        with open(os.path.join(self.local, rel_path), 'rb') as f:
+            return f.read()
+
+    def test_sync_only_changed_files(self):
+        """测试并行同步并在再次同步时跳过未变化的文件"""
+        for compress in (True, False):
+            shutil.rmtree(self.local)
+            sync = ArtifactSync(self.connection, self.remote, self.local, workers=2, compress=compress)
+            result = sync.run()
+            self.assertEqual(len(result['transferred']), 2)
+            self.assertEqual(result['failed'], [])
+            with open(os.path.join(self.remote, 'models/global.pt'), 'rb') as f:
+                self.assertEqual(self.read_local('models/global.pt'), f.read())
+
+        self.write('gamma/Tokyo/round_2.npy', b'new')
+        result = ArtifactSync(self.connection, self.remote, self.local).run()
+        self.assertEqual([item['path'] for item in result['transferred']], ['gamma/Tokyo/round_2.npy'])
+        self.assertEqual(result['skipped'], 2)
+
+    def test_resume_partial_transfer(self):
+        """测试从未完成的部分继续传输，远程文件变化时重新传输"""
+        sync = ArtifactSync(self.connection, self.remote, self.local, compress=False)
+        artifact = [a for a in sync.list_remote() if a.rel_path == 'models/global.pt'][0]
+        part_path = os.path.join(self.local, 'models', 'global.pt.part')
+        os.makedirs(os.path.dirname(part_path))
+        with open(os.path.join(self.remote, 'models/global.pt'), 'rb') as f:
+            data = f.read()
+        with open(part_path, 'wb') as f:
+            f.write(data[:100000])
+        with open(part_path + '.json', 'w') as f:
+            json.dump({'size': artifact.size, 'mtime': artifact.mtime}, f)
+
+        result = sync.run()
+        resumed = {item['path']: item['resumed_from'] for item in result['transferred']}
+        self.assertEqual(resumed['models/global.pt'], 100000)
+        self.assertEqual(self.read_local('models/global.pt'), data)
+        self.assertFalse(os.path.exists(part_path))
+
+        # 损坏的部分文件会在校验失败后完整重传
+        self.write('models/global.pt', b'x' * 1000)
+        os.utime(os.path.join(self.remote, 'models/global.pt'), (artifact.mtime + 10, artifact.mtime + 10))
+        with open(part_path, 'wb') as f:
+            f.write(b'y' * 500)
+        with open(part_path + '.json', 'w') as f:
+            json.dump({'size': 1000, 'mtime': artifact.mtime + 10}, f)
+        result = sync.run()
+        self.assertEqual(result['failed'], [])
+        self.assertEqual(self.read_local('models/global.pt'), b'x' * 1000)
+
+    def test_checksum_fallback(self):
+        """测试远程没有 sha256sum 时改用 python3 或 openssl 校验，全部不可用时不接受文件"""
+        exec_command = self.connection.exec_command
+
+        def without(*tools):
+            def run(command, timeout=None):
+                if command.split()[0] in tools:
+                    return 127, '', f'{command.split()[0]}: command not found'
+                return exec_command(command, timeout=timeout)
+            return run
+
+        for tools in (('sha256sum',), ('sha256sum', 'python3')):
+            shutil.rmtree(self.local)
+            self.connection.exec_command = without(*tools)
+            result = ArtifactSync(self.connection, self.remote, self.local).run()
+            self.assertEqual(len(result['transferred']), 2)
+            self.assertEqual(result['failed'], [])
+            with open(os.path.join(self.remote, 'models/global.pt'), 'rb') as f:
+                self.assertEqual(self.read_local('models/global.pt'), f.read())
+
+        shutil.rmtree(self.local)
+        self.connection.exec_command = without('sha256sum', 'python3', 'openssl')
+        result = ArtifactSync(self.connection, self.remote, self.local).run()
+        self.assertEqual(result['transferred'], [])
+        self.assertEqual(len(result['failed']), 2)
+        self.assertIn('SHA-256', result['failed'][0]['error'])
+        self.assertFalse(os.path.exists(os.path.join(self.local, 'models', 'global.pt')))
+
+class TestTrainingFanout(unittest.TestCase):
+    def setUp(self):
+        FakeSSHClient.reset()
+        FakeSSHClient.accepted_password = 'pw'
+        self.pool = SSHConnectionPool(client_factory=FakeSSHClient)
+        self.connector = SSHConnector(self.pool)
+        self.log_dir = tempfile.mkdtemp()
+        monitors = TrainingMonitorRegistry(self.pool, interval=0.05, idle_timeout=5)
+        self.queue = TrainingJobQueue(os.path.join(self.log_dir, 'queue.db'), self.pool, monitors, interval=0.05)
+        self.fanout = TrainingFanout(self.pool, self.connector, monitors, self.queue)
+
+    def tearDown(self):
+        self.queue.shutdown()
+        self.connector.shutdown()
+        self.pool.close_all()
+        shutil.rmtree(self.log_dir)
+
+    def test_assign_shards(self):
+        """测试按轮询把城市分配到主机"""
+        shards = assign_shards(['Tokyo', 'NYC', 'London'], [{'hostname': 'a'}, {'hostname': 'b'}])
+        self.assertEqual([(city, host['hostname']) for city, host in shards],
+                         [('Tokyo', 'a'), ('NYC', 'b'), ('London', 'a')])
+
+    def test_aggregated_status(self):
+        """测试并发启动分片并汇总各主机进度、最慢主机与失败"""
+        outputs = {'Tokyo': 'Round 3/4', 'NYC': 'Round 1/4', 'London': 'Round 4/4'}
+        hosts = {'Tokyo': 'h1', 'NYC': 'h2', 'London': 'h3'}
+        shards = []
+        for city, output in outputs.items():
+            host = {'hostname': hosts[city], 'username': 'root', 'password': 'bad' if city == 'London' else 'pw'}
+            # 保持进程存活，使进程检测认为训练仍在运行
+            command = f'sh -c "echo \'{output}\'; sleep 3; : train.py"'
+            shards.append(TrainingShard(city, host, command, os.path.join(self.log_dir, f'{city}.log')))
+
+        run = self.fanout.launch(shards)
+        self.assertTrue(run.launched.wait(5))
+        deadline = time.time() + 5
+        status = self.fanout.status(run)
+        while any(item['current_round'] is None for item in status['hosts'][:2]) and time.time() < deadline:
+            time.sleep(0.05)
+            status = self.fanout.status(run)
+        by_city = {item['city']: item for item in status['hosts']}
+        self.assertEqual(by_city['Tokyo']['progress'], 75)
+        self.assertEqual(status['slowest']['city'], 'NYC')
+        self.assertEqual([item['city'] for item in status['failures']], ['London'])
+        self.assertEqual(status['status'], 'running')
+        self.assertEqual(status['progress'], (75 + 25 + 0) // 3)
+        # 分片经训练队列派发，占用主机槽位并出现在队列中
+        self.assertEqual(sorted(job['params']['city'] for job in self.queue.list()), ['NYC', 'Tokyo'])
+        self.assertEqual(by_city['Tokyo']['job_id'], self.queue.find(shards[0].key, shards[0].log_file)['job_id'])
+
+class TestQueuedTrainingEndpoints(unittest.TestCase):
+    def setUp(self):
+        from backend.app import app
+        from backend.utils.ssh_pool import ssh_pool
+        from backend.utils.training_monitor import training_monitors
+        FakeSSHClient.reset()
+        ssh_pool.client_factory = FakeSSHClient
+        training_monitors.interval = 0.05
+        self.queue = use_temp_training_queue(self)
+        self.work_dir = tempfile.mkdtemp()
+        self.app = app.test_client()
+
+    def tearDown(self):
+        from backend.utils.ssh_pool import ssh_pool
+        ssh_pool.close_all()
+        shutil.rmtree(self.work_dir)
+
+    def test_stop_fanout_shard(self):
+        """测试扇出分片可通过 /train/stop 按任务ID停止"""
+        from backend.utils.training_fanout import training_fanout
+        shard = TrainingShard('Tokyo', {'hostname': 'fanout-host', 'username': 'root'},
+                              'sh -c "echo Round 1/4; sleep 5; : train.py"', os.path.join(self.work_dir, 'Tokyo.log'))
+        run = training_fanout.launch([shard])
+        self.assertTrue(run.launched.wait(5))
+        job = self.queue.wait(shard.job_id, statuses=('queued', 'dispatching'), timeout=5)
+        self.assertEqual(job['status'], 'running')
+        self.assertIsNotNone(job['pgid'])
+
+        response = self.app.post('/api/system/train/stop', json={'job_id': shard.job_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['job']['status'], 'cancelled')
+        status = training_fanout.status(run, timeout=1)
+        self.assertEqual(status['hosts'][0]['status'], 'cancelled')
+        self.assertEqual(status['status'], 'cancelled')
+
+    def test_status_uses_queued_pid(self):
+        """测试监控注册表中没有PID时（如服务重启后）按队列记录的PID判断，不受同一主机上其他训练的影响"""
+        from backend.api.system import get_ssh_client
+        from backend.utils.training_monitor import training_monitors
+        response = self.app.post('/api/system/ssh/connect', json={'hostname': 'pid-host', 'username': 'root', 'wait': 5})
+        self.assertTrue(response.get_json()['success'])
+        key = get_ssh_client().key
+        self.queue.set_host_slots(key, 2)
+        done = self.queue.submit(key, 'sh -c "sleep 0.2; : done train.py"', os.path.join(self.work_dir, 'done.log'))
+        other = self.queue.submit(key, 'sh -c "sleep 5; : other train.py"', os.path.join(self.work_dir, 'other.log'))
+        self.assertEqual(self.queue.wait(done['job_id'], statuses=('queued', 'dispatching', 'running'))['status'],
+                         'completed')
+        self.assertEqual(self.queue.get(other['job_id'])['status'], 'running')
+
+        # 模拟服务重启：注册表中既没有监控器也没有PID，按进程名检测会匹配到另一个训练
+        training_monitors.remove(key, done['log_file'])
+        self.assertNotIn((key, done['log_file']), training_monitors._pids)
+        response = self.app.post('/api/system/train/status', json={'log_file': done['log_file']})
+        self.assertEqual(response.get_json()['status'], 'completed')
+        self.queue.cancel(other['job_id'])
+
+class TestTrainingQueue(unittest.TestCase):
+    def setUp(self):
+        FakeSSHClient.reset()
+        self.pool = SSHConnectionPool(client_factory=FakeSSHClient)
+        self.connection = self.pool.connect('host', 'root')
+        self.work_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.work_dir, 'queue.db')
+        self.monitors = TrainingMonitorRegistry(self.pool, interval=0.05, idle_timeout=5)
+        self.queue = self.make_queue()
+
+    def tearDown(self):
+        self.queue.shutdown()
+        self.pool.close_all()
+        shutil.rmtree(self.work_dir)
+
+    def make_queue(self):
+        return TrainingJobQueue(self.db_path, self.pool, self.monitors, default_slots=1, interval=0.05)
+
+    def submit(self, name, priority=0, key=None):
+        command = f'sh -c "echo Round 1/1; sleep 0.3; echo Training completed; : {name} train.py"'
+        return self.queue.submit(key or self.connection.key, command,
+                                 os.path.join(self.work_dir, f'{name}.log'), priority=priority)
+
+    def test_priority_slots_and_cancel(self):
+        """测试主机槽位限制、优先级派发与取消"""
+        first = self.submit('first')
+        first = self.queue.wait(first['job_id'], statuses=('queued', 'dispatching'))
+        self.assertEqual(first['status'], 'running')
+
+        low = self.submit('low', priority=0)
+        high = self.submit('high', priority=5)
+        cancelled = self.submit('cancelled', priority=9)
+        self.assertEqual(self.queue.cancel(cancelled['job_id'])['status'], 'cancelled')
+        self.assertEqual(self.queue.get(low['job_id'])['status'], 'queued')
+
+        high = self.queue.wait(high['job_id'], statuses=('queued', 'dispatching'), timeout=10)
+        self.assertEqual(high['status'], 'running')
+        self.assertEqual(self.queue.get(first['job_id'])['status'], 'completed')
+        self.assertEqual(self.queue.get(low['job_id'])['status'], 'queued')
+        hosts = self.queue.host_slots()
+        self.assertEqual((hosts[0]['running'], hosts[0]['queued']), (1, 1))
+
+    def test_stop_targets_one_job(self):
+        """测试记录PID后停止只终止对应任务的进程组"""
+        self.queue.set_host_slots(self.connection.key, 2)
+        jobs = []
+        for name in ('a', 'b'):
+            job = self.queue.submit(self.connection.key, f'sh -c "echo Round 1/2; sleep 5; : {name} train.py"',
+                                    os.path.join(self.work_dir, f'{name}.log'))
+            jobs.append(self.queue.wait(job['job_id'], statuses=('queued', 'dispatching')))
+        self.assertEqual([job['status'] for job in jobs], ['running', 'running'])
+        self.assertEqual(jobs[0]['pid'], jobs[0]['pgid'])
+
+        self.assertEqual(self.queue.cancel(jobs[0]['job_id'])['status'], 'cancelled')
+        deadline = time.time() + 5
+        while process_alive(self.connection, jobs[0]['pid']) and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(process_alive(self.connection, jobs[0]['pid']))
+        self.assertTrue(process_alive(self.connection, jobs[1]['pid']))
+        self.assertEqual(self.queue.find(self.connection.key, jobs[1]['log_file'])['status'], 'running')
+        self.queue.cancel(jobs[1]['job_id'])
+
+    def test_cancel_while_dispatching(self):
+        """测试派发途中取消任务：任务标记为已取消，派发线程终止刚启动的进程组"""
+        launched, cancelled = [], []
+
+        def launch(connection, command, log_file):
+            pid = launch_training(connection, command, log_file)
+            launched.append(pid)
+            # 模拟停止请求在进程启动后、任务更新为运行中之前到达
+            cancelled.append(self.queue.cancel(self.queue.find(connection.key, log_file)['job_id']))
+            return pid
+
+        with mock.patch.object(job_queue, 'launch_training', side_effect=launch):
+            job = self.queue.submit(self.connection.key, 'sh -c "sleep 5; : slow train.py"',
+                                    os.path.join(self.work_dir, 'slow.log'))
+            job = self.queue.wait(job['job_id'], statuses=('queued', 'dispatching'))
+        self.assertEqual(cancelled[0]['status'], 'cancelled')
+        self.assertEqual(job['status'], 'cancelled')
+        deadline = time.time() + 5
+        while process_alive(self.connection, launched[0]) and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(process_alive(self.connection, launched[0]))
+
+    def test_duplicate_log_and_unmonitored_reap(self):
+        """测试同一主机拒绝重复的未结束日志，且回收任务时不重启已停止的监控"""
+        self.queue.reap_interval = 0
+        job = self.queue.wait(self.submit('dup')['job_id'], statuses=('queued', 'dispatching'))
+        self.assertEqual(job['status'], 'running')
+        with self.assertRaises(ValueError):
+            self.submit('dup')
+
+        # 模拟无人查看导致监控停止，回收改为直接检查远程进程
+        self.monitors.remove(self.connection.key, job['log_file'])
+        job = self.queue.wait(job['job_id'], statuses=('running',))
+        self.assertEqual(job['status'], 'completed')
+        self.assertIsNone(self.monitors.get(self.connection.key, job['log_file'], create=False))
+        self.assertEqual(self.queue.wait(self.submit('dup')['job_id'], statuses=('queued', 'dispatching'))['status'],
+                         'running')
+
+    def test_persisted_across_restart(self):
+        """测试队列在服务重启后保留，派发途中中断的任务标记为失败"""
+        waiting = self.submit('waiting', key=('other', 22, 'root'))
+        interrupted = self.submit('interrupted', key=('other', 22, 'root'))
+        self.queue.shutdown()
+        self.queue._update(interrupted['job_id'], status='dispatching')
+
+        self.queue = self.make_queue()
+        self.assertEqual(self.queue.get(waiting['job_id'])['status'], 'queued')
+        self.assertEqual(self.queue.get(interrupted['job_id'])['status'], 'failed')
+
+    def test_recovery_keeps_live_dispatchers(self):
+        """测试只回收派发进程已退出的任务，其他存活进程正在派发的任务保持不变"""
+        live = self.submit('live', key=('other', 22, 'root'))
+        orphaned = self.submit('orphaned', key=('other', 22, 'root'))
+        self.queue.shutdown()
+        # 父进程仍在运行；本进程PID但启动令牌不同表示重启前的旧进程
+        self.queue._update(live['job_id'], status='dispatching', owner=f'{os.getppid()}:other')
+        self.queue._update(orphaned['job_id'], status='dispatching', owner=f'{os.getpid()}:stale')
+
+        self.queue = self.make_queue()
+        self.assertEqual(self.queue.get(live['job_id'])['status'], 'dispatching')
+        self.assertEqual(self.queue.get(orphaned['job_id'])['status'], 'failed')
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.queue = TrainingJobQueue(os.path.join(self.work_dir, 'queue.db'), SSHConnectionPool())
+        self.launcher = SweepLauncher(self.queue, local_executor=LocalTrainingExecutor(2, self.work_dir, self.work_dir))
+
+    def tearDown(self):
+        self.queue.shutdown()
+        shutil.rmtree(self.work_dir)
+
+    def test_expand_and_pack(self):
+        """测试网格展开、随机采样与按槽位装箱"""
+        configs = expand_grid({'gamma': [0.1, 0.2], 'tau': [0.5, 1.0, 2.0], 'compression': False})
+        self.assertEqual(len(configs), 6)
+        self.assertEqual(configs[0], {'compression': False, 'gamma': 0.1, 'tau': 0.5})
+        with self.assertRaises(ValueError):
+            expand_grid({'city': ['Tokyo']})
+
+        samples = sample_random({'gamma': {'min': 0.01, 'max': 1, 'log': True}, 'rounds': {'min': 10, 'max': 20, 'int': True}},
+                                20, seed=1)
+        self.assertEqual(samples, sample_random({'gamma': {'min': 0.01, 'max': 1, 'log': True},
+                                                 'rounds': {'min': 10, 'max': 20, 'int': True}}, 20, seed=1))
+        self.assertTrue(all(0.01 <= c['gamma'] <= 1 and 10 <= c['rounds'] <= 20 for c in samples))
+
+        self.assertEqual(pack_hosts(3, [{'slots': 2, 'active': 0}, {'slots': 1, 'active': 0}]), [0, 1, 0])
+        self.assertEqual(pack_hosts(2, [{'slots': 1, 'active': 3}, {'slots': 1, 'active': 0}]), [1, 1])
+
+    def test_local_sweep_results(self):
+        """测试本地执行器运行扫描并按指标排序结果表"""
+        trials = [{'params': dict({'gamma': gamma}, **extra),
+                   'command': f"sh -c 'echo Round 1/1 loss={1 - gamma} accuracy={gamma}; echo Training completed'"}
+                  for gamma, extra in ((0.2, {'city': 'Osaka'}), (0.9, {'city': 'Tokyo'}), (0.5, {}))]
+        sweep = self.launcher.launch({'city': 'Tokyo'}, trials, executor='local')
+        deadline = time.time() + 10
+        results = self.launcher.results(sweep, sort_by='accuracy')
+        while not results['finished'] and time.time() < deadline:
+            time.sleep(0.05)
+            results = self.launcher.results(sweep, sort_by='accuracy')
+        self.assertEqual(results['counts'], {'completed': 3})
+        self.assertEqual([row['params']['gamma'] for row in results['rows']], [0.9, 0.5, 0.2])
+        self.assertEqual(results['metric_columns'], ['accuracy', 'loss', 'round'])
+        self.assertEqual(results['rows'][0]['progress'], 100)
+
+        # 按字符串参数排序，缺少该参数的行在升序和降序时都排在最后
+        for descending, expected in ((True, [0.9, 0.2, 0.5]), (False, [0.2, 0.9, 0.5])):
+            results = self.launcher.results(sweep, sort_by='city', descending=descending)
+            self.assertEqual([row['params']['gamma'] for row in results['rows']], expected)
+
+class TestTrainingStream(unittest.TestCase):
+    def setUp(self):
+        from backend.app import app
+        from backend.utils.ssh_pool import ssh_pool
+        from backend.utils.training_monitor import training_monitors
+        FakeSSHClient.reset()
+        self.pool = ssh_pool
+        self.pool.client_factory = FakeSSHClient
+        training_monitors.interval = 0.05
+        use_temp_training_queue(self)
+        self.app = app.test_client()
+        self.log_file = tempfile.NamedTemporaryFile(suffix='.log', delete=False).name
+        response = self.app.post('/api/system/ssh/connect', json={'hostname': 'host', 'username': 'root', 'wait': 5})
+        self.assertTrue(response.get_json()['success'])
+
+    def tearDown(self):
+        self.app.post('/api/system/ssh/close')
+        os.remove(self.log_file)
+
+    def read_events(self, response):
+        events = []
+        for chunk in response.response:
+            text = chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+            if text.startswith('event:'):
+                fields = dict(line.split(': ', 1) for line in text.strip().split('\n'))
+                events.append((fields['event'], fields.get('id'), json.loads(fields['data'])))
+                if fields['event'] == 'end':
+                    break
+        response.close()
+        return events
+
+    def test_stream_deltas_and_resume(self):
+        """测试SSE推送增量并支持 Last-Event-ID 续传"""
+        with open(self.log_file, 'w') as f:
+            f.write('Round 1/2 loss=0.5 accuracy: 0.7\nTraining completed\n')
+        response = self.app.get('/api/system/train/stream', query_string={'log_file': self.log_file}, buffered=False)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        events = self.read_events(response)
+        types = [event[0] for event in events]
+        self.assertEqual(types[0], 'snapshot')
+        self.assertEqual(types[-1], 'end')
+        self.assertEqual(events[-1][2]['status'], 'completed')
+
+        # 从第一个事件之后续传，不再重复发送完整状态
+        first_id = events[0][1]
+        response = self.app.get('/api/system/train/stream', query_string={'log_file': self.log_file},
+                                headers={'Last-Event-ID': first_id}, buffered=False)
+        resumed = self.read_events(response)
+        self.assertNotIn('snapshot', [event[0] for event in resumed])
+        self.assertEqual(resumed[-1][0], 'end')
+
+    def test_metrics_endpoint(self):
+        """测试指标时间序列查询接口"""
+        with open(self.log_file, 'w') as f:
+            f.write('Round 1/3 loss=0.9\nRound 2/3 loss=0.5 accuracy=0.8\n')
+        query = {'log_file': self.log_file, 'metrics': 'loss,accuracy'}
+        data = self.app.get('/api/system/train/metrics', query_string=query).get_json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['rounds'], [1, 2])
+        self.assertEqual(data['metrics'], {'loss': [0.9, 0.5], 'accuracy': [None, 0.8]})
+
+        data = self.app.get('/api/system/train/metrics', query_string=dict(query, since_round=1)).get_json()
+        self.assertEqual(data['rounds'], [2])
+
+    def test_missing_log_file_param(self):
+        """测试缺少日志文件参数"""
+        response = self.app.get('/api/system/train/stream')
+        self.assertEqual(response.status_code, 400)
+
+class TestAsyncEndpoints(unittest.TestCase):
+    def setUp(self):
+        from backend.asgi import create_async_app, app as dispatcher
+        from backend.utils.ssh_pool import ssh_pool
+        from backend.utils.training_monitor import training_monitors
+        FakeSSHClient.reset()
+        ssh_pool.client_factory = FakeSSHClient
+        training_monitors.interval = 0.05
+        use_temp_training_queue(self)
+        self.dispatcher = dispatcher
+        self.app = create_async_app()
+        self.log_file = tempfile.NamedTemporaryFile(suffix='.log', delete=False).name
+
+    def tearDown(self):
+        from backend.api.system import get_ssh_client
+        get_ssh_client().close()
+        os.remove(self.log_file)
+
+    def test_routing(self):
+        """测试SSH与训练接口分发到 asyncio 版本，其余接口仍由 Flask 处理"""
+        self.assertTrue(self.dispatcher.handles('/api/system/ssh/execute', 'POST'))
+        self.assertTrue(self.dispatcher.handles('/api/system/train/stream', 'GET'))
+        self.assertFalse(self.dispatcher.handles('/api/system/ssh/status', 'GET'))
+        self.assertFalse(self.dispatcher.handles('/api/communication/data', 'GET'))
+
+    def test_execute_and_stream(self):
+        """测试 asyncio 版本的连接、命令执行、输出流与训练进度推送"""
+        from backend.utils.metrics import http_request_seconds, http_response_bytes, ssh_command_seconds
+        with open(self.log_file, 'w') as f:
+            f.write('Round 1/2 loss=0.5 accuracy: 0.7\nTraining completed\n')
+        stream_labels = {'blueprint': 'system_async', 'route': '/api/system/ssh/jobs/<job_id>/stream'}
+        streams_before = http_request_seconds.count(method='GET', **stream_labels)
+        sizes_before = http_response_bytes.count(**stream_labels)
+        jobs_before = ssh_command_seconds.count(mode='job', status='completed')
+
+        async def run():
+            client = self.app.test_client()
+            response = await client.post('/api/system/ssh/connect',
+                                         json={'hostname': 'host', 'username': 'root', 'wait': 5})
+            self.assertTrue((await response.get_json())['success'])
+
+            response = await client.post('/api/system/ssh/execute', json={'command': 'echo hi', 'wait': True})
+            data = await response.get_json()
+            self.assertEqual((data['success'], data['stdout']), (True, 'hi\n'))
+            self.assertEqual(response.headers['Access-Control-Allow-Origin'], '*')
+
+            response = await client.post('/api/system/ssh/execute', json={'command': 'echo a; sleep 0.1; echo b'})
+            self.assertEqual(response.status_code, 202)
+            job_id = (await response.get_json())['job_id']
+            response = await client.get(f'/api/system/ssh/jobs/{job_id}/stream')
+            lines = [json.loads(line) for line in (await response.get_data(as_text=True)).splitlines()]
+            self.assertEqual(''.join(line.get('stdout', '') for line in lines), 'a\nb\n')
+            self.assertEqual(lines[-1]['job']['status'], 'completed')
+
+            response = await client.get('/api/system/train/stream', query_string={'log_file': self.log_file})
+            body = await response.get_data(as_text=True)
+            events = [line.split(': ', 1)[1] for line in body.splitlines() if line.startswith('event:')]
+            self.assertEqual(events[0], 'snapshot')
+            self.assertEqual(events[-1], 'end')
+
+        asyncio.run(run())
+        # asyncio 版本同样记录路由耗时、流式响应大小与后台命令耗时
+        self.assertEqual(http_request_seconds.count(method='GET', **stream_labels) - streams_before, 1)
+        self.assertEqual(http_response_bytes.count(**stream_labels) - sizes_before, 1)
+        self.assertEqual(ssh_command_seconds.count(mode='job', status='completed') - jobs_before, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,294 @@
+import unittest
+import sys
+import os
+import tempfile
+import shutil
+
+import numpy as np
+
+# 添加项目根目录及后端目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'FedGMM_Ali_frontend'))
+
+from backend.utils.poi_catalog import POICatalog, StringTable
+from backend.utils.gmm_inference import GMMInference, gamma_to_weights, logsumexp
+from backend.utils.feature_store import FeatureStore
+from backend.utils.shared_data import SharedDataRegistry
+from backend.utils import metrics as metrics_module
+from backend.utils.metrics import MetricsRegistry, instrument_app
+
+class TestPOICatalog(unittest.TestCase):
+    def setUp(self):
+        self.records = [
+            {'place_id': 1, 'name': '西湖', 'category': '自然景观', 'score': 4.9, 'price': '低', 'popularity': 99},
+            {'place_id': 2, 'name': '灵隐寺', 'category': '文化古迹', 'score': 4.7, 'price': '低', 'popularity': 92},
+            {'place_id': 3, 'name': '宋城', 'category': '主题公园', 'score': 4.5, 'price': '高', 'popularity': 85}
+        ]
+        self.catalog = POICatalog.from_records(self.records)
+
+    def test_round_trip(self):
+        """测试列式存储与字典的往返转换"""
+        records = self.catalog.to_records(range(len(self.catalog)))
+        for i, record in enumerate(records):
+            expected = dict(self.records[i], rank=i + 1)
+            self.assertEqual(record, expected)
+
+    def test_dictionary_encoding(self):
+        """测试类别与价格的字典编码"""
+        self.assertEqual(len(self.catalog.prices), 2)
+        self.assertEqual(self.catalog.category_mask('文化古迹').tolist(), [False, True, False])
+        self.assertFalse(self.catalog.category_mask('购物').any())
+
+    def test_top_k(self):
+        """测试前K个选择按分数降序"""
+        scores = np.array([0.1, 0.9, 0.5])
+        self.assertEqual(self.catalog.top_k(scores, 2).tolist(), [1, 2])
+        self.assertEqual(self.catalog.top_k(scores, 10).tolist(), [1, 2, 0])
+        self.assertEqual(len(self.catalog.top_k(scores, 0)), 0)
+        self.assertEqual(self.catalog.top_k(scores, -1).tolist(), [1, 2])
+        self.assertEqual(len(self.catalog.top_k(scores, -5)), 0)
+
+    def test_shared_names(self):
+        """测试多个目录共享名称字符串表"""
+        names = StringTable()
+        POICatalog.from_records(self.records, names=names)
+        POICatalog.from_records(self.records[:1], names=names)
+        self.assertEqual(len(names), 3)
+
+class TestGMMInference(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.model = GMMInference(rng.normal(size=(4, 3)), rng.uniform(0.5, 2, size=(4, 3)))
+        self.X = rng.normal(size=(50, 3))
+
+    def test_gamma_to_weights(self):
+        """测试γ字典按数字键排序并归一化"""
+        weights = gamma_to_weights({'10': 1, '2': 1, '1': 2})
+        self.assertTrue(np.allclose(weights, [0.5, 0.25, 0.25]))
+        with self.assertRaises(ValueError):
+            gamma_to_weights({'1': 0})
+
+    def test_logsumexp_stable(self):
+        """测试log-sum-exp在极端值下不溢出"""
+        a = np.array([[1000.0, 1000.0], [-np.inf, -np.inf]])
+        out = logsumexp(a, axis=1)
+        self.assertAlmostEqual(out[0], 1000.0 + np.log(2))
+        self.assertEqual(out[1], -np.inf)
+
+    def test_responsibilities_match_direct(self):
+        """测试责任度与直接计算结果一致"""
+        weights = np.array([0.1, 0.2, 0.3, 0.4])
+        resp = self.model.responsibilities(self.X, weights)
+        diff = self.X[:, None, :] - self.model.means[None]
+        log_pdf = -0.5 * np.sum(diff ** 2 / self.model.variances + np.log(2 * np.pi * self.model.variances), axis=2)
+        joint = np.exp(log_pdf) * weights
+        self.assertTrue(np.allclose(resp, joint / joint.sum(axis=1, keepdims=True)))
+        self.assertTrue(np.allclose(resp.sum(axis=1), 1))
+
+    def test_per_user_weights_and_mixed_score(self):
+        """测试逐用户权重与个性化混合打分"""
+        weights = np.tile([0.25, 0.25, 0.25, 0.25], (len(self.X), 1))
+        component_scores = np.eye(4)
+        scores = self.model.mixed_score(self.X, component_scores, weights)
+        self.assertTrue(np.allclose(scores, self.model.responsibilities(self.X)))
+        with self.assertRaises(ValueError):
+            self.model.responsibilities(self.X, np.ones(3))
+
+class TestFeatureStore(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = FeatureStore(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_bulk_lookup(self):
+        """测试批量查询与未命中处理"""
+        features = np.arange(12, dtype=np.float32).reshape(4, 3)
+        self.store.publish('Tokyo', [7, 2, 5, 0], features)
+        out, found = self.store.lookup('Tokyo', [5, 3, 7, 100, -1, 0])
+        self.assertEqual(found.tolist(), [True, False, True, False, False, True])
+        self.assertEqual(out[0].tolist(), features[2].tolist())
+        self.assertEqual(out[2].tolist(), features[0].tolist())
+        self.assertEqual(out[1].tolist(), [0, 0, 0])
+        self.assertEqual(out.dtype, np.float32)
+
+    def test_missing_city(self):
+        """测试不存在的城市返回全部未命中"""
+        out, found = self.store.lookup('Osaka', [1, 2])
+        self.assertFalse(found.any())
+        self.assertEqual(out.shape, (2, 0))
+
+    def test_versioned_replacement(self):
+        """测试发布新版本后原子切换并清理旧版本"""
+        self.store.publish('Tokyo', [1], np.ones((1, 2)), version='v1')
+        old_snapshot = self.store.open('Tokyo')
+        self.store.publish('Tokyo', [1], np.full((1, 2), 2.0), version='v2')
+        self.store.publish('Tokyo', [1], np.full((1, 2), 3.0), version='v3')
+        self.assertEqual(self.store.current_version('Tokyo'), 'v3')
+        self.assertEqual(self.store.lookup('Tokyo', [1])[0][0].tolist(), [3.0, 3.0])
+        self.assertEqual(self.store.versions('Tokyo'), ['v2', 'v3'])
+        # 已打开的旧快照仍可读取
+        self.assertEqual(old_snapshot.lookup([1])[0][0].tolist(), [1.0, 1.0])
+        with self.assertRaises(ValueError):
+            self.store.publish('Tokyo', [1, 1], np.ones((2, 2)))
+
+def _read_shared_column(manifest_dir, namespace, name, column, queue):
+    """子进程中附加共享数据并读取一列"""
+    table = SharedDataRegistry(manifest_dir, namespace).attach(name)
+    queue.put((table.generation, table[column].tolist()))
+
+class TestSharedData(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.namespace = f'test{os.getpid()}'
+        self.registry = SharedDataRegistry(self.root, self.namespace)
+
+    def tearDown(self):
+        self.registry.unlink_published()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_publish_and_attach(self):
+        """测试发布后按清单零拷贝附加，列只读且值不变"""
+        columns = {'round': np.arange(5, dtype=np.int32), 'ratio': np.linspace(0, 1, 5)}
+        self.registry.publish('demo', columns)
+        table = SharedDataRegistry(self.root, self.namespace).attach('demo')
+        self.assertEqual(table.generation, 1)
+        self.assertEqual(len(table), 5)
+        self.assertEqual(table['round'].dtype, np.int32)
+        self.assertEqual(table['ratio'].tolist(), columns['ratio'].tolist())
+        self.assertFalse(table['round'].flags.writeable)
+        self.assertEqual(table.to_records(np.array([1, 3])), [{'round': 1, 'ratio': 0.25}, {'round': 3, 'ratio': 0.75}])
+        with self.assertRaises(ValueError):
+            self.registry.publish('demo', {'a': np.zeros(2), 'b': np.zeros(3)})
+
+    def test_generation_swap_across_processes(self):
+        """测试重新发布后其他进程附加到新一代，旧段按保留代数删除"""
+        import multiprocessing
+        self.registry.publish('demo', {'value': np.zeros(3)})
+        reader = SharedDataRegistry(self.root, self.namespace)
+        first = reader.attach('demo')
+        self.registry.publish('demo', {'value': np.ones(3)})
+        self.registry.publish('demo', {'value': np.full(3, 2.0)})
+        self.assertEqual(reader.attach('demo').generation, 3)
+        # 第一代的共享内存段已删除，但已附加的映射仍可读取
+        self.assertEqual(first['value'].tolist(), [0.0, 0.0, 0.0])
+
+        context = multiprocessing.get_context('spawn')
+        queue = context.Queue()
+        process = context.Process(target=_read_shared_column, args=(self.root, self.namespace, 'demo', 'value', queue))
+        process.start()
+        self.assertEqual(queue.get(timeout=30), (3, [2.0, 2.0, 2.0]))
+        process.join(30)
+        # 子进程退出不应删除发布方的共享内存段
+        self.assertEqual(SharedDataRegistry(self.root, self.namespace).attach('demo').generation, 3)
+
+    def test_lazy_publish(self):
+        """测试未发布的数据集在首次访问时按登记的构建函数发布"""
+        self.registry.register('lazy', lambda: {'x': np.arange(3)})
+        self.assertIsNone(self.registry.attach('lazy'))
+        self.assertEqual(self.registry.table('lazy')['x'].tolist(), [0, 1, 2])
+        self.registry.unlink_published()
+        self.assertIsNone(self.registry.read_manifest('lazy'))
+        with self.assertRaises(KeyError):
+            self.registry.table('missing')
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_histogram_render(self):
+        """测试直方图按累计桶导出，标签值转义"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram('demo_seconds', '示例', ('route',), buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, route='/a"b')
+        registry.counter('demo_total', '计数').inc(2)
+        text = registry.render()
+        self.assertIn('# TYPE demo_seconds histogram', text)
+        self.assertIn('demo_seconds_bucket{route="/a\\"b",le="0.1"} 1', text)
+        self.assertIn('demo_seconds_bucket{route="/a\\"b",le="1.0"} 2', text)
+        self.assertIn('demo_seconds_bucket{route="/a\\"b",le="+Inf"} 3', text)
+        self.assertIn('demo_seconds_count{route="/a\\"b"} 3', text)
+        self.assertIn('demo_total 2', text)
+        with self.assertRaises(ValueError):
+            histogram.observe(1, path='/a')
+
+    def test_merge_worker_snapshots(self):
+        """测试合并各工作进程快照，已退出进程的计数并入归档、瞬时值丢弃"""
+        def make_registry():
+            registry = MetricsRegistry(self.root)
+            registry.counter('demo_total', '计数', ('route',))
+            registry.gauge('demo_in_flight', '处理中', ('route',))
+            return registry
+
+        dead = make_registry()
+        dead._metrics['demo_total'].inc(3, route='/a')
+        dead._metrics['demo_in_flight'].inc(route='/a')
+        dead._write_json(dead._worker_path(999999), dead.snapshot())
+        dead.mark_process_dead(999999)
+        self.assertEqual(sorted(os.listdir(self.root)), ['archive.json'])
+
+        live = make_registry()
+        live._metrics['demo_total'].inc(2, route='/a')
+        live._metrics['demo_in_flight'].inc(route='/b')
+        text = live.render()
+        self.assertIn('demo_total{route="/a"} 5', text)
+        self.assertIn('demo_in_flight{route="/b"} 1', text)
+        self.assertNotIn('demo_in_flight{route="/a"}', text)
+
+    def test_flask_request_metrics(self):
+        """测试请求钩子按路由模板记录耗时、状态码、错误数与流式响应大小"""
+        from flask import Flask
+
+        app = Flask('metrics_test')
+        instrument_app(app)
+
+        @app.route('/items/<int:item_id>')
+        def item(item_id):
+            return 'x' * item_id
+
+        @app.route('/boom')
+        def boom():
+            raise RuntimeError('boom')
+
+        @app.route('/stream')
+        def stream():
+            return app.response_class(iter(['ab', 'cde']))
+
+        def count(route):
+            return metrics_module.http_request_seconds.count(blueprint='', route=route, method='GET')
+
+        before = {route: count(route) for route in ('/items/<int:item_id>', '/boom', '/stream')}
+        errors = metrics_module.http_request_errors_total.get(blueprint='', route='/boom', method='GET')
+        sizes = metrics_module.http_response_bytes.samples()
+        client = app.test_client()
+        client.get('/items/3')
+        client.get('/items/4')
+        self.assertEqual(client.get('/boom').status_code, 500)
+        self.assertEqual(client.get('/stream').get_data(), b'abcde')
+
+        self.assertEqual(count('/items/<int:item_id>') - before['/items/<int:item_id>'], 2)
+        self.assertEqual(count('/boom') - before['/boom'], 1)
+        self.assertEqual(metrics_module.http_request_errors_total.get(
+            blueprint='', route='/boom', method='GET') - errors, 1)
+        stream_sizes = dict(metrics_module.http_response_bytes.samples())[('', '/stream')]
+        previous = dict(sizes).get(('', '/stream'), [[0], 0.0])
+        self.assertEqual(stream_sizes[1] - previous[1], 5)
+        self.assertEqual(metrics_module.http_requests_in_flight.get(blueprint='', route='/stream'), 0)
+
+        # 流式响应在响应体发送完毕或被关闭前仍计入正在处理的请求
+        in_flight = lambda: metrics_module.http_requests_in_flight.get(blueprint='', route='/stream')
+        response = client.get('/stream', buffered=False)
+        self.assertEqual(next(response.iter_encoded()), b'ab')
+        self.assertEqual(in_flight(), 1)
+        response.close()
+        self.assertEqual(in_flight(), 0)
+        client.get('/stream', buffered=False).close()
+        self.assertEqual(in_flight(), 0)
+
+if __name__ == '__main__':
+    unittest.main()